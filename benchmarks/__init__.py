@@ -0,0 +1,8 @@
+"""
+Benchmarks do pg-mirror contra um cluster PostgreSQL local e descartável
+
+Uso:
+
+    python -m benchmarks run --output results.json
+    python -m benchmarks compare baseline.json results.json
+"""
@@ -0,0 +1,84 @@
+"""Command line for the benchmark harness"""
+import json
+import sys
+
+import click
+
+from pg_mirror.logger import setup_logger
+
+from benchmarks.cluster import EphemeralCluster
+from benchmarks.run import compare_results, run_benchmarks
+from benchmarks.shapes import SHAPES
+
+
+@click.group()
+def cli():
+    """Benchmarks do pg-mirror em clusters PostgreSQL descartáveis."""
+
+
+@cli.command()
+@click.option('--shape', 'shapes', multiple=True, type=click.Choice(sorted(SHAPES)),
+              help='Formato a executar (repetível; padrão: todos)')
+@click.option('--scale', type=float, default=1.0, show_default=True,
+              help='Multiplicador do volume de dados')
+@click.option('--options', 'options_json', default='{}',
+              help='JSON com a seção options do pg-mirror (ex.: \'{"parallel_jobs": 8}\')')
+@click.option('--pg-bin', help='Diretório de initdb/pg_ctl (padrão: PATH ou PG_BIN)')
+@click.option('-o', '--output', default='bench_results.json', show_default=True,
+              help='Arquivo JSON de resultados')
+@click.option('--baseline', type=click.Path(exists=True),
+              help='Compara com a linha de base e falha em regressão')
+@click.option('--tolerance', type=float, default=0.10, show_default=True,
+              help='Queda de vazão aceita em relação à linha de base')
+@click.option('-v', '--verbose', is_flag=True, help='Mostra mensagens DEBUG')
+def run(shapes, scale, options_json, pg_bin, output, baseline, tolerance, verbose):
+    """
+    Gera os bancos sintéticos, espelha cada um e grava os tempos por fase.
+
+    Origem e destino são dois clusters criados com initdb e removidos ao
+    final.
+    """
+    logger = setup_logger(verbose)
+    options = json.loads(options_json)
+    with EphemeralCluster(pg_bin) as source, EphemeralCluster(pg_bin) as target:
+        report = run_benchmarks(source, target, shapes or sorted(SHAPES), scale, options, logger)
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Resultados gravados em {output}")
+
+    if baseline:
+        sys.exit(_compare(baseline, output, tolerance, logger))
+
+
+@cli.command()
+@click.argument('baseline', type=click.Path(exists=True))
+@click.argument('current', type=click.Path(exists=True))
+@click.option('--tolerance', type=float, default=0.10, show_default=True,
+              help='Queda de vazão aceita em relação à linha de base')
+def compare(baseline, current, tolerance):
+    """Compara dois arquivos de resultados e falha se a vazão cair."""
+    sys.exit(_compare(baseline, current, tolerance, setup_logger()))
+
+
+def _compare(baseline_path, current_path, tolerance, logger):
+    """Imprime o comparativo e retorna o código de saída"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(current_path, encoding='utf-8') as f:
+        current = json.load(f)
+
+    regressions, lines = compare_results(baseline, current, tolerance)
+    for line in lines:
+        logger.info(line)
+    if regressions:
+        logger.error(f"{len(regressions)} regressão(ões) acima de {tolerance:.0%}:")
+        for line in regressions:
+            logger.error(f"   {line}")
+        return 1
+    logger.info("Sem regressões de vazão")
+    return 0
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,154 @@
+"""Ephemeral local PostgreSQL cluster for benchmarks"""
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+
+
+def find_pg_bin(pg_bin=None):
+    """
+    Diretório com initdb e pg_ctl
+
+    Args:
+        pg_bin: Diretório explícito (ou variável PG_BIN)
+
+    Returns:
+        str: Diretório dos binários, ou '' para usar o PATH
+
+    Raises:
+        RuntimeError: Se initdb não for encontrado
+    """
+    pg_bin = pg_bin or os.environ.get('PG_BIN', '')
+    if pg_bin:
+        if not os.path.exists(os.path.join(pg_bin, 'initdb')):
+            raise RuntimeError(f"initdb não encontrado em {pg_bin}")
+        return pg_bin
+    if shutil.which('initdb'):
+        return ''
+    # Debian/Ubuntu instalam os binários do servidor fora do PATH
+    base = '/usr/lib/postgresql'
+    if os.path.isdir(base):
+        for version in sorted(os.listdir(base), key=lambda v: int(v) if v.isdigit() else 0,
+                              reverse=True):
+            candidate = os.path.join(base, version, 'bin')
+            if os.path.exists(os.path.join(candidate, 'initdb')):
+                return candidate
+    raise RuntimeError("initdb não encontrado; informe --pg-bin ou PG_BIN")
+
+
+def free_port():
+    """Porta TCP livre em localhost"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class EphemeralCluster:
+    """
+    Cluster criado com initdb num diretório temporário
+
+    Escuta apenas em um socket Unix próprio, com autenticação trust e
+    configurações de carga (fsync desligado), e é removido ao sair do
+    bloco with.
+    """
+
+    SETTINGS = {
+        'fsync': 'off',
+        'full_page_writes': 'off',
+        'synchronous_commit': 'off',
+        'max_connections': '100',
+        'shared_buffers': '256MB',
+        'maintenance_work_mem': '256MB',
+        'max_wal_size': '4GB',
+    }
+
+    def __init__(self, pg_bin=None, keep=False):
+        """
+        Args:
+            pg_bin: Diretório de initdb/pg_ctl (padrão: PATH ou PG_BIN)
+            keep: Se True, não remove o diretório de dados ao final
+        """
+        self.pg_bin = find_pg_bin(pg_bin)
+        self.keep = keep
+        self.root = None
+        self.port = None
+
+    def _tool(self, name):
+        return os.path.join(self.pg_bin, name) if self.pg_bin else name
+
+    @property
+    def data_dir(self):
+        return os.path.join(self.root, 'data')
+
+    @property
+    def socket_dir(self):
+        return self.root
+
+    def connection(self):
+        """
+        Dicionário de conexão no formato da configuração do pg-mirror
+
+        Returns:
+            dict: host (socket), port, user e password
+        """
+        return {
+            'host': self.socket_dir,
+            'port': self.port,
+            'user': 'postgres',
+            'password': '',
+        }
+
+    def start(self):
+        """Cria e inicia o cluster"""
+        self.root = tempfile.mkdtemp(prefix='pg_mirror_bench_')
+        self.port = free_port()
+        subprocess.run(
+            [self._tool('initdb'), '-D', self.data_dir, '-U', 'postgres',
+             '--auth=trust', '--no-sync', '-E', 'UTF8'],
+            check=True, capture_output=True, text=True
+        )
+        options = ' '.join(f"-c {name}={value}" for name, value in self.SETTINGS.items())
+        subprocess.run(
+            [self._tool('pg_ctl'), '-D', self.data_dir, '-w',
+             '-l', os.path.join(self.root, 'server.log'),
+             '-o', f"-p {self.port} -k {self.socket_dir} -c listen_addresses='' {options}",
+             'start'],
+            check=True, capture_output=True, text=True
+        )
+        return self
+
+    def stop(self):
+        """Para o cluster e remove os arquivos"""
+        if self.root is None:
+            return
+        subprocess.run(
+            [self._tool('pg_ctl'), '-D', self.data_dir, '-m', 'fast', 'stop'],
+            capture_output=True, text=True
+        )
+        if not self.keep:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def psql(self, database, sql):
+        """
+        Executa SQL no cluster (interrompe no primeiro erro)
+
+        Args:
+            database: Banco de dados
+            sql: Comandos a executar
+
+        Returns:
+            str: Saída do psql (-tA)
+        """
+        result = subprocess.run(
+            ['psql', '-h', self.socket_dir, '-p', str(self.port), '-U', 'postgres',
+             '-d', database, '-X', '-tA', '-v', 'ON_ERROR_STOP=1'],
+            input=sql, check=True, capture_output=True, text=True
+        )
+        return result.stdout.strip()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,198 @@
+"""Benchmark runner and baseline comparison"""
+import json
+import os
+import platform
+import tempfile
+from datetime import datetime, timezone
+
+from pg_mirror.config import load_config
+from pg_mirror.metrics import collect_metrics
+from pg_mirror.mirror import mirror_database
+
+from benchmarks.shapes import SHAPES
+
+
+MB = 1024 * 1024
+THROUGHPUT_PHASES = ('backup', 'restore', 'total')
+
+
+def populate(cluster, shape, scale):
+    """
+    Cria o banco de origem de um formato e retorna seu tamanho
+
+    Args:
+        cluster: EphemeralCluster de origem
+        shape: Nome do formato (SHAPES)
+        scale: Multiplicador do volume de dados
+
+    Returns:
+        int: pg_database_size em bytes
+    """
+    database = f"bench_{shape}"
+    cluster.psql('postgres', f'CREATE DATABASE "{database}";')
+    cluster.psql(database, SHAPES[shape](scale))
+    cluster.psql(database, 'VACUUM ANALYZE;')
+    return int(cluster.psql(database, 'SELECT pg_database_size(current_database());'))
+
+
+def build_config(source, target, database, options, work_dir, logger):
+    """
+    Configuração do pg-mirror para a execução, com os padrões do load_config
+
+    Args:
+        source: EphemeralCluster de origem
+        target: EphemeralCluster de destino
+        database: Nome do banco de dados
+        options: Seção options (sobrescreve os padrões)
+        work_dir: Diretório para o arquivo de configuração e estado
+        logger: Logger configurado
+
+    Returns:
+        dict: Configuração carregada
+    """
+    config = {
+        'source': {**source.connection(), 'database': database},
+        'target': target.connection(),
+        'options': {'state_dir': os.path.join(work_dir, 'state'), **options},
+    }
+    path = os.path.join(work_dir, f'{database}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    return load_config(path, logger)
+
+
+def phase_seconds(report, database):
+    """
+    Segundos de relógio por fase de um banco no relatório de métricas
+
+    Fases repetidas (ex.: target_prep e restore de vários destinos) são
+    somadas; fases sem banco (cleanup) também contam.
+
+    Args:
+        report: Relatório de collect_metrics (RunMetrics.to_dict)
+        database: Nome do banco de dados
+
+    Returns:
+        dict: {fase: segundos}, com 'total' = duração da execução
+    """
+    seconds = {}
+    for record in report['phases']:
+        if record.get('database') in (database, None) and record['name'] != 'checks':
+            seconds[record['name']] = seconds.get(record['name'], 0) + record['wall_seconds']
+    seconds['total'] = report['wall_seconds']
+    return seconds
+
+
+def run_shape(source, target, shape, scale, options, logger):
+    """
+    Espelha o banco de um formato medindo cada fase
+
+    Executa mirror_database, o mesmo fluxo do pg-mirror mirror (com o
+    modo e as opções de options), e lê os tempos das fases do relatório
+    de métricas.
+
+    Args:
+        source: EphemeralCluster de origem
+        target: EphemeralCluster de destino
+        shape: Nome do formato (SHAPES)
+        scale: Multiplicador do volume de dados
+        options: Seção options do pg-mirror
+        logger: Logger configurado
+
+    Returns:
+        dict: Tamanhos, segundos por fase e vazão (MB/s)
+    """
+    database = f"bench_{shape}"
+    logger.info(f"[{shape}] Gerando dados (escala {scale})...")
+    database_bytes = populate(source, shape, scale)
+
+    with tempfile.TemporaryDirectory(prefix='pg_mirror_bench_') as work_dir:
+        cfg = build_config(source, target, database, options, work_dir, logger)
+        report_path = os.path.join(work_dir, 'metrics.json')
+        try:
+            with collect_metrics(report_path, logger):
+                success = mirror_database(cfg, database, logger)
+        except SystemExit:
+            success = False
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+
+    timings = phase_seconds(report, database)
+    database_mb = database_bytes / MB
+    return {
+        'success': success,
+        'database_bytes': database_bytes,
+        'archive_bytes': report['databases'].get(database, {}).get('archive_bytes'),
+        'seconds': {phase: round(value, 3) for phase, value in timings.items()},
+        'throughput_mb_s': {
+            phase: round(database_mb / timings[phase], 2) if timings.get(phase) else None
+            for phase in THROUGHPUT_PHASES
+        },
+    }
+
+
+def run_benchmarks(source, target, shapes, scale, options, logger):
+    """
+    Executa os formatos escolhidos e monta o relatório
+
+    Args:
+        source: EphemeralCluster de origem
+        target: EphemeralCluster de destino
+        shapes: Nomes dos formatos
+        scale: Multiplicador do volume de dados
+        options: Seção options do pg-mirror
+        logger: Logger configurado
+
+    Returns:
+        dict: Relatório completo (serializável em JSON)
+    """
+    results = {}
+    for shape in shapes:
+        results[shape] = run_shape(source, target, shape, scale, options, logger)
+        rates = results[shape]['throughput_mb_s']
+        logger.info(
+            f"[{shape}] backup {rates['backup']} MB/s, restore {rates['restore']} MB/s, "
+            f"total {rates['total']} MB/s"
+        )
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'host': platform.node(),
+        'postgres': source.psql('postgres', 'SHOW server_version;'),
+        'scale': scale,
+        'options': options,
+        'results': results,
+    }
+
+
+def compare_results(baseline, current, tolerance):
+    """
+    Compara a vazão de cada formato e fase com a linha de base
+
+    Args:
+        baseline: Relatório de referência
+        current: Relatório da execução atual
+        tolerance: Queda relativa aceita (0.10 = 10%)
+
+    Returns:
+        tuple: (lista de regressões, lista de linhas do comparativo)
+    """
+    regressions, lines = [], []
+    for shape, reference in baseline['results'].items():
+        result = current['results'].get(shape)
+        if result is None:
+            lines.append(f"{shape}: ausente na execução atual")
+            continue
+        if not result['success']:
+            regressions.append(f"{shape}: espelhamento falhou")
+            continue
+        for phase in THROUGHPUT_PHASES:
+            before = reference['throughput_mb_s'].get(phase)
+            after = result['throughput_mb_s'].get(phase)
+            if not before or after is None:
+                continue
+            change = after / before - 1
+            line = f"{shape}.{phase}: {before} -> {after} MB/s ({change:+.1%})"
+            lines.append(line)
+            if change < -tolerance:
+                regressions.append(line)
+    return regressions, lines
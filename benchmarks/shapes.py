@@ -0,0 +1,100 @@
+"""Synthetic database shapes for benchmarks"""
+
+
+def many_small(scale):
+    """Muitas tabelas pequenas: custo fixo por objeto domina"""
+    tables, rows = int(400 * scale), 500
+    return f"""
+    DO $$
+    BEGIN
+        FOR i IN 1..{tables} LOOP
+            EXECUTE format(
+                'CREATE TABLE small_%s (id integer PRIMARY KEY, name text NOT NULL, '
+                'created_at timestamptz NOT NULL DEFAULT now())', i);
+            EXECUTE format(
+                'INSERT INTO small_%s (id, name) '
+                'SELECT g, md5(g::text) FROM generate_series(1, {rows}) g', i);
+        END LOOP;
+    END $$;
+    """
+
+
+def few_huge(scale):
+    """Poucas tabelas grandes: vazão de COPY e da compressão"""
+    rows = int(2_000_000 * scale)
+    statements = []
+    for i in range(1, 4):
+        statements.append(f"""
+        CREATE TABLE huge_{i} (
+            id bigint PRIMARY KEY,
+            account_id integer NOT NULL,
+            amount numeric(12, 2) NOT NULL,
+            payload text NOT NULL,
+            created_at timestamptz NOT NULL
+        );
+        INSERT INTO huge_{i}
+        SELECT g, g % 10000, (random() * 10000)::numeric(12, 2),
+               repeat(md5(g::text), 3), now() - g * interval '1 second'
+        FROM generate_series(1, {rows}) g;
+        """)
+    return '\n'.join(statements)
+
+
+def heavy_indexes(scale):
+    """Uma tabela com muitos índices e FK: custo do post-data"""
+    rows = int(1_000_000 * scale)
+    return f"""
+    CREATE TABLE accounts (id integer PRIMARY KEY, email text NOT NULL);
+    INSERT INTO accounts SELECT g, 'user' || g || '@example.com'
+    FROM generate_series(1, 10000) g;
+
+    CREATE TABLE events (
+        id bigint PRIMARY KEY,
+        account_id integer NOT NULL REFERENCES accounts (id),
+        kind text NOT NULL,
+        score double precision NOT NULL,
+        tags text[] NOT NULL,
+        attributes jsonb NOT NULL,
+        created_at timestamptz NOT NULL
+    );
+    INSERT INTO events
+    SELECT g, 1 + g % 10000, 'kind_' || (g % 50), random(),
+           ARRAY['t' || (g % 7), 't' || (g % 11)],
+           jsonb_build_object('n', g, 'bucket', g % 100),
+           now() - g * interval '1 minute'
+    FROM generate_series(1, {rows}) g;
+
+    CREATE INDEX ON events (account_id);
+    CREATE INDEX ON events (kind, created_at);
+    CREATE INDEX ON events (created_at DESC);
+    CREATE INDEX ON events (score);
+    CREATE INDEX ON events (lower(kind));
+    CREATE INDEX ON events USING gin (tags);
+    CREATE INDEX ON events USING gin (attributes);
+    CREATE UNIQUE INDEX ON events (account_id, id);
+    """
+
+
+def blobs(scale):
+    """bytea grande e large objects: dados pouco compressíveis"""
+    rows, objects = int(4000 * scale), int(400 * scale)
+    return f"""
+    CREATE TABLE documents (id integer PRIMARY KEY, content bytea NOT NULL);
+    INSERT INTO documents
+    SELECT g, decode(string_agg(md5(g::text || ':' || p), ''), 'hex')
+    FROM generate_series(1, {rows}) g, generate_series(1, 2048) p
+    GROUP BY g;
+
+    CREATE TABLE attachments (id integer PRIMARY KEY, blob oid NOT NULL);
+    INSERT INTO attachments
+    SELECT g, lo_from_bytea(0, decode(repeat(md5(g::text), 4096), 'hex'))
+    FROM generate_series(1, {objects}) g;
+    """
+
+
+SHAPES = {
+    'many_small': many_small,
+    'few_huge': few_huge,
+    'heavy_indexes': heavy_indexes,
+    'blobs': blobs,
+}
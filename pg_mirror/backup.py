@@ -2,17 +2,54 @@
 import subprocess
 import sys
 import os
+import shutil
 import tempfile
 from pathlib import Path
 
+from pg_mirror.database import quote_ident
+from pg_mirror.compression import compression_args, describe_compression
+from pg_mirror.progress import run_with_progress
+from pg_mirror import metrics
+from pg_mirror.openmetrics import BACKUP_BYTES, DUMPED_TABLES
 
-def create_backup(host, port, database, user, password, logger):
+
+def build_dump_command(host, port, database, user, *args):
+    """
+    Monta a linha de comando base do pg_dump
+    
+    Args:
+        host: Hostname do servidor PostgreSQL
+        port: Porta do servidor
+        database: Nome do banco de dados
+        user: Usuário do PostgreSQL
+        *args: Argumentos adicionais do pg_dump
+        
+    Returns:
+        list: Comando pronto para subprocess
+    """
+    return [
+        'pg_dump',
+        '-h', host,
+        '-p', str(port),
+        '-U', user,
+        '-d', database,
+        *args
+    ]
+
+
+def create_backup(host, port, database, user, password, logger, dump_jobs=1,
+                  tables=None, data_only=False, compression=None, output_dir=None,
+                  exclude_data=None, snapshot=None):
     """
     Cria backup com formato custom (-Fc):
     - Compressão nativa (menor tamanho)
     - Permite restore paralelo (mais rápido)
     - Formato binário otimizado
     
+    Com dump_jobs > 1 usa o formato diretório (-Fd -j N), em que o
+    próprio pg_dump é paralelizado (uma tabela por worker). O
+    resultado é um diretório, aceito da mesma forma pelo pg_restore.
+    
     Args:
         host: Hostname do servidor PostgreSQL
         port: Porta do servidor
@@ -20,49 +57,91 @@ def create_backup(host, port, database, user, password, logger):
         user: Usuário do PostgreSQL
         password: Senha do usuário
         logger: Logger configurado
+        dump_jobs: Número de jobs paralelos do pg_dump
+        tables: Lista opcional de tabelas (schema, nome) a incluir (-t);
+            large objects só são incluídos no backup completo
+        data_only: Se True, gera apenas os dados (--data-only)
+        compression: Configuração de compressão normalizada (padrão gzip:6);
+            workers > 1 paraleliza o dump (e a compressão) como dump_jobs
+        output_dir: Diretório onde criar o backup (padrão: diretório temporário)
+        exclude_data: Lista opcional de tabelas (schema, nome) cujo schema entra
+            no backup, mas os dados não (--exclude-table-data)
+        snapshot: Snapshot exportado a ser lido pelo dump (--snapshot, opcional)
         
     Returns:
-        str: Caminho do arquivo de backup criado
+        str: Caminho do arquivo (ou diretório) de backup criado
     """
-    # Cria arquivo temporário
-    temp_file = tempfile.NamedTemporaryFile(
-        suffix='.dump',
-        prefix=f'{database}_',
-        delete=False
-    )
-    backup_path = temp_file.name
-    temp_file.close()
+    if compression:
+        # O pg_dump não tem workers de compressão: cada worker do formato
+        # diretório comprime os dados da sua tabela
+        dump_jobs = max(dump_jobs, compression['workers'])
+    
+    if dump_jobs > 1:
+        # pg_dump -Fd aceita diretório existente desde que vazio
+        backup_path = tempfile.mkdtemp(suffix='.dir', prefix=f'{database}_', dir=output_dir)
+        format_args = [
+            '-Fd',  # Formato diretório (permite dump paralelo)
+            '-j', str(dump_jobs),
+        ]
+    else:
+        # Cria arquivo temporário
+        temp_file = tempfile.NamedTemporaryFile(
+            suffix='.dump',
+            prefix=f'{database}_',
+            dir=output_dir,
+            delete=False
+        )
+        backup_path = temp_file.name
+        temp_file.close()
+        format_args = ['-Fc']  # Formato Custom (compactado e performático)
+    
+    if tables is not None:
+        selection_args = []
+        for schema, name in tables:
+            selection_args += ['-t', f"{quote_ident(schema)}.{quote_ident(name)}"]
+    else:
+        selection_args = ['-b']  # Include large objects
+    if data_only:
+        selection_args.append('--data-only')
+    for schema, name in exclude_data or ():
+        selection_args.append(f"--exclude-table-data={quote_ident(schema)}.{quote_ident(name)}")
+    if snapshot:
+        selection_args.append(f"--snapshot={snapshot}")
     
     env = os.environ.copy()
     env['PGPASSWORD'] = password
     
-    cmd = [
-        'pg_dump',
-        '-h', host,
-        '-p', str(port),
-        '-U', user,
-        '-d', database,
-        '-Fc',  # Formato Custom (compactado e performático)
-        '-Z', '6',  # Nível de compressão (0-9, 6 é bom balanço)
-        '-b',  # Include large objects
+    cmd = build_dump_command(
+        host, port, database, user,
+        *format_args,
+        *compression_args(compression),
+        *selection_args,
         '-v',  # Verbose
         '-f', backup_path
-    ]
+    )
     
     logger.info(f"Criando backup de '{database}' ({host})...")
+    if dump_jobs > 1:
+        logger.info(f"Usando {dump_jobs} jobs paralelos no dump")
+    if compression:
+        logger.debug(f"Compressão: {describe_compression(compression)}")
     logger.debug(f"Usando arquivo temporário: {backup_path}")
     
     try:
-        subprocess.run(
-            cmd,
-            env=env,
-            check=True,
-            capture_output=True,
-            text=True
-        )
+        with metrics.phase('backup', database, jobs=dump_jobs):
+            run_with_progress(
+                cmd,
+                env=env,
+                logger=logger,
+                label=f"Backup de '{database}'",
+                size_probe=lambda: get_backup_size(backup_path),
+                on_event=lambda kind, name, line: DUMPED_TABLES.inc(database=database)
+            )
         
-        size_mb = Path(backup_path).stat().st_size / (1024 * 1024)
-        logger.info(f"Backup criado com sucesso: {size_mb:.2f} MB")
+        size = get_backup_size(backup_path)
+        metrics.record(database, archive_bytes=size)
+        BACKUP_BYTES.inc(size, database=database)
+        logger.info(f"Backup criado com sucesso: {size / (1024 * 1024):.2f} MB")
         return backup_path
     
     except subprocess.CalledProcessError as e:
@@ -71,9 +150,24 @@ def create_backup(host, port, database, user, password, logger):
         sys.exit(1)
 
 
+def get_backup_size(path):
+    """
+    Calcula o tamanho do backup em bytes
+    
+    Args:
+        path: Caminho do arquivo ou diretório de backup
+        
+    Returns:
+        int: Tamanho total em bytes
+    """
+    if os.path.isdir(path):
+        return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file())
+    return Path(path).stat().st_size
+
+
 def cleanup_backup(filepath, logger):
     """
-    Remove arquivo temporário de backup
+    Remove arquivo (ou diretório) temporário de backup
     
     Args:
         filepath: Caminho do arquivo a ser removido
@@ -81,7 +175,11 @@ def cleanup_backup(filepath, logger):
     """
     try:
         if filepath and os.path.exists(filepath):
-            os.unlink(filepath)
+            with metrics.phase('cleanup'):
+                if os.path.isdir(filepath):
+                    shutil.rmtree(filepath)
+                else:
+                    os.unlink(filepath)
             logger.info("Backup temporário removido")
     except Exception as e:
         logger.warning(f"Erro ao remover backup: {e}")
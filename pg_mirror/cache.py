@@ -0,0 +1,341 @@
+"""Reusable on-disk dump cache shared between runs"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from pg_mirror.backup import cleanup_backup, get_backup_size
+
+try:
+    import fcntl
+except ImportError:  # Windows: ver DumpCache._lock
+    fcntl = None
+
+
+MB = 1024 * 1024
+META_SUFFIX = '.json'
+
+
+@dataclass
+class CacheEntry:
+    """Um dump publicado no cache e seu arquivo de metadados"""
+
+    key: str
+    path: str
+    meta_path: str
+    created_at: float
+    size: int
+
+    @property
+    def last_used(self):
+        # O mtime dos metadados é atualizado a cada reutilização (LRU)
+        try:
+            return os.stat(self.meta_path).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+
+def cache_key(source, database, filters=None):
+    """
+    Chave de um dump no cache
+
+    Args:
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        filters: Opções que mudam o conteúdo do dump (compressão, seleção...)
+
+    Returns:
+        str: Hash hexadecimal estável
+    """
+    parts = {
+        'host': source['host'],
+        'port': source['port'],
+        'database': database,
+        'filters': filters or {},
+    }
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+class DumpCache:
+    """
+    Diretório de dumps reutilizáveis entre execuções
+
+    Cada dump é criado dentro do próprio diretório do cache e publicado
+    com rename atômico sob um nome único; o arquivo de metadados é
+    gravado por último e marca a entrada como completa. Quem usa uma
+    entrada mantém um lock compartilhado (flock) nos metadados até
+    terminar o restore, e a remoção (TTL ou LRU) só acontece com lock
+    exclusivo, então um dump nunca some no meio de um restore.
+
+    Sem flock (Windows), quem usa a entrada apenas mantém os metadados
+    abertos: o Windows não remove um arquivo aberto por outro processo,
+    e a remoção desiste da entrada.
+    """
+
+    def __init__(self, directory, ttl_minutes, max_size_mb, logger):
+        """
+        Args:
+            directory: Diretório do cache
+            ttl_minutes: Idade máxima de um dump reutilizável
+            max_size_mb: Tamanho máximo do cache (None: sem limite)
+            logger: Logger configurado
+        """
+        self.directory = os.path.expanduser(directory)
+        self.ttl = ttl_minutes * 60
+        self.max_bytes = max_size_mb * MB if max_size_mb else None
+        self.logger = logger
+        os.makedirs(self.directory, exist_ok=True)
+
+    def entries(self):
+        """
+        Entradas completas no cache
+
+        Returns:
+            list: CacheEntry de todas as entradas com metadados válidos
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(META_SUFFIX):
+                continue
+            meta_path = os.path.join(self.directory, name)
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                entries.append(CacheEntry(
+                    key=meta['key'],
+                    path=os.path.join(self.directory, meta['file']),
+                    meta_path=meta_path,
+                    created_at=meta['created_at'],
+                    size=meta['size'],
+                ))
+            except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                continue
+        return entries
+
+    def is_fresh(self, entry, now=None):
+        """Indica se a entrada ainda está dentro do TTL"""
+        return ((now or time.time()) - entry.created_at) < self.ttl
+
+    @contextmanager
+    def acquire(self, key, create):
+        """
+        Fornece um dump para a chave, reutilizando uma entrada fresca
+
+        Sem entrada fresca, create(diretório) gera o dump dentro do
+        cache e ele é publicado para as próximas execuções. O dump
+        fica protegido contra remoção enquanto o bloco with executa.
+
+        Args:
+            key: Chave do dump (cache_key)
+            create: Função que recebe o diretório de saída e retorna o
+                caminho do dump criado
+
+        Yields:
+            str: Caminho do arquivo (ou diretório) de backup
+        """
+        found = self._lookup(key)
+        if found is None:
+            fd, entry = self._publish(key, create(self.directory))
+            self.evict()
+        else:
+            fd, entry = found
+        try:
+            yield entry.path
+        finally:
+            os.close(fd)
+
+    def _lookup(self, key):
+        """Entrada fresca mais nova para a chave, já com lock compartilhado"""
+        now = time.time()
+        candidates = sorted(
+            (e for e in self.entries() if e.key == key and self.is_fresh(e, now)),
+            key=lambda e: e.created_at,
+            reverse=True
+        )
+        for entry in candidates:
+            fd = self._lock(entry.meta_path)
+            if fd is None:
+                continue
+            # A entrada pode ter sido removida entre a listagem e o lock
+            if os.path.exists(entry.meta_path) and os.path.exists(entry.path):
+                os.utime(entry.meta_path)
+                age = int((now - entry.created_at) / 60)
+                self.logger.info(f"Reutilizando dump do cache ({age} min): {entry.path}")
+                return fd, entry
+            os.close(fd)
+        return None
+
+    def _publish(self, key, backup_path):
+        """
+        Move o dump para o nome definitivo e grava os metadados
+
+        O lock compartilhado é tomado no arquivo temporário, antes do
+        rename que torna a entrada visível: uma remoção concorrente (LRU)
+        nunca encontra a entrada nova sem lock.
+
+        Returns:
+            tuple: (descritor com o lock, CacheEntry)
+
+        Raises:
+            FileNotFoundError: Se a entrada foi removida antes do lock
+                (apenas sem flock)
+        """
+        created_at = time.time()
+        extension = '.dir' if os.path.isdir(backup_path) else '.dump'
+        name = f"{key}-{int(created_at)}-{uuid.uuid4().hex[:8]}{extension}"
+        path = os.path.join(self.directory, name)
+        os.rename(backup_path, path)
+
+        meta = {
+            'key': key,
+            'file': name,
+            'created_at': created_at,
+            'size': get_backup_size(path),
+        }
+        meta_path = os.path.join(self.directory, f"{name}{META_SUFFIX}")
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        # Sem flock (Windows) o rename falharia com o temporário aberto
+        lock_fd = self._lock(tmp_path) if fcntl is not None else None
+        os.replace(tmp_path, meta_path)
+        if lock_fd is None:
+            lock_fd = self._lock(meta_path)
+            # Como em _lookup: a entrada pode ter sido removida antes do lock
+            if lock_fd is None or not os.path.exists(path):
+                if lock_fd is not None:
+                    os.close(lock_fd)
+                raise FileNotFoundError(f"Dump removido do cache antes do uso: {path}")
+        self.logger.info(f"Dump publicado no cache: {path}")
+        return lock_fd, CacheEntry(key, path, meta_path, created_at, meta['size'])
+
+    def evict(self):
+        """
+        Remove entradas expiradas e, acima do limite, as menos usadas
+
+        Entradas em uso (lock compartilhado) nunca são removidas.
+
+        Returns:
+            int: Número de entradas removidas
+        """
+        now = time.time()
+        entries = sorted(self.entries(), key=lambda e: e.last_used)
+        total = sum(e.size for e in entries)
+        removed = 0
+        for entry in entries:
+            over_budget = self.max_bytes is not None and total > self.max_bytes
+            if self.is_fresh(entry, now) and not over_budget:
+                continue
+            if self._remove(entry):
+                total -= entry.size
+                removed += 1
+        if self.max_bytes is not None and total > self.max_bytes:
+            self.logger.warning(
+                f"Cache de dumps acima do limite ({total / MB:.0f} MB): entradas em uso"
+            )
+        return removed
+
+    def _remove(self, entry):
+        """Remove uma entrada se nenhum processo a estiver usando"""
+        if fcntl is None:
+            # Falha enquanto outro processo mantém os metadados abertos
+            try:
+                os.unlink(entry.meta_path)
+            except OSError:
+                return False
+            self.logger.debug(f"Removendo dump do cache: {entry.path}")
+            cleanup_backup(entry.path, self.logger)
+            return True
+
+        fd = self._lock(entry.meta_path, exclusive=True)
+        if fd is None:
+            return False
+        try:
+            self.logger.debug(f"Removendo dump do cache: {entry.path}")
+            os.unlink(entry.meta_path)
+            cleanup_backup(entry.path, self.logger)
+            return True
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _lock(path, exclusive=False):
+        """
+        Abre o arquivo com flock compartilhado (ou exclusivo, sem esperar)
+
+        Sem flock (Windows) o arquivo apenas fica aberto.
+
+        Returns:
+            int: Descritor aberto, ou None se o arquivo sumiu ou está bloqueado
+        """
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        if fcntl is None:
+            return fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB if exclusive else fcntl.LOCK_SH)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+
+def parse_dump_cache(value):
+    """
+    Normaliza options.dump_cache
+
+    Args:
+        value: None, caminho do diretório ou
+            {"dir": str, "ttl_minutes": int, "max_size_mb": int}
+
+    Returns:
+        dict: Configuração completa ou None se desativado
+
+    Raises:
+        ValueError: Se o valor não for reconhecido
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = {'dir': value}
+    if not isinstance(value, dict) or not value.get('dir'):
+        raise ValueError("'dump_cache' deve ser um diretório ou {\"dir\": ...}")
+    settings = {
+        'dir': value['dir'],
+        'ttl_minutes': value.get('ttl_minutes', 60),
+        'max_size_mb': value.get('max_size_mb'),
+    }
+    for name in ('ttl_minutes', 'max_size_mb'):
+        number = settings[name]
+        if number is not None and (not isinstance(number, int) or number < 1):
+            raise ValueError(f"'dump_cache.{name}' deve ser inteiro positivo")
+    return settings
+
+
+def open_dump_cache(options, logger):
+    """
+    Cache de dumps configurado em options.dump_cache
+
+    Args:
+        options: Seção options da configuração
+        logger: Logger configurado
+
+    Returns:
+        DumpCache ou None se o cache estiver desativado
+    """
+    settings = options.get('dump_cache')
+    if not settings:
+        return None
+    return DumpCache(
+        settings['dir'],
+        ttl_minutes=settings['ttl_minutes'],
+        max_size_mb=settings['max_size_mb'],
+        logger=logger
+    )
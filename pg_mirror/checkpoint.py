@@ -0,0 +1,224 @@
+"""Checkpoint journal for resumable mirrors"""
+import json
+import os
+import re
+import threading
+from datetime import datetime, timezone
+
+from pg_mirror.backup import cleanup_backup
+
+
+# Linha do pg_restore paralelo ao concluir uma entrada do TOC
+FINISHED_RE = re.compile(r'^pg_restore: finished item (\d+) ')
+
+
+def journal_path(state_dir, source, database):
+    """
+    Caminho do diário de um banco da origem
+
+    Args:
+        state_dir: Diretório base de estado (options.state_dir)
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+
+    Returns:
+        str: Caminho do arquivo JSON lines
+    """
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', f"{source['host']}_{source['port']}_{database}")
+    return os.path.join(os.path.expanduser(state_dir), 'checkpoints', f'{name}.jsonl')
+
+
+class TargetProgress:
+    """Progresso de um destino no diário (seções e entradas do TOC concluídas)"""
+
+    def __init__(self, journal, target):
+        self.journal = journal
+        self.target = target
+        self.sections = set()
+        self.items = set()
+        self.prepared = False
+        self.done = False
+
+    @property
+    def started(self):
+        """True se algo já foi restaurado neste destino"""
+        return bool(self.sections or self.items)
+
+    def mark_prepared(self):
+        """Registra que o banco de destino foi preparado e o restore começou"""
+        self.prepared = True
+        self.journal.append({'target': self.target, 'prepared': True})
+
+    def mark_section(self, section):
+        self.sections.add(section)
+        self.journal.append({'target': self.target, 'section': section})
+
+    def mark_item(self, dump_id):
+        self.items.add(dump_id)
+        self.journal.append({'target': self.target, 'item': dump_id})
+
+    def mark_done(self):
+        self.done = True
+        self.journal.append({'target': self.target, 'done': True})
+
+    def on_restore_line(self, line):
+        """Registra a entrada concluída de uma linha "finished item" do pg_restore"""
+        match = FINISHED_RE.match(line)
+        if match:
+            self.mark_item(int(match.group(1)))
+
+
+class Journal:
+    """
+    Diário de um espelhamento retomável
+
+    Arquivo JSON lines: a primeira linha guarda o backup usado e as
+    seguintes, gravadas (com fsync) à medida que o restore avança, as
+    seções e entradas do TOC concluídas em cada destino. Um diário
+    interrompido no meio de uma linha continua legível: a linha
+    incompleta é ignorada.
+    """
+
+    def __init__(self, path, logger):
+        self.path = path
+        self.logger = logger
+        self.backup_file = None
+        self.created_at = None
+        self.targets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, logger):
+        """
+        Lê um diário existente
+
+        Args:
+            path: Caminho do diário
+            logger: Logger configurado
+
+        Returns:
+            Journal: Diário carregado (vazio se não existir)
+        """
+        journal = cls(path, logger)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return journal
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Última linha cortada por uma queda
+            if 'backup' in record:
+                journal.backup_file = record['backup']
+                journal.created_at = record.get('created_at')
+                continue
+            progress = journal.target(record['target'])
+            if 'section' in record:
+                progress.sections.add(record['section'])
+            elif 'item' in record:
+                progress.items.add(record['item'])
+            elif record.get('prepared'):
+                progress.prepared = True
+            elif record.get('done'):
+                progress.done = True
+        return journal
+
+    def target(self, label):
+        """
+        Progresso de um destino (criado vazio se ainda não houver)
+
+        Args:
+            label: Rótulo do destino (host:porta)
+
+        Returns:
+            TargetProgress
+        """
+        with self._lock:
+            if label not in self.targets:
+                self.targets[label] = TargetProgress(self, label)
+            return self.targets[label]
+
+    @property
+    def complete(self):
+        """True se todos os destinos registrados terminaram"""
+        return bool(self.targets) and all(p.done for p in self.targets.values())
+
+    def start(self, backup_file):
+        """
+        Inicia um diário novo para o backup (descarta o anterior)
+
+        Args:
+            backup_file: Caminho do arquivo (ou diretório) de backup
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.backup_file = backup_file
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        labels = list(self.targets)
+        self.targets = {}
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'backup': backup_file, 'created_at': self.created_at}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        for label in labels:
+            self.target(label)
+
+    def append(self, record):
+        """Acrescenta um registro e força a gravação em disco"""
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def remove(self):
+        """Remove o diário (espelhamento concluído)"""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def open_journal(options, source, database, logger):
+    """
+    Diário do espelhamento conforme options.checkpoint e options.resume
+
+    Com resume, um diário cujo backup ainda existe é retomado; caso
+    contrário (ou sem resume) começa vazio e o backup anterior, se
+    houver, é removido.
+
+    Args:
+        options: Seção options da configuração
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        logger: Logger configurado
+
+    Returns:
+        Journal ou None se o checkpoint estiver desativado
+    """
+    if not options['checkpoint']:
+        return None
+
+    path = journal_path(options['state_dir'], source, database)
+    journal = Journal.load(path, logger)
+    if journal.backup_file is None:
+        if options['resume']:
+            logger.info(f"Nenhum checkpoint para '{database}': espelhamento completo")
+        return journal
+
+    if not options['resume']:
+        logger.warning(f"Checkpoint anterior de '{database}' descartado (use --resume para retomar)")
+        if os.path.exists(journal.backup_file):
+            cleanup_backup(journal.backup_file, logger)
+        return Journal(path, logger)
+
+    if not os.path.exists(journal.backup_file):
+        logger.warning(
+            f"Backup do checkpoint não existe mais ({journal.backup_file}): espelhamento completo"
+        )
+        return Journal(path, logger)
+
+    logger.info(f"Retomando '{database}' a partir do checkpoint de {journal.created_at}")
+    return journal
@@ -3,17 +3,30 @@
 pg-mirror CLI - PostgreSQL Database Mirroring Tool
 """
 import sys
+import functools
+import threading
 import click
 
-from pg_mirror.logger import setup_logger
-from pg_mirror.config import load_config
-from pg_mirror.database import (
-    check_database_exists,
-    create_database,
-    drop_and_create_database
+from pg_mirror.logger import (
+    DEFAULT_LOG_BACKUPS,
+    DEFAULT_LOG_MAX_MB,
+    LOG_FORMATS,
+    log_context,
+    setup_logger
 )
-from pg_mirror.backup import create_backup, cleanup_backup
-from pg_mirror.restore import restore_backup
+from pg_mirror.config import MODES, load_config
+from pg_mirror.mirror import (
+    is_multi_database,
+    resolve_databases,
+    mirror_database,
+    get_targets,
+    describe_target
+)
+from pg_mirror.replication import setup_sync, monitor_lag
+from pg_mirror.scheduler import MirrorJob, run_jobs, log_summary
+from pg_mirror.session import connection_pool
+from pg_mirror import metrics, openmetrics
+from pg_mirror.compression import parse_compression, describe_compression
 from pg_mirror.system_checks import (
     verify_system_requirements,
     SystemCheckError,
@@ -25,8 +38,16 @@ from pg_mirror import __version__
 @click.group()
 @click.version_option(version=__version__, prog_name='pg-mirror')
 @click.option('-v', '--verbose', is_flag=True, help='Modo verbose (mostra mensagens DEBUG)')
+@click.option('--log-format', type=click.Choice(LOG_FORMATS), default='text', show_default=True,
+              help='Formato dos logs (json: uma linha por registro, com run_id, banco e fase)')
+@click.option('--log-file', type=click.Path(dir_okay=False),
+              help='Grava também em arquivo, com rotação por tamanho')
+@click.option('--log-max-mb', type=click.IntRange(min=1), default=DEFAULT_LOG_MAX_MB,
+              show_default=True, help='Tamanho do arquivo de log antes da rotação')
+@click.option('--log-backups', type=click.IntRange(min=0), default=DEFAULT_LOG_BACKUPS,
+              show_default=True, help='Arquivos de log rotacionados mantidos')
 @click.pass_context
-def cli(ctx, verbose):
+def cli(ctx, verbose, log_format, log_file, log_max_mb, log_backups):
     """
     🪞 pg-mirror - PostgreSQL Database Mirroring Tool
     
@@ -35,20 +56,69 @@ def cli(ctx, verbose):
     """
     ctx.ensure_object(dict)
     ctx.obj['verbose'] = verbose
-    ctx.obj['logger'] = setup_logger(verbose)
+    ctx.obj['logger'] = setup_logger(
+        verbose,
+        log_format=log_format,
+        log_file=log_file,
+        max_mb=log_max_mb,
+        backups=log_backups
+    )
+
+
+def _parse_jobs(ctx, param, value):
+    """Converte --jobs em inteiro positivo ou 'auto'"""
+    if value is None or value == 'auto':
+        return value
+    try:
+        jobs = int(value)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        raise click.BadParameter('use um inteiro positivo ou "auto"')
+    return jobs
 
 
 @cli.command()
 @click.option('-c', '--config', default='config.json', 
               help='Caminho para arquivo de configuração JSON')
-@click.option('-j', '--jobs', type=int, 
-              help='Número de jobs paralelos (sobrescreve config)')
+@click.option('-j', '--jobs', callback=_parse_jobs,
+              help='Número de jobs paralelos ou "auto" (sobrescreve config)')
+@click.option('--dump-jobs', type=int,
+              help='Jobs paralelos do pg_dump, usa formato diretório (sobrescreve config)')
+@click.option('--compression',
+              help='Compressão do backup: none, gzip[:N], lz4[:N], zstd[:N] ou auto (sobrescreve config)')
+@click.option('--spool-dir',
+              help='Diretório dos backups temporários (sobrescreve config)')
+@click.option('--concurrent-databases', type=int,
+              help='Bancos espelhados simultaneamente em modo multi-banco (sobrescreve config)')
 @click.option('--drop-existing', is_flag=True, 
               help='Recriar banco se já existir (sobrescreve config)')
 @click.option('--skip-checks', is_flag=True,
               help='Pular verificação de ferramentas PostgreSQL')
+@click.option('--stream', is_flag=True,
+              help='Pipe pg_dump -> pg_restore sem arquivo temporário (sobrescreve config)')
+@click.option('--pipeline', is_flag=True,
+              help='Restaura cada tabela assim que seu dump termina (sobrescreve config)')
+@click.option('--copy-engine', is_flag=True,
+              help='Dados das tabelas por COPY binário direto entre os servidores (sobrescreve config)')
+@click.option('--fast-restore', is_flag=True,
+              help='Carga sem commit síncrono, triggers e FKs (destinos descartáveis; sobrescreve config)')
+@click.option('--no-dump-cache', is_flag=True,
+              help='Ignora options.dump_cache e gera um backup novo e temporário')
+@click.option('--metrics-file',
+              help='Grava um relatório JSON com tempos, bytes e vazão de cada fase')
+@click.option('--metrics-textfile',
+              help='Grava métricas Prometheus (.prom) para o textfile collector do node-exporter')
+@click.option('--metrics-port', type=int,
+              help='Serve /metrics (OpenMetrics) em 127.0.0.1 durante a execução')
+@click.option('--resume', is_flag=True,
+              help='Retoma o último espelhamento interrompido a partir do checkpoint')
+@click.option('--incremental', is_flag=True,
+              help='Recopia apenas as tabelas alteradas desde a última execução (sobrescreve config)')
 @click.pass_context
-def mirror(ctx, config, jobs, drop_existing, skip_checks):
+def mirror(ctx, config, jobs, dump_jobs, compression, spool_dir, concurrent_databases,
+           drop_existing, skip_checks, stream, pipeline, copy_engine, fast_restore, no_dump_cache,
+           metrics_file, metrics_textfile, metrics_port, resume, incremental):
     """
     Espelha um banco PostgreSQL de origem para destino.
     
@@ -60,94 +130,136 @@ def mirror(ctx, config, jobs, drop_existing, skip_checks):
         pg-mirror mirror --config config.json
         
         pg-mirror mirror -c prod-to-staging.json --jobs 8
+        
+        pg-mirror mirror -c prod-to-staging.json --stream
+        
+        pg-mirror mirror -c prod-to-staging.json --pipeline --jobs 8
+        
+        pg-mirror mirror -c prod-to-staging.json --copy-engine --jobs 8
+        
+        pg-mirror mirror -c prod-to-staging.json --incremental
+        
+        pg-mirror mirror -c prod-to-staging.json --resume
     """
     logger = ctx.obj['logger']
     verbose = ctx.obj['verbose']
     
-    # Verifica requisitos do sistema
-    if not skip_checks:
-        logger.info("Verificando ferramentas PostgreSQL...")
-        try:
-            verify_system_requirements(verbose=verbose)
-            logger.info("✓ Todas as ferramentas necessárias estão instaladas")
-        except SystemCheckError as e:
-            logger.error(f"✗ Verificação do sistema falhou: {e}")
-            logger.error("")
-            print_installation_help()
+    # Relatório de métricas gravado ao final, inclusive em falhas
+    exporter = openmetrics.exporting(logger, textfile=metrics_textfile, port=metrics_port)
+    with metrics.collect_metrics(metrics_file, logger) as run_metrics, exporter:
+        # Verifica requisitos do sistema
+        if not skip_checks:
+            logger.info("Verificando ferramentas PostgreSQL...")
+            try:
+                with metrics.phase('checks'):
+                    verify_system_requirements(verbose=verbose)
+                logger.info("✓ Todas as ferramentas necessárias estão instaladas")
+            except SystemCheckError as e:
+                logger.error(f"✗ Verificação do sistema falhou: {e}")
+                logger.error("")
+                print_installation_help()
+                sys.exit(1)
+        
+        # Carrega configuração
+        cfg = load_config(config, logger)
+        
+        # Override de opções via CLI
+        if jobs:
+            cfg['options']['parallel_jobs'] = jobs
+        if dump_jobs:
+            cfg['options']['dump_jobs'] = dump_jobs
+        if compression:
+            try:
+                cfg['options']['compression'] = parse_compression(compression)
+            except ValueError as e:
+                logger.error(f"--compression inválido: {e}")
+                sys.exit(1)
+        if spool_dir:
+            cfg['options']['spool_dir'] = spool_dir
+        if concurrent_databases:
+            cfg['options']['concurrent_databases'] = concurrent_databases
+        if drop_existing:
+            cfg['options']['drop_existing'] = True
+        if stream:
+            cfg['options']['stream'] = True
+        if pipeline:
+            cfg['options']['pipeline'] = True
+        if copy_engine:
+            cfg['options']['copy_engine'] = True
+        if fast_restore and not cfg['options']['fast_restore']:
+            cfg['options']['fast_restore'] = {'unlogged': False}
+        if no_dump_cache:
+            cfg['options']['dump_cache'] = None
+        if incremental:
+            cfg['options']['incremental'] = True
+        modes = [m.replace('_', '-') for m in MODES if cfg['options'][m]]
+        if len(modes) > 1:
+            logger.error(f"Opções {' e '.join('--' + m for m in modes)} são mutuamente exclusivas")
+            sys.exit(1)
+        if len(get_targets(cfg)) > 1 and modes and modes != ['incremental']:
+            logger.error(f"Vários destinos exigem o modo padrão (sem --{modes[0]})")
+            sys.exit(1)
+        filtered = [f for f in ('include', 'exclude', 'where') if cfg['options'][f]]
+        if filtered and modes and modes != ['copy-engine']:
+            logger.error(f"Filtros ({', '.join(filtered)}) exigem o modo padrão (sem --{modes[0]})")
+            sys.exit(1)
+        if resume:
+            cfg['options']['checkpoint'] = True
+            cfg['options']['resume'] = True
+        if cfg['options']['checkpoint'] and modes:
+            logger.warning(f"Checkpoint ignorado: disponível apenas no modo padrão (não em --{modes[0]})")
+        elif cfg['options']['checkpoint'] and not cfg['options']['drop_existing']:
+            # O restore retomável usa --exit-on-error: objetos já existentes no destino abortariam
+            logger.error("Checkpoint exige 'drop_existing': true (ou --drop-existing)")
             sys.exit(1)
-    
-    # Carrega configuração
-    cfg = load_config(config, logger)
-    
-    # Override de opções via CLI
-    if jobs:
-        cfg['options']['parallel_jobs'] = jobs
-    if drop_existing:
-        cfg['options']['drop_existing'] = True
-    
-    logger.info("=" * 60)
-    logger.info("Configuração carregada:")
-    logger.info(f"   Origem: {cfg['source']['database']} @ {cfg['source']['host']}")
-    logger.info(f"   Destino: {cfg['source']['database']} @ {cfg['target']['host']}")
-    logger.info(f"   Jobs paralelos: {cfg['options']['parallel_jobs']}")
-    logger.info(f"   Drop existing: {cfg['options']['drop_existing']}")
-    logger.info("=" * 60)
-    
-    backup_file = None
-    
-    try:
-        # 1. BACKUP
-        backup_file = create_backup(
-            host=cfg['source']['host'],
-            port=cfg['source']['port'],
-            database=cfg['source']['database'],
-            user=cfg['source']['user'],
-            password=cfg['source']['password'],
-            logger=logger
-        )
         
-        # 2. PREPARAR DESTINO
-        db_exists = check_database_exists(
-            host=cfg['target']['host'],
-            port=cfg['target']['port'],
-            database=cfg['source']['database'],
-            user=cfg['target']['user'],
-            password=cfg['target']['password'],
-            logger=logger
-        )
+        databases = cfg['source'].get('database_pattern') or cfg['source']['database']
+        targets = ', '.join(describe_target(t) for t in get_targets(cfg))
         
-        if db_exists and cfg['options']['drop_existing']:
-            logger.warning(f"Recriando banco '{cfg['source']['database']}'...")
-            drop_and_create_database(
-                host=cfg['target']['host'],
-                port=cfg['target']['port'],
-                database=cfg['source']['database'],
-                user=cfg['target']['user'],
-                password=cfg['target']['password'],
-                logger=logger
-            )
-        elif not db_exists:
-            logger.info(f"Banco '{cfg['source']['database']}' não existe. Criando...")
-            create_database(
-                host=cfg['target']['host'],
-                port=cfg['target']['port'],
-                database=cfg['source']['database'],
-                user=cfg['target']['user'],
-                password=cfg['target']['password'],
-                logger=logger
-            )
-        
-        # 3. RESTORE
-        success = restore_backup(
-            backup_file=backup_file,
-            host=cfg['target']['host'],
-            port=cfg['target']['port'],
-            database=cfg['source']['database'],
-            user=cfg['target']['user'],
-            password=cfg['target']['password'],
-            parallel_jobs=cfg['options']['parallel_jobs'],
-            logger=logger
-        )
+        logger.info("=" * 60)
+        logger.info("Configuração carregada:")
+        logger.info(f"   Origem: {databases} @ {cfg['source']['host']}")
+        logger.info(f"   Destino: {databases} @ {targets}")
+        logger.info(f"   Jobs paralelos: {cfg['options']['parallel_jobs']}")
+        logger.info(f"   Jobs de dump: {cfg['options']['dump_jobs']}")
+        logger.info(f"   Compressão: {describe_compression(cfg['options']['compression'])}")
+        logger.info(f"   Spool: {cfg['options']['spool_dir'] or 'diretório temporário do sistema'}")
+        logger.info(f"   Drop existing: {cfg['options']['drop_existing']}")
+        logger.info(f"   Streaming: {cfg['options']['stream']}")
+        logger.info(f"   Pipeline: {cfg['options']['pipeline']}")
+        logger.info(f"   COPY binário: {cfg['options']['copy_engine']}")
+        logger.info(f"   Incremental: {cfg['options']['incremental']}")
+        logger.info(f"   Fast restore: {cfg['options']['fast_restore'] or False}")
+        logger.info(f"   Checkpoint: {cfg['options']['checkpoint']}")
+        if filtered:
+            logger.info(f"   Filtros de dados: {', '.join(filtered)}")
+        logger.info(f"   Pool de conexões: {cfg['options']['connection_pool']}")
+        if cfg['options']['dump_cache']:
+            logger.info(f"   Cache de dumps: {cfg['options']['dump_cache']['dir']}")
+        logger.info("=" * 60)
+        
+        if run_metrics is not None:
+            run_metrics.settings = {
+                'parallel_jobs': cfg['options']['parallel_jobs'],
+                'dump_jobs': cfg['options']['dump_jobs'],
+                'compression': describe_compression(cfg['options']['compression']),
+                'concurrent_databases': cfg['options']['concurrent_databases'],
+                'mode': next((m for m in MODES if cfg['options'][m]), 'standard'),
+                'targets': len(get_targets(cfg)),
+            }
+        
+        # Operações de catálogo reutilizam conexões nativas durante toda a execução
+        with connection_pool(
+            logger,
+            enabled=cfg['options']['connection_pool'],
+            max_idle=max(4, cfg['options']['concurrent_databases'])
+        ):
+            if is_multi_database(cfg):
+                _mirror_many(cfg, logger)
+                return
+            
+            success = mirror_database(cfg, cfg['source']['database'], logger)
+            metrics.record(cfg['source']['database'], success=success)
         
         if success:
             logger.info("=" * 60)
@@ -158,11 +270,137 @@ def mirror(ctx, config, jobs, drop_existing, skip_checks):
             logger.error("❌ Espelhamento concluído com erros")
             logger.error("=" * 60)
             sys.exit(1)
+
+
+def _mirror_many(cfg, logger):
+    """
+    Espelha vários bancos pelo scheduler e encerra com um resumo único
     
-    finally:
-        # 4. SEMPRE limpa o arquivo temporário
-        if backup_file:
-            cleanup_backup(backup_file, logger)
+    Args:
+        cfg: Configuração carregada
+        logger: Logger configurado
+    """
+    databases = resolve_databases(cfg, logger)
+    if not databases:
+        logger.error("Nenhum banco selecionado para espelhamento")
+        sys.exit(1)
+    
+    logger.info(
+        f"Espelhando {len(databases)} banco(s) com até "
+        f"{cfg['options']['concurrent_databases']} simultâneo(s)"
+    )
+    jobs = [
+        MirrorJob(
+            name=name,
+            host=cfg['source']['host'],
+            size=size,
+            func=functools.partial(mirror_database, cfg, name, logger)
+        )
+        for name, size in databases
+    ]
+    # Todos os bancos vêm da mesma origem: o limite global é o do host
+    run_jobs(
+        jobs,
+        max_concurrent=cfg['options']['concurrent_databases'],
+        max_per_host=cfg['options']['concurrent_databases'],
+        logger=logger
+    )
+    for job in jobs:
+        metrics.record(job.name, success=job.success)
+    
+    if not log_summary(jobs, logger):
+        sys.exit(1)
+
+
+@cli.command()
+@click.option('-c', '--config', default='config.json',
+              help='Caminho para arquivo de configuração JSON')
+@click.option('-j', '--jobs', callback=_parse_jobs,
+              help='Jobs paralelos da cópia inicial ou "auto" (sobrescreve config)')
+@click.option('--interval', type=click.IntRange(min=1), default=30, show_default=True,
+              help='Segundos entre as leituras de lag')
+@click.option('--setup-only', is_flag=True,
+              help='Encerra após criar a assinatura, sem monitorar o lag')
+@click.option('--skip-checks', is_flag=True,
+              help='Pular verificação de ferramentas PostgreSQL')
+@click.option('--metrics-textfile',
+              help='Grava métricas Prometheus (.prom) a cada leitura de lag')
+@click.option('--metrics-port', type=int,
+              help='Serve /metrics (OpenMetrics) em 127.0.0.1 enquanto monitora')
+@click.pass_context
+def sync(ctx, config, jobs, interval, setup_only, skip_checks, metrics_textfile, metrics_port):
+    """
+    Mantém o destino atualizado por replicação lógica.
+    
+    Na primeira execução copia o banco pelo backup/restore padrão,
+    no snapshot de um slot de replicação lógica, e cria a publicação
+    na origem e a assinatura no destino. Depois (e nas execuções
+    seguintes) apenas monitora o lag da assinatura.
+    
+    Exemplo:
+    
+        pg-mirror sync -c prod-to-replica.json --metrics-port 9187
+        
+        pg-mirror sync -c prod-to-replica.json --setup-only
+    """
+    logger = ctx.obj['logger']
+    verbose = ctx.obj['verbose']
+    
+    exporter = openmetrics.exporting(logger, textfile=metrics_textfile, port=metrics_port)
+    with exporter:
+        if not skip_checks:
+            logger.info("Verificando ferramentas PostgreSQL...")
+            try:
+                verify_system_requirements(verbose=verbose)
+                logger.info("✓ Todas as ferramentas necessárias estão instaladas")
+            except SystemCheckError as e:
+                logger.error(f"✗ Verificação do sistema falhou: {e}")
+                logger.error("")
+                print_installation_help()
+                sys.exit(1)
+        
+        cfg = load_config(config, logger)
+        if jobs:
+            cfg['options']['parallel_jobs'] = jobs
+        
+        # A cópia inicial usa sempre o backup/restore padrão
+        modes = [m.replace('_', '-') for m in MODES if cfg['options'][m]]
+        filtered = [f for f in ('include', 'exclude', 'where') if cfg['options'][f]]
+        if modes or filtered:
+            logger.error(f"sync exige o modo padrão, sem filtros ({', '.join(modes + filtered)})")
+            sys.exit(1)
+        targets = get_targets(cfg)
+        if len(targets) > 1:
+            logger.error("sync exige um único destino")
+            sys.exit(1)
+        
+        with connection_pool(logger, enabled=cfg['options']['connection_pool']):
+            if is_multi_database(cfg):
+                databases = [name for name, _ in resolve_databases(cfg, logger)]
+            else:
+                databases = [cfg['source']['database']]
+            if not databases:
+                logger.error("Nenhum banco selecionado para sincronização")
+                sys.exit(1)
+            
+            failed = []
+            for database in databases:
+                with log_context(database=database):
+                    if not setup_sync(cfg, database, logger):
+                        failed.append(database)
+            if failed:
+                logger.error(f"❌ Sincronização não configurada para: {', '.join(failed)}")
+                sys.exit(1)
+            logger.info(f"✅ {len(databases)} banco(s) replicado(s) em {describe_target(targets[0])}")
+            
+            if setup_only:
+                return
+            logger.info(f"Monitorando o lag a cada {interval}s (Ctrl+C para encerrar)...")
+            try:
+                monitor_lag(cfg['source'], targets[0], databases, logger, interval,
+                            threading.Event(), textfile=metrics_textfile)
+            except KeyboardInterrupt:
+                logger.info("Monitoramento encerrado; a assinatura continua ativa no destino")
 
 
 @cli.command()
@@ -214,8 +452,9 @@ def validate(ctx, config):
         cfg = load_config(config, logger)
         
         logger.info("✅ Configuração válida!")
-        logger.info(f"   Origem: {cfg['source']['database']} @ {cfg['source']['host']}:{cfg['source']['port']}")
-        logger.info(f"   Destino: {cfg['target']['host']}:{cfg['target']['port']}")
+        databases = cfg['source'].get('database_pattern') or cfg['source']['database']
+        logger.info(f"   Origem: {databases} @ {cfg['source']['host']}:{cfg['source']['port']}")
+        logger.info(f"   Destino: {', '.join(describe_target(t) for t in get_targets(cfg))}")
         logger.info(f"   Opções: jobs={cfg['options']['parallel_jobs']}, drop_existing={cfg['options']['drop_existing']}")
         
     except Exception as e:
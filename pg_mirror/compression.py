@@ -0,0 +1,262 @@
+"""Compression settings and automatic calibration for pg_dump"""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+import zlib
+
+from pg_mirror.database import list_tables, quote_ident
+from pg_mirror.system_checks import get_command_version
+
+
+ALGORITHMS = ('none', 'gzip', 'lz4', 'zstd')
+DEFAULT_COMPRESSION = {'algorithm': 'gzip', 'level': 6, 'workers': 1}
+DEFAULT_LEVELS = {'none': 0, 'gzip': 6, 'lz4': 1, 'zstd': 3}
+# Níveis aceitos pelo pg_dump (fora deles o dump falha só ao iniciar)
+LEVEL_RANGES = {'none': (0, 0), 'gzip': (0, 9), 'lz4': (0, 12), 'zstd': (1, 22)}
+SAMPLE_MB = 32  # Amostra lida da maior tabela na calibração automática
+
+# lz4 e zstd no pg_dump exigem PostgreSQL 16+
+_MIN_MAJOR = {'lz4': 16, 'zstd': 16}
+
+# Candidatos da calibração e a ferramenta externa usada para medi-los
+_CANDIDATES = [
+    ('none', 0, None),
+    ('lz4', 1, ['lz4', '-1', '-c']),
+    ('zstd', 3, ['zstd', '-3', '-c', '-q']),
+    ('gzip', 1, None),
+    ('gzip', 6, None),
+]
+
+
+def parse_compression(value):
+    """
+    Normaliza options.compression
+
+    Aceita "auto", "algoritmo[:nível]" (ex.: "zstd:3", "lz4", "none")
+    ou um dicionário {"algorithm", "level", "workers"}.
+
+    Args:
+        value: Valor da configuração ou da CLI
+
+    Returns:
+        dict|str: Configuração normalizada ou "auto"
+
+    Raises:
+        ValueError: Se o algoritmo for inválido ou o nível estiver fora da
+            faixa do algoritmo (gzip 0-9, lz4 0-12, zstd 1-22)
+    """
+    if value == 'auto':
+        return 'auto'
+
+    if isinstance(value, str):
+        algorithm, _, level = value.partition(':')
+        value = {'algorithm': algorithm}
+        if level:
+            if not level.isdigit():
+                raise ValueError(f"Nível de compressão inválido: '{level}'")
+            value['level'] = int(level)
+    if not isinstance(value, dict):
+        raise ValueError("'options.compression' deve ser texto ou objeto")
+
+    algorithm = value.get('algorithm', DEFAULT_COMPRESSION['algorithm'])
+    if algorithm == 'auto':
+        return 'auto'
+    if algorithm not in ALGORITHMS:
+        raise ValueError(
+            f"Algoritmo de compressão '{algorithm}' inválido "
+            f"(use {', '.join(ALGORITHMS)} ou auto)"
+        )
+
+    level = value.get('level', DEFAULT_LEVELS[algorithm])
+    workers = value.get('workers', 1)
+    low, high = LEVEL_RANGES[algorithm]
+    if not isinstance(level, int) or isinstance(level, bool) or not low <= level <= high:
+        raise ValueError(
+            f"Nível de compressão inválido para {algorithm}: '{level}' (use {low} a {high})"
+        )
+    if not isinstance(workers, int) or workers < 1:
+        raise ValueError(f"'options.compression.workers' inválido: '{workers}'")
+    return {'algorithm': algorithm, 'level': level, 'workers': workers}
+
+
+def describe_compression(setting):
+    """Rótulo legível de uma configuração de compressão (ex.: "zstd:3")"""
+    if setting == 'auto':
+        return 'auto'
+    if setting['algorithm'] == 'none':
+        return 'none'
+    return f"{setting['algorithm']}:{setting['level']}"
+
+
+def compression_args(setting):
+    """
+    Argumentos de compressão do pg_dump
+
+    gzip continua com o -Z numérico, aceito por qualquer versão do
+    pg_dump; lz4 e zstd usam a sintaxe método:nível do PostgreSQL 16+.
+
+    Args:
+        setting: Configuração normalizada (ou None para o padrão gzip:6)
+
+    Returns:
+        list: Argumentos para o pg_dump
+    """
+    setting = setting or DEFAULT_COMPRESSION
+    if setting['algorithm'] == 'none':
+        return ['-Z', '0']
+    if setting['algorithm'] == 'gzip':
+        return ['-Z', str(setting['level'])]
+    return ['-Z', f"{setting['algorithm']}:{setting['level']}"]
+
+
+def pg_dump_major():
+    """
+    Versão principal do pg_dump instalado
+
+    Returns:
+        int: Versão principal (ex.: 16) ou 0 se não for possível detectar
+    """
+    version = get_command_version('pg_dump') or ''
+    match = re.search(r'(\d+)(?:\.\d+)?', version)
+    return int(match.group(1)) if match else 0
+
+
+def required_pg_dump_major(algorithm):
+    """Versão principal mínima do pg_dump para o algoritmo (0: qualquer)"""
+    return _MIN_MAJOR.get(algorithm, 0)
+
+
+def _read_sample(source, database, logger, sample_mb):
+    """
+    Lê até sample_mb MB de dados da maior tabela da origem
+
+    Returns:
+        tuple: (amostra em bytes, MB/s de leitura) ou (b'', 0) sem tabelas
+    """
+    tables = [
+        (schema, name, size)
+        for schema, name, relkind, size in list_tables(
+            source['host'], source['port'], database,
+            source['user'], source['password'], logger
+        )
+        if relkind == 'r'
+    ]
+    if not tables:
+        return b'', 0.0
+    schema, name, _ = max(tables, key=lambda table: table[2])
+
+    env = os.environ.copy()
+    env['PGPASSWORD'] = source['password']
+    cmd = [
+        'psql',
+        '-h', source['host'],
+        '-p', str(source['port']),
+        '-U', source['user'],
+        '-d', database,
+        '-X',
+        '-c', f"COPY {quote_ident(schema)}.{quote_ident(name)} TO STDOUT"
+    ]
+    logger.debug(f"Calibrando compressão com amostra de {schema}.{name}")
+
+    limit = sample_mb * 1024 * 1024
+    started = time.monotonic()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        sample = proc.stdout.read(limit)
+    finally:
+        elapsed = time.monotonic() - started
+        proc.kill()
+        proc.wait()
+    return sample, len(sample) / (1024 * 1024) / max(elapsed, 1e-6)
+
+
+def _measure_disk(sample):
+    """MB/s de escrita (com fsync) no diretório temporário"""
+    started = time.monotonic()
+    with tempfile.TemporaryFile() as f:
+        f.write(sample)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(sample) / (1024 * 1024) / max(time.monotonic() - started, 1e-6)
+
+
+def _measure_candidate(sample, algorithm, level, tool):
+    """
+    Comprime a amostra como o pg_dump faria
+
+    Returns:
+        tuple: (MB/s de compressão, razão tamanho comprimido / original)
+            ou None se a ferramenta não estiver disponível ou falhar
+    """
+    size_mb = len(sample) / (1024 * 1024)
+    if algorithm == 'none':
+        return float('inf'), 1.0
+
+    started = time.monotonic()
+    if algorithm == 'gzip':
+        compressed = len(zlib.compress(sample, level))
+    else:
+        if not shutil.which(tool[0]):
+            return None
+        try:
+            result = subprocess.run(tool, input=sample, capture_output=True, check=True)
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        compressed = len(result.stdout)
+    elapsed = max(time.monotonic() - started, 1e-6)
+    return size_mb / elapsed, compressed / len(sample)
+
+
+def calibrate_compression(source, database, logger, sample_mb=SAMPLE_MB):
+    """
+    Escolhe a compressão com melhor vazão de ponta a ponta
+
+    Lê uma amostra da maior tabela (medindo a vazão da origem), mede a
+    escrita em disco e comprime a amostra com cada candidato. A vazão
+    estimada do dump é o gargalo entre leitura da origem, compressão e
+    escrita dos bytes já comprimidos, que ocorrem ao mesmo tempo:
+    em rede rápida a compressão leve (ou nenhuma) vence; com origem
+    lenta sobra CPU para um nível mais alto sem custo de tempo.
+
+    Args:
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        logger: Logger configurado
+        sample_mb: Tamanho máximo da amostra em MB
+
+    Returns:
+        dict: Configuração de compressão escolhida
+    """
+    sample, read_rate = _read_sample(source, database, logger, sample_mb)
+    if not sample:
+        logger.info("Banco sem dados para calibrar; usando gzip:6")
+        return dict(DEFAULT_COMPRESSION)
+
+    disk_rate = _measure_disk(sample)
+    major = pg_dump_major()
+    best, best_rate, best_ratio = None, 0.0, 1.0
+    for algorithm, level, tool in _CANDIDATES:
+        if major < required_pg_dump_major(algorithm):
+            continue
+        measured = _measure_candidate(sample, algorithm, level, tool)
+        if measured is None:
+            continue
+        compress_rate, ratio = measured
+        rate = min(read_rate, compress_rate, disk_rate / ratio)
+        logger.debug(
+            f"Compressão {algorithm}:{level}: {compress_rate:.1f} MB/s, "
+            f"razão {ratio:.2f}, estimativa {rate:.1f} MB/s"
+        )
+        # Empate (mesmo gargalo): prefere o arquivo menor
+        if best is None or rate > best_rate * 1.05 or (rate >= best_rate * 0.95 and ratio < best_ratio):
+            best, best_rate, best_ratio = (algorithm, level), rate, ratio
+
+    setting = {'algorithm': best[0], 'level': best[1], 'workers': 1}
+    logger.info(
+        f"Compressão escolhida: {describe_compression(setting)} "
+        f"(origem {read_rate:.1f} MB/s, disco {disk_rate:.1f} MB/s)"
+    )
+    return setting
@@ -2,6 +2,15 @@
 import json
 import sys
 
+from pg_mirror.cache import parse_dump_cache
+from pg_mirror.compression import parse_compression
+from pg_mirror.fastrestore import parse_fast_restore
+from pg_mirror.subset import parse_patterns, parse_where
+
+
+# Modos de espelhamento alternativos ao padrão (mutuamente exclusivos)
+MODES = ('stream', 'pipeline', 'incremental', 'copy_engine')
+
 
 def load_config(config_path, logger):
     """
@@ -20,23 +29,111 @@ def load_config(config_path, logger):
         
         # Valida campos obrigatórios
         required_fields = {
-            'source': ['host', 'database', 'user', 'password'],
+            'source': ['host', 'user', 'password'],
             'target': ['host', 'user', 'password']
         }
         
         for section, fields in required_fields.items():
             if section not in config:
                 raise ValueError(f"Seção '{section}' não encontrada no JSON")
-            for field in fields:
-                if field not in config[section]:
-                    raise ValueError(f"Campo '{section}.{field}' obrigatório")
+            # target aceita um servidor ou uma lista de servidores
+            entries = config[section]
+            if isinstance(entries, list):
+                if not entries:
+                    raise ValueError(f"Seção '{section}' não pode ser uma lista vazia")
+                labels = [f"{section}[{i}]" for i in range(len(entries))]
+            else:
+                entries, labels = [entries], [section]
+            for entry, label in zip(entries, labels):
+                for field in fields:
+                    if field not in entry:
+                        raise ValueError(f"Campo '{label}.{field}' obrigatório")
+        
+        # source.database aceita um nome ou uma lista; database_pattern
+        # é resolvido contra pg_database no início do espelhamento
+        source = config['source']
+        if 'database' not in source and 'database_pattern' not in source:
+            raise ValueError("Campo 'source.database' obrigatório")
+        if isinstance(source.get('database'), list) and not source['database']:
+            raise ValueError("Campo 'source.database' não pode ser uma lista vazia")
         
         # Define valores padrão
         config['source'].setdefault('port', 5432)
-        config['target'].setdefault('port', 5432)
+        targets = config['target'] if isinstance(config['target'], list) else [config['target']]
+        for target in targets:
+            target.setdefault('port', 5432)
         config.setdefault('options', {})
         config['options'].setdefault('drop_existing', False)
         config['options'].setdefault('parallel_jobs', 4)
+        config['options'].setdefault('dump_jobs', 1)
+        config['options']['compression'] = parse_compression(
+            config['options'].get('compression', 'gzip:6')
+        )
+        config['options'].setdefault('restore_ordering', True)
+        config['options'].setdefault('maintenance_memory_mb', None)
+        config['options']['fast_restore'] = parse_fast_restore(
+            config['options'].get('fast_restore', False)
+        )
+        for target in targets:
+            if 'fast_restore' in target:
+                target['fast_restore'] = parse_fast_restore(target['fast_restore'])
+        config['options'].setdefault('stream', False)
+        config['options'].setdefault('stream_buffer_mb', 64)
+        config['options'].setdefault('pipeline', False)
+        config['options'].setdefault('copy_engine', False)
+        config['options'].setdefault('split_table_mb', 1024)
+        config['options'].setdefault('incremental', False)
+        config['options'].setdefault('state_dir', '~/.pg-mirror')
+        config['options'].setdefault('spool_dir', None)
+        config['options'].setdefault('spool_fallback', 'fail')
+        config['options'].setdefault('checkpoint', False)
+        config['options'].setdefault('resume', False)
+        config['options'].setdefault('connection_pool', True)
+        config['options']['dump_cache'] = parse_dump_cache(
+            config['options'].get('dump_cache')
+        )
+        config['options']['include'] = parse_patterns(config['options'].get('include'), 'include')
+        config['options']['exclude'] = parse_patterns(config['options'].get('exclude'), 'exclude')
+        config['options']['where'] = parse_where(config['options'].get('where'))
+        config['options'].setdefault('concurrent_databases', 1)
+        
+        for owner, label in [(config['options'], 'options')] + [
+            (target, f"target[{i}]" if len(targets) > 1 else 'target')
+            for i, target in enumerate(targets)
+        ]:
+            jobs = owner.get('parallel_jobs')
+            if jobs is not None and jobs != 'auto' and (not isinstance(jobs, int) or jobs < 1):
+                raise ValueError(f"Campo '{label}.parallel_jobs' deve ser inteiro positivo ou \"auto\"")
+            budget = owner.get('maintenance_memory_mb')
+            if budget is not None and (not isinstance(budget, int) or budget < 1):
+                raise ValueError(f"Campo '{label}.maintenance_memory_mb' deve ser inteiro positivo")
+        
+        dump_jobs = config['options']['dump_jobs']
+        if not isinstance(dump_jobs, int) or dump_jobs < 1:
+            raise ValueError("Campo 'options.dump_jobs' deve ser inteiro positivo")
+        concurrent = config['options']['concurrent_databases']
+        if not isinstance(concurrent, int) or concurrent < 1:
+            raise ValueError("Campo 'options.concurrent_databases' deve ser inteiro positivo")
+        split_mb = config['options']['split_table_mb']
+        if split_mb is not None and (not isinstance(split_mb, int) or split_mb < 1):
+            raise ValueError("Campo 'options.split_table_mb' deve ser inteiro positivo ou null")
+        if config['options']['spool_fallback'] not in ('fail', 'stream'):
+            raise ValueError("Campo 'options.spool_fallback' deve ser \"fail\" ou \"stream\"")
+        
+        modes = [m for m in MODES if config['options'][m]]
+        if len(modes) > 1:
+            raise ValueError(f"Opções {' e '.join(repr(m) for m in modes)} são mutuamente exclusivas")
+        if len(targets) > 1 and set(modes) & {'stream', 'pipeline', 'copy_engine'}:
+            raise ValueError(
+                "Vários destinos exigem o modo padrão (sem 'stream', 'pipeline' ou 'copy_engine')"
+            )
+        filtered = [f for f in ('include', 'exclude', 'where') if config['options'][f]]
+        # O motor de COPY aplica os filtros na própria cópia
+        if filtered and set(modes) - {'copy_engine'}:
+            raise ValueError(
+                f"Filtros ({', '.join(filtered)}) exigem o modo padrão ou 'copy_engine' "
+                f"(sem {modes[0]!r})"
+            )
         
         return config
     
@@ -0,0 +1,495 @@
+"""Parallel binary COPY data engine (bypasses pg_dump for table data)"""
+import functools
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from pg_mirror.database import QueryError, list_tables, quote_ident, run_query, server_version
+from pg_mirror.pipeline import run_dump, run_restore, auxiliary_data_item
+from pg_mirror.scheduler import MirrorJob, run_jobs
+from pg_mirror.snapshot import SnapshotCoordinator
+from pg_mirror.stream import pump_stream
+from pg_mirror.toc import read_toc
+
+
+# Divisão de tabelas grandes em faixas: até RANGES_PER_WORKER faixas por
+# worker, nenhuma menor que RANGE_MIN_BYTES
+RANGES_PER_WORKER = 4
+RANGE_MIN_BYTES = 256 * 1024 * 1024
+
+# Chave primária inteira de uma coluna (se houver) e número de blocos
+SPLIT_KEY_SQL = """
+    SELECT a.attname, pg_relation_size(c.oid) / current_setting('block_size')::int
+    FROM pg_class c
+    LEFT JOIN pg_index i ON i.indrelid = c.oid AND i.indisprimary AND i.indnkeyatts = 1
+    LEFT JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = i.indkey[0]
+        AND a.atttypid IN ('int2'::regtype, 'int4'::regtype, 'int8'::regtype)
+    WHERE c.oid = '{relation}'::regclass;
+"""
+
+# Colunas gravadas pelo COPY, na ordem da tabela; colunas geradas
+# (PostgreSQL 12+) ficam de fora, o destino as calcula
+COLUMNS_SQL = """
+    SELECT a.attname
+    FROM pg_attribute a
+    WHERE a.attrelid = '{relation}'::regclass
+    AND a.attnum > 0
+    AND NOT a.attisdropped
+    {generated}
+    ORDER BY a.attnum;
+"""
+GENERATED_COLUMNS_VERSION = 120000
+
+# Faixas de ctid só viram TID Range Scan a partir do PostgreSQL 14; antes,
+# cada faixa leria a tabela inteira
+TID_RANGE_SCAN_VERSION = 140000
+
+
+def _psql_command(conn, database, *commands, single_transaction=False):
+    """Monta uma chamada psql silenciosa (-q: sem tags de comando no stdout)"""
+    cmd = [
+        'psql',
+        '-h', conn['host'],
+        '-p', str(conn['port']),
+        '-U', conn['user'],
+        '-d', database,
+        '-X',
+        '-q',
+        '-v', 'ON_ERROR_STOP=1'
+    ]
+    if single_transaction:
+        cmd.append('-1')
+    for command in commands:
+        cmd += ['-c', command]
+    return cmd
+
+
+def table_columns(source, database, table, logger, version=None):
+    """
+    Colunas de uma tabela que entram no COPY (sem geradas nem removidas)
+
+    Args:
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        table: Tupla (schema, tabela)
+        logger: Logger configurado
+        version: server_version_num da origem (padrão: consultado)
+
+    Returns:
+        list: Nomes das colunas, na ordem da tabela
+
+    Raises:
+        QueryError: Se a consulta falhar
+    """
+    args = (source['host'], source['port'], database, source['user'], source['password'])
+    if version is None:
+        version = server_version(*args, logger)
+    name = f"{quote_ident(table[0])}.{quote_ident(table[1])}"
+    sql = COLUMNS_SQL.format(
+        relation=name.replace("'", "''"),
+        generated="AND a.attgenerated = ''" if version >= GENERATED_COLUMNS_VERSION else ''
+    )
+    return [row[0] for row in run_query(*args, sql, logger)]
+
+
+def copy_table(source, target, database, table, logger, snapshot=None, predicate=None,
+               truncate=False, buffer_mb=4, columns=None):
+    """
+    Copia os dados de uma tabela com COPY binário, da origem direto no destino
+
+    COPY ... TO STDOUT (FORMAT binary) na origem é ligado ao
+    COPY ... FROM STDIN (FORMAT binary) no destino por um pool fixo de
+    buffers reutilizáveis (ver pump_stream): nenhuma linha vira objeto
+    Python e nada é gravado em disco. O formato binário evita a
+    conversão para texto de numéricos, timestamps e bytea.
+
+    Com predicado, a leitura é um SELECT com a lista explícita de
+    colunas (ver table_columns), a mesma usada no COPY do destino:
+    SELECT * traria as colunas geradas, que o COPY FROM não aceita.
+
+    Args:
+        source: Dicionário de conexão da origem
+        target: Dicionário de conexão do destino
+        database: Nome do banco de dados
+        table: Tupla (schema, tabela)
+        logger: Logger configurado
+        snapshot: Snapshot exportado a usar na leitura (opcional)
+        predicate: Condição SQL para copiar apenas parte das linhas (opcional)
+        truncate: Se True, esvazia a tabela na mesma transação do COPY
+        buffer_mb: Memória máxima dos buffers desta cópia
+        columns: Colunas a copiar (padrão: consultadas na origem quando
+            há predicado)
+
+    Returns:
+        int: Bytes transferidos, ou None em caso de erro
+    """
+    name = f"{quote_ident(table[0])}.{quote_ident(table[1])}"
+    label = f"{table[0]}.{table[1]}"
+    source_env = os.environ.copy()
+    source_env['PGPASSWORD'] = source['password']
+    target_env = os.environ.copy()
+    target_env['PGPASSWORD'] = target['password']
+
+    if predicate and columns is None:
+        try:
+            columns = table_columns(source, database, table, logger)
+        except QueryError as e:
+            logger.error(f"Erro ao ler as colunas de {label}: {e}")
+            return None
+    column_names = ', '.join(quote_ident(column) for column in columns or ())
+    column_list = f" ({column_names})" if column_names else ''
+
+    if predicate:
+        relation = f"(SELECT {column_names} FROM {name} WHERE {predicate})"
+    else:
+        relation = f"{name}{column_list}"
+    reads = [f"COPY {relation} TO STDOUT (FORMAT binary)"]
+    if snapshot:
+        reads = [
+            "BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY",
+            f"SET TRANSACTION SNAPSHOT '{snapshot}'",
+        ] + reads
+    writes = [f"COPY {name}{column_list} FROM STDIN (FORMAT binary)"]
+    if truncate:
+        writes.insert(0, f"TRUNCATE TABLE ONLY {name}")
+
+    reader = subprocess.Popen(
+        _psql_command(source, database, *reads),
+        env=source_env, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    writer = subprocess.Popen(
+        _psql_command(target, database, *writes, single_transaction=True),
+        env=target_env, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+
+    transferred = 0
+    pipe_broken = False
+    try:
+        transferred = pump_stream(reader.stdout, writer.stdin,
+                                  max_buffers=max(2, int(buffer_mb)))
+    except BrokenPipeError:
+        # O destino encerrou antes do fim da leitura
+        pipe_broken = True
+        reader.kill()
+    except BaseException:
+        for proc in (reader, writer):
+            proc.kill()
+            proc.wait()
+        raise
+
+    # O COPY binário aceita EOF entre linhas como fim dos dados: fechar o
+    # stdin do destino confirma a transação. Se a origem falhou no meio,
+    # o destino é encerrado sem EOF e desfaz o TRUNCATE e o COPY
+    read_rc = reader.wait()
+    if pipe_broken or read_rc != 0:
+        writer.kill()
+    else:
+        try:
+            writer.stdin.close()
+        except BrokenPipeError:
+            pipe_broken = True
+    write_rc = writer.wait()
+    if not writer.stdin.closed:
+        try:
+            writer.stdin.close()
+        except BrokenPipeError:
+            pass
+    read_err = reader.stderr.read().decode(errors='replace')
+    write_err = writer.stderr.read().decode(errors='replace')
+    reader.stdout.close()
+    reader.stderr.close()
+    writer.stderr.close()
+
+    # Sem pipe quebrado, a falha da leitura vem antes: o destino só
+    # recebeu um COPY incompleto
+    if not pipe_broken and read_rc != 0:
+        logger.error(f"Erro ao ler {label} na origem: {read_err}")
+        return None
+    if pipe_broken or write_rc != 0:
+        logger.error(f"Erro ao carregar {label}: {write_err}")
+        return None
+
+    logger.debug(f"Copiado {label}: {transferred / (1024 * 1024):.2f} MB")
+    return transferred
+
+
+def copy_mirror(source, target, database, parallel_jobs, logger, post_data_jobs=None,
+                buffer_mb=64, work_root=None, subset=None, split_mb=None):
+    """
+    Espelhamento com o motor de COPY binário:
+    1. Extrai pre-data e post-data com pg_dump e aplica o pre-data
+    2. Workers copiam as tabelas com COPY binário direto entre os
+       servidores, todos no mesmo snapshot exportado (maiores primeiro)
+    3. Copia valores de sequências e large objects com pg_dump
+    4. Aplica o post-data (índices, constraints, triggers)
+
+    Tabelas a partir de split_mb são divididas em faixas de chave
+    primária ou de blocos (ver split_ranges), cada uma copiada por um
+    worker, também no mesmo snapshot.
+
+    Os dados das tabelas não passam pelo formato de arquivo do pg_dump
+    nem por disco. Com subset (ver subset.plan_subset), tabelas
+    filtradas ficam vazias e as de options.where recebem apenas as
+    linhas do predicado, lidas no mesmo snapshot; as FKs para tabelas
+    filtradas não são criadas.
+
+    Args:
+        source: Dicionário de conexão da origem
+        target: Dicionário de conexão do destino
+        database: Nome do banco de dados
+        parallel_jobs: Número de workers de COPY
+        logger: Logger configurado
+        post_data_jobs: Jobs do restore do post-data (padrão: parallel_jobs)
+        buffer_mb: Memória total dos buffers, dividida entre os workers
+        work_root: Diretório dos arquivos de schema (padrão: diretório temporário)
+        subset: SubsetPlan dos filtros de dados (opcional)
+        split_mb: Tamanho a partir do qual uma tabela é dividida em faixas
+            (None: cada tabela é um único COPY)
+
+    Returns:
+        bool: True se o espelhamento foi bem-sucedido, False caso contrário
+    """
+    post_data_jobs = post_data_jobs or parallel_jobs
+    work_dir = tempfile.mkdtemp(prefix=f'{database}_copy_', dir=work_root)
+
+    logger.info(f"COPY binário de '{database}' ({source['host']} -> {target['host']})...")
+    logger.info(f"Usando {parallel_jobs} workers de COPY e {post_data_jobs} no post-data")
+
+    coordinator = SnapshotCoordinator(source, database, logger)
+    try:
+        snapshot = coordinator.open()
+    except RuntimeError as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        logger.error(str(e))
+        return False
+
+    try:
+        tables = list_tables(
+            source['host'], source['port'], database,
+            source['user'], source['password'], logger
+        )
+
+        # 1. SCHEMA (pre-data e post-data são extraídos no mesmo snapshot)
+        pre_data = os.path.join(work_dir, 'pre-data.dump')
+        post_data = os.path.join(work_dir, 'post-data.dump')
+        extras = os.path.join(work_dir, 'extras.dump')
+        label, extras_args = auxiliary_data_item(tables)
+        try:
+            run_dump(source, database, snapshot, pre_data, '--section=pre-data')
+            run_dump(source, database, snapshot, post_data, '--section=post-data')
+            run_dump(source, database, snapshot, extras, '--section=data', *extras_args)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Erro ao extrair schema: {e.stderr}")
+            return False
+
+        logger.info("Aplicando schema (pre-data)...")
+        if not run_restore(target, database, pre_data, logger):
+            return False
+
+        # 2. DADOS DAS TABELAS
+        if not _copy_tables(source, target, database, snapshot, tables, parallel_jobs,
+                            buffer_mb, subset, split_mb, logger):
+            return False
+
+        # 3. SEQUÊNCIAS E LARGE OBJECTS
+        logger.info(f"Restaurando {label}...")
+        if not run_restore(target, database, extras, logger, '--section=data'):
+            return False
+
+        coordinator.close()
+
+        # 4. POST-DATA (sem as FKs para tabelas filtradas)
+        logger.info("Aplicando índices e constraints (post-data)...")
+        keep = subset.toc_filter if subset is not None else None
+        list_args = []
+        if keep is not None:
+            list_args = ['-L', os.path.join(work_dir, 'post-data.list')]
+            try:
+                toc = read_toc(post_data).select(keep)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Erro ao ler o TOC do post-data: {e.stderr}")
+                return False
+            with open(list_args[1], 'w', encoding='utf-8') as f:
+                f.write(toc.render())
+        if not run_restore(target, database, post_data, logger, '-j', str(post_data_jobs),
+                           *list_args):
+            return False
+
+        logger.info("COPY binário concluído com sucesso!")
+        return True
+
+    finally:
+        coordinator.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _copy_tables(source, target, database, snapshot, tables, parallel_jobs, buffer_mb,
+                 subset, split_mb, logger):
+    """
+    Copia as tabelas (ou faixas delas) em paralelo; a primeira falha
+    cancela as cópias que não começaram
+
+    Returns:
+        bool: True se todas as tabelas foram copiadas
+    """
+    excluded = set(subset.excluded) if subset is not None else set()
+    predicates = subset.predicates if subset is not None else {}
+    split_bytes = split_mb * 1024 * 1024 if split_mb else None
+    worker_buffer_mb = max(2, int(buffer_mb) // max(1, parallel_jobs))
+    failed = threading.Event()
+    lock = threading.Lock()
+    copied = [0, 0]  # cópias, bytes
+
+    def _copy(label, table, predicate, columns):
+        if failed.is_set():
+            return False
+        transferred = copy_table(source, target, database, table, logger,
+                                 snapshot=snapshot, predicate=predicate,
+                                 buffer_mb=worker_buffer_mb, columns=columns)
+        if transferred is None:
+            failed.set()
+            return False
+        with lock:
+            copied[0] += 1
+            copied[1] += transferred
+            logger.info(f"Copiado {copied[0]}/{len(jobs)}: {label}")
+        return True
+
+    try:
+        version = server_version(source['host'], source['port'], database,
+                                 source['user'], source['password'], logger)
+    except QueryError as e:
+        logger.error(f"Erro ao consultar a versão da origem: {e}")
+        return False
+
+    jobs = []
+    for schema, name, relkind, size in tables:
+        table = (schema, name)
+        if relkind != 'r' or table in excluded:
+            continue
+        count = range_count(size, parallel_jobs, split_bytes)
+        ranges = (split_ranges(source, database, table, count, logger, version=version)
+                  if count > 1 else [None])
+        # Lista de colunas consultada uma vez e repetida em todas as faixas
+        columns = None
+        if table in predicates or len(ranges) > 1:
+            try:
+                columns = table_columns(source, database, table, logger, version=version)
+            except QueryError as e:
+                logger.error(f"Erro ao ler as colunas de {schema}.{name}: {e}")
+                return False
+        for index, range_predicate in enumerate(ranges, start=1):
+            predicate = ' AND '.join(
+                f"({p})" for p in (predicates.get(table), range_predicate) if p
+            ) or None
+            label = f"{schema}.{name}" + (f" [{index}/{len(ranges)}]" if len(ranges) > 1 else '')
+            jobs.append(MirrorJob(
+                name=label,
+                host=target['host'],
+                size=size // len(ranges),
+                func=functools.partial(_copy, label, table, predicate, columns)
+            ))
+    run_jobs(jobs, max_concurrent=parallel_jobs, max_per_host=parallel_jobs, logger=logger)
+    if not all(job.success for job in jobs):
+        return False
+
+    logger.info(f"{copied[0]} cópia(s) concluídas: {copied[1] / (1024 * 1024):.2f} MB")
+    return True
+
+
+def range_count(size, workers, split_bytes):
+    """
+    Em quantas faixas copiar uma tabela
+
+    Tabelas a partir de split_bytes são divididas para ocupar os
+    workers: até RANGES_PER_WORKER faixas por worker (o que equilibra o
+    fim da cópia), sem faixas menores que RANGE_MIN_BYTES.
+
+    Args:
+        size: Tamanho da tabela em bytes
+        workers: Número de workers de COPY
+        split_bytes: Tamanho mínimo para dividir (None: nunca divide)
+
+    Returns:
+        int: Número de faixas (1 = tabela inteira)
+    """
+    if not split_bytes or workers < 2 or size < split_bytes:
+        return 1
+    return max(2, min(workers * RANGES_PER_WORKER, size // RANGE_MIN_BYTES))
+
+
+def _bounds(low, high, count):
+    """Limites internos que dividem [low, high] em até count faixas"""
+    return sorted({low + (high - low) * i // count for i in range(1, count)} - {low})
+
+
+def _range_predicates(column, bounds, literal):
+    """Predicados das faixas; a primeira e a última ficam abertas"""
+    if not bounds:
+        return [None]
+    predicates = [f"{column} < {literal(bounds[0])}"]
+    for start, end in zip(bounds, bounds[1:]):
+        predicates.append(f"{column} >= {literal(start)} AND {column} < {literal(end)}")
+    predicates.append(f"{column} >= {literal(bounds[-1])}")
+    return predicates
+
+
+def split_ranges(source, database, table, count, logger, version=None):
+    """
+    Predicados que dividem uma tabela em faixas disjuntas
+
+    Com chave primária inteira de uma coluna, as faixas são de valores
+    da chave entre min e max; sem ela, de blocos (ctid), que o
+    PostgreSQL 14+ lê com TID Range Scan. Em versões anteriores uma
+    tabela sem essa chave é copiada inteira. A primeira e a última
+    faixa são abertas, então linhas fora dos limites calculados
+    (inseridas depois da consulta) continuam cobertas.
+
+    Args:
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        table: Tupla (schema, tabela)
+        count: Número de faixas desejado
+        logger: Logger configurado
+        version: server_version_num da origem (padrão: consultado se
+            a divisão for por blocos)
+
+    Returns:
+        list: Predicados SQL ([None] = tabela inteira)
+    """
+    name = f"{quote_ident(table[0])}.{quote_ident(table[1])}"
+    args = (source['host'], source['port'], database, source['user'], source['password'])
+    try:
+        key, blocks = run_query(
+            *args, SPLIT_KEY_SQL.format(relation=name.replace("'", "''")), logger
+        )[0]
+        if key:
+            column = quote_ident(key)
+            low, high = run_query(*args, f"SELECT min({column}), max({column}) FROM {name};",
+                                  logger)[0]
+            if low in (None, ''):
+                return [None]  # Tabela vazia
+            predicates = _range_predicates(column, _bounds(int(low), int(high), count), str)
+        else:
+            if version is None:
+                version = server_version(*args, logger)
+            if version < TID_RANGE_SCAN_VERSION:
+                logger.info(
+                    f"{table[0]}.{table[1]} será copiada inteira: sem chave primária inteira "
+                    f"e sem TID Range Scan (PostgreSQL < 14)"
+                )
+                return [None]
+            predicates = _range_predicates(
+                'ctid', _bounds(0, int(blocks), count), lambda block: f"'({block},0)'::tid"
+            )
+    except (QueryError, IndexError, ValueError) as e:
+        logger.warning(f"{table[0]}.{table[1]} será copiada inteira: {e}")
+        return [None]
+
+    logger.info(
+        f"{table[0]}.{table[1]} dividida em {len(predicates)} faixas "
+        f"({'chave ' + key if key else 'blocos'})"
+    )
+    return predicates
@@ -1,8 +1,237 @@
 """Database operations for PostgreSQL"""
+import functools
 import subprocess
 import sys
 
+from pg_mirror.session import get_pool, DriverError
+from pg_mirror.openmetrics import DATABASE_OPERATIONS
 
+
+FIELD_SEPARATOR = '\x1f'  # Separador de colunas improvável em nomes de objetos
+
+
+class QueryError(Exception):
+    """Exception raised when a catalog query fails (psql or native driver)."""
+    pass
+
+
+def quote_ident(name):
+    """
+    Cita um identificador SQL (também aceito como padrão literal pelo pg_dump)
+    
+    Args:
+        name: Nome do objeto
+        
+    Returns:
+        str: Identificador entre aspas duplas
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _counted(operation):
+    """Conta a operação em pg_mirror_database_operations_total (ok/error)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            status = 'error'
+            try:
+                result = func(*args, **kwargs)
+                status = 'ok'
+                return result
+            finally:
+                DATABASE_OPERATIONS.inc(operation=operation, status=status)
+        return wrapper
+    return decorator
+
+
+@_counted('query')
+def run_query(host, port, database, user, password, sql, logger):
+    """
+    Executa uma consulta e retorna as linhas resultantes
+    
+    Usa uma conexão do pool nativo quando ativo (ver session.py);
+    caso contrário executa via psql.
+    
+    Args:
+        host: Hostname do servidor PostgreSQL
+        port: Porta do servidor
+        database: Nome do banco de dados
+        user: Usuário do PostgreSQL
+        password: Senha do usuário
+        sql: Consulta a executar
+        logger: Logger configurado
+        
+    Returns:
+        list: Linhas como tuplas de strings
+        
+    Raises:
+        QueryError: Se a consulta falhar
+    """
+    import os
+    
+    pool = get_pool()
+    if pool is not None:
+        try:
+            return pool.query(host, port, database, user, password, sql)
+        except DriverError as e:
+            raise QueryError(str(e).strip()) from e
+    
+    env = os.environ.copy()
+    env['PGPASSWORD'] = password
+    
+    cmd = [
+        'psql',
+        '-h', host,
+        '-p', str(port),
+        '-U', user,
+        '-d', database,
+        '-X',
+        '-tA',
+        '-F', FIELD_SEPARATOR,
+        '-v', 'ON_ERROR_STOP=1',
+        '-c', sql
+    ]
+    
+    logger.debug(f"Executando consulta em '{database}' ({host})")
+    try:
+        result = subprocess.run(cmd, env=env, check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as e:
+        raise QueryError((e.stderr or str(e)).strip()) from e
+    return [tuple(line.split(FIELD_SEPARATOR)) for line in result.stdout.splitlines() if line]
+
+
+def server_version(host, port, database, user, password, logger):
+    """
+    Versão do servidor (server_version_num, ex.: 140005)
+    
+    Args:
+        host: Hostname do servidor PostgreSQL
+        port: Porta do servidor
+        database: Nome do banco de dados
+        user: Usuário do PostgreSQL
+        password: Senha do usuário
+        logger: Logger configurado
+        
+    Returns:
+        int: server_version_num
+        
+    Raises:
+        QueryError: Se a consulta falhar
+    """
+    rows = run_query(host, port, database, user, password,
+                     "SELECT current_setting('server_version_num');", logger)
+    return int(rows[0][0])
+
+
+def list_databases(host, port, user, password, logger, pattern=None):
+    """
+    Lista bancos conectáveis do servidor com seus tamanhos
+    
+    Args:
+        host: Hostname do servidor PostgreSQL
+        port: Porta do servidor
+        user: Usuário do PostgreSQL
+        password: Senha do usuário
+        logger: Logger configurado
+        pattern: Padrão LIKE opcional aplicado ao nome (ex.: 'tenant_%')
+        
+    Returns:
+        list: Tuplas (nome, tamanho em bytes), do maior para o menor
+    """
+    condition = ""
+    if pattern:
+        escaped = pattern.replace("'", "''")
+        condition = f"AND datname LIKE '{escaped}'"
+    
+    sql = f"""
+        SELECT datname, pg_database_size(datname)
+        FROM pg_database
+        WHERE datallowconn AND NOT datistemplate
+        {condition}
+        ORDER BY 2 DESC, 1;
+    """
+    try:
+        rows = run_query(host, port, 'postgres', user, password, sql, logger)
+        return [(name, int(size)) for name, size in rows]
+    except QueryError as e:
+        logger.error(f"Erro ao listar bancos: {e}")
+        sys.exit(1)
+
+
+def list_tables(host, port, database, user, password, logger):
+    """
+    Lista tabelas e sequências do banco, da maior para a menor
+    
+    Args:
+        host: Hostname do servidor PostgreSQL
+        port: Porta do servidor
+        database: Nome do banco de dados
+        user: Usuário do PostgreSQL
+        password: Senha do usuário
+        logger: Logger configurado
+        
+    Returns:
+        list: Tuplas (schema, nome, relkind, tamanho em bytes)
+    """
+    sql = """
+        SELECT n.nspname, c.relname, c.relkind, pg_table_size(c.oid)
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'S')
+        AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+        AND n.nspname NOT LIKE 'pg\\_%'
+        AND NOT EXISTS (
+            SELECT 1 FROM pg_depend d
+            WHERE d.classid = 'pg_class'::regclass
+            AND d.objid = c.oid AND d.deptype = 'e'
+        )
+        ORDER BY 4 DESC, 1, 2;
+    """
+    try:
+        rows = run_query(host, port, database, user, password, sql, logger)
+        return [(schema, name, relkind, int(size)) for schema, name, relkind, size in rows]
+    except QueryError as e:
+        logger.error(f"Erro ao listar tabelas: {e}")
+        sys.exit(1)
+
+
+def list_foreign_keys(host, port, database, user, password, logger):
+    """
+    Lista as foreign keys do banco com a tabela referenciada
+    
+    Args:
+        host: Hostname do servidor PostgreSQL
+        port: Porta do servidor
+        database: Nome do banco de dados
+        user: Usuário do PostgreSQL
+        password: Senha do usuário
+        logger: Logger configurado
+        
+    Returns:
+        list: Tuplas ((schema, tabela), constraint, (schema, tabela referenciada))
+    """
+    sql = """
+        SELECT n.nspname, c.relname, con.conname, rn.nspname, r.relname
+        FROM pg_constraint con
+        JOIN pg_class c ON c.oid = con.conrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_class r ON r.oid = con.confrelid
+        JOIN pg_namespace rn ON rn.oid = r.relnamespace
+        WHERE con.contype = 'f'
+        AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+        AND n.nspname NOT LIKE 'pg\\_%'
+        ORDER BY 1, 2, 3;
+    """
+    try:
+        rows = run_query(host, port, database, user, password, sql, logger)
+        return [((schema, table), name, (ref_schema, ref_table))
+                for schema, table, name, ref_schema, ref_table in rows]
+    except QueryError as e:
+        logger.error(f"Erro ao listar foreign keys: {e}")
+        sys.exit(1)
+
+
+@_counted('exists')
 def check_database_exists(host, port, database, user, password, logger):
     """
     Verifica se o banco de dados existe
@@ -20,6 +249,20 @@ def check_database_exists(host, port, database, user, password, logger):
     """
     import os
     
+    pool = get_pool()
+    if pool is not None:
+        try:
+            rows = pool.query(
+                host, port, 'postgres', user, password,
+                "SELECT 1 FROM pg_database WHERE datname = %s;", (database,)
+            )
+            exists = bool(rows)
+            logger.debug(f"Banco '{database}' existe: {exists}")
+            return exists
+        except DriverError as e:
+            logger.error(f"Erro ao verificar existência do banco: {e}")
+            return False
+    
     env = os.environ.copy()
     env['PGPASSWORD'] = password
     
@@ -48,6 +291,7 @@ def check_database_exists(host, port, database, user, password, logger):
         return False
 
 
+@_counted('create')
 def create_database(host, port, database, user, password, logger):
     """
     Cria o banco de dados
@@ -62,6 +306,17 @@ def create_database(host, port, database, user, password, logger):
     """
     import os
     
+    pool = get_pool()
+    if pool is not None:
+        try:
+            pool.query(host, port, 'postgres', user, password,
+                       f'CREATE DATABASE {quote_ident(database)};')
+            logger.info(f"Banco '{database}' criado com sucesso")
+            return
+        except DriverError as e:
+            logger.error(f"Erro ao criar banco: {e}")
+            sys.exit(1)
+    
     env = os.environ.copy()
     env['PGPASSWORD'] = password
     
@@ -82,6 +337,7 @@ def create_database(host, port, database, user, password, logger):
         sys.exit(1)
 
 
+@_counted('recreate')
 def drop_and_create_database(host, port, database, user, password, logger):
     """
     Recria o banco do zero (remove e cria novamente)
@@ -96,6 +352,11 @@ def drop_and_create_database(host, port, database, user, password, logger):
     """
     import os
     
+    pool = get_pool()
+    if pool is not None:
+        _drop_and_create_pooled(pool, host, port, database, user, password, logger)
+        return
+    
     env = os.environ.copy()
     env['PGPASSWORD'] = password
     
@@ -143,3 +404,26 @@ def drop_and_create_database(host, port, database, user, password, logger):
     except subprocess.CalledProcessError as e:
         logger.error(f"Erro ao recriar banco: {e.stderr.decode() if e.stderr else e}")
         sys.exit(1)
+
+
+def _drop_and_create_pooled(pool, host, port, database, user, password, logger):
+    """Recria o banco usando uma única conexão do pool"""
+    try:
+        with pool.connection(host, port, 'postgres', user, password) as conn:
+            logger.debug(f"Terminando conexões existentes no banco '{database}'")
+            conn.execute(
+                """
+                SELECT pg_terminate_backend(pid)
+                FROM pg_stat_activity
+                WHERE datname = %s AND pid <> pg_backend_pid();
+                """,
+                (database,)
+            )
+            logger.debug(f"Removendo banco '{database}'")
+            conn.execute(f'DROP DATABASE IF EXISTS {quote_ident(database)};')
+            logger.debug(f"Criando banco '{database}'")
+            conn.execute(f'CREATE DATABASE {quote_ident(database)};')
+        logger.info(f"Banco '{database}' recriado com sucesso")
+    except DriverError as e:
+        logger.error(f"Erro ao recriar banco: {e}")
+        sys.exit(1)
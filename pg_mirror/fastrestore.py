@@ -0,0 +1,140 @@
+"""Fast-restore session profile for disposable targets"""
+from pg_mirror.database import run_query, quote_ident, QueryError
+
+
+SUPERUSER_SQL = "SELECT rolsuper FROM pg_roles WHERE rolname = current_user;"
+
+# Tabelas comuns criadas pelo pre-data (partições e tabelas particionadas
+# não aceitam SET UNLOGGED em todas as versões)
+USER_TABLES_SQL = """
+    SELECT n.nspname, c.relname
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind = 'r' AND c.relpersistence = 'p' AND NOT c.relispartition
+    AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+    AND n.nspname NOT LIKE 'pg\\_%'
+    ORDER BY 1, 2;
+"""
+
+
+def parse_fast_restore(value):
+    """
+    Normaliza options.fast_restore
+
+    Args:
+        value: false, true ou {"unlogged": bool}
+
+    Returns:
+        dict: {"unlogged": bool} ou None se desativado
+
+    Raises:
+        ValueError: Se o valor não for reconhecido
+    """
+    if value is None or value is False:
+        return None
+    if value is True:
+        return {'unlogged': False}
+    if isinstance(value, dict):
+        return {'unlogged': bool(value.get('unlogged', False))}
+    raise ValueError("'fast_restore' deve ser booleano ou {\"unlogged\": bool}")
+
+
+class FastRestore:
+    """
+    Perfil de restore rápido para destinos descartáveis
+
+    Durante a carga de dados as sessões do pg_restore usam
+    synchronous_commit=off e, para superusuários,
+    session_replication_role=replica (sem triggers nem checagem de FK).
+    Opcionalmente as tabelas são carregadas como UNLOGGED e voltam a
+    LOGGED ao fim da carga. Tudo o que foi alterado é registrado e
+    desfeito em finish().
+    """
+
+    def __init__(self, host, port, database, user, password, logger, unlogged=False):
+        """
+        Args:
+            host: Hostname do servidor de destino
+            port: Porta do servidor
+            database: Nome do banco de dados
+            user: Usuário do PostgreSQL
+            password: Senha do usuário
+            logger: Logger configurado
+            unlogged: Se True, carrega os dados em tabelas UNLOGGED
+        """
+        self.connection = (host, port, database, user, password)
+        self.logger = logger
+        self.unlogged = unlogged
+        self.settings = {'synchronous_commit': 'off'}
+        self.unlogged_tables = []
+        self.changes = []
+
+    def _query(self, sql):
+        return run_query(*self.connection, sql, self.logger)
+
+    def before_data(self):
+        """Prepara o destino após o pre-data (privilégios e tabelas UNLOGGED)"""
+        try:
+            is_superuser = self._query(SUPERUSER_SQL)[0][0] == 't'
+        except QueryError as e:
+            self.logger.warning(f"Não foi possível verificar privilégios: {e}")
+            is_superuser = False
+        if is_superuser:
+            self.settings['session_replication_role'] = 'replica'
+        else:
+            self.logger.warning(
+                "session_replication_role exige superusuário; triggers e FKs seguem ativos"
+            )
+        for name, value in self.settings.items():
+            self.changes.append(f"{name}={value} nas sessões de carga (vale só para a sessão)")
+
+        if self.unlogged:
+            try:
+                tables = self._query(USER_TABLES_SQL)
+            except QueryError as e:
+                self.logger.warning(f"Não foi possível listar tabelas para UNLOGGED: {e}")
+                tables = []
+            for schema, name in tables:
+                table = f"{quote_ident(schema)}.{quote_ident(name)}"
+                try:
+                    self._query(f"ALTER TABLE {table} SET UNLOGGED;")
+                    self.unlogged_tables.append((schema, name))
+                except QueryError as e:
+                    self.logger.warning(f"{schema}.{name} continua LOGGED: {e}")
+            self.changes.append(f"{len(self.unlogged_tables)} tabela(s) carregada(s) como UNLOGGED")
+
+    def session_options(self):
+        """
+        Opções de sessão (PGOPTIONS) para a carga de dados
+
+        Returns:
+            str: Opções no formato "-c nome=valor ..."
+        """
+        return ' '.join(f"-c {name}={value}" for name, value in self.settings.items())
+
+    def finish(self):
+        """
+        Desfaz as alterações persistentes e registra o relatório
+
+        Chamado também em caso de falha, para não deixar tabelas UNLOGGED.
+
+        Returns:
+            bool: True se tudo foi restaurado
+        """
+        restored = True
+        while self.unlogged_tables:
+            schema, name = self.unlogged_tables.pop()
+            try:
+                self._query(f"ALTER TABLE {quote_ident(schema)}.{quote_ident(name)} SET LOGGED;")
+            except QueryError as e:
+                self.logger.error(f"Não foi possível voltar {schema}.{name} para LOGGED: {e}")
+                restored = False
+
+        if self.changes:
+            self.logger.info("Perfil fast_restore aplicado:")
+            for change in self.changes:
+                self.logger.info(f"   - {change}")
+            if self.unlogged and restored:
+                self.logger.info("   - Tabelas de volta a LOGGED")
+        self.changes = []
+        return restored
@@ -0,0 +1,173 @@
+"""Change tracking for incremental PostgreSQL mirrors"""
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, timezone
+
+from pg_mirror.database import run_query, quote_ident, QueryError
+
+
+MARKERS_SQL = """
+    SELECT schemaname, relname, n_tup_ins, n_tup_upd, n_tup_del,
+           pg_relation_filenode(relid), pg_table_size(relid)
+    FROM pg_stat_user_tables
+    ORDER BY 1, 2;
+"""
+
+# Assinatura do schema: colunas, índices e constraints das tabelas de usuário.
+# Qualquer mudança estrutural invalida o estado e força um espelhamento completo.
+SIGNATURE_SQL = """
+    WITH rels AS (
+        SELECT c.oid, n.nspname, c.relname
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p')
+        AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+        AND n.nspname NOT LIKE 'pg\\_%'
+    )
+    SELECT md5(coalesce(string_agg(item, E'\\n' ORDER BY item), ''))
+    FROM (
+        SELECT format('col %s.%s %s %s', r.nspname, r.relname, a.attname,
+                      format_type(a.atttypid, a.atttypmod)) AS item
+        FROM rels r
+        JOIN pg_attribute a ON a.attrelid = r.oid
+        WHERE a.attnum > 0 AND NOT a.attisdropped
+        UNION ALL
+        SELECT 'idx ' || pg_get_indexdef(i.indexrelid)
+        FROM rels r
+        JOIN pg_index i ON i.indrelid = r.oid
+        UNION ALL
+        SELECT format('con %s.%s %s', r.nspname, r.relname, pg_get_constraintdef(co.oid))
+        FROM rels r
+        JOIN pg_constraint co ON co.conrelid = r.oid
+    ) items;
+"""
+
+
+def collect_markers(source, database, logger):
+    """
+    Coleta os marcadores de mudança das tabelas na origem
+
+    Os contadores de pg_stat_user_tables são atualizados com um pequeno
+    atraso; uma escrita ainda não refletida é detectada na execução
+    seguinte, pois os marcadores salvos são os lidos aqui.
+
+    Args:
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        logger: Logger configurado
+
+    Returns:
+        tuple: (assinatura do schema, {(schema, tabela): [ins, upd, del, filenode, tamanho]})
+    """
+    args = (source['host'], source['port'], database, source['user'], source['password'])
+    signature = run_query(*args, SIGNATURE_SQL, logger)[0][0]
+    markers = {
+        (schema, name): [int(value) if value else 0 for value in values]
+        for schema, name, *values in run_query(*args, MARKERS_SQL, logger)
+    }
+    logger.debug(f"Marcadores coletados para {len(markers)} tabelas")
+    return signature, markers
+
+
+def changed_tables(previous, current):
+    """
+    Compara marcadores e retorna as tabelas que precisam ser recopiadas
+
+    Args:
+        previous: Marcadores da última execução bem-sucedida
+        current: Marcadores atuais da origem
+
+    Returns:
+        list: Tuplas (schema, tabela) novas ou alteradas, em ordem
+    """
+    return sorted(key for key, markers in current.items() if previous.get(key) != markers)
+
+
+def state_path(state_dir, source, target, database):
+    """
+    Caminho do arquivo de estado de um par origem/destino
+
+    Args:
+        state_dir: Diretório base de estado (options.state_dir)
+        source: Dicionário de conexão da origem
+        target: Dicionário de conexão do destino
+        database: Nome do banco de dados
+
+    Returns:
+        str: Caminho do arquivo JSON de estado
+    """
+    name = (f"{source['host']}_{source['port']}_{database}"
+            f"__{target['host']}_{target['port']}")
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+    return os.path.join(os.path.expanduser(state_dir), 'incremental', f'{name}.json')
+
+
+def load_state(path):
+    """
+    Carrega o estado da última execução
+
+    Args:
+        path: Caminho do arquivo de estado
+
+    Returns:
+        tuple: (assinatura, marcadores) ou None se não houver estado válido
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        markers = {(schema, name): values for schema, name, values in state['markers']}
+        return state['signature'], markers
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError):
+        return None
+
+
+def save_state(path, signature, markers):
+    """
+    Grava o estado de forma atômica (arquivo temporário + rename)
+
+    Args:
+        path: Caminho do arquivo de estado
+        signature: Assinatura do schema
+        markers: Marcadores das tabelas
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    state = {
+        'signature': signature,
+        'updated_at': datetime.now(timezone.utc).isoformat(),
+        'markers': [[schema, name, values] for (schema, name), values in sorted(markers.items())],
+    }
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def truncate_tables(target, database, tables, logger):
+    """
+    Esvazia no destino as tabelas que serão recarregadas
+
+    Sem CASCADE: se uma tabela inalterada referencia uma das tabelas
+    alteradas por FK o TRUNCATE falha e o chamador deve recorrer ao
+    espelhamento completo.
+
+    Args:
+        target: Dicionário de conexão do destino
+        database: Nome do banco de dados
+        tables: Tuplas (schema, tabela)
+        logger: Logger configurado
+
+    Returns:
+        bool: True se as tabelas foram esvaziadas
+    """
+    names = ', '.join(f"{quote_ident(schema)}.{quote_ident(name)}" for schema, name in tables)
+    try:
+        run_query(
+            target['host'], target['port'], database, target['user'], target['password'],
+            f"TRUNCATE TABLE {names};", logger
+        )
+        return True
+    except QueryError as e:
+        logger.warning(f"Não foi possível esvaziar as tabelas alteradas: {e}")
+        return False
@@ -1,19 +1,117 @@
 """Logger configuration for pg-mirror"""
-import sys
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import queue
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+LOG_FORMATS = ('text', 'json')
+DEFAULT_LOG_MAX_MB = 50
+DEFAULT_LOG_BACKUPS = 5
+
+# Identificador da execução, compartilhado com o relatório de métricas
+RUN_ID = uuid.uuid4().hex[:12]
+
+# Campos de contexto (database, phase...) do bloco atual
+_context = contextvars.ContextVar('pg_mirror_log_context', default={})
+_listener = None
+
+
+@contextmanager
+def log_context(**fields):
+    """
+    Adiciona campos aos registros JSON emitidos dentro do bloco
+    
+    Vale para a thread (ou contexto) atual; None remove o campo.
+    
+    Args:
+        **fields: Campos do contexto (ex.: database='app', phase='restore')
+    """
+    current = dict(_context.get())
+    current.update(fields)
+    if 'phase' in fields:
+        current['_started'] = time.time()
+    token = _context.set(current)
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
 
+class ContextFilter(logging.Filter):
+    """Copia o contexto da thread que emite o log para o registro"""
+    
+    def filter(self, record):
+        context = _context.get()
+        record.run_id = RUN_ID
+        for name in ('database', 'phase'):
+            if not hasattr(record, name):
+                setattr(record, name, context.get(name))
+        if not hasattr(record, 'object'):
+            record.object = None
+        started = context.get('_started')
+        record.elapsed_ms = round((record.created - started) * 1000) if started else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro"""
+    
+    FIELDS = ('run_id', 'database', 'phase', 'object', 'elapsed_ms')
+    
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name in self.FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def shutdown_logging():
+    """Esvazia a fila e encerra a thread de escrita"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
 
-def setup_logger(verbose=False):
+
+def setup_logger(verbose=False, log_format='text', log_file=None,
+                 max_mb=DEFAULT_LOG_MAX_MB, backups=DEFAULT_LOG_BACKUPS):
     """
     Configura o logger da aplicação
     
+    No formato texto sem arquivo, escreve direto no stdout. Em JSON ou
+    com arquivo, os registros vão para uma fila (QueueHandler) e uma
+    thread (QueueListener) faz a escrita, de modo que workers de dump e
+    restore nunca esperam por I/O de log.
+    
     Args:
         verbose: Se True, mostra mensagens DEBUG
+        log_format: 'text' ou 'json' (uma linha JSON por registro)
+        log_file: Arquivo de log adicional, com rotação (opcional)
+        max_mb: Tamanho máximo do arquivo antes da rotação
+        backups: Quantidade de arquivos rotacionados mantidos
     """
     logger = logging.getLogger('pg-mirror')
     logger.setLevel(logging.DEBUG if verbose else logging.INFO)
     
     # Remove handlers existentes
+    shutdown_logging()
     logger.handlers = []
     
     # Handler para console
@@ -21,11 +119,40 @@ def setup_logger(verbose=False):
     console_handler.setLevel(logging.DEBUG if verbose else logging.INFO)
     
     # Formato detalhado
-    formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    if log_format == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
     console_handler.setFormatter(formatter)
     
-    logger.addHandler(console_handler)
+    if log_format == 'text' and not log_file:
+        logger.addHandler(console_handler)
+        return logger
+    
+    handlers = [console_handler]
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=max_mb * 1024 * 1024,
+            backupCount=backups,
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    
+    # Fila sem limite: quem loga nunca bloqueia
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    logger.addHandler(queue_handler)
+    
+    global _listener
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
     return logger
+
+
+atexit.register(shutdown_logging)
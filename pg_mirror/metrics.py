@@ -0,0 +1,239 @@
+"""Per-phase run metrics (timings, bytes and rates)"""
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+from pg_mirror.logger import RUN_ID, log_context
+from pg_mirror.openmetrics import PHASE_DURATION
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+MB = 1024 * 1024
+
+_active_metrics = None
+
+
+def _cpu_seconds():
+    """CPU (usuário + sistema) do processo e dos filhos já encerrados"""
+    if resource is None:
+        # Sem getrusage (Windows) a CPU dos filhos fica fora do relatório
+        return time.process_time()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+class RunMetrics:
+    """
+    Métricas de uma execução do pg-mirror
+
+    Cada fase registra tempo de relógio e CPU. A CPU inclui os
+    pg_dump/pg_restore (processos filhos) encerrados durante a fase;
+    fases simultâneas (vários bancos ou destinos) contam também a CPU
+    umas das outras. No Windows apenas a CPU do próprio processo é
+    medida.
+    """
+
+    def __init__(self):
+        self.run_id = RUN_ID
+        self.started_at = datetime.now(timezone.utc)
+        self.phases = []
+        self._spans = []
+        self.databases = {}
+        self.settings = {}
+        self._started = time.perf_counter()
+        self._cpu_started = _cpu_seconds()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name, database=None, **attributes):
+        """
+        Mede uma fase (checks, backup, target_prep, restore, cleanup...)
+
+        Args:
+            name: Nome da fase
+            database: Banco de dados da fase (opcional)
+            **attributes: Atributos extras (ex.: jobs)
+
+        Yields:
+            dict: Registro da fase, que pode receber atributos durante o bloco
+        """
+        record = {'name': name, 'database': database, **attributes}
+        wall, cpu = time.perf_counter(), _cpu_seconds()
+        try:
+            yield record
+            record.setdefault('success', True)
+        except BaseException:
+            record['success'] = False
+            raise
+        finally:
+            record['wall_seconds'] = round(time.perf_counter() - wall, 3)
+            record['cpu_seconds'] = round(_cpu_seconds() - cpu, 3)
+            with self._lock:
+                self.phases.append(record)
+                self._spans.append((name, database, wall, time.perf_counter()))
+
+    def record(self, database, **values):
+        """
+        Acumula valores de um banco (bytes, tamanhos, resultado...)
+
+        Args:
+            database: Nome do banco de dados
+            **values: Valores a gravar
+        """
+        with self._lock:
+            self.databases.setdefault(database, {}).update(values)
+
+    def _database_report(self, database, values):
+        """Valores de um banco com razão de compressão e vazões"""
+        report = dict(values)
+        archive = values.get('archive_bytes')
+        source = values.get('database_bytes')
+        if archive and source:
+            report['compression_ratio'] = round(archive / source, 4)
+        for phase in ('backup', 'restore'):
+            # Restores simultâneos (vários destinos) contam uma vez: do
+            # primeiro início ao último fim, não a soma das durações
+            spans = [
+                (start, end) for name, db, start, end in self._spans
+                if name == phase and db == database
+            ]
+            seconds = spans and max(end for _, end in spans) - min(start for start, _ in spans)
+            if archive and seconds:
+                report[f'{phase}_mb_s'] = round(archive / MB / seconds, 2)
+        return report
+
+    def to_dict(self, exit_code):
+        """
+        Relatório completo da execução
+
+        Args:
+            exit_code: Código de saída do processo
+
+        Returns:
+            dict: Relatório serializável em JSON
+        """
+        with self._lock:
+            phases = list(self.phases)
+            databases = {name: dict(values) for name, values in self.databases.items()}
+        return {
+            'run_id': self.run_id,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+            'wall_seconds': round(time.perf_counter() - self._started, 3),
+            'cpu_seconds': round(_cpu_seconds() - self._cpu_started, 3),
+            'exit_code': exit_code,
+            'status': 'success' if exit_code == 0 else 'failure',
+            'settings': self.settings,
+            'phases': phases,
+            'databases': {
+                name: self._database_report(name, values)
+                for name, values in databases.items()
+            },
+        }
+
+    def write(self, path, exit_code):
+        """
+        Grava o relatório de forma atômica (arquivo temporário + rename)
+
+        Args:
+            path: Caminho do arquivo JSON
+            exit_code: Código de saída do processo
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(exit_code), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def get_metrics():
+    """
+    Retorna as métricas da execução ativa
+
+    Returns:
+        RunMetrics ou None se não houver coleta ativa
+    """
+    return _active_metrics
+
+
+@contextmanager
+def phase(name, database=None, **attributes):
+    """
+    Mede uma fase na execução ativa e no histograma exportado
+
+    Sem coleta ativa apenas o histograma de duração é atualizado. Os
+    logs JSON emitidos no bloco levam a fase e o banco.
+
+    Args:
+        name: Nome da fase
+        database: Banco de dados da fase (opcional)
+        **attributes: Atributos extras (ex.: jobs)
+
+    Yields:
+        dict: Registro da fase
+    """
+    metrics = _active_metrics
+    measure = nullcontext({}) if metrics is None else metrics.phase(name, database, **attributes)
+    fields = {'phase': name} if database is None else {'phase': name, 'database': database}
+    started = time.perf_counter()
+    try:
+        with log_context(**fields), measure as record:
+            yield record
+    finally:
+        PHASE_DURATION.observe(time.perf_counter() - started, phase=name)
+
+
+def record(database, **values):
+    """Acumula valores de um banco na execução ativa, se houver"""
+    if _active_metrics is not None:
+        _active_metrics.record(database, **values)
+
+
+@contextmanager
+def collect_metrics(path, logger):
+    """
+    Coleta métricas durante o bloco e grava o relatório ao final
+
+    O relatório é gravado também quando o bloco termina com
+    sys.exit ou exceção, com o código de saída correspondente.
+
+    Args:
+        path: Arquivo JSON do relatório (None: coleta desativada)
+        logger: Logger configurado
+
+    Yields:
+        RunMetrics ou None
+    """
+    global _active_metrics
+
+    if not path:
+        yield None
+        return
+
+    metrics = RunMetrics()
+    previous, _active_metrics = _active_metrics, metrics
+    exit_code = 0
+    try:
+        yield metrics
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        raise
+    except BaseException:
+        exit_code = 1
+        raise
+    finally:
+        _active_metrics = previous
+        try:
+            metrics.write(path, exit_code)
+            logger.info(f"Métricas gravadas em {path}")
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar as métricas: {e}")
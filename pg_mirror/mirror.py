@@ -0,0 +1,691 @@
+"""Mirror orchestration for PostgreSQL databases"""
+import functools
+import sys
+from contextlib import contextmanager
+
+from pg_mirror.database import (
+    check_database_exists,
+    create_database,
+    drop_and_create_database,
+    list_databases,
+    list_tables
+)
+from pg_mirror.backup import create_backup, cleanup_backup, get_backup_size
+from pg_mirror.cache import cache_key, open_dump_cache
+from pg_mirror.checkpoint import open_journal
+from pg_mirror.compression import (
+    calibrate_compression,
+    describe_compression,
+    pg_dump_major,
+    required_pg_dump_major
+)
+from pg_mirror.spool import (
+    SpoolSpaceError,
+    spool_directory,
+    ratio_key,
+    expected_ratio,
+    record_ratio,
+    database_size,
+    check_free_space
+)
+from pg_mirror.planner import RestorePlan, auto_restore_plan
+from pg_mirror.toc import collect_object_sizes
+from pg_mirror.restore import restore_backup
+from pg_mirror.stream import stream_mirror
+from pg_mirror.pipeline import pipeline_mirror
+from pg_mirror.copyengine import copy_mirror
+from pg_mirror.subset import plan_subset, load_filtered
+from pg_mirror.scheduler import MirrorJob, run_jobs, log_summary
+from pg_mirror import metrics
+from pg_mirror.logger import log_context
+from pg_mirror.incremental import (
+    collect_markers,
+    changed_tables,
+    state_path,
+    load_state,
+    save_state,
+    truncate_tables
+)
+
+
+def get_targets(cfg):
+    """
+    Retorna os servidores de destino configurados
+
+    Args:
+        cfg: Configuração carregada
+
+    Returns:
+        list: Dicionários de conexão dos destinos
+    """
+    targets = cfg['target']
+    return targets if isinstance(targets, list) else [targets]
+
+
+def describe_target(target):
+    """Rótulo legível de um destino (host:porta)"""
+    return f"{target['host']}:{target['port']}"
+
+
+def is_multi_database(cfg):
+    """
+    Indica se a configuração seleciona mais de um banco (lista ou padrão)
+
+    Args:
+        cfg: Configuração carregada
+
+    Returns:
+        bool: True se source.database é lista ou há source.database_pattern
+    """
+    return 'database_pattern' in cfg['source'] or isinstance(cfg['source'].get('database'), list)
+
+
+def resolve_databases(cfg, logger):
+    """
+    Resolve os bancos a espelhar e seus tamanhos na origem
+
+    Args:
+        cfg: Configuração carregada
+        logger: Logger configurado
+
+    Returns:
+        list: Tuplas (nome, tamanho em bytes), do maior para o menor
+    """
+    source = cfg['source']
+    pattern = source.get('database_pattern')
+    available = list_databases(
+        source['host'], source['port'], source['user'], source['password'],
+        logger, pattern=pattern
+    )
+
+    if pattern:
+        logger.info(f"Padrão '{pattern}' corresponde a {len(available)} banco(s)")
+        return available
+
+    sizes = dict(available)
+    names = source['database']
+    if isinstance(names, str):
+        names = [names]
+    for name in names:
+        if name not in sizes:
+            logger.warning(f"Banco '{name}' não encontrado na origem")
+    return sorted(((name, sizes.get(name, 0)) for name in names),
+                  key=lambda item: item[1], reverse=True)
+
+
+def resolve_compression(cfg, database, logger):
+    """
+    Resolve a compressão do backup, calibrando quando configurada como "auto"
+
+    Um algoritmo explícito que o pg_dump instalado não suporta (lz4 e
+    zstd antes do PostgreSQL 16) encerra a execução antes do dump.
+
+    Args:
+        cfg: Configuração carregada
+        database: Nome do banco de dados
+        logger: Logger configurado
+
+    Returns:
+        dict: Configuração de compressão normalizada
+    """
+    setting = cfg['options']['compression']
+    if setting == 'auto':
+        return calibrate_compression(cfg['source'], database, logger)
+    required = required_pg_dump_major(setting['algorithm'])
+    major = pg_dump_major() if required else 0
+    # Versão não detectada: o próprio pg_dump reporta o erro
+    if 0 < major < required:
+        logger.error(
+            f"Compressão {describe_compression(setting)} exige pg_dump {required}+ "
+            f"(instalado: {major}); use gzip ou none"
+        )
+        sys.exit(1)
+    return setting
+
+
+def create_source_backup(cfg, database, logger, output_dir=None, subset=None, snapshot=None):
+    """
+    Backup completo da origem com verificação prévia de espaço livre
+
+    Antes do dump o tamanho do arquivo é estimado por pg_database_size
+    e pela razão de compressão observada nas últimas execuções (mesma
+    origem, banco e compressão); se a estimativa não couber no
+    diretório de saída o backup nem começa. Ao final a razão real é
+    registrada para a próxima estimativa.
+
+    Args:
+        cfg: Configuração carregada
+        database: Nome do banco de dados
+        logger: Logger configurado
+        output_dir: Diretório do backup (padrão: options.spool_dir)
+        subset: SubsetPlan com as tabelas sem dados no dump (opcional)
+        snapshot: Snapshot exportado a ser lido pelo dump (opcional)
+
+    Returns:
+        str: Caminho do arquivo (ou diretório) de backup criado
+
+    Raises:
+        SpoolSpaceError: Se não houver espaço para o backup estimado
+    """
+    source = cfg['source']
+    state_dir = cfg['options']['state_dir']
+    compression = resolve_compression(cfg, database, logger)
+    directory = output_dir or spool_directory(cfg['options']['spool_dir'])
+    key = ratio_key(source, database, describe_compression(compression))
+
+    db_size = database_size(source, database, logger)
+    if db_size is not None:
+        metrics.record(database, database_bytes=db_size)
+        ratio = expected_ratio(state_dir, key, compression['algorithm'])
+        check_free_space(directory, db_size, ratio, logger)
+
+    backup_file = create_backup(
+        host=source['host'],
+        port=source['port'],
+        database=database,
+        user=source['user'],
+        password=source['password'],
+        logger=logger,
+        dump_jobs=cfg['options']['dump_jobs'],
+        compression=compression,
+        output_dir=directory,
+        exclude_data=subset.exclude_data if subset is not None else None,
+        snapshot=snapshot
+    )
+    if db_size:
+        record_ratio(state_dir, key, db_size, get_backup_size(backup_file))
+    return backup_file
+
+
+@contextmanager
+def source_backup(cfg, database, logger, journal=None, subset=None):
+    """
+    Backup completo da origem, compartilhado por todos os destinos
+
+    Com options.dump_cache um dump recente da mesma origem, banco e
+    compressão é reutilizado em vez de consultar a origem de novo; um
+    dump novo é publicado no cache e mantido para as próximas
+    execuções. Sem cache o backup é temporário (em options.spool_dir)
+    e removido ao final.
+
+    Com um diário de checkpoint (que tem precedência sobre o cache) o
+    backup retomado é reutilizado e, se algum destino não terminou, o
+    backup e o diário são mantidos para o próximo --resume.
+
+    Args:
+        cfg: Configuração carregada
+        database: Nome do banco de dados
+        logger: Logger configurado
+        journal: Journal do checkpoint (opcional)
+        subset: SubsetPlan dos filtros de dados (opcional)
+
+    Yields:
+        str: Caminho do arquivo (ou diretório) de backup
+
+    Raises:
+        SpoolSpaceError: Se não houver espaço para o backup estimado
+    """
+    create = functools.partial(create_source_backup, cfg, database, logger, subset=subset)
+    if journal is not None:
+        if journal.backup_file is None:
+            journal.start(create())
+        try:
+            yield journal.backup_file
+        finally:
+            if journal.complete:
+                journal.remove()
+                cleanup_backup(journal.backup_file, logger)
+            else:
+                logger.warning(
+                    f"Backup e checkpoint de '{database}' mantidos; "
+                    f"execute novamente com --resume para continuar"
+                )
+        return
+
+    cache = open_dump_cache(cfg['options'], logger)
+    if cache is not None:
+        key = cache_key(cfg['source'], database, {
+            'compression': describe_compression(cfg['options']['compression']),
+            'include': cfg['options']['include'],
+            'exclude': cfg['options']['exclude'],
+            'where': sorted(f"{s}.{t}" for s, t in cfg['options']['where']),
+        })
+        with cache.acquire(key, create) as backup_file:
+            yield backup_file
+        return
+
+    backup_file = create()
+    try:
+        yield backup_file
+    finally:
+        # SEMPRE limpa o arquivo temporário
+        cleanup_backup(backup_file, logger)
+
+
+def restore_plan(cfg, target, database, logger):
+    """
+    Jobs do restore em um destino (fixos ou planejados com "auto")
+
+    Args:
+        cfg: Configuração carregada
+        target: Dicionário de conexão do destino
+        database: Nome do banco de dados
+        logger: Logger configurado
+
+    Returns:
+        RestorePlan: Jobs por fase
+    """
+    jobs = target.get('parallel_jobs', cfg['options']['parallel_jobs'])
+    if jobs != 'auto':
+        return RestorePlan.fixed(jobs)
+
+    source = cfg['source']
+    sizes = [
+        size
+        for _, _, relkind, size in list_tables(
+            source['host'], source['port'], database,
+            source['user'], source['password'], logger
+        )
+        if relkind == 'r'
+    ]
+    return auto_restore_plan(target, sizes, logger)
+
+
+def restore_order_sizes(cfg, database, logger):
+    """
+    Tamanhos da origem para ordenar o restore (None se desativado)
+
+    Args:
+        cfg: Configuração carregada
+        database: Nome do banco de dados
+        logger: Logger configurado
+
+    Returns:
+        ObjectSizes ou None
+    """
+    if not cfg['options']['restore_ordering']:
+        return None
+    return collect_object_sizes(cfg['source'], database, logger)
+
+
+def maintenance_budget(cfg, target):
+    """Memória para builds de índice no destino (None: post-data padrão)"""
+    return target.get('maintenance_memory_mb', cfg['options']['maintenance_memory_mb'])
+
+
+def prepare_target(target, database, drop_existing, logger):
+    """
+    Garante que o banco de destino exista (criando ou recriando conforme config)
+
+    Args:
+        target: Dicionário de conexão do destino
+        database: Nome do banco de dados
+        drop_existing: Se True, recria o banco quando ele já existe
+        logger: Logger configurado
+    """
+    with metrics.phase('target_prep', database, target=describe_target(target)):
+        db_exists = check_database_exists(
+            host=target['host'],
+            port=target['port'],
+            database=database,
+            user=target['user'],
+            password=target['password'],
+            logger=logger
+        )
+
+        if db_exists and drop_existing:
+            logger.warning(f"Recriando banco '{database}' em {describe_target(target)}...")
+            drop_and_create_database(
+                host=target['host'],
+                port=target['port'],
+                database=database,
+                user=target['user'],
+                password=target['password'],
+                logger=logger
+            )
+        elif not db_exists:
+            logger.info(f"Banco '{database}' não existe em {describe_target(target)}. Criando...")
+            create_database(
+                host=target['host'],
+                port=target['port'],
+                database=database,
+                user=target['user'],
+                password=target['password'],
+                logger=logger
+            )
+
+
+def restore_to_target(cfg, target, backup_file, database, logger, object_sizes=None,
+                      journal=None, subset=None):
+    """
+    Prepara um destino e restaura nele o backup já criado
+
+    Com um diário de checkpoint, um destino já concluído é pulado e um
+    destino com progresso não é recriado (drop_existing é ignorado):
+    o restore continua de onde parou. Um destino preparado em que a
+    seção pre-data não terminou é recriado, já que o esquema parcial
+    não pode ser retomado.
+
+    Com filtros de dados (subset), as tabelas de options.where são
+    copiadas da origem logo após a seção de dados, antes de índices e
+    constraints, e as FKs para tabelas filtradas não são restauradas.
+
+    Args:
+        cfg: Configuração carregada
+        target: Dicionário de conexão do destino
+        backup_file: Caminho do backup compartilhado entre os destinos
+        database: Nome do banco de dados
+        logger: Logger configurado
+        object_sizes: ObjectSizes da origem para ordenar o restore (opcional)
+        journal: Journal do checkpoint (opcional)
+        subset: SubsetPlan dos filtros de dados (opcional)
+
+    Returns:
+        bool: True se o restore foi bem-sucedido, False caso contrário
+    """
+    progress = journal.target(describe_target(target)) if journal is not None else None
+    if progress is not None and progress.done:
+        logger.info(f"'{database}' já restaurado em {describe_target(target)} (checkpoint)")
+        return True
+
+    drop_existing = cfg['options']['drop_existing']
+    if progress is not None and progress.started:
+        drop_existing = False
+    elif progress is not None and progress.prepared:
+        logger.warning(
+            f"pre-data de '{database}' interrompido em {describe_target(target)}: recriando o banco"
+        )
+        drop_existing = True
+    prepare_target(target, database, drop_existing, logger)
+    if progress is not None and not progress.prepared:
+        progress.mark_prepared()
+    plan = restore_plan(cfg, target, database, logger)
+    after_data = None
+    if subset is not None and subset.predicates:
+        after_data = functools.partial(
+            load_filtered, cfg['source'], target, database, subset.predicates,
+            plan.data_jobs, logger
+        )
+    success = restore_backup(
+        backup_file=backup_file,
+        host=target['host'],
+        port=target['port'],
+        database=database,
+        user=target['user'],
+        password=target['password'],
+        parallel_jobs=plan.data_jobs,
+        logger=logger,
+        post_data_jobs=plan.post_data_jobs,
+        single_transaction=plan.single_transaction,
+        object_sizes=object_sizes,
+        maintenance_budget_mb=maintenance_budget(cfg, target),
+        fast_restore=target.get('fast_restore', cfg['options']['fast_restore']),
+        checkpoint=progress,
+        after_data=after_data,
+        keep=subset.toc_filter if subset is not None else None
+    )
+    if success and progress is not None:
+        progress.mark_done()
+    return success
+
+
+def incremental_mirror(cfg, target, database, logger):
+    """
+    Espelhamento incremental: recopia apenas as tabelas alteradas
+
+    Compara os marcadores atuais da origem (contadores de
+    pg_stat_user_tables, relfilenode e tamanho) com os da última
+    execução bem-sucedida para este destino. As tabelas alteradas são
+    esvaziadas no destino e recarregadas a partir de um backup apenas
+    com seus dados. Sem estado anterior, com mudança estrutural ou se o
+    TRUNCATE não for possível, faz um espelhamento completo recriando
+    o banco de destino.
+
+    Args:
+        cfg: Configuração carregada
+        target: Dicionário de conexão do destino
+        database: Nome do banco de dados
+        logger: Logger configurado
+
+    Returns:
+        bool: True se o espelhamento foi bem-sucedido, False caso contrário
+    """
+    source = cfg['source']
+    path = state_path(cfg['options']['state_dir'], source, target, database)
+    signature, markers = collect_markers(source, database, logger)
+    previous = load_state(path)
+
+    target_exists = check_database_exists(
+        host=target['host'],
+        port=target['port'],
+        database=database,
+        user=target['user'],
+        password=target['password'],
+        logger=logger
+    )
+
+    if previous is None or not target_exists:
+        logger.info(f"Sem estado incremental para '{database}': espelhamento completo")
+        success = _full_incremental_mirror(cfg, target, database, logger)
+    elif previous[0] != signature:
+        logger.info(f"Schema de '{database}' mudou desde a última execução: espelhamento completo")
+        success = _full_incremental_mirror(cfg, target, database, logger)
+    else:
+        changed = changed_tables(previous[1], markers)
+        logger.info(f"{len(changed)}/{len(markers)} tabela(s) alterada(s) em '{database}'")
+        if not changed:
+            success = True
+        elif not truncate_tables(target, database, changed, logger):
+            logger.warning("Recorrendo ao espelhamento completo")
+            success = _full_incremental_mirror(cfg, target, database, logger)
+        else:
+            success = _partial_incremental_mirror(cfg, target, database, changed, logger)
+
+    if success:
+        save_state(path, signature, markers)
+    return success
+
+
+def _full_incremental_mirror(cfg, target, database, logger):
+    """Backup completo e restore em um banco de destino recriado"""
+    try:
+        backup_file = create_source_backup(cfg, database, logger)
+    except SpoolSpaceError as e:
+        logger.error(str(e))
+        return False
+    try:
+        prepare_target(target, database, True, logger)
+        plan = restore_plan(cfg, target, database, logger)
+        return restore_backup(
+            backup_file=backup_file,
+            host=target['host'],
+            port=target['port'],
+            database=database,
+            user=target['user'],
+            password=target['password'],
+            parallel_jobs=plan.data_jobs,
+            logger=logger,
+            post_data_jobs=plan.post_data_jobs,
+            single_transaction=plan.single_transaction,
+            object_sizes=restore_order_sizes(cfg, database, logger),
+            maintenance_budget_mb=maintenance_budget(cfg, target),
+            fast_restore=target.get('fast_restore', cfg['options']['fast_restore'])
+        )
+    finally:
+        cleanup_backup(backup_file, logger)
+
+
+def _partial_incremental_mirror(cfg, target, database, tables, logger):
+    """Backup apenas dos dados das tabelas alteradas (e sequências) e restore"""
+    source = cfg['source']
+    sequences = [
+        (schema, name)
+        for schema, name, relkind, _ in list_tables(
+            source['host'], source['port'], database,
+            source['user'], source['password'], logger
+        )
+        if relkind == 'S'
+    ]
+    backup_file = create_backup(
+        host=source['host'],
+        port=source['port'],
+        database=database,
+        user=source['user'],
+        password=source['password'],
+        logger=logger,
+        tables=list(tables) + sequences,
+        data_only=True,
+        compression=resolve_compression(cfg, database, logger),
+        output_dir=spool_directory(cfg['options']['spool_dir'])
+    )
+    try:
+        # Serial: o pg_dump ordena os dados pelas FKs, e o restore
+        # paralelo poderia carregar uma tabela filha antes da mãe
+        return restore_backup(
+            backup_file=backup_file,
+            host=target['host'],
+            port=target['port'],
+            database=database,
+            user=target['user'],
+            password=target['password'],
+            parallel_jobs=1,
+            logger=logger
+        )
+    finally:
+        cleanup_backup(backup_file, logger)
+
+
+def stream_to_target(cfg, target, database, logger):
+    """Dump e restore simultâneos, sem arquivo temporário"""
+    prepare_target(target, database, cfg['options']['drop_existing'], logger)
+    return stream_mirror(
+        source=cfg['source'],
+        target=target,
+        database=database,
+        logger=logger,
+        buffer_mb=cfg['options']['stream_buffer_mb']
+    )
+
+
+def mirror_database(cfg, database, logger):
+    """
+    Espelha um banco da origem para o(s) destino(s) com o modo configurado
+    (padrão, incremental, streaming, pipeline ou COPY binário)
+
+    No modo padrão com vários destinos o backup é criado uma única vez
+    e restaurado em todos os destinos em paralelo. Cada destino usa seu
+    próprio parallel_jobs e uma falha em um deles não interrompe os demais.
+    O backup pode vir do cache de dumps ou de um checkpoint retomado
+    (ver source_backup). Sem espaço
+    para o backup estimado, recorre ao streaming com
+    options.spool_fallback="stream" ou falha antes do dump.
+
+    Args:
+        cfg: Configuração carregada
+        database: Nome do banco de dados
+        logger: Logger configurado
+
+    Returns:
+        bool: True se o espelhamento foi bem-sucedido em todos os destinos
+    """
+    with log_context(database=database):
+        return _mirror_database(cfg, database, logger)
+
+
+def _mirror_database(cfg, database, logger):
+    """Implementação de mirror_database"""
+    targets = get_targets(cfg)
+
+    if cfg['options']['incremental']:
+        # Cada destino tem seu próprio estado e conjunto de tabelas alteradas
+        if len(targets) == 1:
+            return incremental_mirror(cfg, targets[0], database, logger)
+        jobs = [
+            MirrorJob(
+                name=f"{database} -> {describe_target(target)}",
+                host=describe_target(target),
+                size=0,
+                func=functools.partial(incremental_mirror, cfg, target, database, logger)
+            )
+            for target in targets
+        ]
+        run_jobs(jobs, max_concurrent=len(jobs), max_per_host=len(jobs), logger=logger)
+        return log_summary(jobs, logger, label='destinos restaurados')
+
+    if cfg['options']['stream']:
+        with metrics.phase('stream', database):
+            return stream_to_target(cfg, targets[0], database, logger)
+
+    if cfg['options']['pipeline']:
+        # Restore de cada tabela assim que seu dump termina
+        prepare_target(targets[0], database, cfg['options']['drop_existing'], logger)
+        plan = restore_plan(cfg, targets[0], database, logger)
+        with metrics.phase('pipeline', database, jobs=plan.data_jobs):
+            return pipeline_mirror(
+                source=cfg['source'],
+                target=targets[0],
+                database=database,
+                parallel_jobs=plan.data_jobs,
+                logger=logger,
+                dump_jobs=cfg['options']['dump_jobs'],
+                post_data_jobs=plan.post_data_jobs,
+                work_root=spool_directory(cfg['options']['spool_dir'])
+            )
+
+    if cfg['options']['copy_engine']:
+        # Dados por COPY binário entre os servidores, sem arquivo de dump
+        prepare_target(targets[0], database, cfg['options']['drop_existing'], logger)
+        plan = restore_plan(cfg, targets[0], database, logger)
+        subset = plan_subset(cfg['source'], database, cfg['options'], logger)
+        with metrics.phase('copy', database, jobs=plan.data_jobs):
+            return copy_mirror(
+                source=cfg['source'],
+                target=targets[0],
+                database=database,
+                parallel_jobs=plan.data_jobs,
+                logger=logger,
+                post_data_jobs=plan.post_data_jobs,
+                buffer_mb=cfg['options']['stream_buffer_mb'],
+                work_root=spool_directory(cfg['options']['spool_dir']),
+                subset=subset,
+                split_mb=cfg['options']['split_table_mb']
+            )
+
+    subset = plan_subset(cfg['source'], database, cfg['options'], logger)
+    journal = open_journal(cfg['options'], cfg['source'], database, logger)
+    if journal is not None:
+        for target in targets:
+            journal.target(describe_target(target))
+
+    try:
+        # 1. BACKUP (único, compartilhado por todos os destinos)
+        with source_backup(cfg, database, logger, journal, subset) as backup_file:
+            # 2. PREPARAR DESTINO E RESTORE
+            object_sizes = restore_order_sizes(cfg, database, logger)
+            if len(targets) == 1:
+                return restore_to_target(
+                    cfg, targets[0], backup_file, database, logger, object_sizes, journal,
+                    subset
+                )
+
+            logger.info(f"Restaurando '{database}' em {len(targets)} destinos simultaneamente...")
+            jobs = [
+                MirrorJob(
+                    name=f"{database} -> {describe_target(target)}",
+                    host=describe_target(target),
+                    size=0,
+                    func=functools.partial(
+                        restore_to_target, cfg, target, backup_file, database, logger,
+                        object_sizes, journal, subset
+                    )
+                )
+                for target in targets
+            ]
+            run_jobs(jobs, max_concurrent=len(jobs), max_per_host=len(jobs), logger=logger)
+            return log_summary(jobs, logger, label='destinos restaurados')
+    except SpoolSpaceError as e:
+        if cfg['options']['spool_fallback'] == 'stream' and len(targets) == 1 and subset is None:
+            logger.warning(f"{e}; usando streaming (sem arquivo temporário)")
+            return stream_to_target(cfg, targets[0], database, logger)
+        logger.error(str(e))
+        return False
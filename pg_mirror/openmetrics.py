@@ -0,0 +1,379 @@
+"""OpenMetrics/Prometheus exporter for mirror runs"""
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Durações de fase: de checagens rápidas a restores de várias horas
+PHASE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400, 28800)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Família de métricas com labels fixos"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} espera os labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, **extra):
+        return list(zip(self.labelnames, key)) + list(extra.items())
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, items):
+        """Soma valores de uma execução anterior (ver Registry.merge)"""
+        with self._lock:
+            for key, value in items:
+                self._merge_value(tuple(key), value)
+
+    def _merge_value(self, key, value):
+        self._values[key] = self._values.get(key, 0) + value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """Contador monotônico (amostras com sufixo _total)"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(f'{self.name}_total', self._labels(key), value)
+                    for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """Valor instantâneo"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self._labels(key), value)
+                    for key, value in sorted(self._values.items())]
+
+    def _merge_value(self, key, value):
+        # O valor da execução atual prevalece
+        self._values.setdefault(key, value)
+
+
+class Histogram(_Metric):
+    """Histograma com buckets cumulativos, soma e contagem"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=PHASE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, {'buckets': [0] * len(self.buckets),
+                                                  'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][i] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state['buckets']):
+                    samples.append((f'{self.name}_bucket',
+                                    self._labels(key, le=_format_value(bound)), count))
+                samples.append((f'{self.name}_sum', self._labels(key), state['sum']))
+                samples.append((f'{self.name}_count', self._labels(key), state['count']))
+        return samples
+
+    def _merge_value(self, key, value):
+        state = self._values.setdefault(key, {'buckets': [0] * len(self.buckets),
+                                              'sum': 0.0, 'count': 0})
+        if len(value['buckets']) != len(self.buckets):
+            return  # Buckets mudaram entre versões: descarta o histórico
+        state['buckets'] = [a + b for a, b in zip(state['buckets'], value['buckets'])]
+        state['sum'] += value['sum']
+        state['count'] += value['count']
+
+
+class Registry:
+    """Conjunto de métricas exportadas"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, openmetrics=True):
+        """
+        Texto de exposição das métricas
+
+        Args:
+            openmetrics: True para OpenMetrics 1.0; False para o formato
+                texto do Prometheus 0.0.4 (lido pelo textfile collector
+                do node-exporter)
+
+        Returns:
+            str: Exposição completa
+        """
+        lines = []
+        for metric in self.metrics:
+            family = metric.name
+            if metric.kind == 'counter' and not openmetrics:
+                family = f'{metric.name}_total'
+            lines.append(f'# HELP {family} {metric.documentation}')
+            lines.append(f'# TYPE {family} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """Valores de todas as métricas, serializáveis em JSON"""
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def merge(self, snapshot):
+        """Soma contadores e histogramas de um snapshot anterior"""
+        for metric in self.metrics:
+            metric.merge(snapshot.get(metric.name, []))
+
+    def clear(self):
+        """Zera todas as métricas"""
+        for metric in self.metrics:
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+PHASE_DURATION = REGISTRY.register(Histogram(
+    'pg_mirror_phase_duration_seconds', 'Duração de cada fase do espelhamento', ['phase']
+))
+BACKUP_BYTES = REGISTRY.register(Counter(
+    'pg_mirror_backup_bytes', 'Bytes gravados em arquivos de backup', ['database']
+))
+DUMPED_TABLES = REGISTRY.register(Counter(
+    'pg_mirror_dumped_tables', 'Tabelas extraídas pelo pg_dump', ['database']
+))
+RESTORED_OBJECTS = REGISTRY.register(Counter(
+    'pg_mirror_restored_objects', 'Objetos processados pelo pg_restore', ['database', 'kind']
+))
+DATABASE_OPERATIONS = REGISTRY.register(Counter(
+    'pg_mirror_database_operations', 'Operações no catálogo dos servidores',
+    ['operation', 'status']
+))
+RUNS = REGISTRY.register(Counter(
+    'pg_mirror_runs', 'Execuções do pg-mirror por resultado', ['status']
+))
+LAST_RUN = REGISTRY.register(Gauge(
+    'pg_mirror_last_run_timestamp_seconds', 'Fim da última execução (epoch) por resultado',
+    ['status']
+))
+LAST_DURATION = REGISTRY.register(Gauge(
+    'pg_mirror_last_run_duration_seconds', 'Duração da última execução'
+))
+SNAPSHOT_HELD = REGISTRY.register(Histogram(
+    'pg_mirror_snapshot_held_seconds', 'Tempo em que um snapshot exportado ficou aberto na origem'
+))
+REPLICATION_UP = REGISTRY.register(Gauge(
+    'pg_mirror_replication_up', 'Worker da assinatura ativo no destino (1) ou parado (0)',
+    ['database']
+))
+REPLICATION_LAG_BYTES = REGISTRY.register(Gauge(
+    'pg_mirror_replication_lag_bytes', 'WAL da origem ainda não confirmado pela assinatura',
+    ['database']
+))
+REPLICATION_LAG_SECONDS = REGISTRY.register(Gauge(
+    'pg_mirror_replication_lag_seconds', 'Tempo desde a última posição confirmada pela assinatura',
+    ['database']
+))
+
+
+def write_textfile(path, registry=REGISTRY):
+    """
+    Grava a exposição para o textfile collector de forma atômica
+
+    Args:
+        path: Arquivo .prom no diretório do collector
+        registry: Registry a exportar
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.pg_mirror_', suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(registry.render(openmetrics=False))
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def state_path(textfile):
+    """Arquivo com os valores acumulados das execuções anteriores"""
+    return os.path.splitext(textfile)[0] + '.state.json'
+
+
+def _load_snapshot(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_snapshot(path, snapshot):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+        body = self.registry.render(openmetrics=openmetrics).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type',
+                         OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # noqa: A002 - assinatura da stdlib
+        pass
+
+
+def serve(port, host='127.0.0.1', registry=REGISTRY):
+    """
+    Serve /metrics em uma thread daemon
+
+    Responde em OpenMetrics quando o cliente o aceita (Accept) e no
+    formato texto do Prometheus caso contrário.
+
+    Args:
+        port: Porta TCP (0: escolhe uma livre)
+        host: Endereço de escuta (padrão: apenas local)
+        registry: Registry a exportar
+
+    Returns:
+        ThreadingHTTPServer: Servidor ativo (encerre com shutdown())
+    """
+    handler = type('Handler', (_Handler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@contextmanager
+def exporting(logger, textfile=None, port=None, registry=REGISTRY):
+    """
+    Exporta as métricas da execução
+
+    Com textfile, o registry parte dos acumulados das execuções
+    anteriores e, ao final (inclusive em falhas), grava o arquivo .prom
+    e os novos acumulados, de modo que contadores e histogramas
+    continuem crescendo entre execuções do cron. Com port, serve
+    /metrics durante o bloco.
+
+    Args:
+        logger: Logger configurado
+        textfile: Arquivo .prom do textfile collector (opcional)
+        port: Porta do endpoint HTTP local (opcional)
+        registry: Registry a exportar
+
+    Yields:
+        Registry
+    """
+    if textfile:
+        registry.clear()
+        registry.merge(_load_snapshot(state_path(textfile)))
+
+    server = None
+    if port is not None:
+        server = serve(port, registry=registry)
+        logger.info(f"Métricas em http://127.0.0.1:{server.server_address[1]}/metrics")
+
+    started = time.monotonic()
+    status = 'success'
+    try:
+        yield registry
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            status = 'failure'
+        raise
+    except BaseException:
+        status = 'failure'
+        raise
+    finally:
+        RUNS.inc(status=status)
+        LAST_RUN.set(time.time(), status=status)
+        LAST_DURATION.set(round(time.monotonic() - started, 3))
+        if textfile:
+            try:
+                write_textfile(textfile, registry)
+                _save_snapshot(state_path(textfile), registry.snapshot())
+                logger.debug(f"Métricas OpenMetrics gravadas em {textfile}")
+            except OSError as e:
+                logger.warning(f"Não foi possível gravar as métricas em {textfile}: {e}")
+        if server is not None:
+            server.shutdown()
+            server.server_close()
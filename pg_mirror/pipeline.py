@@ -0,0 +1,258 @@
+"""Table-level pipelined mirror for PostgreSQL"""
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from pg_mirror.backup import build_dump_command
+from pg_mirror.database import list_tables, quote_ident
+from pg_mirror.restore import build_restore_command
+from pg_mirror.snapshot import SnapshotCoordinator
+
+
+def run_dump(source, database, snapshot, path, *args):
+    """Executa pg_dump -Fc no snapshot compartilhado"""
+    env = os.environ.copy()
+    env['PGPASSWORD'] = source['password']
+
+    cmd = build_dump_command(
+        source['host'], source['port'], database, source['user'],
+        '-Fc',
+        '--snapshot', snapshot,
+        *args,
+        '-f', path
+    )
+    subprocess.run(cmd, env=env, check=True, capture_output=True, text=True)
+
+
+def run_restore(target, database, path, logger, *args):
+    """
+    Executa pg_restore de um arquivo parcial
+
+    Returns:
+        bool: True se bem-sucedido (avisos são tolerados como no restore_backup)
+    """
+    env = os.environ.copy()
+    env['PGPASSWORD'] = target['password']
+
+    cmd = build_restore_command(
+        target['host'], target['port'], database, target['user'],
+        '--no-owner',
+        '--no-acl',
+        *args,
+        path
+    )
+    try:
+        subprocess.run(cmd, env=env, check=True, capture_output=True, text=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        # pg_restore pode retornar 1 mesmo com sucesso (avisos)
+        if "ERROR" in e.stderr:
+            logger.error(f"Erro no restore de {os.path.basename(path)}: {e.stderr}")
+            return False
+        logger.debug(f"Restore de {os.path.basename(path)} concluído com avisos")
+        return True
+
+
+def _build_data_items(tables):
+    """
+    Monta os itens de dados do pipeline
+
+    Cada tabela vira um item próprio. Valores de sequências e large
+    objects (que não pertencem a nenhuma tabela) formam um item extra.
+
+    Args:
+        tables: Tuplas (schema, nome, relkind, tamanho) de list_tables
+
+    Returns:
+        list: Tuplas (rótulo, argumentos do pg_dump), maiores primeiro
+    """
+    items = [
+        (f"{schema}.{name}", ['-t', f"{quote_ident(schema)}.{quote_ident(name)}"])
+        for schema, name, relkind, _ in tables
+        if relkind != 'S'
+    ]
+    items.append(auxiliary_data_item(tables))
+    return items
+
+
+def auxiliary_data_item(tables):
+    """
+    Item de dados que não pertence a nenhuma tabela
+
+    Valores de sequências e large objects são extraídos juntos por um
+    pg_dump --section=data próprio.
+
+    Args:
+        tables: Tuplas (schema, nome, relkind, tamanho) de list_tables
+
+    Returns:
+        tuple: (rótulo, argumentos do pg_dump)
+    """
+    sequence_args = []
+    for schema, name, relkind, _ in tables:
+        if relkind == 'S':
+            sequence_args += ['-t', f"{quote_ident(schema)}.{quote_ident(name)}"]
+    if sequence_args:
+        # -t com -b inclui os large objects junto das sequências
+        return 'sequências e large objects', sequence_args + ['-b']
+    return 'large objects', ['-b', '--exclude-table-data', '*']
+
+
+def pipeline_mirror(source, target, database, parallel_jobs, logger,
+                    dump_jobs=None, queue_size=None, post_data_jobs=None, work_root=None):
+    """
+    Espelhamento em pipeline por tabela:
+    1. Aplica o schema pre-data no destino
+    2. Workers de dump geram um arquivo por tabela enquanto workers
+       de restore carregam as tabelas já prontas (fila limitada)
+    3. Aplica o post-data (índices, constraints, triggers)
+
+    Todos os pg_dump usam o mesmo snapshot exportado, então o
+    resultado é consistente como um dump único.
+
+    Args:
+        source: Dicionário de conexão da origem
+        target: Dicionário de conexão do destino
+        database: Nome do banco de dados
+        parallel_jobs: Número de workers de restore
+        logger: Logger configurado
+        dump_jobs: Número de workers de dump (padrão: parallel_jobs)
+        queue_size: Tabelas prontas aguardando restore (padrão: 2 * parallel_jobs)
+        post_data_jobs: Jobs do restore do post-data (padrão: parallel_jobs)
+        work_root: Diretório dos arquivos por tabela (padrão: diretório temporário)
+
+    Returns:
+        bool: True se o espelhamento foi bem-sucedido, False caso contrário
+    """
+    dump_jobs = dump_jobs if dump_jobs and dump_jobs > 1 else parallel_jobs
+    queue_size = queue_size or 2 * parallel_jobs
+    post_data_jobs = post_data_jobs or parallel_jobs
+    work_dir = tempfile.mkdtemp(prefix=f'{database}_pipeline_', dir=work_root)
+
+    logger.info(f"Pipeline de '{database}' ({source['host']} -> {target['host']})...")
+    logger.info(f"Usando {dump_jobs} workers de dump e {parallel_jobs} de restore")
+
+    coordinator = SnapshotCoordinator(source, database, logger)
+    try:
+        snapshot = coordinator.open()
+    except RuntimeError as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        logger.error(str(e))
+        return False
+
+    try:
+        tables = list_tables(
+            source['host'], source['port'], database,
+            source['user'], source['password'], logger
+        )
+        items = _build_data_items(tables)
+
+        # 1. SCHEMA (pre-data e post-data são extraídos no mesmo snapshot)
+        pre_data = os.path.join(work_dir, 'pre-data.dump')
+        post_data = os.path.join(work_dir, 'post-data.dump')
+        try:
+            run_dump(source, database, snapshot, pre_data, '--section=pre-data')
+            run_dump(source, database, snapshot, post_data, '--section=post-data')
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Erro ao extrair schema: {e.stderr}")
+            return False
+
+        logger.info("Aplicando schema (pre-data)...")
+        if not run_restore(target, database, pre_data, logger):
+            return False
+
+        # 2. DADOS
+        if not _run_data_pipeline(source, target, database, snapshot, items, work_dir,
+                                  dump_jobs, parallel_jobs, queue_size, logger):
+            return False
+
+        coordinator.close()
+
+        # 3. POST-DATA
+        logger.info("Aplicando índices e constraints (post-data)...")
+        if not run_restore(target, database, post_data, logger, '-j', str(post_data_jobs)):
+            return False
+
+        logger.info("Pipeline concluído com sucesso!")
+        return True
+
+    finally:
+        coordinator.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _run_data_pipeline(source, target, database, snapshot, items, work_dir,
+                       dump_jobs, restore_jobs, queue_size, logger):
+    """
+    Executa os workers de dump e restore ligados por uma fila limitada
+
+    Returns:
+        bool: True se todos os itens foram restaurados
+    """
+    pending = queue.Queue()
+    for index, item in enumerate(items):
+        pending.put((index, item))
+
+    ready = queue.Queue(maxsize=queue_size)
+    failed = threading.Event()
+    done_lock = threading.Lock()
+    done = [0]
+    total = len(items)
+
+    def dump_worker():
+        while not failed.is_set():
+            try:
+                index, (label, args) = pending.get_nowait()
+            except queue.Empty:
+                return
+            path = os.path.join(work_dir, f'{index}.dump')
+            try:
+                run_dump(source, database, snapshot, path, '--section=data', *args)
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Erro no dump de {label}: {e.stderr}")
+                failed.set()
+                return
+            logger.debug(f"Dump concluído: {label}")
+            # Bloqueia enquanto a fila estiver cheia (backpressure)
+            while not failed.is_set():
+                try:
+                    ready.put((label, path), timeout=1)
+                    break
+                except queue.Full:
+                    continue
+
+    def restore_worker():
+        while True:
+            item = ready.get()
+            if item is None:
+                return
+            label, path = item
+            try:
+                if not failed.is_set():
+                    if run_restore(target, database, path, logger, '--section=data'):
+                        with done_lock:
+                            done[0] += 1
+                            logger.info(f"Restaurado {done[0]}/{total}: {label}")
+                    else:
+                        failed.set()
+            finally:
+                # Libera o espaço da tabela assim que ela é carregada
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    dumpers = [threading.Thread(target=dump_worker) for _ in range(dump_jobs)]
+    restorers = [threading.Thread(target=restore_worker) for _ in range(restore_jobs)]
+    for thread in dumpers + restorers:
+        thread.start()
+
+    for thread in dumpers:
+        thread.join()
+    for _ in restorers:
+        ready.put(None)
+    for thread in restorers:
+        thread.join()
+
+    return not failed.is_set() and done[0] == total
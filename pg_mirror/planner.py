@@ -0,0 +1,122 @@
+"""Adaptive job planning for pg_restore"""
+import math
+import os
+
+from pg_mirror.database import run_query, QueryError
+
+
+TINY_DATABASE_BYTES = 64 * 1024 * 1024  # Abaixo disso: restore serial em transação única
+MAX_JOBS = 32  # Limite superior mesmo em máquinas muito grandes
+
+CONNECTIONS_SQL = """
+    SELECT current_setting('max_connections'),
+           current_setting('superuser_reserved_connections'),
+           (SELECT count(*) FROM pg_stat_activity);
+"""
+
+
+class RestorePlan:
+    """Jobs do restore por fase"""
+
+    def __init__(self, data_jobs, post_data_jobs, single_transaction=False):
+        """
+        Args:
+            data_jobs: Jobs paralelos na carga de dados
+            post_data_jobs: Jobs paralelos em índices e constraints (post-data)
+            single_transaction: Se True, restore serial em transação única (-1)
+        """
+        self.data_jobs = data_jobs
+        self.post_data_jobs = post_data_jobs
+        self.single_transaction = single_transaction
+
+    @classmethod
+    def fixed(cls, jobs):
+        """Plano com o mesmo número de jobs em todas as fases"""
+        return cls(jobs, jobs)
+
+    def __repr__(self):
+        if self.single_transaction:
+            return "RestorePlan(serial, transação única)"
+        return f"RestorePlan(dados={self.data_jobs}, post-data={self.post_data_jobs})"
+
+
+def free_connections(target, logger):
+    """
+    Conexões disponíveis no destino
+
+    Args:
+        target: Dicionário de conexão do destino
+        logger: Logger configurado
+
+    Returns:
+        int: max_connections menos reservadas e backends atuais, ou
+            None se não for possível consultar
+    """
+    try:
+        rows = run_query(
+            target['host'], target['port'], 'postgres', target['user'], target['password'],
+            CONNECTIONS_SQL, logger
+        )
+    except QueryError as e:
+        logger.warning(f"Não foi possível consultar conexões do destino: {e}")
+        return None
+    max_connections, reserved, backends = (int(value) for value in rows[0])
+    return max_connections - reserved - backends
+
+
+def plan_restore(table_sizes, cpu_count=None, available_connections=None):
+    """
+    Escolhe os jobs de cada fase do restore
+
+    Dados: o tempo total nunca é menor que o da maior tabela, então
+    workers acima de total / maior tabela ficam ociosos no fim; também
+    não passa do número de tabelas, das CPUs locais nem de metade das
+    conexões livres no destino. Post-data (índices, constraints) é
+    limitado apenas por CPU e conexões. Bancos pequenos são
+    restaurados em série numa única transação, sem o custo de abrir
+    conexões e sincronizar workers.
+
+    Args:
+        table_sizes: Tamanhos das tabelas em bytes
+        cpu_count: CPUs locais (padrão: os.cpu_count())
+        available_connections: Conexões livres no destino (None: sem limite)
+
+    Returns:
+        RestorePlan: Jobs por fase
+    """
+    total = sum(table_sizes)
+    if total < TINY_DATABASE_BYTES:
+        return RestorePlan(1, 1, single_transaction=True)
+
+    cpus = cpu_count or os.cpu_count() or 1
+    limit = min(cpus, MAX_JOBS)
+    if available_connections is not None:
+        limit = min(limit, max(1, available_connections // 2))
+
+    largest = max(table_sizes)
+    useful = math.ceil(total / largest)
+    tables = sum(1 for size in table_sizes if size > 0)
+    data_jobs = max(1, min(limit, useful, tables))
+    return RestorePlan(data_jobs, max(1, limit))
+
+
+def auto_restore_plan(target, table_sizes, logger):
+    """
+    Plano de restore para parallel_jobs = "auto"
+
+    Args:
+        target: Dicionário de conexão do destino
+        table_sizes: Tamanhos das tabelas em bytes (origem)
+        logger: Logger configurado
+
+    Returns:
+        RestorePlan: Jobs por fase
+    """
+    available = free_connections(target, logger)
+    plan = plan_restore(table_sizes, available_connections=available)
+    logger.info(
+        f"Plano automático para {target['host']}: {plan} "
+        f"({os.cpu_count()} CPUs, {available if available is not None else '?'} conexões livres, "
+        f"{sum(table_sizes) / (1024 * 1024):.1f} MB em {len(table_sizes)} tabela(s))"
+    )
+    return plan
@@ -0,0 +1,80 @@
+"""Memory-budgeted planning for the post-data (index build) phase"""
+import math
+from dataclasses import dataclass
+
+from pg_mirror.toc import TocEntry
+
+
+MB = 1024 * 1024
+MIN_MAINTENANCE_MB = 64  # maintenance_work_mem mínimo por sessão
+LARGE_BUILD_BYTES = 256 * MB  # Índices menores são criados juntos no post-data restante
+PARALLEL_BUILD_BYTES = 1024 * MB  # A partir daqui o build usa workers paralelos
+PARALLEL_WORKER_MB = 32  # Memória mínima por participante de um build paralelo
+MAX_MAINTENANCE_WORKERS = 4
+
+
+@dataclass(frozen=True)
+class IndexBuild:
+    """Um índice (ou constraint PK/UNIQUE) criado em sessão própria"""
+
+    entry: TocEntry
+    memory_mb: int
+    workers: int
+
+    @property
+    def label(self):
+        return f"{self.entry.schema}.{self.entry.name}"
+
+
+def session_options(memory_mb, workers=None):
+    """
+    Valor de PGOPTIONS com as configurações de manutenção da sessão
+
+    Args:
+        memory_mb: maintenance_work_mem em MB
+        workers: max_parallel_maintenance_workers (None mantém o do servidor)
+
+    Returns:
+        str: Opções no formato "-c nome=valor ..."
+    """
+    options = f"-c maintenance_work_mem={memory_mb}MB"
+    if workers is not None:
+        options += f" -c max_parallel_maintenance_workers={workers}"
+    return options
+
+
+def plan_post_data(toc, budget_mb, jobs):
+    """
+    Separa os builds grandes e define memória e workers de cada um
+
+    Cada build grande recebe memória proporcional ao tamanho da tabela
+    (entre MIN_MAINTENANCE_MB e metade do orçamento, ou o orçamento
+    inteiro com um único job). Builds paralelos dividem essa mesma
+    memória entre os workers, então o total nunca passa do orçamento
+    quando o scheduler limita a soma das sessões ativas.
+
+    Args:
+        toc: ArchiveToc já pesado (with_sizes)
+        budget_mb: Memória total para builds simultâneos, em MB
+        jobs: Builds simultâneos no máximo
+
+    Returns:
+        tuple: (lista de IndexBuild do maior para o menor,
+            maintenance_work_mem por sessão no post-data restante)
+    """
+    budget_mb = max(budget_mb, MIN_MAINTENANCE_MB)
+    cap = budget_mb if jobs <= 1 else max(MIN_MAINTENANCE_MB, budget_mb // 2)
+
+    builds = []
+    for entry in toc.entries:
+        if not entry.is_build or entry.size < LARGE_BUILD_BYTES:
+            continue
+        memory_mb = min(cap, max(MIN_MAINTENANCE_MB, math.ceil(entry.size / MB)))
+        workers = 0
+        if entry.size >= PARALLEL_BUILD_BYTES:
+            workers = max(0, min(MAX_MAINTENANCE_WORKERS, memory_mb // PARALLEL_WORKER_MB - 1))
+        builds.append(IndexBuild(entry, memory_mb, workers))
+
+    builds.sort(key=lambda build: build.entry.size, reverse=True)
+    rest_memory_mb = max(MIN_MAINTENANCE_MB, budget_mb // max(1, jobs))
+    return builds, rest_memory_mb
@@ -0,0 +1,188 @@
+"""Live progress from pg_dump/pg_restore verbose output"""
+import collections
+import re
+import subprocess
+import threading
+import time
+
+
+TAIL_LINES = 200  # Últimas linhas mantidas para diagnóstico
+ERROR_LINES = 50  # Linhas de erro mantidas mesmo fora da cauda
+PROGRESS_INTERVAL = 5.0  # Segundos entre relatórios de progresso
+
+# Linhas do -v que marcam o início ou o fim de um objeto
+_EVENT_PATTERNS = [
+    ('dump', re.compile(r'^pg_dump: dumping contents of table "?(?P<object>[^"]+)"?')),
+    ('restore', re.compile(r'^pg_restore: processing data for table "?(?P<object>[^"]+)"?')),
+    ('finished', re.compile(r'^pg_restore: finished item \d+ (?P<object>.+)$')),
+    ('create', re.compile(r'^pg_restore: creating (?P<object>.+)$')),
+]
+
+# No restore paralelo cada entrada gera também um "finished item", depois
+# do "processing data"/"creating": só o início conta como objeto
+_COUNTED_EVENTS = ('dump', 'restore', 'create')
+
+
+def parse_event(line):
+    """
+    Converte uma linha do modo verbose em evento estruturado
+
+    Args:
+        line: Linha do stderr do pg_dump/pg_restore
+
+    Returns:
+        tuple: (tipo, objeto) ou None se a linha não for um evento
+    """
+    for kind, pattern in _EVENT_PATTERNS:
+        match = pattern.match(line)
+        if match:
+            return kind, match.group('object').strip()
+    return None
+
+
+def is_error_line(line):
+    """Indica se a linha reporta um erro (servidor ou ferramenta)"""
+    return 'ERROR' in line or ': error:' in line
+
+
+class ProgressTracker:
+    """
+    Acompanha a saída verbose de um processo sem acumulá-la
+
+    As linhas brutas vão para um buffer circular limitado; linhas de
+    erro são mantidas à parte para que não se percam na cauda.
+    """
+
+    def __init__(self, label, logger, size_probe=None, tail_lines=TAIL_LINES, on_event=None):
+        """
+        Args:
+            label: Rótulo do processo nos relatórios (ex.: "Backup de 'app'")
+            logger: Logger configurado
+            size_probe: Função opcional que retorna os bytes já escritos
+            tail_lines: Tamanho do buffer circular de linhas
+            on_event: Função opcional chamada com (tipo, objeto, linha)
+                a cada evento
+        """
+        self.label = label
+        self.logger = logger
+        self.size_probe = size_probe
+        self.tail = collections.deque(maxlen=tail_lines)
+        self.errors = collections.deque(maxlen=ERROR_LINES)
+        self.objects = 0
+        self.current = None
+        self.started = time.monotonic()
+        self.on_event = on_event
+
+    def feed(self, line):
+        """
+        Processa uma linha do stderr
+
+        Args:
+            line: Linha lida do processo
+        """
+        line = line.rstrip('\n')
+        if not line:
+            return
+        self.tail.append(line)
+        if is_error_line(line):
+            self.errors.append(line)
+
+        event = parse_event(line)
+        if event:
+            if event[0] in _COUNTED_EVENTS:
+                self.objects += 1
+                self.current = event[1]
+            self.logger.debug(f"{self.label}: {event[0]} {event[1]}", extra={'object': event[1]})
+            if self.on_event is not None:
+                self.on_event(event[0], event[1], line)
+
+    def bytes_written(self):
+        """Bytes já escritos segundo size_probe (0 se indisponível)"""
+        if self.size_probe is None:
+            return 0
+        try:
+            return self.size_probe()
+        except OSError:
+            return 0
+
+    def report(self):
+        """Registra uma linha de progresso (objetos, MB, MB/s e objeto atual)"""
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        message = f"{self.label}: {self.objects} objeto(s)"
+        if self.size_probe is not None:
+            size_mb = self.bytes_written() / (1024 * 1024)
+            message += f", {size_mb:.1f} MB ({size_mb / elapsed:.1f} MB/s)"
+        if self.current:
+            message += f" - atual: {self.current}"
+        self.logger.info(message)
+
+    def output(self):
+        """
+        Texto de diagnóstico: erros seguidos da cauda da saída
+
+        Returns:
+            str: Linhas de erro e últimas linhas, sem repetições
+        """
+        tail = list(self.tail)
+        errors = [line for line in self.errors if line not in tail]
+        return '\n'.join(errors + tail)
+
+
+def run_with_progress(cmd, env, logger, label, size_probe=None, interval=PROGRESS_INTERVAL,
+                      on_event=None):
+    """
+    Executa um comando lendo o stderr linha a linha com progresso ao vivo
+
+    Equivalente a subprocess.run(check=True), mas a saída verbose é
+    processada à medida que chega e apenas uma cauda limitada fica em
+    memória. O progresso é registrado a cada interval segundos, mesmo
+    durante objetos longos que não geram linhas.
+
+    Args:
+        cmd: Comando a executar
+        env: Variáveis de ambiente do processo
+        logger: Logger configurado
+        label: Rótulo do processo nos relatórios
+        size_probe: Função opcional que retorna os bytes já escritos
+        interval: Segundos entre relatórios de progresso
+        on_event: Função opcional chamada com (tipo, objeto, linha) a cada evento
+
+    Returns:
+        ProgressTracker: Estado final (objetos, cauda e erros)
+
+    Raises:
+        subprocess.CalledProcessError: Se o processo terminar com erro;
+            stderr contém ProgressTracker.output()
+    """
+    tracker = ProgressTracker(label, logger, size_probe, on_event=on_event)
+    proc = subprocess.Popen(
+        cmd,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors='replace'
+    )
+
+    stop = threading.Event()
+
+    def _tick():
+        # Primeira leitura: linha de base das sondas que medem crescimento
+        tracker.bytes_written()
+        while not stop.wait(interval):
+            tracker.report()
+
+    ticker = threading.Thread(target=_tick, daemon=True)
+    ticker.start()
+    try:
+        for line in proc.stderr:
+            tracker.feed(line)
+    finally:
+        stop.set()
+        ticker.join()
+        proc.stderr.close()
+        returncode = proc.wait()
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=tracker.output())
+    return tracker
@@ -0,0 +1,431 @@
+"""Continuous mirroring through logical replication (pg-mirror sync)"""
+import functools
+import os
+import re
+import subprocess
+from dataclasses import dataclass
+from typing import Optional
+
+from pg_mirror.backup import cleanup_backup
+from pg_mirror.database import QueryError, run_query
+from pg_mirror.mirror import create_source_backup, describe_target, get_targets, restore_to_target
+from pg_mirror.openmetrics import (
+    REPLICATION_LAG_BYTES,
+    REPLICATION_LAG_SECONDS,
+    REPLICATION_UP,
+    write_textfile
+)
+from pg_mirror.snapshot import SnapshotCoordinator
+from pg_mirror.spool import SpoolSpaceError
+from pg_mirror import metrics
+
+
+# Tabelas sem identidade de réplica: com a publicação FOR ALL TABLES,
+# UPDATE e DELETE nelas passam a falhar na origem
+MISSING_IDENTITY_SQL = """
+    SELECT n.nspname, c.relname
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind IN ('r', 'p')
+      AND c.relpersistence = 'p'
+      AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+      AND n.nspname NOT LIKE 'pg_toast%'
+      AND (
+        c.relreplident = 'n'
+        OR (c.relreplident = 'd' AND NOT EXISTS (
+          SELECT 1 FROM pg_index i WHERE i.indrelid = c.oid AND i.indisprimary
+        ))
+      )
+    ORDER BY 1, 2;
+"""
+
+
+class ReplicationError(Exception):
+    """Exception raised when logical replication cannot be set up."""
+    pass
+
+
+def replication_name(database):
+    """
+    Nome da publicação, do slot e da assinatura de um banco
+
+    Slots aceitam apenas [a-z0-9_] e até 63 caracteres.
+
+    Args:
+        database: Nome do banco de dados
+
+    Returns:
+        str: Ex.: 'pg_mirror_meu_banco'
+    """
+    return 'pg_mirror_' + re.sub(r'[^a-z0-9_]', '_', database.lower())[:53]
+
+
+def _literal(value):
+    """Literal SQL entre aspas simples"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _conninfo_value(value):
+    """Valor de conninfo libpq entre aspas simples"""
+    return "'" + str(value).replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def _query(conn, database, sql, logger):
+    return run_query(conn['host'], conn['port'], database, conn['user'], conn['password'],
+                     sql, logger)
+
+
+def check_source(source, database, logger):
+    """
+    Verifica se a origem aceita replicação lógica de todas as tabelas
+
+    Args:
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        logger: Logger configurado
+
+    Raises:
+        ReplicationError: Se wal_level não for logical ou houver tabelas sem
+            chave primária nem REPLICA IDENTITY
+    """
+    try:
+        wal_level = _query(source, database, "SHOW wal_level;", logger)[0][0]
+        missing = _query(source, database, MISSING_IDENTITY_SQL, logger)
+    except QueryError as e:
+        raise ReplicationError(f"Erro ao verificar a origem: {e}") from e
+
+    if wal_level != 'logical':
+        raise ReplicationError(
+            f"wal_level da origem é '{wal_level}'; defina wal_level = logical e reinicie o servidor"
+        )
+    if missing:
+        names = ', '.join(f"{schema}.{table}" for schema, table in missing[:10])
+        more = f" (e mais {len(missing) - 10})" if len(missing) > 10 else ""
+        raise ReplicationError(
+            f"{len(missing)} tabela(s) sem chave primária nem REPLICA IDENTITY: {names}{more}"
+        )
+
+
+def create_publication(source, database, name, logger):
+    """
+    Cria a publicação de todas as tabelas na origem (se ainda não existir)
+
+    Args:
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        name: Nome da publicação
+        logger: Logger configurado
+
+    Raises:
+        QueryError: Se a publicação não puder ser criada
+    """
+    exists = _query(source, database,
+                    f"SELECT 1 FROM pg_publication WHERE pubname = {_literal(name)};", logger)
+    if exists:
+        logger.info(f"Publicação {name} já existe na origem")
+        return
+    _query(source, database, f"CREATE PUBLICATION {name} FOR ALL TABLES;", logger)
+    logger.info(f"Publicação {name} criada na origem")
+
+
+def create_slot(source, database, logger, slot):
+    """
+    Cria o slot de replicação lógica e exporta o snapshot do seu início
+
+    O dump lido nesse snapshot contém exatamente as transações
+    anteriores ao slot; as seguintes chegam pela assinatura. O
+    snapshot vale enquanto a sessão de replicação não receber outro
+    comando (ver SnapshotCoordinator com keepalive=None).
+
+    Args:
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        logger: Logger configurado
+        slot: Nome do slot
+
+    Returns:
+        tuple: (processo psql da sessão, id do snapshot)
+
+    Raises:
+        RuntimeError: Se não for possível criar o slot
+    """
+    env = os.environ.copy()
+    env['PGPASSWORD'] = source['password']
+
+    cmd = [
+        'psql',
+        '-h', source['host'],
+        '-p', str(source['port']),
+        '-U', source['user'],
+        '-d', f"dbname={_conninfo_value(database)} replication=database",
+        '-X', '-q', '-tA',
+        '-v', 'ON_ERROR_STOP=1'
+    ]
+    session = subprocess.Popen(
+        cmd,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    session.stdin.write(f"CREATE_REPLICATION_SLOT {slot} LOGICAL pgoutput EXPORT_SNAPSHOT;\n")
+    session.stdin.flush()
+    # slot_name|consistent_point|snapshot_name|output_plugin
+    fields = session.stdout.readline().strip().split('|')
+
+    if len(fields) < 3 or not fields[2]:
+        session.kill()
+        _, stderr = session.communicate()
+        raise RuntimeError(f"Não foi possível criar o slot {slot}: {stderr}")
+
+    logger.info(f"Slot {slot} criado na origem em {fields[1]}")
+    return session, fields[2]
+
+
+def drop_slot(source, database, slot, logger):
+    """
+    Remove o slot se não estiver em uso (senão a origem retém WAL para sempre)
+
+    Args:
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        slot: Nome do slot
+        logger: Logger configurado
+    """
+    try:
+        dropped = _query(source, database, f"""
+            SELECT pg_drop_replication_slot(slot_name)
+            FROM pg_replication_slots
+            WHERE slot_name = {_literal(slot)} AND NOT active;
+        """, logger)
+    except QueryError as e:
+        logger.warning(f"Erro ao remover o slot {slot}: {e}")
+        return
+    if dropped:
+        logger.info(f"Slot {slot} removido da origem")
+
+
+def subscription_exists(target, name, logger):
+    """
+    Indica se a assinatura já existe no destino
+
+    Args:
+        target: Dicionário de conexão do destino
+        name: Nome da assinatura
+        logger: Logger configurado
+
+    Returns:
+        bool
+    """
+    # pg_subscription é compartilhado entre os bancos do servidor
+    rows = _query(target, 'postgres',
+                  f"SELECT 1 FROM pg_subscription WHERE subname = {_literal(name)};", logger)
+    return bool(rows)
+
+
+def create_subscription(source, target, database, name, logger):
+    """
+    Cria no destino a assinatura do slot já criado, sem cópia inicial
+
+    Args:
+        source: Dicionário de conexão da origem (replication_host, se
+            definido, é o endereço da origem visto pelo destino)
+        target: Dicionário de conexão do destino
+        database: Nome do banco de dados
+        name: Nome da assinatura, da publicação e do slot
+        logger: Logger configurado
+
+    Raises:
+        QueryError: Se a assinatura não puder ser criada
+    """
+    conninfo = ' '.join(f"{key}={_conninfo_value(value)}" for key, value in [
+        ('host', source.get('replication_host', source['host'])),
+        ('port', source['port']),
+        ('user', source['user']),
+        ('password', source['password']),
+        ('dbname', database),
+    ])
+    _query(target, database, f"""
+        CREATE SUBSCRIPTION {name}
+        CONNECTION {_literal(conninfo)}
+        PUBLICATION {name}
+        WITH (create_slot = false, slot_name = {_literal(name)}, copy_data = false);
+    """, logger)
+    logger.info(f"Assinatura {name} criada em {describe_target(target)}")
+
+
+def setup_sync(cfg, database, logger):
+    """
+    Cópia inicial e replicação lógica contínua de um banco
+
+    Sem assinatura no destino: cria a publicação (FOR ALL TABLES) e o
+    slot na origem, faz o backup no snapshot do slot e o restore pelo
+    caminho padrão e, por fim, cria a assinatura com copy_data = false.
+    Se a assinatura já existe, nada é copiado. Em caso de falha o slot
+    é removido.
+
+    Args:
+        cfg: Configuração carregada
+        database: Nome do banco de dados
+        logger: Logger configurado
+
+    Returns:
+        bool: True se a assinatura existe ao final
+    """
+    source, target = cfg['source'], get_targets(cfg)[0]
+    name = replication_name(database)
+
+    try:
+        if subscription_exists(target, name, logger):
+            logger.info(f"Assinatura {name} já existe em {describe_target(target)}: sem cópia inicial")
+            return True
+        check_source(source, database, logger)
+        create_publication(source, database, name, logger)
+    except (QueryError, ReplicationError) as e:
+        logger.error(f"Replicação lógica de '{database}' indisponível: {e}")
+        return False
+
+    # Slot de uma tentativa anterior que não chegou à assinatura
+    drop_slot(source, database, name, logger)
+    coordinator = SnapshotCoordinator(
+        source, database, logger, keepalive=None,
+        export=functools.partial(create_slot, slot=name)
+    )
+    try:
+        coordinator.open()
+    except RuntimeError as e:
+        logger.error(str(e))
+        return False
+
+    success = False
+    try:
+        try:
+            backup_file = create_source_backup(cfg, database, logger,
+                                               snapshot=coordinator.snapshot)
+        finally:
+            coordinator.close()
+        try:
+            if not restore_to_target(cfg, target, backup_file, database, logger):
+                return False
+        finally:
+            cleanup_backup(backup_file, logger)
+        create_subscription(source, target, database, name, logger)
+        success = True
+        return success
+    except (QueryError, SpoolSpaceError) as e:
+        logger.error(str(e))
+        return False
+    finally:
+        if not success:
+            drop_slot(source, database, name, logger)
+
+
+@dataclass
+class ReplicationLag:
+    """Estado da assinatura de um banco em pg_stat_subscription"""
+
+    running: bool
+    lag_bytes: Optional[int] = None
+    lag_seconds: Optional[float] = None
+
+
+def replication_lag(source, target, database, logger):
+    """
+    Lê o atraso da assinatura no destino
+
+    lag_bytes é o WAL da origem além da última posição confirmada
+    (latest_end_lsn); lag_seconds, o tempo desde essa confirmação.
+
+    Args:
+        source: Dicionário de conexão da origem
+        target: Dicionário de conexão do destino
+        database: Nome do banco de dados
+        logger: Logger configurado
+
+    Returns:
+        ReplicationLag
+
+    Raises:
+        QueryError: Se a origem ou o destino não responderem
+    """
+    rows = _query(target, database, f"""
+        SELECT pid IS NOT NULL, latest_end_lsn, extract(epoch FROM now() - latest_end_time)
+        FROM pg_stat_subscription
+        WHERE subname = {_literal(replication_name(database))} AND relid IS NULL;
+    """, logger)
+    if not rows or rows[0][0] != 't':
+        return ReplicationLag(running=False)
+
+    _, lsn, seconds = rows[0]
+    lag = ReplicationLag(running=True, lag_seconds=float(seconds) if seconds else None)
+    if lsn:
+        diff = _query(source, database,
+                      f"SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), {_literal(lsn)})::bigint;",
+                      logger)
+        lag.lag_bytes = max(int(diff[0][0]), 0)
+    return lag
+
+
+def check_lag(source, target, databases, logger):
+    """
+    Lê e publica o atraso de cada banco (pg_mirror_replication_*)
+
+    Args:
+        source: Dicionário de conexão da origem
+        target: Dicionário de conexão do destino
+        databases: Nomes dos bancos sincronizados
+        logger: Logger configurado
+
+    Returns:
+        bool: True se todas as assinaturas estão ativas
+    """
+    healthy = True
+    for database in databases:
+        try:
+            lag = replication_lag(source, target, database, logger)
+        except QueryError as e:
+            logger.warning(f"Erro ao ler o lag de '{database}': {e}")
+            healthy = False
+            continue
+
+        REPLICATION_UP.set(int(lag.running), database=database)
+        if not lag.running:
+            logger.warning(f"Assinatura de '{database}' sem worker ativo no destino")
+            healthy = False
+            continue
+        if lag.lag_bytes is not None:
+            REPLICATION_LAG_BYTES.set(lag.lag_bytes, database=database)
+        if lag.lag_seconds is not None:
+            REPLICATION_LAG_SECONDS.set(round(lag.lag_seconds, 3), database=database)
+        metrics.record(database, replication_lag_bytes=lag.lag_bytes,
+                       replication_lag_seconds=lag.lag_seconds)
+        logger.info(
+            f"Lag de '{database}': {(lag.lag_bytes or 0) / (1024 * 1024):.1f} MB, "
+            f"{lag.lag_seconds or 0:.0f}s"
+        )
+    return healthy
+
+
+def monitor_lag(source, target, databases, logger, interval, stop, textfile=None):
+    """
+    Publica o atraso a cada interval segundos até stop ser sinalizado
+
+    Args:
+        source: Dicionário de conexão da origem
+        target: Dicionário de conexão do destino
+        databases: Nomes dos bancos sincronizados
+        logger: Logger configurado
+        interval: Segundos entre as leituras
+        stop: threading.Event que encerra o monitoramento
+        textfile: Arquivo .prom regravado a cada leitura (opcional)
+    """
+    while True:
+        check_lag(source, target, databases, logger)
+        if textfile:
+            try:
+                write_textfile(textfile)
+            except OSError as e:
+                logger.warning(f"Não foi possível gravar as métricas em {textfile}: {e}")
+        if stop.wait(interval):
+            return
@@ -1,65 +1,452 @@
 """Restore operations for PostgreSQL"""
+import functools
 import subprocess
 import sys
 import os
 
+from pg_mirror.database import QueryError, run_query
+from pg_mirror.progress import run_with_progress
+from pg_mirror.spool import DATABASE_SIZE_SQL
+from pg_mirror.toc import ObjectSizes, read_toc, write_list, write_ordered_list
+from pg_mirror.incremental import truncate_tables
+from pg_mirror.postdata import MIN_MAINTENANCE_MB, plan_post_data, session_options
+from pg_mirror.scheduler import MirrorJob, run_jobs
+from pg_mirror.fastrestore import FastRestore
+from pg_mirror import metrics
+from pg_mirror.openmetrics import RESTORED_OBJECTS
+
+
+def build_restore_command(host, port, database, user, *args):
+    """
+    Monta a linha de comando base do pg_restore
+    
+    Args:
+        host: Hostname do servidor PostgreSQL
+        port: Porta do servidor
+        database: Nome do banco de dados
+        user: Usuário do PostgreSQL
+        *args: Argumentos adicionais do pg_restore
+        
+    Returns:
+        list: Comando pronto para subprocess
+    """
+    return [
+        'pg_restore',
+        '-h', host,
+        '-p', str(port),
+        '-U', user,
+        '-d', database,
+        *args
+    ]
+
 
 def restore_backup(backup_file, host, port, database, user, password, 
-                   parallel_jobs, logger):
+                   parallel_jobs, logger, post_data_jobs=None, single_transaction=False,
+                   object_sizes=None, maintenance_budget_mb=None, fast_restore=None,
+                   checkpoint=None, after_data=None, keep=None):
     """
     Restore com paralelização (-j):
     - Múltiplas threads simultâneas
     - Muito mais rápido em bancos grandes
     
+    Aceita tanto arquivos no formato custom (-Fc) quanto diretórios
+    no formato diretório (-Fd); o pg_restore detecta o formato.
+    
+    Com post_data_jobs diferente de parallel_jobs o restore é feito em
+    duas etapas (schema e dados, depois post-data), cada uma com seus
+    jobs. Com single_transaction o restore é serial numa única
+    transação (-1), mais rápido em bancos pequenos.
+    
+    Com object_sizes o restore paralelo segue uma lista -L gerada do
+    TOC do arquivo, com as maiores tabelas e índices primeiro.
+    
+    Com maintenance_budget_mb o restore é feito em três fases
+    (pre-data, data, post-data) e o post-data passa pelo scheduler de
+    builds com memória limitada (ver restore_post_data). O perfil
+    fast_restore também usa as três fases: é aplicado apenas à carga de
+    dados e desfeito antes do post-data (ver FastRestore).
+    
+    Com checkpoint o restore também é feito em três fases, com
+    --exit-on-error, e cada seção e entrada do TOC concluída é gravada
+    no diário. Se o destino já tem progresso, apenas o que falta é
+    restaurado (ver _remaining_list).
+    
+    Com after_data o restore também é feito em três fases e a função é
+    chamada ao fim da carga de dados, antes do post-data (ex.: cópia
+    das tabelas filtradas por WHERE, ver subset.load_filtered).
+    
+    Com keep o restore segue uma lista -L sem as entradas do TOC
+    recusadas (ex.: FKs para tabelas filtradas, ver
+    subset.SubsetPlan.toc_filter).
+    
     Args:
-        backup_file: Caminho do arquivo de backup
+        backup_file: Caminho do arquivo (ou diretório) de backup
         host: Hostname do servidor PostgreSQL
         port: Porta do servidor
         database: Nome do banco de dados
         user: Usuário do PostgreSQL
         password: Senha do usuário
-        parallel_jobs: Número de jobs paralelos
+        parallel_jobs: Número de jobs paralelos (carga de dados)
         logger: Logger configurado
+        post_data_jobs: Jobs para índices e constraints (padrão: parallel_jobs)
+        single_transaction: Se True, restore serial em transação única
+        object_sizes: ObjectSizes da origem para ordenar o restore (opcional)
+        maintenance_budget_mb: Memória total para builds de índice simultâneos
+        fast_restore: Perfil de restore rápido ({"unlogged": bool}) ou None
+        checkpoint: TargetProgress do diário (ver checkpoint.py) ou None
+        after_data: Função sem argumentos, chamada após os dados; False
+            interrompe o restore
+        keep: Função TocEntry -> bool com as entradas a restaurar (opcional)
         
     Returns:
         bool: True se o restore foi bem-sucedido, False caso contrário
     """
+    with metrics.phase('restore', database, jobs=parallel_jobs,
+                       post_data_jobs=post_data_jobs or parallel_jobs) as step:
+        step['success'] = _restore_backup(
+            backup_file, host, port, database, user, password, parallel_jobs, logger,
+            post_data_jobs, single_transaction, object_sizes, maintenance_budget_mb,
+            fast_restore, checkpoint, after_data, keep
+        )
+        return step['success']
+
+
+def _restore_backup(backup_file, host, port, database, user, password, parallel_jobs,
+                    logger, post_data_jobs, single_transaction, object_sizes,
+                    maintenance_budget_mb, fast_restore, checkpoint, after_data, keep):
+    """Implementação de restore_backup (ver restore_backup)"""
     env = os.environ.copy()
     env['PGPASSWORD'] = password
-    
-    cmd = [
-        'pg_restore',
-        '-h', host,
-        '-p', str(port),
-        '-U', user,
-        '-d', database,
-        '-j', str(parallel_jobs),  # PARALELIZAÇÃO!
-        '-v',
-        '--no-owner',
-        '--no-acl',
-        backup_file
-    ]
+    post_data_jobs = post_data_jobs or parallel_jobs
+    phased = (bool(maintenance_budget_mb or fast_restore) or checkpoint is not None
+              or after_data is not None) and not single_transaction
+    fast = None
+    if fast_restore and phased:
+        fast = FastRestore(host, port, database, user, password, logger,
+                           unlogged=fast_restore['unlogged'])
     
     logger.info(f"Restaurando em '{database}' ({host})...")
-    logger.info(f"Usando {parallel_jobs} jobs paralelos")
+    if single_transaction:
+        passes = [['-1']]  # Serial, tudo ou nada
+        logger.info("Restore serial em transação única")
+    elif phased:
+        passes = [
+            ['--section=pre-data'],
+            ['--section=data', '-j', str(parallel_jobs)],
+        ]
+        if maintenance_budget_mb:
+            logger.info(
+                f"Usando {parallel_jobs} jobs nos dados e até {post_data_jobs} builds "
+                f"com {maintenance_budget_mb} MB no post-data"
+            )
+        else:
+            passes.append(['--section=post-data', '-j', str(post_data_jobs)])
+            logger.info(f"Usando {parallel_jobs} jobs nos dados e {post_data_jobs} no post-data")
+    elif post_data_jobs != parallel_jobs:
+        passes = [
+            ['--section=pre-data', '--section=data', '-j', str(parallel_jobs)],
+            ['--section=post-data', '-j', str(post_data_jobs)],
+        ]
+        logger.info(f"Usando {parallel_jobs} jobs nos dados e {post_data_jobs} no post-data")
+    else:
+        passes = [['-j', str(parallel_jobs)]]  # PARALELIZAÇÃO!
+        logger.info(f"Usando {parallel_jobs} jobs paralelos")
     
+    list_path = None
+    if checkpoint is not None and checkpoint.started and not single_transaction:
+        target = {'host': host, 'port': port, 'user': user, 'password': password}
+        list_path = _remaining_list(backup_file, target, database, object_sizes, checkpoint,
+                                    logger, keep)
+        if list_path is None:
+            return False
+    elif keep is not None:
+        list_path = write_ordered_list(backup_file, None if single_transaction else object_sizes,
+                                       logger, keep=keep)
+    elif object_sizes is not None and not single_transaction:
+        list_path = write_ordered_list(backup_file, object_sizes, logger)
+    list_args = ['-L', list_path] if list_path else []
+    if checkpoint is not None:
+        list_args.append('--exit-on-error')
+    
+    warnings = False
     try:
-        subprocess.run(
-            cmd,
-            env=env,
-            check=True,
-            capture_output=True,
-            text=True
+        for args in passes:
+            section = _section(args)
+            if checkpoint is not None and section in checkpoint.sections:
+                logger.info(f"Seção {section} já restaurada (checkpoint)")
+                continue
+            cmd = build_restore_command(
+                host, port, database, user,
+                *args,
+                *list_args,
+                '-v',
+                '--no-owner',
+                '--no-acl',
+                backup_file
+            )
+            loading = fast is not None and '--section=data' in args
+            step_env = env
+            if loading:
+                fast.before_data()
+                step_env = _with_session_options(env, fast.session_options())
+            ok, warned = _run_step(
+                cmd, step_env, database, logger, checkpoint,
+                size_probe=_growth_probe(host, port, database, user, password, logger)
+            )
+            if not ok:
+                return False
+            warnings = warnings or warned
+            # Em transação única (-1) a etapa inclui os dados
+            if after_data is not None and section in ('data', None) and not after_data():
+                return False
+            if checkpoint is not None and section:
+                checkpoint.mark_section(section)
+            # UNLOGGED -> LOGGED antes das FKs do post-data
+            if loading and not fast.finish():
+                return False
+    finally:
+        if list_path:
+            os.unlink(list_path)
+        if fast is not None:
+            fast.finish()
+    
+    if phased and maintenance_budget_mb and not (checkpoint and 'post-data' in checkpoint.sections):
+        ok, warned = restore_post_data(
+            backup_file, host, port, database, user, env,
+            post_data_jobs, maintenance_budget_mb, object_sizes, logger,
+            checkpoint=checkpoint, keep=keep
         )
+        if not ok:
+            return False
+        warnings = warnings or warned
+        if checkpoint is not None:
+            checkpoint.mark_section('post-data')
+    
+    if warnings:
+        logger.warning("Restore concluído com avisos")
+    else:
         logger.info("Restore concluído com sucesso!")
-        return True
+    return True
+
+
+def _run_step(cmd, env, database, logger, checkpoint=None, size_probe=None):
+    """
+    Executa uma chamada do pg_restore
     
+    Com checkpoint, as entradas concluídas ("finished item", apenas no
+    restore paralelo) são gravadas no diário. size_probe (ver
+    _growth_probe) acrescenta MB gravados e MB/s ao progresso.
+    
+    Returns:
+        tuple: (sucesso, terminou com avisos)
+    """
+    def on_event(kind, name, line):
+        _count_restored(database, kind, name, line)
+        if checkpoint is not None:
+            checkpoint.on_restore_line(line)
+    
+    try:
+        run_with_progress(
+            cmd,
+            env=env,
+            logger=logger,
+            label=f"Restore de '{database}'",
+            size_probe=size_probe,
+            on_event=on_event
+        )
+        return True, False
     except subprocess.CalledProcessError as e:
         logger.debug(f"Erro capturado: {e}")
         # pg_restore pode retornar 1 mesmo com sucesso (avisos)
         if "ERROR" in e.stderr:
             logger.error(f"Erro no restore: {e.stderr}")
-            return False
-        else:
-            logger.warning("Restore concluído com avisos")
-            return True
+            return False, False
+        return True, True
+
+
+def _count_restored(database, kind, name, line):
+    """Conta objetos criados e tabelas carregadas (ignora "finished item")"""
+    if kind == 'create':
+        RESTORED_OBJECTS.inc(database=database, kind='schema')
+    elif kind == 'restore':
+        RESTORED_OBJECTS.inc(database=database, kind='data')
+
+
+def _growth_probe(host, port, database, user, password, logger):
+    """
+    size_probe do restore: bytes acrescentados ao banco de destino
+    
+    A primeira leitura de pg_database_size é a linha de base; as
+    seguintes retornam o crescimento desde ela.
+    
+    Returns:
+        function: Sonda sem argumentos (OSError se a consulta falhar)
+    """
+    baseline = []
+    
+    def probe():
+        try:
+            rows = run_query(host, port, database, user, password, DATABASE_SIZE_SQL, logger)
+            size = int(rows[0][0])
+        except (QueryError, IndexError, ValueError) as e:
+            raise OSError(str(e)) from e
+        if not baseline:
+            baseline.append(size)
+        return max(size - baseline[0], 0)
+    
+    return probe
+
+
+def _section(args):
+    """Seção restaurada por uma etapa (None se a etapa não for de uma única seção)"""
+    sections = [arg.split('=', 1)[1] for arg in args if arg.startswith('--section=')]
+    return sections[0] if len(sections) == 1 else None
+
+
+def _remaining_list(backup_file, target, database, object_sizes, checkpoint, logger, keep=None):
+    """
+    Lista -L apenas com as entradas do TOC ainda não concluídas no destino
+    
+    Se a carga de dados foi interrompida, as tabelas cujos dados serão
+    carregados de novo são esvaziadas antes (o COPY interrompido já é
+    desfeito pelo PostgreSQL; o TRUNCATE cobre uma conclusão que não
+    chegou ao diário).
+    
+    Returns:
+        str: Caminho do arquivo de lista (o chamador remove), ou None em
+            caso de falha
+    """
+    try:
+        toc = read_toc(backup_file)
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Não foi possível ler o TOC para retomar o restore: {e.stderr}")
+        return None
+    if keep is not None:
+        toc = toc.select(keep)
+    if object_sizes is not None:
+        toc = toc.with_sizes(object_sizes).ordered()
+    
+    remaining = toc.select(lambda entry: entry.dump_id not in checkpoint.items)
+    logger.info(
+        f"Retomando restore: {len(toc.entries) - len(remaining.entries)} de "
+        f"{len(toc.entries)} entrada(s) já concluída(s)"
+    )
+    pending = [(entry.schema, entry.name) for entry in remaining.entries if entry.is_data]
+    if pending and 'pre-data' in checkpoint.sections and 'data' not in checkpoint.sections:
+        logger.info(f"Esvaziando {len(pending)} tabela(s) antes de recarregar os dados")
+        if not truncate_tables(target, database, pending, logger):
+            return None
+    return write_list(remaining)
+
+
+def _with_session_options(env, options):
+    """Cópia do ambiente com opções de sessão adicionadas ao PGOPTIONS"""
+    env = dict(env)
+    env['PGOPTIONS'] = f"{env.get('PGOPTIONS', '')} {options}".strip()
+    return env
+
+
+def restore_post_data(backup_file, host, port, database, user, env, jobs,
+                      budget_mb, object_sizes, logger, checkpoint=None, keep=None):
+    """
+    Post-data com orçamento de memória para a criação de índices
+    
+    Os índices grandes (e constraints PK/UNIQUE) são criados um por
+    sessão, do maior para o menor, cada um com maintenance_work_mem e
+    max_parallel_maintenance_workers próprios; o scheduler só inicia um
+    build se a memória das sessões ativas couber no orçamento. Em
+    seguida o restante do post-data (índices pequenos, FKs, triggers...)
+    é aplicado com -j, dividindo o orçamento entre os jobs.
+    
+    Args:
+        backup_file: Caminho do arquivo (ou diretório) de backup
+        host: Hostname do servidor PostgreSQL
+        port: Porta do servidor
+        database: Nome do banco de dados
+        user: Usuário do PostgreSQL
+        env: Ambiente com PGPASSWORD
+        jobs: Builds simultâneos no máximo
+        budget_mb: Memória total para builds simultâneos, em MB
+        object_sizes: ObjectSizes da origem (None: todos os builds vão juntos)
+        logger: Logger configurado
+        checkpoint: TargetProgress do diário (entradas concluídas são puladas)
+        keep: Função TocEntry -> bool com as entradas a restaurar (opcional)
+        
+    Returns:
+        tuple: (sucesso, terminou com avisos)
+    """
+    try:
+        toc = read_toc(backup_file).with_sizes(object_sizes or ObjectSizes())
+        if keep is not None:
+            toc = toc.select(keep)
+        if checkpoint is not None:
+            toc = toc.select(lambda entry: entry.dump_id not in checkpoint.items)
+        builds, rest_memory_mb = plan_post_data(toc, budget_mb, jobs)
+    except subprocess.CalledProcessError as e:
+        logger.warning(f"Não foi possível ler o TOC; post-data sem scheduler: {e.stderr}")
+        toc, builds, rest_memory_mb = None, [], max(MIN_MAINTENANCE_MB, budget_mb // max(1, jobs))
+    
+    warnings = [False]
+    exit_args = ['--exit-on-error'] if checkpoint is not None else []
+    
+    def _build(build):
+        list_path = write_list(toc.select(lambda entry: entry.dump_id == build.entry.dump_id))
+        try:
+            cmd = build_restore_command(
+                host, port, database, user,
+                '--section=post-data', '-L', list_path,
+                *exit_args,
+                '-v', '--no-owner', '--no-acl',
+                backup_file
+            )
+            step_env = _with_session_options(env, session_options(build.memory_mb, build.workers))
+            ok, warned = _run_step(cmd, step_env, database, logger)
+            warnings[0] = warnings[0] or warned
+            if ok and checkpoint is not None:
+                checkpoint.mark_item(build.entry.dump_id)
+            return ok
+        finally:
+            os.unlink(list_path)
+    
+    if builds:
+        logger.info(
+            f"Criando {len(builds)} índice(s) grande(s) com até {jobs} build(s) "
+            f"simultâneo(s) em {budget_mb} MB"
+        )
+        build_jobs = [
+            MirrorJob(
+                name=build.label,
+                host=build.entry.table or build.label,
+                size=build.entry.size,
+                func=functools.partial(_build, build),
+                cost=build.memory_mb
+            )
+            for build in builds
+        ]
+        run_jobs(build_jobs, max_concurrent=jobs, max_per_host=jobs, logger=logger,
+                 budget=budget_mb)
+        if not all(job.success for job in build_jobs):
+            logger.error("Falha na criação de índices")
+            return False, False
+    
+    # Restante do post-data, sem os índices já criados
+    done = {build.entry.dump_id for build in builds}
+    list_path = write_list(toc.select(lambda entry: entry.dump_id not in done)) if toc else None
+    try:
+        cmd = build_restore_command(
+            host, port, database, user,
+            '--section=post-data', '-j', str(jobs),
+            *(['-L', list_path] if list_path else []),
+            *exit_args,
+            '-v', '--no-owner', '--no-acl',
+            backup_file
+        )
+        ok, warned = _run_step(
+            cmd, _with_session_options(env, session_options(rest_memory_mb)), database, logger,
+            checkpoint,
+            size_probe=_growth_probe(host, port, database, user, env['PGPASSWORD'], logger)
+        )
+    finally:
+        if list_path:
+            os.unlink(list_path)
+    return ok, warnings[0] or warned
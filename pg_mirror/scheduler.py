@@ -0,0 +1,126 @@
+"""Concurrent job scheduler for multi-database mirroring"""
+import contextvars
+import threading
+import time
+
+
+class MirrorJob:
+    """Unidade de trabalho do scheduler (normalmente um banco de dados)"""
+
+    def __init__(self, name, host, size, func, cost=0):
+        """
+        Args:
+            name: Identificador do job (ex.: nome do banco)
+            host: Host de origem (usado no limite por host)
+            size: Tamanho estimado em bytes (maiores começam primeiro)
+            func: Função sem argumentos que retorna True em caso de sucesso
+            cost: Recurso consumido enquanto executa (ex.: MB de memória),
+                limitado pelo budget de run_jobs
+        """
+        self.name = name
+        self.host = host
+        self.size = size
+        self.func = func
+        self.cost = cost
+        self.success = None
+        self.error = None
+        self.elapsed = 0.0
+
+
+def run_jobs(jobs, max_concurrent, max_per_host, logger, budget=None):
+    """
+    Executa jobs em paralelo respeitando limites globais e por host
+
+    Os jobs são despachados do maior para o menor, para que os bancos
+    grandes não fiquem para o fim. Um job que não pode iniciar por
+    causa do limite do seu host não bloqueia jobs de outros hosts.
+    Exceções (incluindo SystemExit) marcam apenas o job como falho.
+    Com budget, a soma do cost dos jobs em execução não passa dele
+    (um job maior que o budget executa sozinho).
+
+    Args:
+        jobs: Lista de MirrorJob
+        max_concurrent: Máximo de jobs simultâneos no total
+        max_per_host: Máximo de jobs simultâneos por host de origem
+        logger: Logger configurado
+        budget: Limite opcional para a soma de cost dos jobs simultâneos
+
+    Returns:
+        list: Os mesmos jobs, com success, error e elapsed preenchidos
+    """
+    max_concurrent = max(1, max_concurrent)
+    max_per_host = max(1, max_per_host)
+    pending = sorted(jobs, key=lambda job: job.size, reverse=True)
+    running_per_host = {}
+    running = [0]
+    running_cost = [0]
+    condition = threading.Condition()
+    threads = []
+
+    def _run(job):
+        started = time.monotonic()
+        try:
+            job.success = bool(job.func())
+        except BaseException as e:
+            job.success = False
+            job.error = e
+            logger.error(f"Falha em '{job.name}': {e!r}")
+        finally:
+            job.elapsed = time.monotonic() - started
+            with condition:
+                running[0] -= 1
+                running_cost[0] -= job.cost
+                running_per_host[job.host] -= 1
+                condition.notify_all()
+
+    def _fits(job):
+        if running_per_host.get(job.host, 0) >= max_per_host:
+            return False
+        return budget is None or not running[0] or running_cost[0] + job.cost <= budget
+
+    with condition:
+        while pending:
+            job = next((j for j in pending if _fits(j)), None)
+            if job is None or running[0] >= max_concurrent:
+                condition.wait()
+                continue
+
+            pending.remove(job)
+            running[0] += 1
+            running_cost[0] += job.cost
+            running_per_host[job.host] = running_per_host.get(job.host, 0) + 1
+            logger.info(f"Iniciando '{job.name}' ({job.size / (1024 * 1024):.2f} MB)")
+            # Copia o contexto para que os logs JSON do job herdem os campos atuais
+            thread = threading.Thread(target=contextvars.copy_context().run, args=(_run, job),
+                                      name=f"mirror-{job.name}")
+            threads.append(thread)
+            thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return jobs
+
+
+def log_summary(jobs, logger, label='bancos espelhados'):
+    """
+    Registra o resumo final de uma execução com vários jobs
+
+    Args:
+        jobs: Lista de MirrorJob já executados
+        logger: Logger configurado
+        label: Descrição dos jobs no resumo
+
+    Returns:
+        bool: True se todos os jobs foram bem-sucedidos
+    """
+    failed = [job for job in jobs if not job.success]
+
+    logger.info("=" * 60)
+    logger.info(f"Resumo: {len(jobs) - len(failed)}/{len(jobs)} {label} com sucesso")
+    for job in sorted(jobs, key=lambda j: j.name):
+        status = "✅" if job.success else "❌"
+        logger.info(f"   {status} {job.name:<40} {job.elapsed:8.1f}s")
+    logger.info("=" * 60)
+
+    return not failed
@@ -0,0 +1,166 @@
+"""Pooled native-driver sessions for catalog operations"""
+import threading
+from contextlib import contextmanager
+
+try:
+    import psycopg
+    DriverError = psycopg.Error
+except ImportError:  # Dependência opcional: pip install pg-mirror[driver]
+    psycopg = None
+    DriverError = ()  # Nenhuma exceção do driver a capturar
+
+
+_active_pool = None
+
+
+def _to_text(value):
+    """Converte um valor para o mesmo texto que o psql -tA produziria"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value)
+
+
+class ConnectionPool:
+    """
+    Pool de conexões psycopg reutilizadas durante toda a execução
+
+    As conexões são separadas por (host, porta, banco, usuário) e
+    emprestadas com exclusividade a uma thread por vez. Uma conexão
+    que falha durante o uso é descartada em vez de devolvida.
+    """
+
+    def __init__(self, logger, max_idle=4):
+        """
+        Args:
+            logger: Logger configurado
+            max_idle: Máximo de conexões ociosas mantidas por servidor/banco
+        """
+        self.logger = logger
+        self.max_idle = max_idle
+        self.connections_opened = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self, host, port, database, user, password):
+        """
+        Empresta uma conexão (autocommit) do pool
+
+        Args:
+            host: Hostname do servidor PostgreSQL
+            port: Porta do servidor
+            database: Nome do banco de dados
+            user: Usuário do PostgreSQL
+            password: Senha do usuário
+
+        Yields:
+            Conexão psycopg
+        """
+        key = (host, str(port), database, user)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            conn = idle.pop() if idle else None
+
+        if conn is None or conn.closed:
+            self.logger.debug(f"Abrindo conexão com '{database}' ({host})")
+            conn = psycopg.connect(
+                host=host,
+                port=port,
+                dbname=database,
+                user=user,
+                password=password,
+                autocommit=True,
+                application_name='pg-mirror'
+            )
+            with self._lock:
+                self.connections_opened += 1
+
+        try:
+            yield conn
+        except BaseException:
+            conn.close()
+            raise
+
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle and not conn.closed:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def query(self, host, port, database, user, password, sql, params=None):
+        """
+        Executa uma consulta em uma conexão do pool
+
+        Args:
+            host: Hostname do servidor PostgreSQL
+            port: Porta do servidor
+            database: Nome do banco de dados
+            user: Usuário do PostgreSQL
+            password: Senha do usuário
+            sql: Comando SQL
+            params: Parâmetros opcionais do comando
+
+        Returns:
+            list: Linhas como tuplas de strings (mesmo formato do psql -tA)
+        """
+        with self.connection(host, port, database, user, password) as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                if cur.description is None:
+                    return []
+                return [tuple(_to_text(v) for v in row) for row in cur.fetchall()]
+
+    def close(self):
+        """Fecha todas as conexões ociosas"""
+        with self._lock:
+            connections = [conn for idle in self._idle.values() for conn in idle]
+            self._idle = {}
+        for conn in connections:
+            conn.close()
+
+
+def get_pool():
+    """
+    Retorna o pool ativo
+
+    Returns:
+        ConnectionPool ou None se não houver pool ativo
+    """
+    return _active_pool
+
+
+@contextmanager
+def connection_pool(logger, enabled=True, max_idle=4):
+    """
+    Ativa o pool de conexões durante o bloco
+
+    Sem o psycopg instalado (ou com enabled=False) as operações de
+    catálogo continuam usando o psql.
+
+    Args:
+        logger: Logger configurado
+        enabled: Se False, não ativa o pool
+        max_idle: Máximo de conexões ociosas por servidor/banco
+
+    Yields:
+        ConnectionPool ou None
+    """
+    global _active_pool
+
+    if not enabled or psycopg is None:
+        if enabled:
+            logger.debug("psycopg não instalado; operações de catálogo usarão psql")
+        yield None
+        return
+
+    pool = ConnectionPool(logger, max_idle=max_idle)
+    previous, _active_pool = _active_pool, pool
+    try:
+        yield pool
+    finally:
+        _active_pool = previous
+        pool.close()
+        logger.debug(f"Pool encerrado ({pool.connections_opened} conexões abertas)")
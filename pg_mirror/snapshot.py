@@ -0,0 +1,182 @@
+"""Exported-snapshot coordination for multi-worker reads of the source"""
+import os
+import subprocess
+import threading
+import time
+
+from pg_mirror import metrics
+from pg_mirror.openmetrics import SNAPSHOT_HELD
+
+
+KEEPALIVE_SECONDS = 30
+
+
+def export_snapshot(source, database, logger):
+    """
+    Abre uma transação REPEATABLE READ na origem e exporta o snapshot
+
+    A sessão psql precisa permanecer aberta enquanto o snapshot for
+    usado pelos pg_dump (--snapshot) e pelos workers de COPY.
+
+    Args:
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        logger: Logger configurado
+
+    Returns:
+        tuple: (processo psql da sessão, id do snapshot)
+
+    Raises:
+        RuntimeError: Se não for possível exportar o snapshot
+    """
+    env = os.environ.copy()
+    env['PGPASSWORD'] = source['password']
+
+    cmd = [
+        'psql',
+        '-h', source['host'],
+        '-p', str(source['port']),
+        '-U', source['user'],
+        '-d', database,
+        '-X', '-q', '-tA',
+        '-v', 'ON_ERROR_STOP=1'
+    ]
+    session = subprocess.Popen(
+        cmd,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    session.stdin.write(
+        "BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY;\n"
+        # A sessão fica ociosa entre os keepalives
+        "SET LOCAL idle_in_transaction_session_timeout = 0;\n"
+        "SELECT pg_export_snapshot();\n"
+    )
+    session.stdin.flush()
+    snapshot = session.stdout.readline().strip()
+
+    if not snapshot:
+        session.kill()
+        _, stderr = session.communicate()
+        raise RuntimeError(f"Não foi possível exportar o snapshot: {stderr}")
+
+    logger.debug(f"Snapshot exportado: {snapshot}")
+    return session, snapshot
+
+
+def release_snapshot(session, logger):
+    """
+    Encerra a transação que mantém o snapshot exportado
+
+    Args:
+        session: Processo psql retornado por export_snapshot
+        logger: Logger configurado
+    """
+    try:
+        session.communicate("COMMIT;\n", timeout=30)
+    except Exception as e:
+        logger.warning(f"Erro ao liberar snapshot: {e}")
+        session.kill()
+
+
+class SnapshotCoordinator:
+    """
+    Snapshot da origem compartilhado por todos os workers de uma execução
+
+    open() exporta o snapshot numa transação REPEATABLE READ que fica
+    aberta até close(); o id é passado aos pg_dump (--snapshot) e aos
+    workers de COPY (SET TRANSACTION SNAPSHOT), que assim leem os
+    mesmos dados. Uma thread envia um keepalive à sessão a cada
+    keepalive segundos e avisa se ela cair (os workers que ainda não
+    começaram vão falhar).
+
+    export substitui export_snapshot (mesma assinatura e retorno), como
+    no slot de replicação do sync; keepalive=None desliga o keepalive
+    para sessões que não aceitam outros comandos enquanto o snapshot
+    estiver em uso.
+
+    Enquanto o snapshot está aberto o vacuum da origem não remove
+    versões de linhas mais novas que ele; o tempo em que ficou aberto
+    é registrado no log, no relatório de métricas
+    (snapshot_held_seconds) e em pg_mirror_snapshot_held_seconds.
+    """
+
+    def __init__(self, source, database, logger, keepalive=KEEPALIVE_SECONDS,
+                 export=None):
+        self.source = source
+        self.database = database
+        self.logger = logger
+        self.keepalive = keepalive
+        self.export = export
+        self.snapshot = None
+        self.lost = False
+        self.held_seconds = None
+        self._session = None
+        self._opened_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def open(self):
+        """
+        Exporta o snapshot e inicia o keepalive
+
+        Returns:
+            str: Id do snapshot
+
+        Raises:
+            RuntimeError: Se não for possível exportar o snapshot
+        """
+        export = self.export or export_snapshot
+        self._session, self.snapshot = export(self.source, self.database, self.logger)
+        self._opened_at = time.monotonic()
+        if self.keepalive is not None:
+            self._thread = threading.Thread(target=self._keepalive_loop, daemon=True)
+            self._thread.start()
+        return self.snapshot
+
+    def _keepalive_loop(self):
+        while not self._stop.wait(self.keepalive):
+            try:
+                self._session.stdin.write("SELECT 1;\n")
+                self._session.stdin.flush()
+                alive = self._session.stdout.readline().strip() == '1'
+            except (OSError, ValueError):
+                alive = False
+            if not alive:
+                if not self._stop.is_set():
+                    self.lost = True
+                    self.logger.error(
+                        f"Sessão do snapshot {self.snapshot} encerrada na origem: "
+                        f"as cópias que ainda não começaram vão falhar"
+                    )
+                return
+
+    def close(self):
+        """Encerra a transação do snapshot e registra o tempo em que ficou aberto"""
+        if self._session is None:
+            return
+        self._stop.set()
+        if self._thread is not None:
+            # Um keepalive preso numa sessão travada não impede o COMMIT
+            # (release_snapshot encerra o psql se não responder)
+            self._thread.join(timeout=self.keepalive)
+        release_snapshot(self._session, self.logger)
+        self._session = None
+
+        self.held_seconds = time.monotonic() - self._opened_at
+        SNAPSHOT_HELD.observe(self.held_seconds)
+        metrics.record(self.database, snapshot_held_seconds=round(self.held_seconds, 3))
+        self.logger.info(
+            f"Snapshot {self.snapshot} mantido por {self.held_seconds:.1f}s na origem"
+        )
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,165 @@
+"""Spool directory selection and free-space pre-flight for backups"""
+import json
+import os
+import shutil
+import tempfile
+
+from pg_mirror.database import run_query, QueryError
+
+
+DATABASE_SIZE_SQL = "SELECT pg_database_size(current_database());"
+
+# Razão tamanho do arquivo / pg_database_size sem histórico. Conservadora:
+# o dump não contém índices, então a razão real costuma ser bem menor.
+DEFAULT_RATIOS = {'none': 1.0, 'gzip': 0.5, 'lz4': 0.6, 'zstd': 0.5}
+SAFETY_MARGIN = 1.15  # Folga sobre a estimativa
+HISTORY_SIZE = 5  # Razões guardadas por banco e compressão
+
+
+class SpoolSpaceError(Exception):
+    """Espaço livre insuficiente para o backup no diretório de spool"""
+    pass
+
+
+def spool_directory(spool_dir=None):
+    """
+    Diretório onde os backups temporários são gravados
+
+    Args:
+        spool_dir: options.spool_dir (None: diretório temporário do sistema)
+
+    Returns:
+        str: Caminho absoluto, criado se necessário
+    """
+    if not spool_dir:
+        return tempfile.gettempdir()
+    path = os.path.abspath(os.path.expanduser(spool_dir))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def ratios_path(state_dir):
+    """Arquivo com o histórico de razões de compressão"""
+    return os.path.join(os.path.expanduser(state_dir), 'spool', 'ratios.json')
+
+
+def ratio_key(source, database, compression_label):
+    """Chave do histórico: origem, banco e compressão"""
+    return f"{source['host']}:{source['port']}/{database}|{compression_label}"
+
+
+def load_ratios(state_dir):
+    """
+    Carrega o histórico de razões observadas
+
+    Args:
+        state_dir: Diretório base de estado (options.state_dir)
+
+    Returns:
+        dict: {chave: [razões mais recentes]}
+    """
+    try:
+        with open(ratios_path(state_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def expected_ratio(state_dir, key, algorithm):
+    """
+    Razão esperada para a próxima execução
+
+    Usa a maior das últimas razões observadas (o banco pode ter
+    crescido em dados pouco compressíveis) ou o padrão do algoritmo.
+
+    Args:
+        state_dir: Diretório base de estado
+        key: Chave do histórico (ratio_key)
+        algorithm: Algoritmo de compressão
+
+    Returns:
+        float: Razão tamanho do arquivo / tamanho do banco
+    """
+    history = load_ratios(state_dir).get(key)
+    if history:
+        return max(history)
+    return DEFAULT_RATIOS.get(algorithm, 1.0)
+
+
+def record_ratio(state_dir, key, database_size, archive_size):
+    """
+    Registra a razão observada em um backup concluído
+
+    Gravado de forma atômica (arquivo temporário + rename).
+
+    Args:
+        state_dir: Diretório base de estado
+        key: Chave do histórico (ratio_key)
+        database_size: pg_database_size antes do dump, em bytes
+        archive_size: Tamanho do arquivo gerado, em bytes
+    """
+    if not database_size:
+        return
+    path = ratios_path(state_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ratios = load_ratios(state_dir)
+    history = ratios.get(key, []) + [round(archive_size / database_size, 4)]
+    ratios[key] = history[-HISTORY_SIZE:]
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(ratios, f)
+    os.replace(tmp_path, path)
+
+
+def database_size(source, database, logger):
+    """
+    Tamanho do banco na origem
+
+    Args:
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        logger: Logger configurado
+
+    Returns:
+        int: Tamanho em bytes, ou None se a consulta falhar
+    """
+    try:
+        rows = run_query(
+            source['host'], source['port'], database, source['user'], source['password'],
+            DATABASE_SIZE_SQL, logger
+        )
+        return int(rows[0][0])
+    except (QueryError, IndexError, ValueError) as e:
+        logger.warning(f"Não foi possível ler o tamanho de '{database}': {e}")
+        return None
+
+
+def check_free_space(directory, db_size, ratio, logger):
+    """
+    Compara a estimativa do backup com o espaço livre no spool
+
+    Args:
+        directory: Diretório de spool
+        db_size: Tamanho do banco em bytes
+        ratio: Razão esperada (expected_ratio)
+        logger: Logger configurado
+
+    Returns:
+        int: Estimativa do tamanho do arquivo, em bytes
+
+    Raises:
+        SpoolSpaceError: Se a estimativa (com folga) não couber
+    """
+    estimate = int(db_size * ratio)
+    free = shutil.disk_usage(directory).free
+    mb = 1024 * 1024
+    logger.debug(
+        f"Spool {directory}: backup estimado em {estimate / mb:.0f} MB "
+        f"(razão {ratio:.2f}), {free / mb:.0f} MB livres"
+    )
+    if estimate * SAFETY_MARGIN > free:
+        raise SpoolSpaceError(
+            f"Espaço insuficiente em {directory}: backup estimado em "
+            f"{estimate / mb:.0f} MB, {free / mb:.0f} MB livres"
+        )
+    return estimate
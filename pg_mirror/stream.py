@@ -0,0 +1,192 @@
+"""Streaming dump -> restore operations for PostgreSQL"""
+import os
+import queue
+import subprocess
+import threading
+
+from pg_mirror.backup import build_dump_command
+from pg_mirror.restore import build_restore_command
+
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB por buffer
+
+
+def pump_stream(reader, writer, chunk_size=CHUNK_SIZE, max_buffers=64):
+    """
+    Copia bytes de reader para writer com buffer limitado em memória.
+
+    Usa um pool fixo de buffers reutilizáveis: a leitura só avança
+    quando há buffer livre, o que gera backpressure sobre o produtor
+    quando o consumidor é mais lento. Memória máxima usada:
+    chunk_size * max_buffers.
+
+    Args:
+        reader: Objeto binário com readinto() (ex.: stdout do pg_dump)
+        writer: Objeto binário com write() (ex.: stdin do pg_restore)
+        chunk_size: Tamanho de cada buffer em bytes
+        max_buffers: Número máximo de buffers em trânsito
+
+    Returns:
+        int: Total de bytes copiados
+    """
+    free_buffers = queue.Queue()
+    for _ in range(max_buffers):
+        free_buffers.put(bytearray(chunk_size))
+    filled_buffers = queue.Queue()
+    read_error = []
+
+    def _read():
+        try:
+            while True:
+                buf = free_buffers.get()
+                if buf is None:
+                    break
+                size = reader.readinto(buf)
+                if not size:
+                    break
+                filled_buffers.put((buf, size))
+        except Exception as e:
+            read_error.append(e)
+        finally:
+            filled_buffers.put(None)
+
+    reader_thread = threading.Thread(target=_read, daemon=True)
+    reader_thread.start()
+
+    total = 0
+    try:
+        while True:
+            item = filled_buffers.get()
+            if item is None:
+                break
+            buf, size = item
+            with memoryview(buf) as view:
+                writer.write(view[:size])
+            total += size
+            free_buffers.put(buf)
+    except BaseException:
+        # Libera a thread de leitura caso esteja aguardando buffer livre
+        free_buffers.put(None)
+        raise
+
+    reader_thread.join()
+    if read_error:
+        raise read_error[0]
+    return total
+
+
+def _drain(stream, chunks):
+    """Lê um stream até EOF acumulando o conteúdo (evita deadlock de pipe)"""
+    for line in iter(stream.readline, b''):
+        chunks.append(line)
+    stream.close()
+
+
+def stream_mirror(source, target, database, logger, buffer_mb=64):
+    """
+    Espelha o banco via pipe pg_dump -> pg_restore, sem arquivo temporário:
+    - Dump e restore executam ao mesmo tempo
+    - Nenhum espaço em disco necessário no host do mirror
+    - Buffer em memória limitado a buffer_mb
+
+    O pg_restore lendo de stdin não suporta -j, portanto o restore é
+    serial. O dump é gerado sem compressão (-Z 0), já que os dados
+    não são persistidos.
+
+    Args:
+        source: Dicionário de conexão da origem (host, port, user, password)
+        target: Dicionário de conexão do destino (host, port, user, password)
+        database: Nome do banco de dados
+        logger: Logger configurado
+        buffer_mb: Memória máxima usada no buffer entre os processos
+
+    Returns:
+        bool: True se o espelhamento foi bem-sucedido, False caso contrário
+    """
+    dump_env = os.environ.copy()
+    dump_env['PGPASSWORD'] = source['password']
+    restore_env = os.environ.copy()
+    restore_env['PGPASSWORD'] = target['password']
+
+    dump_cmd = build_dump_command(
+        source['host'], source['port'], database, source['user'],
+        '-Fc',
+        '-Z', '0',  # Sem compressão: os dados não vão para disco
+        '-b'
+    )
+    restore_cmd = build_restore_command(
+        target['host'], target['port'], database, target['user'],
+        '--no-owner',
+        '--no-acl'
+    )
+
+    logger.info(f"Streaming de '{database}' ({source['host']} -> {target['host']})...")
+    logger.debug(f"Buffer máximo em memória: {buffer_mb} MB")
+
+    dump_proc = subprocess.Popen(
+        dump_cmd, env=dump_env, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    restore_proc = subprocess.Popen(
+        restore_cmd, env=restore_env, stdin=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+
+    dump_stderr, restore_stderr = [], []
+    drains = [
+        threading.Thread(target=_drain, args=(dump_proc.stderr, dump_stderr), daemon=True),
+        threading.Thread(target=_drain, args=(restore_proc.stderr, restore_stderr), daemon=True),
+    ]
+    for thread in drains:
+        thread.start()
+
+    transferred = 0
+    pipe_broken = False
+    try:
+        transferred = pump_stream(
+            dump_proc.stdout,
+            restore_proc.stdin,
+            max_buffers=max(1, int(buffer_mb)),
+        )
+    except BrokenPipeError:
+        # pg_restore encerrou antes do fim do dump
+        pipe_broken = True
+        dump_proc.kill()
+    except BaseException:
+        # Interrupção (Ctrl+C, erro inesperado): encerra os dois processos
+        # para o pg_restore não aplicar um archive truncado
+        dump_proc.kill()
+        restore_proc.kill()
+        dump_proc.wait()
+        restore_proc.wait()
+        raise
+    finally:
+        try:
+            restore_proc.stdin.close()
+        except BrokenPipeError:
+            pipe_broken = True
+
+    dump_rc = dump_proc.wait()
+    restore_rc = restore_proc.wait()
+    for thread in drains:
+        thread.join()
+
+    dump_err = b''.join(dump_stderr).decode(errors='replace')
+    restore_err = b''.join(restore_stderr).decode(errors='replace')
+
+    if pipe_broken:
+        logger.error(f"pg_restore encerrou antes do fim do dump: {restore_err}")
+        return False
+
+    if dump_rc != 0:
+        logger.error(f"Erro no pg_dump: {dump_err}")
+        return False
+
+    if restore_rc != 0:
+        # pg_restore pode retornar 1 mesmo com sucesso (avisos)
+        if "ERROR" in restore_err:
+            logger.error(f"Erro no restore: {restore_err}")
+            return False
+        logger.warning("Restore concluído com avisos")
+
+    size_mb = transferred / (1024 * 1024)
+    logger.info(f"Streaming concluído com sucesso: {size_mb:.2f} MB transferidos")
+    return True
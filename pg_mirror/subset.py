@@ -0,0 +1,243 @@
+"""Filtered (subset) mirroring: include/exclude patterns and row predicates"""
+import functools
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from typing import Dict, List, Tuple
+
+from pg_mirror.copyengine import copy_table
+from pg_mirror.database import list_foreign_keys, list_tables
+from pg_mirror.scheduler import MirrorJob, run_jobs
+
+
+def parse_patterns(value, label):
+    """
+    Normaliza options.include / options.exclude
+
+    Cada padrão é "schema.tabela" com curingas do shell (*, ?, [...]);
+    sem ponto, vale para todas as tabelas do schema.
+
+    Args:
+        value: Lista de padrões (ou None)
+        label: Nome do campo para mensagens de erro
+
+    Returns:
+        list: Padrões, ou None quando não configurado
+
+    Raises:
+        ValueError: Se o valor não for uma lista de strings
+    """
+    if value is None:
+        return None
+    if not isinstance(value, list) or not all(isinstance(p, str) and p for p in value):
+        raise ValueError(f"Campo 'options.{label}' deve ser uma lista de padrões \"schema.tabela\"")
+    return value
+
+
+def parse_where(value):
+    """
+    Normaliza options.where ({"schema.tabela": "predicado SQL"})
+
+    Args:
+        value: Dicionário de predicados (ou None)
+
+    Returns:
+        dict: {(schema, tabela): predicado}
+
+    Raises:
+        ValueError: Se uma chave não for "schema.tabela" ou o predicado for vazio
+    """
+    if not value:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError("Campo 'options.where' deve ser um objeto {\"schema.tabela\": \"predicado\"}")
+    predicates = {}
+    for name, predicate in value.items():
+        schema, dot, table = name.partition('.')
+        if not dot or not schema or not table:
+            raise ValueError(f"Tabela '{name}' em 'options.where' deve ser \"schema.tabela\"")
+        if not isinstance(predicate, str) or not predicate.strip():
+            raise ValueError(f"Predicado de '{name}' em 'options.where' deve ser um texto SQL")
+        predicates[(schema, table)] = predicate.strip()
+    return predicates
+
+
+def has_filters(options):
+    """True se include, exclude ou where estiverem configurados"""
+    return bool(options['include'] or options['exclude'] or options['where'])
+
+
+def matches(schema, table, patterns):
+    """
+    Indica se a tabela corresponde a algum dos padrões
+
+    Args:
+        schema: Schema da tabela
+        table: Nome da tabela
+        patterns: Padrões "schema.tabela" ou "schema"
+
+    Returns:
+        bool
+    """
+    for pattern in patterns:
+        schema_pattern, dot, table_pattern = pattern.partition('.')
+        if fnmatchcase(schema, schema_pattern) and (not dot or fnmatchcase(table, table_pattern)):
+            return True
+    return False
+
+
+@dataclass
+class SubsetPlan:
+    """
+    Tabelas cujos dados ficam fora do dump, as carregadas com WHERE e as
+    foreign keys que não são criadas no destino
+    """
+
+    excluded: List[Tuple[str, str]] = field(default_factory=list)
+    predicates: Dict[Tuple[str, str], str] = field(default_factory=dict)
+    skipped_fks: List[Tuple[str, str, str]] = field(default_factory=list)
+
+    @property
+    def exclude_data(self):
+        """Tabelas passadas ao pg_dump como --exclude-table-data"""
+        return self.excluded + sorted(self.predicates)
+
+    @property
+    def toc_filter(self):
+        """
+        Filtro das entradas do TOC sem as FKs de skipped_fks
+
+        Returns:
+            Função TocEntry -> bool, ou None se nenhuma FK for pulada
+        """
+        if not self.skipped_fks:
+            return None
+        skipped = set(self.skipped_fks)
+        return lambda entry: not (
+            entry.desc == 'FK CONSTRAINT' and (entry.schema, entry.table, entry.name) in skipped
+        )
+
+
+def plan_subset(source, database, options, logger):
+    """
+    Decide, na origem, quais tabelas entram no dump com todos os dados
+
+    O schema é copiado por inteiro, exceto as foreign keys de tabelas
+    com dados que referenciam uma tabela filtrada (vazia ou com WHERE):
+    as linhas referenciadas podem faltar e o ADD CONSTRAINT falharia,
+    então elas ficam em skipped_fks e não são criadas. Os filtros valem
+    apenas para os dados. Tabelas fora de include ou dentro de exclude
+    ficam vazias no destino; as de options.where são copiadas depois,
+    via COPY, apenas com as linhas do predicado. Sequências mantêm seus
+    valores.
+
+    Args:
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        options: Seção options da configuração
+        logger: Logger configurado
+
+    Returns:
+        SubsetPlan ou None se não houver filtros
+    """
+    if not has_filters(options):
+        return None
+
+    include, exclude = options['include'], options['exclude'] or []
+    tables = [
+        (schema, name)
+        for schema, name, relkind, _ in list_tables(
+            source['host'], source['port'], database,
+            source['user'], source['password'], logger
+        )
+        if relkind == 'r'
+    ]
+    kept = {
+        table for table in tables
+        if (include is None or matches(*table, include)) and not matches(*table, exclude)
+    }
+
+    plan = SubsetPlan()
+    for table, predicate in options['where'].items():
+        if table in kept:
+            plan.predicates[table] = predicate
+        else:
+            logger.warning(f"options.where ignorado para {table[0]}.{table[1]}: tabela fora do filtro")
+    plan.excluded = sorted(table for table in tables if table not in kept)
+
+    filtered = set(plan.excluded) | set(plan.predicates)
+    plan.skipped_fks = [
+        (*table, name)
+        for table, name, referenced in list_foreign_keys(
+            source['host'], source['port'], database,
+            source['user'], source['password'], logger
+        )
+        if referenced in filtered and table in kept
+    ]
+    if plan.skipped_fks:
+        logger.warning(
+            f"{len(plan.skipped_fks)} foreign key(s) para tabelas filtradas não serão criadas: "
+            + ', '.join('.'.join(fk) for fk in plan.skipped_fks)
+        )
+
+    logger.info(
+        f"Filtro de dados em '{database}': {len(kept) - len(plan.predicates)} tabela(s) completas, "
+        f"{len(plan.predicates)} com WHERE, {len(plan.excluded)} sem dados"
+    )
+    return plan
+
+
+def copy_filtered(source, target, database, table, predicate, logger):
+    """
+    Copia as linhas de uma tabela que atendem ao predicado
+
+    Usa o COPY binário entre os servidores (ver copyengine.copy_table).
+    O destino esvazia a tabela na mesma transação, então repetir a
+    cópia não duplica linhas.
+
+    Args:
+        source: Dicionário de conexão da origem
+        target: Dicionário de conexão do destino
+        database: Nome do banco de dados
+        table: Tupla (schema, tabela)
+        predicate: Condição SQL (sem WHERE)
+        logger: Logger configurado
+
+    Returns:
+        bool: True se a cópia foi bem-sucedida
+    """
+    logger.debug(f"Copiando {table[0]}.{table[1]} com WHERE {predicate}")
+    transferred = copy_table(source, target, database, table, logger,
+                             predicate=predicate, truncate=True)
+    return transferred is not None
+
+
+def load_filtered(source, target, database, predicates, jobs, logger):
+    """
+    Carrega no destino as tabelas de options.where, em paralelo
+
+    Args:
+        source: Dicionário de conexão da origem
+        target: Dicionário de conexão do destino
+        database: Nome do banco de dados
+        predicates: {(schema, tabela): predicado}
+        jobs: Cópias simultâneas no máximo
+        logger: Logger configurado
+
+    Returns:
+        bool: True se todas as cópias foram bem-sucedidas
+    """
+    if not predicates:
+        return True
+    logger.info(f"Copiando {len(predicates)} tabela(s) filtrada(s) por WHERE...")
+    copies = [
+        MirrorJob(
+            name=f"{schema}.{table}",
+            host=target['host'],
+            size=0,
+            func=functools.partial(copy_filtered, source, target, database,
+                                   (schema, table), predicate, logger)
+        )
+        for (schema, table), predicate in sorted(predicates.items())
+    ]
+    run_jobs(copies, max_concurrent=jobs, max_per_host=jobs, logger=logger)
+    return all(job.success for job in copies)
@@ -0,0 +1,276 @@
+"""Archive TOC parsing and size-aware restore ordering"""
+import os
+import re
+import subprocess
+import tempfile
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+from pg_mirror.database import run_query, QueryError
+
+
+# Tipos reordenados pelo tamanho; os demais mantêm a posição original
+DATA_DESCS = ('TABLE DATA',)
+BUILD_DESCS = ('INDEX', 'CONSTRAINT')
+
+# Descrições com espaço testadas antes das de uma palavra
+_MULTIWORD_DESCS = (
+    'MATERIALIZED VIEW DATA', 'SEQUENCE OWNED BY', 'FK CONSTRAINT', 'TABLE DATA',
+    'SEQUENCE SET', 'INDEX ATTACH', 'DEFAULT ACL', 'MATERIALIZED VIEW',
+)
+
+_ENTRY_RE = re.compile(r'^(?P<dump_id>\d+); (?P<catalog>\d+) (?P<oid>\d+) (?P<rest>.*)$')
+
+INDEX_SIZES_SQL = """
+    SELECT n.nspname, ci.relname, t.relname, pg_table_size(i.indrelid)
+    FROM pg_index i
+    JOIN pg_class ci ON ci.oid = i.indexrelid
+    JOIN pg_class t ON t.oid = i.indrelid
+    JOIN pg_namespace n ON n.oid = ci.relnamespace
+    WHERE n.nspname NOT IN ('pg_catalog', 'information_schema')
+    AND n.nspname NOT LIKE 'pg\\_%';
+"""
+
+TABLE_SIZES_SQL = """
+    SELECT n.nspname, c.relname, pg_table_size(c.oid)
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind IN ('r', 'p', 'm')
+    AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+    AND n.nspname NOT LIKE 'pg\\_%';
+"""
+
+
+@dataclass(frozen=True)
+class TocEntry:
+    """Uma linha do TOC do arquivo (saída de pg_restore -l)"""
+
+    dump_id: int
+    desc: str
+    schema: str
+    name: str
+    line: str
+    size: int = 0
+    table: Optional[str] = None  # Tabela do índice/constraint, quando conhecida
+
+    @property
+    def is_data(self):
+        return self.desc in DATA_DESCS
+
+    @property
+    def is_build(self):
+        return self.desc in BUILD_DESCS
+
+
+@dataclass
+class ObjectSizes:
+    """Tamanhos na origem usados para pesar as entradas do TOC"""
+
+    tables: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    index_tables: Dict[Tuple[str, str], str] = field(default_factory=dict)
+
+    def table_size(self, schema, table):
+        return self.tables.get((schema, table), 0)
+
+
+@dataclass
+class ArchiveToc:
+    """TOC de um arquivo de backup: comentários do cabeçalho e entradas em ordem"""
+
+    header: List[str] = field(default_factory=list)
+    entries: List[TocEntry] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Interpreta a saída de pg_restore -l
+
+        Args:
+            text: Saída completa do pg_restore -l
+
+        Returns:
+            ArchiveToc: Cabeçalho e entradas
+        """
+        toc = cls()
+        for line in text.splitlines():
+            match = _ENTRY_RE.match(line)
+            if not match:
+                if line.startswith(';') or not line.strip():
+                    toc.header.append(line)
+                continue
+            toc.entries.append(_parse_entry(int(match.group('dump_id')), match.group('rest'), line))
+        return toc
+
+    def with_sizes(self, sizes):
+        """
+        Retorna uma cópia com o peso de cada entrada
+
+        Dados pesam o tamanho da tabela; índices e constraints o
+        tamanho da tabela que precisam varrer.
+
+        Args:
+            sizes: ObjectSizes da origem
+
+        Returns:
+            ArchiveToc: Novo TOC com size/table preenchidos
+        """
+        entries = []
+        for entry in self.entries:
+            if entry.is_data:
+                entry = replace(entry, size=sizes.table_size(entry.schema, entry.name),
+                                table=entry.name)
+            elif entry.desc == 'INDEX':
+                table = sizes.index_tables.get((entry.schema, entry.name))
+                entry = replace(entry, table=table, size=sizes.table_size(entry.schema, table))
+            elif entry.desc == 'CONSTRAINT' and entry.table:
+                entry = replace(entry, size=sizes.table_size(entry.schema, entry.table))
+            entries.append(entry)
+        return ArchiveToc(list(self.header), entries)
+
+    def ordered(self):
+        """
+        Reordena dados e construção de índices do maior para o menor
+
+        Cada classe (dados; índices e constraints) ocupa as mesmas
+        posições da lista original, apenas em outra ordem, então as
+        demais entradas (FKs, triggers, ACLs...) e as seções ficam onde
+        estavam. Começar pelos maiores trabalhos evita que o maior
+        termine sozinho no fim do restore.
+
+        Returns:
+            ArchiveToc: Novo TOC reordenado
+        """
+        entries = list(self.entries)
+        for belongs in (lambda e: e.is_data, lambda e: e.is_build):
+            slots = [i for i, entry in enumerate(entries) if belongs(entry)]
+            by_size = sorted((entries[i] for i in slots), key=lambda e: e.size, reverse=True)
+            for slot, entry in zip(slots, by_size):
+                entries[slot] = entry
+        return ArchiveToc(list(self.header), entries)
+
+    def select(self, predicate):
+        """
+        Retorna uma cópia apenas com as entradas aceitas por predicate
+
+        Args:
+            predicate: Função TocEntry -> bool
+
+        Returns:
+            ArchiveToc: Novo TOC filtrado
+        """
+        return ArchiveToc(list(self.header), [e for e in self.entries if predicate(e)])
+
+    def render(self):
+        """Texto no formato aceito por pg_restore -L"""
+        return '\n'.join(self.header + [entry.line for entry in self.entries]) + '\n'
+
+
+def _parse_entry(dump_id, rest, line):
+    """Separa tipo, schema e nome do restante de uma linha do TOC"""
+    desc = next((d for d in _MULTIWORD_DESCS if rest.startswith(d + ' ')), rest.split(' ', 1)[0])
+    fields = rest[len(desc):].split()
+    # Último campo é o dono; em constraints (e FKs) o nome vem precedido da tabela
+    schema = fields[0] if fields else ''
+    names = fields[1:-1] if len(fields) > 2 else fields[1:]
+    table = None
+    if desc in ('CONSTRAINT', 'FK CONSTRAINT') and len(names) >= 2:
+        table = names[0]
+        names = names[1:]
+    return TocEntry(dump_id, desc, schema, ' '.join(names), line, table=table)
+
+
+def read_toc(backup_file):
+    """
+    Lê o TOC do arquivo (custom ou diretório) com pg_restore -l
+
+    Args:
+        backup_file: Caminho do arquivo ou diretório de backup
+
+    Returns:
+        ArchiveToc: TOC do arquivo
+
+    Raises:
+        subprocess.CalledProcessError: Se o pg_restore falhar
+    """
+    result = subprocess.run(
+        ['pg_restore', '-l', backup_file],
+        check=True,
+        capture_output=True,
+        text=True
+    )
+    return ArchiveToc.parse(result.stdout)
+
+
+def collect_object_sizes(source, database, logger):
+    """
+    Coleta tamanhos de tabelas e a tabela de cada índice na origem
+
+    Args:
+        source: Dicionário de conexão da origem
+        database: Nome do banco de dados
+        logger: Logger configurado
+
+    Returns:
+        ObjectSizes: Tamanhos, ou None se a consulta falhar
+    """
+    args = (source['host'], source['port'], database, source['user'], source['password'])
+    try:
+        tables = run_query(*args, TABLE_SIZES_SQL, logger)
+        indexes = run_query(*args, INDEX_SIZES_SQL, logger)
+    except QueryError as e:
+        logger.warning(f"Não foi possível ler tamanhos para ordenar o restore: {e}")
+        return None
+    return ObjectSizes(
+        tables={(schema, name): int(size or 0) for schema, name, size in tables},
+        index_tables={(schema, index): table for schema, index, table, _ in indexes},
+    )
+
+
+def write_ordered_list(backup_file, sizes, logger, keep=None):
+    """
+    Gera a lista -L do pg_restore com os maiores trabalhos primeiro
+
+    Args:
+        backup_file: Caminho do arquivo ou diretório de backup
+        sizes: ObjectSizes da origem (None: mantém a ordem do arquivo)
+        logger: Logger configurado
+        keep: Função TocEntry -> bool; entradas recusadas ficam fora da
+            lista (opcional)
+
+    Returns:
+        str: Caminho do arquivo de lista (o chamador remove), ou None se
+            não foi possível ler o TOC
+    """
+    try:
+        toc = read_toc(backup_file)
+    except subprocess.CalledProcessError as e:
+        logger.warning(f"Não foi possível ler o TOC; usando a ordem padrão: {e.stderr}")
+        return None
+
+    if keep is not None:
+        toc = toc.select(keep)
+    if sizes is None:
+        return write_list(toc)
+
+    ordered = toc.with_sizes(sizes).ordered()
+    largest = next((e for e in ordered.entries if e.is_data), None)
+    if largest:
+        logger.debug(f"Restore ordenado por tamanho; primeira tabela: {largest.schema}.{largest.name}")
+
+    return write_list(ordered)
+
+
+def write_list(toc):
+    """
+    Grava um TOC como arquivo de lista para pg_restore -L
+
+    Args:
+        toc: ArchiveToc a gravar
+
+    Returns:
+        str: Caminho do arquivo temporário (o chamador remove)
+    """
+    fd, path = tempfile.mkstemp(suffix='.list', prefix='pg_mirror_toc_')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(toc.render())
+    return path
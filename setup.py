@@ -75,6 +75,9 @@ setup(
             "pytest>=8.4.2",
             "pytest-cov>=7.0.0",
         ],
+        "driver": [
+            "psycopg[binary]>=3.1",
+        ],
     },
     entry_points={
         "console_scripts": [
@@ -5,13 +5,14 @@ import pytest
 import os
 from unittest.mock import patch, MagicMock, call
 from pathlib import Path
-from pg_mirror.backup import create_backup, cleanup_backup
+from pg_mirror.backup import create_backup, cleanup_backup, get_backup_size
+from pg_mirror.metrics import collect_metrics
 
 
 class TestCreateBackup:
     """Testes para a função create_backup"""
     
-    @patch('subprocess.run')
+    @patch('pg_mirror.backup.run_with_progress')
     @patch('tempfile.NamedTemporaryFile')
     @patch('pathlib.Path.stat')
     def test_successful_backup(self, mock_stat, mock_tempfile, mock_run, mock_logger):
@@ -44,7 +45,7 @@ class TestCreateBackup:
         mock_logger.info.assert_called()
         mock_run.assert_called_once()
     
-    @patch('subprocess.run')
+    @patch('pg_mirror.backup.run_with_progress')
     @patch('tempfile.NamedTemporaryFile')
     def test_backup_command_structure(self, mock_tempfile, mock_run, mock_logger):
         """Testa estrutura do comando pg_dump"""
@@ -82,7 +83,7 @@ class TestCreateBackup:
         assert 'mydb' in cmd
         assert '-Fc' in cmd  # Formato custom
     
-    @patch('subprocess.run')
+    @patch('pg_mirror.backup.run_with_progress')
     @patch('tempfile.NamedTemporaryFile')
     @patch('pg_mirror.backup.cleanup_backup')
     def test_backup_failure_calls_cleanup(self, mock_cleanup, mock_tempfile, mock_run, mock_logger):
@@ -103,7 +104,7 @@ class TestCreateBackup:
                 logger=mock_logger
             )
     
-    @patch('subprocess.run')
+    @patch('pg_mirror.backup.run_with_progress')
     @patch('tempfile.NamedTemporaryFile')
     def test_backup_sets_pgpassword_env(self, mock_tempfile, mock_run, mock_logger):
         """Testa que PGPASSWORD é definida no ambiente"""
@@ -134,6 +135,180 @@ class TestCreateBackup:
         assert env['PGPASSWORD'] == 'my_secret_password'
 
 
+    @patch('pg_mirror.backup.run_with_progress')
+    @patch('tempfile.mkdtemp')
+    @patch('pg_mirror.backup.get_backup_size')
+    def test_directory_format_with_dump_jobs(self, mock_size, mock_mkdtemp, mock_run, mock_logger):
+        """Testa que dump_jobs > 1 usa formato diretório paralelo"""
+        mock_mkdtemp.return_value = '/tmp/test_db_abc.dir'
+        mock_size.return_value = 1024
+        mock_run.return_value = MagicMock(returncode=0)
+        
+        result = create_backup(
+            host='localhost',
+            port=5432,
+            database='test_db',
+            user='postgres',
+            password='password',
+            logger=mock_logger,
+            dump_jobs=8
+        )
+        
+        cmd = mock_run.call_args[0][0]
+        
+        assert result == '/tmp/test_db_abc.dir'
+        assert '-Fd' in cmd
+        assert '-Fc' not in cmd
+        assert cmd[cmd.index('-j') + 1] == '8'
+        assert cmd[cmd.index('-f') + 1] == '/tmp/test_db_abc.dir'
+    
+    @patch('pg_mirror.backup.run_with_progress')
+    @patch('tempfile.NamedTemporaryFile')
+    def test_single_job_keeps_custom_format(self, mock_tempfile, mock_run, mock_logger):
+        """Testa que dump_jobs=1 mantém o formato custom sem -j"""
+        mock_file = MagicMock()
+        mock_file.name = '/tmp/backup.dump'
+        mock_tempfile.return_value = mock_file
+        mock_run.return_value = MagicMock(returncode=0)
+        
+        with patch('pathlib.Path.stat') as mock_stat:
+            mock_stat.return_value = MagicMock(st_size=1024)
+            
+            create_backup(
+                host='localhost',
+                port=5432,
+                database='test_db',
+                user='postgres',
+                password='password',
+                logger=mock_logger,
+                dump_jobs=1
+            )
+        
+        cmd = mock_run.call_args[0][0]
+        
+        assert '-Fc' in cmd
+        assert '-j' not in cmd
+
+    
+    @patch('pg_mirror.backup.run_with_progress')
+    @patch('tempfile.NamedTemporaryFile')
+    def test_selected_tables_data_only(self, mock_tempfile, mock_run, mock_logger):
+        """Testa backup apenas dos dados de tabelas selecionadas"""
+        mock_file = MagicMock()
+        mock_file.name = '/tmp/backup.dump'
+        mock_tempfile.return_value = mock_file
+        mock_run.return_value = MagicMock(returncode=0)
+        
+        with patch('pathlib.Path.stat') as mock_stat:
+            mock_stat.return_value = MagicMock(st_size=1024)
+            
+            create_backup(
+                host='localhost',
+                port=5432,
+                database='test_db',
+                user='postgres',
+                password='password',
+                logger=mock_logger,
+                tables=[('public', 'events'), ('sales', 'Orders')],
+                data_only=True
+            )
+        
+        cmd = mock_run.call_args[0][0]
+        
+        assert '--data-only' in cmd
+        assert '"public"."events"' in cmd
+        assert '"sales"."Orders"' in cmd
+        assert '-b' not in cmd  # Large objects só no backup completo
+    
+    @patch('pg_mirror.backup.run_with_progress')
+    @patch('tempfile.NamedTemporaryFile')
+    def test_exclude_table_data(self, mock_tempfile, mock_run, mock_logger):
+        """Testa backup completo sem os dados de tabelas filtradas"""
+        mock_file = MagicMock()
+        mock_file.name = '/tmp/backup.dump'
+        mock_tempfile.return_value = mock_file
+        mock_run.return_value = MagicMock(returncode=0)
+        
+        with patch('pathlib.Path.stat') as mock_stat:
+            mock_stat.return_value = MagicMock(st_size=1024)
+            
+            create_backup(
+                host='localhost',
+                port=5432,
+                database='test_db',
+                user='postgres',
+                password='password',
+                logger=mock_logger,
+                exclude_data=[('audit', 'log')]
+            )
+        
+        cmd = mock_run.call_args[0][0]
+        
+        assert '--exclude-table-data="audit"."log"' in cmd
+        assert '-b' in cmd
+    
+    @patch('pg_mirror.backup.run_with_progress')
+    @patch('tempfile.NamedTemporaryFile')
+    def test_exported_snapshot(self, mock_tempfile, mock_run, mock_logger):
+        """Testa dump lido em um snapshot exportado"""
+        mock_file = MagicMock()
+        mock_file.name = '/tmp/backup.dump'
+        mock_tempfile.return_value = mock_file
+        
+        with patch('pathlib.Path.stat') as mock_stat:
+            mock_stat.return_value = MagicMock(st_size=1024)
+            
+            create_backup(
+                host='localhost',
+                port=5432,
+                database='test_db',
+                user='postgres',
+                password='password',
+                logger=mock_logger,
+                snapshot='00000003-0000001B-1'
+            )
+        
+        assert '--snapshot=00000003-0000001B-1' in mock_run.call_args[0][0]
+    
+    @patch('pg_mirror.backup.run_with_progress')
+    @patch('tempfile.mkdtemp')
+    @patch('pg_mirror.backup.get_backup_size', return_value=1024)
+    def test_compression_setting(self, mock_size, mock_mkdtemp, mock_run, mock_logger):
+        """Testa algoritmo de compressão e workers como jobs do dump"""
+        mock_mkdtemp.return_value = '/tmp/test_db_abc.dir'
+        
+        create_backup(
+            host='localhost',
+            port=5432,
+            database='test_db',
+            user='postgres',
+            password='password',
+            logger=mock_logger,
+            compression={'algorithm': 'zstd', 'level': 3, 'workers': 4}
+        )
+        
+        cmd = mock_run.call_args[0][0]
+        
+        assert cmd[cmd.index('-Z') + 1] == 'zstd:3'
+        assert '-Fd' in cmd
+        assert cmd[cmd.index('-j') + 1] == '4'
+
+
+class TestGetBackupSize:
+    """Testes para a função get_backup_size"""
+    
+    def test_file_size(self, temp_backup_file):
+        """Testa tamanho de arquivo no formato custom"""
+        assert get_backup_size(temp_backup_file) == len(b'fake backup data')
+    
+    def test_directory_size(self, tmp_path):
+        """Testa tamanho somado de um backup em formato diretório"""
+        (tmp_path / 'toc.dat').write_bytes(b'x' * 100)
+        (tmp_path / '3001.dat.gz').write_bytes(b'y' * 250)
+        
+        assert get_backup_size(str(tmp_path)) == 350
+
+
 class TestCleanupBackup:
     """Testes para a função cleanup_backup"""
     
@@ -169,6 +344,17 @@ class TestCleanupBackup:
         
         mock_logger.warning.assert_called_once()
     
+    def test_cleanup_directory_backup(self, tmp_path, mock_logger):
+        """Testa remoção de backup em formato diretório"""
+        backup_dir = tmp_path / 'test_db.dir'
+        backup_dir.mkdir()
+        (backup_dir / 'toc.dat').write_bytes(b'toc')
+        
+        cleanup_backup(str(backup_dir), mock_logger)
+        
+        assert not backup_dir.exists()
+        mock_logger.info.assert_called_once()
+    
     def test_cleanup_with_none_filepath(self, mock_logger):
         """Testa com filepath None"""
         cleanup_backup(None, mock_logger)
@@ -182,3 +368,20 @@ class TestCleanupBackup:
         
         # Não deve lançar exceção
         assert True
+
+
+class TestBackupMetrics:
+    """Testes para as métricas do backup"""
+    
+    @patch('pg_mirror.backup.run_with_progress')
+    @patch('pg_mirror.backup.get_backup_size', return_value=2048)
+    def test_records_phase_and_bytes(self, mock_size, mock_run, mock_logger, tmp_path):
+        """Testa fase de backup e bytes gerados na coleta ativa"""
+        with collect_metrics(str(tmp_path / 'm.json'), mock_logger) as run:
+            create_backup(
+                host='localhost', port=5432, database='app', user='postgres',
+                password='pw', logger=mock_logger, output_dir=str(tmp_path)
+            )
+        
+        assert [p['name'] for p in run.phases] == ['backup']
+        assert run.databases['app']['archive_bytes'] == 2048
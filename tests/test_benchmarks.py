@@ -0,0 +1,103 @@
+"""
+Testes para a comparação de resultados do benchmarks
+"""
+from unittest.mock import patch
+from pg_mirror import metrics
+from benchmarks.run import compare_results, phase_seconds, run_shape
+
+
+def _report(**rates):
+    """Relatório mínimo com a vazão de cada formato"""
+    return {
+        'results': {
+            shape: {
+                'success': True,
+                'throughput_mb_s': {'backup': rate, 'restore': rate, 'total': rate},
+            }
+            for shape, rate in rates.items()
+        }
+    }
+
+
+class TestCompareResults:
+    """Testes para compare_results"""
+
+    def test_within_tolerance(self):
+        """Testa variação dentro da tolerância"""
+        regressions, lines = compare_results(_report(few_huge=100.0), _report(few_huge=95.0), 0.10)
+
+        assert regressions == []
+        assert len(lines) == 3
+
+    def test_throughput_drop_is_regression(self):
+        """Testa queda de vazão acima da tolerância"""
+        regressions, _ = compare_results(_report(few_huge=100.0), _report(few_huge=80.0), 0.10)
+
+        assert len(regressions) == 3
+        assert regressions[0].startswith('few_huge.backup')
+
+    def test_failed_run_is_regression(self):
+        """Testa que um espelhamento com falha conta como regressão"""
+        current = _report(blobs=100.0)
+        current['results']['blobs']['success'] = False
+
+        regressions, _ = compare_results(_report(blobs=100.0), current, 0.10)
+
+        assert regressions == ['blobs: espelhamento falhou']
+
+    def test_missing_shape_is_reported(self):
+        """Testa formato ausente na execução atual"""
+        regressions, lines = compare_results(_report(blobs=1.0), _report(), 0.10)
+
+        assert regressions == []
+        assert lines == ['blobs: ausente na execução atual']
+
+
+class TestRunShape:
+    """Testes para run_shape e phase_seconds"""
+
+    def test_phase_seconds(self):
+        """Testa soma das fases repetidas do banco, sem checks nem outros bancos"""
+        report = {
+            'wall_seconds': 9.0,
+            'phases': [
+                {'name': 'checks', 'database': None, 'wall_seconds': 1.0},
+                {'name': 'restore', 'database': 'db', 'wall_seconds': 2.0},
+                {'name': 'restore', 'database': 'db', 'wall_seconds': 3.0},
+                {'name': 'restore', 'database': 'other', 'wall_seconds': 7.0},
+                {'name': 'cleanup', 'database': None, 'wall_seconds': 0.5},
+            ],
+        }
+
+        assert phase_seconds(report, 'db') == {'restore': 5.0, 'cleanup': 0.5, 'total': 9.0}
+
+    @patch('benchmarks.run.build_config', return_value={})
+    @patch('benchmarks.run.populate', return_value=100 * 1024 * 1024)
+    @patch('benchmarks.run.mirror_database')
+    def test_times_mirror_database(self, mock_mirror, mock_populate, mock_config, mock_logger):
+        """Testa que o fluxo medido é o mirror_database, com tempos do relatório de métricas"""
+        def mirror(cfg, database, logger):
+            with metrics.phase('backup', database):
+                metrics.record(database, archive_bytes=1024)
+            with metrics.phase('stream', database):
+                pass
+            return True
+        mock_mirror.side_effect = mirror
+
+        result = run_shape(None, None, 'few_huge', 1.0, {'stream': True}, mock_logger)
+
+        assert result['success'] is True
+        assert result['archive_bytes'] == 1024
+        assert set(result['seconds']) == {'backup', 'stream', 'total'}
+        assert mock_mirror.call_args[0][1] == 'bench_few_huge'
+        assert metrics.get_metrics() is None
+
+    @patch('benchmarks.run.build_config', return_value={})
+    @patch('benchmarks.run.populate', return_value=1024)
+    @patch('benchmarks.run.mirror_database', side_effect=SystemExit(1))
+    def test_exit_counts_as_failure(self, mock_mirror, mock_populate, mock_config, mock_logger):
+        """Testa que um sys.exit no espelhamento vira falha do formato"""
+        result = run_shape(None, None, 'blobs', 1.0, {}, mock_logger)
+
+        assert result['success'] is False
+        assert result['throughput_mb_s']['backup'] is None
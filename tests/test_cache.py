@@ -0,0 +1,190 @@
+"""
+Testes para o módulo pg_mirror.cache
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+import pytest
+from unittest.mock import patch
+from pg_mirror.cache import DumpCache, cache_key, parse_dump_cache
+
+
+SOURCE = {'host': 'prod.db', 'port': 5432}
+
+
+def _creator(calls, size=100):
+    """Simula create_backup gravando o dump no diretório recebido"""
+    def create(output_dir):
+        calls.append(output_dir)
+        path = os.path.join(output_dir, f'app_{len(calls)}.dump')
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        return path
+    return create
+
+
+class TestCacheKey:
+    """Testes para cache_key"""
+
+    def test_filters_change_key(self):
+        """Testa que origem, banco e filtros compõem a chave"""
+        base = cache_key(SOURCE, 'app', {'compression': 'gzip:6'})
+
+        assert base == cache_key(SOURCE, 'app', {'compression': 'gzip:6'})
+        assert base != cache_key(SOURCE, 'other', {'compression': 'gzip:6'})
+        assert base != cache_key(SOURCE, 'app', {'compression': 'zstd:3'})
+        assert base != cache_key({'host': 'replica.db', 'port': 5432}, 'app', {'compression': 'gzip:6'})
+
+
+class TestParseDumpCache:
+    """Testes para parse_dump_cache"""
+
+    def test_values(self):
+        """Testa formatos aceitos e padrões"""
+        assert parse_dump_cache(None) is None
+        assert parse_dump_cache('/var/cache/pg-mirror') == {
+            'dir': '/var/cache/pg-mirror', 'ttl_minutes': 60, 'max_size_mb': None
+        }
+        assert parse_dump_cache({'dir': '/c', 'max_size_mb': 2048})['max_size_mb'] == 2048
+
+    def test_invalid(self):
+        """Testa valores inválidos"""
+        with pytest.raises(ValueError):
+            parse_dump_cache({'ttl_minutes': 10})
+        with pytest.raises(ValueError):
+            parse_dump_cache({'dir': '/c', 'ttl_minutes': 0})
+
+
+class TestDumpCache:
+    """Testes para DumpCache"""
+
+    def test_reuses_fresh_entry(self, tmp_path, mock_logger):
+        """Testa que a segunda execução reutiliza o dump publicado"""
+        cache = DumpCache(str(tmp_path), ttl_minutes=60, max_size_mb=None, logger=mock_logger)
+        calls = []
+
+        with cache.acquire('k', _creator(calls)) as first:
+            assert os.path.exists(first)
+        with cache.acquire('k', _creator(calls)) as second:
+            assert second == first
+
+        assert calls == [str(tmp_path)]
+        assert len(cache.entries()) == 1
+
+    def test_expired_entry_is_replaced(self, tmp_path, mock_logger):
+        """Testa que uma entrada fora do TTL gera novo dump e é removida"""
+        cache = DumpCache(str(tmp_path), ttl_minutes=60, max_size_mb=None, logger=mock_logger)
+        calls = []
+        with cache.acquire('k', _creator(calls)) as first:
+            pass
+        entry = cache.entries()[0]
+        entry.created_at -= 2 * 3600
+        _rewrite_created_at(entry)
+
+        with cache.acquire('k', _creator(calls)) as second:
+            assert second != first
+
+        assert len(calls) == 2
+        assert not os.path.exists(first)
+
+    def test_lru_eviction_over_budget(self, tmp_path, mock_logger):
+        """Testa remoção da entrada menos usada acima do limite"""
+        cache = DumpCache(str(tmp_path), ttl_minutes=60, max_size_mb=1, logger=mock_logger)
+        calls = []
+        size = 400 * 1024
+        with cache.acquire('a', _creator(calls, size)) as path_a:
+            pass
+        with cache.acquire('b', _creator(calls, size)) as path_b:
+            pass
+        # 'a' foi reutilizado depois de 'b' ser criado
+        last_used = {'a': time.time() - 10, 'b': time.time() - 100}
+        for entry in cache.entries():
+            os.utime(entry.meta_path, (last_used[entry.key], last_used[entry.key]))
+
+        with cache.acquire('c', _creator(calls, size)):
+            pass
+
+        assert sorted(entry.key for entry in cache.entries()) == ['a', 'c']
+        assert os.path.exists(path_a)
+        assert not os.path.exists(path_b)
+
+    def test_entry_in_use_is_kept(self, tmp_path, mock_logger):
+        """Testa que uma entrada em uso não é removida"""
+        cache = DumpCache(str(tmp_path), ttl_minutes=60, max_size_mb=None, logger=mock_logger)
+        calls = []
+
+        with cache.acquire('k', _creator(calls)) as path:
+            entry = cache.entries()[0]
+            entry.created_at -= 2 * 3600
+            _rewrite_created_at(entry)
+            assert cache.evict() == 0
+            assert os.path.exists(path)
+
+        assert cache.evict() == 1
+        assert not os.path.exists(path)
+
+
+    def test_new_entry_locked_before_visible(self, tmp_path, mock_logger):
+        """Testa que a limpeza concorrente logo após a publicação não remove o dump novo"""
+        cache = DumpCache(str(tmp_path), ttl_minutes=60, max_size_mb=None, logger=mock_logger)
+        other = DumpCache(str(tmp_path), ttl_minutes=60, max_size_mb=1, logger=mock_logger)
+        real_replace = os.replace
+
+        def replace_then_evict(src, dst):
+            real_replace(src, dst)
+            other.evict()  # Outro processo acima do limite, antes do lock em acquire
+        with patch('pg_mirror.cache.os.replace', side_effect=replace_then_evict):
+            with cache.acquire('k', _creator([], 2 * 1024 * 1024)) as path:
+                assert os.path.exists(path)
+                assert len(cache.entries()) == 1
+
+
+class TestWithoutFlock:
+    """Comportamento sem fcntl (Windows)"""
+
+    def test_package_imports_without_fcntl(self):
+        """Testa que config (e a CLI) não dependem de fcntl para importar"""
+        code = "import sys; sys.modules['fcntl'] = None; import pg_mirror.config"
+        subprocess.run([sys.executable, '-c', code], check=True)
+
+    @patch('pg_mirror.cache.fcntl', None)
+    def test_open_entry_is_kept(self, tmp_path, mock_logger):
+        """Testa que a entrada fica quando o Windows recusa remover os metadados"""
+        cache = DumpCache(str(tmp_path), ttl_minutes=60, max_size_mb=None, logger=mock_logger)
+
+        with cache.acquire('k', _creator([])) as path:
+            entry = cache.entries()[0]
+            entry.created_at -= 2 * 3600
+            _rewrite_created_at(entry)
+            with patch('pg_mirror.cache.os.unlink', side_effect=PermissionError):
+                assert cache.evict() == 0
+            assert os.path.exists(path)
+
+        assert cache.evict() == 1
+        assert not os.path.exists(path)
+
+
+    @patch('pg_mirror.cache.fcntl', None)
+    def test_entry_removed_before_lock(self, tmp_path, mock_logger):
+        """Testa erro claro quando a entrada some entre o rename e a abertura"""
+        cache = DumpCache(str(tmp_path), ttl_minutes=60, max_size_mb=None, logger=mock_logger)
+        real_replace = os.replace
+
+        def replace_then_remove(src, dst):
+            real_replace(src, dst)
+            os.unlink(dst)
+        with patch('pg_mirror.cache.os.replace', side_effect=replace_then_remove):
+            with pytest.raises(FileNotFoundError, match='removido do cache'):
+                with cache.acquire('k', _creator([])):
+                    pass
+
+
+def _rewrite_created_at(entry):
+    """Envelhece uma entrada reescrevendo seus metadados"""
+    with open(entry.meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    meta['created_at'] = entry.created_at
+    with open(entry.meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
@@ -0,0 +1,109 @@
+"""
+Testes para o módulo pg_mirror.checkpoint
+"""
+from pg_mirror.checkpoint import Journal, journal_path, open_journal
+
+
+def options(tmp_path, **values):
+    """Seção options com checkpoint ativo"""
+    return {'checkpoint': True, 'resume': False, 'state_dir': str(tmp_path), **values}
+
+
+SOURCE = {'host': 'src', 'port': 5432}
+
+
+class TestJournal:
+    """Testes para Journal"""
+
+    def test_roundtrip(self, mock_logger, tmp_path):
+        """Testa gravação e leitura de seções, entradas e conclusão por destino"""
+        journal = Journal(str(tmp_path / 'app.jsonl'), mock_logger)
+        journal.target('a:5432')
+        journal.start('/spool/app.dump')
+        journal.target('a:5432').mark_prepared()
+        journal.target('a:5432').mark_section('pre-data')
+        journal.target('a:5432').mark_item(3012)
+        journal.target('b:5432').mark_done()
+
+        loaded = Journal.load(journal.path, mock_logger)
+
+        assert loaded.backup_file == '/spool/app.dump'
+        assert loaded.target('a:5432').sections == {'pre-data'}
+        assert loaded.target('a:5432').items == {3012}
+        assert loaded.target('a:5432').started
+        assert loaded.target('a:5432').prepared
+        assert not loaded.target('b:5432').prepared
+        assert loaded.target('b:5432').done
+        assert not loaded.complete
+
+    def test_truncated_line_ignored(self, mock_logger, tmp_path):
+        """Testa diário cortado no meio de uma linha"""
+        journal = Journal(str(tmp_path / 'app.jsonl'), mock_logger)
+        journal.start('/spool/app.dump')
+        journal.target('a:5432').mark_item(1)
+        with open(journal.path, 'a') as f:
+            f.write('{"target": "a:5432", "it')
+
+        assert Journal.load(journal.path, mock_logger).target('a:5432').items == {1}
+
+    def test_finished_item_line(self, mock_logger, tmp_path):
+        """Testa registro a partir da saída do pg_restore paralelo"""
+        journal = Journal(str(tmp_path / 'app.jsonl'), mock_logger)
+        journal.start('/spool/app.dump')
+        progress = journal.target('a:5432')
+
+        progress.on_restore_line('pg_restore: finished item 3012 TABLE DATA orders')
+        progress.on_restore_line('pg_restore: processing data for table "public.orders"')
+
+        assert progress.items == {3012}
+
+    def test_journal_path(self, tmp_path):
+        """Testa nome do diário por origem e banco"""
+        path = journal_path(str(tmp_path), SOURCE, 'my/app')
+
+        assert path == str(tmp_path / 'checkpoints' / 'src_5432_my_app.jsonl')
+
+
+class TestOpenJournal:
+    """Testes para open_journal"""
+
+    def _previous(self, tmp_path, mock_logger, backup):
+        journal = Journal(journal_path(str(tmp_path), SOURCE, 'app'), mock_logger)
+        journal.start(str(backup))
+        journal.target('a:5432').mark_item(1)
+
+    def test_disabled(self, mock_logger, tmp_path):
+        """Testa checkpoint desativado"""
+        assert open_journal(options(tmp_path, checkpoint=False), SOURCE, 'app', mock_logger) is None
+
+    def test_resume(self, mock_logger, tmp_path):
+        """Testa retomada com o backup ainda em disco"""
+        backup = tmp_path / 'app.dump'
+        backup.write_text('dump')
+        self._previous(tmp_path, mock_logger, backup)
+
+        journal = open_journal(options(tmp_path, resume=True), SOURCE, 'app', mock_logger)
+
+        assert journal.backup_file == str(backup)
+        assert journal.target('a:5432').items == {1}
+
+    def test_resume_without_backup(self, mock_logger, tmp_path):
+        """Testa que sem o backup a retomada vira espelhamento completo"""
+        self._previous(tmp_path, mock_logger, tmp_path / 'removido.dump')
+
+        journal = open_journal(options(tmp_path, resume=True), SOURCE, 'app', mock_logger)
+
+        assert journal.backup_file is None
+        mock_logger.warning.assert_called_once()
+
+    def test_without_resume_discards_previous(self, mock_logger, tmp_path):
+        """Testa que sem --resume o checkpoint e o backup antigos são descartados"""
+        backup = tmp_path / 'app.dump'
+        backup.write_text('dump')
+        self._previous(tmp_path, mock_logger, backup)
+
+        journal = open_journal(options(tmp_path), SOURCE, 'app', mock_logger)
+
+        assert journal.backup_file is None
+        assert not journal.targets
+        assert not backup.exists()
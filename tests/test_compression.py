@@ -0,0 +1,137 @@
+"""
+Testes para o módulo pg_mirror.compression
+"""
+import os
+import subprocess
+import pytest
+from unittest.mock import patch
+from pg_mirror.compression import (
+    parse_compression,
+    describe_compression,
+    compression_args,
+    pg_dump_major,
+    calibrate_compression
+)
+
+
+SOURCE = {'host': 'prod.db', 'port': 5432, 'user': 'postgres', 'password': 'pw'}
+
+
+class TestParseCompression:
+    """Testes para parse_compression"""
+
+    def test_string_with_level(self):
+        """Testa formato algoritmo:nível"""
+        assert parse_compression('zstd:9') == {'algorithm': 'zstd', 'level': 9, 'workers': 1}
+
+    def test_default_level(self):
+        """Testa nível padrão de cada algoritmo"""
+        assert parse_compression('lz4')['level'] == 1
+        assert parse_compression('gzip')['level'] == 6
+
+    def test_dict_with_workers(self):
+        """Testa formato objeto com workers"""
+        setting = parse_compression({'algorithm': 'zstd', 'level': 3, 'workers': 4})
+        assert setting['workers'] == 4
+
+    def test_level_bounds(self):
+        """Testa os extremos aceitos de cada algoritmo"""
+        assert parse_compression('gzip:9')['level'] == 9
+        assert parse_compression('lz4:12')['level'] == 12
+        assert parse_compression('zstd:22')['level'] == 22
+        assert parse_compression('gzip:0')['level'] == 0
+
+    def test_auto(self):
+        """Testa modo automático nos dois formatos"""
+        assert parse_compression('auto') == 'auto'
+        assert parse_compression({'algorithm': 'auto'}) == 'auto'
+
+    @pytest.mark.parametrize('value', ['bzip2', 'gzip:x', {'algorithm': 'zstd', 'workers': 0}, 6,
+                                       'gzip:15', 'lz4:20', 'zstd:30', 'zstd:0', 'none:3'])
+    def test_invalid(self, value):
+        """Testa valores inválidos"""
+        with pytest.raises(ValueError):
+            parse_compression(value)
+
+
+class TestCompressionArgs:
+    """Testes para compression_args"""
+
+    def test_default_is_gzip_6(self):
+        """Testa que sem configuração o comportamento anterior é mantido"""
+        assert compression_args(None) == ['-Z', '6']
+
+    def test_modern_algorithms(self):
+        """Testa sintaxe método:nível para lz4/zstd"""
+        assert compression_args(parse_compression('zstd:3')) == ['-Z', 'zstd:3']
+        assert compression_args(parse_compression('none')) == ['-Z', '0']
+
+    def test_describe(self):
+        """Testa rótulos legíveis"""
+        assert describe_compression(parse_compression('none')) == 'none'
+        assert describe_compression(parse_compression('lz4')) == 'lz4:1'
+
+
+class TestPgDumpMajor:
+    """Testes para pg_dump_major"""
+
+    @patch('pg_mirror.compression.get_command_version')
+    def test_parses_version(self, mock_version):
+        """Testa extração da versão principal"""
+        mock_version.return_value = 'pg_dump (PostgreSQL) 16.2 (Ubuntu 16.2-1)'
+        assert pg_dump_major() == 16
+
+    @patch('pg_mirror.compression.get_command_version', return_value=None)
+    def test_unknown(self, mock_version):
+        """Testa pg_dump ausente"""
+        assert pg_dump_major() == 0
+
+
+class TestCalibrateCompression:
+    """Testes para calibrate_compression"""
+
+    SAMPLE = os.urandom(256 * 1024) + b'abc' * (512 * 1024)
+
+    @patch('pg_mirror.compression.pg_dump_major', return_value=15)
+    @patch('pg_mirror.compression._measure_disk', return_value=10000.0)
+    @patch('pg_mirror.compression._read_sample')
+    def test_fast_source_prefers_light_compression(self, mock_sample, mock_disk, mock_major,
+                                                   mock_logger):
+        """Testa que com origem muito rápida a compressão pesada não compensa"""
+        mock_sample.return_value = (self.SAMPLE, 1e9)
+
+        setting = calibrate_compression(SOURCE, 'app', mock_logger)
+
+        assert setting['algorithm'] == 'none'
+
+    @patch('pg_mirror.compression.pg_dump_major', return_value=15)
+    @patch('pg_mirror.compression._measure_disk', return_value=10000.0)
+    @patch('pg_mirror.compression._read_sample')
+    def test_slow_source_prefers_smaller_output(self, mock_sample, mock_disk, mock_major,
+                                                mock_logger):
+        """Testa que com origem lenta vence o menor arquivo"""
+        mock_sample.return_value = (self.SAMPLE, 0.01)
+
+        setting = calibrate_compression(SOURCE, 'app', mock_logger)
+
+        assert setting == {'algorithm': 'gzip', 'level': 6, 'workers': 1}
+
+    @patch('pg_mirror.compression._read_sample', return_value=(b'', 0.0))
+    def test_empty_database_uses_default(self, mock_sample, mock_logger):
+        """Testa padrão gzip:6 quando não há dados para amostrar"""
+        assert calibrate_compression(SOURCE, 'app', mock_logger)['algorithm'] == 'gzip'
+
+    @patch('pg_mirror.compression.shutil.which', return_value='/usr/bin/zstd')
+    @patch('subprocess.run', side_effect=subprocess.CalledProcessError(1, 'zstd'))
+    @patch('pg_mirror.compression.pg_dump_major', return_value=16)
+    @patch('pg_mirror.compression._measure_disk', return_value=10000.0)
+    @patch('pg_mirror.compression._read_sample')
+    def test_failing_tool_skips_candidate(self, mock_sample, mock_disk, mock_major, mock_run,
+                                          mock_which, mock_logger):
+        """Testa que a falha do lz4/zstd local descarta o candidato em vez de abortar"""
+        mock_sample.return_value = (self.SAMPLE, 0.01)
+
+        setting = calibrate_compression(SOURCE, 'app', mock_logger)
+
+        assert setting['algorithm'] == 'gzip'
+        assert mock_run.call_count == 2
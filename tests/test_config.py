@@ -35,6 +35,7 @@ class TestLoadConfig:
             assert config['target']['port'] == 5432
             assert config['options']['drop_existing'] is False
             assert config['options']['parallel_jobs'] == 4
+            assert config['options']['dump_jobs'] == 1
         finally:
             os.unlink(temp_path)
     
@@ -178,3 +179,237 @@ class TestLoadConfig:
             assert result['options']['parallel_jobs'] == 8
         finally:
             os.unlink(temp_path)
+
+
+def _load_dict(config, logger):
+    """Grava a configuração em arquivo temporário e carrega com load_config"""
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+        json.dump(config, f)
+        temp_path = f.name
+    
+    try:
+        return load_config(temp_path, logger)
+    finally:
+        os.unlink(temp_path)
+
+
+class TestMultiDatabaseConfig:
+    """Testes para seleção de vários bancos na origem"""
+    
+    def test_database_list_accepted(self, minimal_config, mock_logger):
+        """Testa source.database como lista"""
+        minimal_config['source']['database'] = ['tenant_a', 'tenant_b']
+        
+        config = _load_dict(minimal_config, mock_logger)
+        
+        assert config['source']['database'] == ['tenant_a', 'tenant_b']
+    
+    def test_pattern_without_database(self, minimal_config, mock_logger):
+        """Testa source.database_pattern no lugar de source.database"""
+        del minimal_config['source']['database']
+        minimal_config['source']['database_pattern'] = 'tenant_%'
+        
+        config = _load_dict(minimal_config, mock_logger)
+        
+        assert config['source']['database_pattern'] == 'tenant_%'
+    
+    def test_missing_database_and_pattern(self, minimal_config, mock_logger):
+        """Testa erro sem source.database nem source.database_pattern"""
+        del minimal_config['source']['database']
+        
+        with pytest.raises(SystemExit):
+            _load_dict(minimal_config, mock_logger)
+        
+        assert 'source.database' in str(mock_logger.error.call_args)
+    
+    def test_empty_database_list(self, minimal_config, mock_logger):
+        """Testa erro com lista vazia de bancos"""
+        minimal_config['source']['database'] = []
+        
+        with pytest.raises(SystemExit):
+            _load_dict(minimal_config, mock_logger)
+    
+    def test_concurrency_defaults(self, minimal_config, mock_logger):
+        """Testa padrões de concorrência entre bancos"""
+        minimal_config['options'] = {'concurrent_databases': 6}
+        
+        config = _load_dict(minimal_config, mock_logger)
+        
+        assert config['options']['concurrent_databases'] == 6
+        assert 'max_per_host' not in config['options']
+    
+    def test_dump_jobs_must_be_positive_int(self, minimal_config, mock_logger):
+        """Testa que dump_jobs não inteiro ou menor que 1 é rejeitado"""
+        for value in ('4', 0, 2.5):
+            minimal_config['options'] = {'dump_jobs': value}
+            
+            with pytest.raises(SystemExit):
+                _load_dict(minimal_config, mock_logger)
+            
+            assert 'Configuração inválida' in mock_logger.error.call_args[0][0]
+            assert 'dump_jobs' in mock_logger.error.call_args[0][0]
+    
+    def test_concurrent_databases_must_be_positive_int(self, minimal_config, mock_logger):
+        """Testa que concurrent_databases não inteiro ou menor que 1 é rejeitado"""
+        for value in ('2', 0, None):
+            minimal_config['options'] = {'concurrent_databases': value}
+            
+            with pytest.raises(SystemExit):
+                _load_dict(minimal_config, mock_logger)
+            
+            assert 'Configuração inválida' in mock_logger.error.call_args[0][0]
+            assert 'concurrent_databases' in mock_logger.error.call_args[0][0]
+
+
+class TestMultiTargetConfig:
+    """Testes para lista de destinos"""
+    
+    def test_target_list_defaults(self, minimal_config, mock_logger):
+        """Testa lista de destinos com porta padrão em cada um"""
+        minimal_config['target'] = [
+            {'host': 'qa1', 'user': 'postgres', 'password': 'a'},
+            {'host': 'qa2', 'port': 6432, 'user': 'postgres', 'password': 'b'},
+        ]
+        
+        config = _load_dict(minimal_config, mock_logger)
+        
+        assert [t['port'] for t in config['target']] == [5432, 6432]
+    
+    def test_target_list_missing_field(self, minimal_config, mock_logger):
+        """Testa que o campo ausente indica o índice do destino"""
+        minimal_config['target'] = [
+            {'host': 'qa1', 'user': 'postgres', 'password': 'a'},
+            {'host': 'qa2', 'user': 'postgres'},
+        ]
+        
+        with pytest.raises(SystemExit):
+            _load_dict(minimal_config, mock_logger)
+        
+        assert 'target[1].password' in str(mock_logger.error.call_args)
+    
+    def test_target_list_rejects_stream(self, minimal_config, mock_logger):
+        """Testa que vários destinos exigem o modo padrão"""
+        minimal_config['target'] = [minimal_config['target'], dict(minimal_config['target'])]
+        minimal_config['options'] = {'stream': True}
+        
+        with pytest.raises(SystemExit):
+            _load_dict(minimal_config, mock_logger)
+
+
+class TestCompressionConfig:
+    """Testes para options.compression"""
+    
+    def test_default_gzip_6(self, minimal_config, mock_logger):
+        """Testa que o padrão mantém gzip nível 6"""
+        config = _load_dict(minimal_config, mock_logger)
+        
+        assert config['options']['compression'] == {'algorithm': 'gzip', 'level': 6, 'workers': 1}
+    
+    def test_invalid_algorithm(self, minimal_config, mock_logger):
+        """Testa algoritmo desconhecido"""
+        minimal_config['options'] = {'compression': 'brotli'}
+        
+        with pytest.raises(SystemExit):
+            _load_dict(minimal_config, mock_logger)
+
+
+class TestSubsetConfig:
+    """Testes para options.include, options.exclude e options.where"""
+    
+    def test_defaults_without_filters(self, minimal_config, mock_logger):
+        """Testa que sem filtros todos os dados são copiados"""
+        config = _load_dict(minimal_config, mock_logger)
+        
+        assert config['options']['include'] is None
+        assert config['options']['exclude'] is None
+        assert config['options']['where'] == {}
+    
+    def test_where_keyed_by_table(self, minimal_config, mock_logger):
+        """Testa normalização dos predicados por (schema, tabela)"""
+        minimal_config['options'] = {
+            'include': ['public.*'],
+            'where': {'public.orders': ' id > 100 '}
+        }
+        
+        config = _load_dict(minimal_config, mock_logger)
+        
+        assert config['options']['where'] == {('public', 'orders'): 'id > 100'}
+    
+    def test_where_requires_schema(self, minimal_config, mock_logger):
+        """Testa chave de options.where sem schema"""
+        minimal_config['options'] = {'where': {'orders': 'id > 100'}}
+        
+        with pytest.raises(SystemExit):
+            _load_dict(minimal_config, mock_logger)
+    
+    def test_filters_reject_stream(self, minimal_config, mock_logger):
+        """Testa que filtros exigem o modo padrão"""
+        minimal_config['options'] = {'exclude': ['audit'], 'stream': True}
+        
+        with pytest.raises(SystemExit):
+            _load_dict(minimal_config, mock_logger)
+    
+    def test_filters_with_copy_engine(self, minimal_config, mock_logger):
+        """Testa que o motor de COPY aceita filtros"""
+        minimal_config['options'] = {'exclude': ['audit'], 'copy_engine': True}
+        
+        config = _load_dict(minimal_config, mock_logger)
+        
+        assert config['options']['copy_engine'] is True
+    
+    def test_split_table_mb(self, minimal_config, mock_logger):
+        """Testa o padrão de 1 GB e a desativação com null"""
+        assert _load_dict(minimal_config, mock_logger)['options']['split_table_mb'] == 1024
+        
+        minimal_config['options'] = {'split_table_mb': None}
+        assert _load_dict(minimal_config, mock_logger)['options']['split_table_mb'] is None
+        
+        minimal_config['options'] = {'split_table_mb': 0}
+        with pytest.raises(SystemExit):
+            _load_dict(minimal_config, mock_logger)
+    
+    def test_copy_engine_single_target(self, minimal_config, mock_logger):
+        """Testa que o motor de COPY exige um único destino"""
+        minimal_config['target'] = [minimal_config['target'], dict(minimal_config['target'])]
+        minimal_config['options'] = {'copy_engine': True}
+        
+        with pytest.raises(SystemExit):
+            _load_dict(minimal_config, mock_logger)
+
+
+class TestParallelJobsConfig:
+    """Testes para parallel_jobs"""
+    
+    def test_auto_accepted(self, minimal_config, mock_logger):
+        """Testa parallel_jobs = "auto" nas opções e no destino"""
+        minimal_config['options'] = {'parallel_jobs': 'auto'}
+        minimal_config['target']['parallel_jobs'] = 'auto'
+        
+        config = _load_dict(minimal_config, mock_logger)
+        
+        assert config['options']['parallel_jobs'] == 'auto'
+    
+    def test_invalid_rejected(self, minimal_config, mock_logger):
+        """Testa valor inválido em parallel_jobs"""
+        minimal_config['options'] = {'parallel_jobs': 0}
+        
+        with pytest.raises(SystemExit):
+            _load_dict(minimal_config, mock_logger)
+
+
+class TestDumpCacheConfig:
+    """Testes para options.dump_cache"""
+    
+    def test_disabled_by_default(self, minimal_config, mock_logger):
+        """Testa que o cache é opcional"""
+        config = _load_dict(minimal_config, mock_logger)
+        
+        assert config['options']['dump_cache'] is None
+    
+    def test_directory_shorthand(self, minimal_config, mock_logger):
+        """Testa diretório informado como string"""
+        minimal_config['options'] = {'dump_cache': '/var/cache/pg-mirror'}
+        
+        config = _load_dict(minimal_config, mock_logger)
+        
+        assert config['options']['dump_cache']['ttl_minutes'] == 60
@@ -0,0 +1,397 @@
+"""
+Testes para o módulo pg_mirror.copyengine
+"""
+import io
+import subprocess
+import pytest
+from unittest.mock import patch, MagicMock
+from pg_mirror.copyengine import (
+    copy_table,
+    copy_mirror,
+    range_count,
+    split_ranges,
+    table_columns
+)
+from pg_mirror.database import QueryError
+from pg_mirror.subset import SubsetPlan
+from pg_mirror.toc import ArchiveToc
+
+
+SOURCE = {'host': 'source.example.com', 'port': 5432, 'user': 'postgres', 'password': 'src_pass'}
+TARGET = {'host': 'target.example.com', 'port': 5433, 'user': 'admin', 'password': 'tgt_pass'}
+
+MB = 1024 * 1024
+
+TABLES = [
+    ('public', 'events', 'r', 5000),
+    ('public', 'users', 'r', 10),
+    ('public', 'users_id_seq', 'S', 0),
+]
+
+
+def make_reader(data=b'', stderr=b'', returncode=0):
+    """Processo psql da origem (COPY TO STDOUT)"""
+    proc = MagicMock()
+    proc.stdout = io.BytesIO(data)
+    proc.stderr = io.BytesIO(stderr)
+    proc.wait.return_value = returncode
+    return proc
+
+
+def make_writer(stderr=b'', returncode=0):
+    """Processo psql do destino (COPY FROM STDIN), que guarda os bytes recebidos"""
+    proc = MagicMock()
+    proc.received = bytearray()
+    proc.stdin.write.side_effect = lambda data: proc.received.extend(data)
+    proc.stderr = io.BytesIO(stderr)
+    proc.wait.return_value = returncode
+    return proc
+
+
+class TestCopyTable:
+    """Testes para copy_table"""
+
+    @patch('subprocess.Popen')
+    def test_binary_copy_between_servers(self, mock_popen, mock_logger):
+        """Testa COPY binário da origem ligado ao COPY FROM STDIN do destino"""
+        payload = b'PGCOPY\n\xff\r\n\x00' + bytes(range(256)) * 100
+        reader, writer = make_reader(payload), make_writer()
+        mock_popen.side_effect = [reader, writer]
+
+        transferred = copy_table(SOURCE, TARGET, 'db', ('public', 'events'), mock_logger)
+
+        assert transferred == len(payload)
+        assert bytes(writer.received) == payload
+        source_cmd, target_cmd = (c[0][0] for c in mock_popen.call_args_list)
+        assert 'COPY "public"."events" TO STDOUT (FORMAT binary)' in source_cmd
+        assert 'COPY "public"."events" FROM STDIN (FORMAT binary)' in target_cmd
+        assert source_cmd[source_cmd.index('-h') + 1] == 'source.example.com'
+        assert target_cmd[target_cmd.index('-h') + 1] == 'target.example.com'
+        assert '-q' in source_cmd  # Sem tags de comando no meio dos dados
+        writer.stdin.close.assert_called_once()
+
+    @patch('subprocess.Popen')
+    def test_sets_passwords(self, mock_popen, mock_logger):
+        """Testa que leitor e escritor recebem a senha do seu servidor"""
+        mock_popen.side_effect = [make_reader(), make_writer()]
+
+        copy_table(SOURCE, TARGET, 'db', ('public', 'events'), mock_logger)
+
+        assert mock_popen.call_args_list[0][1]['env']['PGPASSWORD'] == 'src_pass'
+        assert mock_popen.call_args_list[1][1]['env']['PGPASSWORD'] == 'tgt_pass'
+
+    @patch('pg_mirror.copyengine.server_version', return_value=160002)
+    @patch('pg_mirror.copyengine.run_query', return_value=[('id',), ('payload',)])
+    @patch('subprocess.Popen')
+    def test_snapshot_predicate_and_truncate(self, mock_popen, mock_query, mock_version,
+                                             mock_logger):
+        """Testa leitura no snapshot exportado, com predicado e TRUNCATE na mesma transação"""
+        mock_popen.side_effect = [make_reader(), make_writer()]
+
+        copy_table(SOURCE, TARGET, 'db', ('public', 'events'), mock_logger,
+                   snapshot='00000003-1', predicate='id > 10', truncate=True)
+
+        source_cmd, target_cmd = (c[0][0] for c in mock_popen.call_args_list)
+        commands = [source_cmd[i + 1] for i, arg in enumerate(source_cmd) if arg == '-c']
+        assert commands == [
+            "BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY",
+            "SET TRANSACTION SNAPSHOT '00000003-1'",
+            'COPY (SELECT "id", "payload" FROM "public"."events" WHERE id > 10) '
+            'TO STDOUT (FORMAT binary)',
+        ]
+        # Mesma lista explícita dos dois lados: colunas geradas ficam de fora
+        assert 'COPY "public"."events" ("id", "payload") FROM STDIN (FORMAT binary)' in target_cmd
+        assert 'TRUNCATE TABLE ONLY "public"."events"' in target_cmd
+        assert '-1' in target_cmd
+
+    @patch('pg_mirror.copyengine.server_version', side_effect=QueryError('permission denied'))
+    @patch('subprocess.Popen')
+    def test_column_lookup_error(self, mock_popen, mock_version, mock_logger):
+        """Testa que falha ao listar colunas aborta a cópia antes do COPY"""
+        assert copy_table(SOURCE, TARGET, 'db', ('public', 'events'), mock_logger,
+                          predicate='id > 10') is None
+        mock_popen.assert_not_called()
+
+    @patch('subprocess.Popen')
+    def test_source_error(self, mock_popen, mock_logger):
+        """Testa que erro na leitura da origem falha a cópia com a mensagem do servidor"""
+        mock_popen.side_effect = [
+            make_reader(stderr=b'ERROR: permission denied', returncode=1),
+            make_writer(returncode=1),
+        ]
+
+        assert copy_table(SOURCE, TARGET, 'db', ('public', 'events'), mock_logger) is None
+        assert 'permission denied' in str(mock_logger.error.call_args)
+
+    @patch('subprocess.Popen')
+    def test_source_dies_midway_rolls_back(self, mock_popen, mock_logger):
+        """Testa que a leitura interrompida encerra o destino sem EOF (sem commit parcial)"""
+        reader = make_reader(b'x' * 4096, stderr=b'FATAL: terminating connection', returncode=2)
+        writer = make_writer()
+        mock_popen.side_effect = [reader, writer]
+
+        assert copy_table(SOURCE, TARGET, 'db', ('public', 'events'), mock_logger,
+                          predicate='id > 10', truncate=True, columns=['id']) is None
+        writer.kill.assert_called_once()
+        writer.stdin.close.assert_not_called()
+        assert 'terminating connection' in str(mock_logger.error.call_args)
+
+    @patch('pg_mirror.copyengine.pump_stream', side_effect=KeyboardInterrupt)
+    @patch('subprocess.Popen')
+    def test_interrupted_pump_kills_both(self, mock_popen, mock_pump, mock_logger):
+        """Testa que uma exceção no meio da cópia encerra e aguarda os dois psql"""
+        reader, writer = make_reader(), make_writer()
+        mock_popen.side_effect = [reader, writer]
+
+        with pytest.raises(KeyboardInterrupt):
+            copy_table(SOURCE, TARGET, 'db', ('public', 'events'), mock_logger)
+        for proc in (reader, writer):
+            proc.kill.assert_called_once()
+            proc.wait.assert_called_once()
+        writer.stdin.close.assert_not_called()
+
+    @patch('subprocess.Popen')
+    def test_target_closed_early(self, mock_popen, mock_logger):
+        """Testa destino que encerra no meio da cópia"""
+        reader = make_reader(b'x' * 4096)
+        writer = make_writer(stderr=b'ERROR: invalid binary data', returncode=1)
+        writer.stdin.write.side_effect = BrokenPipeError
+        mock_popen.side_effect = [reader, writer]
+
+        assert copy_table(SOURCE, TARGET, 'db', ('public', 'events'), mock_logger) is None
+        reader.kill.assert_called_once()
+        assert 'invalid binary data' in str(mock_logger.error.call_args)
+
+
+class TestTableColumns:
+    """Testes para table_columns"""
+
+    @patch('pg_mirror.copyengine.server_version', return_value=150004)
+    @patch('pg_mirror.copyengine.run_query', return_value=[('id',), ('total',)])
+    def test_excludes_generated_columns(self, mock_query, mock_version, mock_logger):
+        """Testa que a lista de colunas omite colunas geradas e removidas"""
+        assert table_columns(SOURCE, 'db', ('public', "o'rders"), mock_logger) == ['id', 'total']
+
+        sql = mock_query.call_args[0][5]
+        assert "attgenerated = ''" in sql
+        assert "NOT a.attisdropped" in sql
+        assert "'\"public\".\"o''rders\"'::regclass" in sql
+
+    @patch('pg_mirror.copyengine.run_query', return_value=[('id',)])
+    def test_before_generated_columns(self, mock_query, mock_logger):
+        """Testa que versões sem colunas geradas não consultam attgenerated"""
+        table_columns(SOURCE, 'db', ('public', 'orders'), mock_logger, version=110000)
+
+        mock_query.assert_called_once()
+        assert 'attgenerated' not in mock_query.call_args[0][5]
+
+
+class TestRangeCount:
+    """Testes para range_count"""
+
+    def test_small_table_not_split(self):
+        """Testa que tabela abaixo do limite é copiada inteira"""
+        assert range_count(512 * MB, 8, 1024 * MB) == 1
+
+    def test_disabled_or_single_worker(self):
+        """Testa que divisão desativada ou um único worker não divide a tabela"""
+        assert range_count(100 * 1024 * MB, 8, None) == 1
+        assert range_count(100 * 1024 * MB, 1, 1024 * MB) == 1
+
+    def test_capped_by_workers(self):
+        """Testa tabela enorme: até 4 faixas por worker"""
+        assert range_count(1200 * 1024 * MB, 8, 1024 * MB) == 32
+
+    def test_capped_by_minimum_range(self):
+        """Testa que nenhuma faixa fica menor que 256 MB"""
+        assert range_count(1024 * MB, 8, 1024 * MB) == 4
+
+
+class TestSplitRanges:
+    """Testes para split_ranges"""
+
+    @patch('pg_mirror.copyengine.run_query')
+    def test_primary_key_ranges(self, mock_query, mock_logger):
+        """Testa faixas de chave primária, abertas nas pontas"""
+        mock_query.side_effect = [[('id', '9000')], [('1', '1000')]]
+
+        ranges = split_ranges(SOURCE, 'db', ('public', 'events'), 4, mock_logger)
+
+        assert ranges == [
+            '"id" < 250',
+            '"id" >= 250 AND "id" < 500',
+            '"id" >= 500 AND "id" < 750',
+            '"id" >= 750',
+        ]
+        assert 'min("id"), max("id") FROM "public"."events"' in mock_query.call_args[0][5]
+
+    @patch('pg_mirror.copyengine.run_query')
+    def test_ctid_ranges_without_key(self, mock_query, mock_logger):
+        """Testa faixas de blocos (ctid) sem chave primária inteira"""
+        mock_query.return_value = [('', '1000')]
+
+        ranges = split_ranges(SOURCE, 'db', ('public', 'logs'), 2, mock_logger, version=140000)
+
+        assert ranges == ["ctid < '(500,0)'::tid", "ctid >= '(500,0)'::tid"]
+        mock_query.assert_called_once()
+
+    @patch('pg_mirror.copyengine.server_version', return_value=130011)
+    @patch('pg_mirror.copyengine.run_query', return_value=[('', '1000')])
+    def test_ctid_before_tid_range_scan(self, mock_query, mock_version, mock_logger):
+        """Testa que antes do PostgreSQL 14 a tabela sem chave é copiada inteira"""
+        assert split_ranges(SOURCE, 'db', ('public', 'logs'), 2, mock_logger) == [None]
+        mock_version.assert_called_once()
+
+    @patch('pg_mirror.copyengine.run_query')
+    def test_empty_table_copied_whole(self, mock_query, mock_logger):
+        """Testa que tabela vazia (sem limites) é copiada inteira"""
+        mock_query.side_effect = [[('id', '10')], [('', '')]]
+
+        assert split_ranges(SOURCE, 'db', ('public', 'events'), 4, mock_logger) == [None]
+
+    @patch('pg_mirror.copyengine.run_query', side_effect=QueryError('permission denied'))
+    def test_query_error_copies_whole_table(self, mock_query, mock_logger):
+        """Testa que erro ao calcular as faixas recai na cópia inteira"""
+        assert split_ranges(SOURCE, 'db', ('public', 'events'), 4, mock_logger) == [None]
+        mock_logger.warning.assert_called_once()
+
+
+class TestCopyMirror:
+    """Testes para copy_mirror"""
+
+    @patch('pg_mirror.copyengine.server_version', return_value=160000)
+    @patch('pg_mirror.snapshot.release_snapshot')
+    @patch('pg_mirror.snapshot.export_snapshot', return_value=(MagicMock(), 'snap-1'))
+    @patch('pg_mirror.copyengine.list_tables', return_value=TABLES)
+    @patch('pg_mirror.copyengine.run_restore', return_value=True)
+    @patch('pg_mirror.copyengine.run_dump')
+    @patch('pg_mirror.copyengine.copy_table', return_value=1024)
+    def test_successful_copy(self, mock_copy, mock_dump, mock_restore, mock_tables,
+                             mock_export, mock_release, mock_version, mock_logger):
+        """Testa schema por pg_dump, tabelas por COPY e post-data por último"""
+        result = copy_mirror(SOURCE, TARGET, 'test_db', 2, mock_logger)
+
+        assert result is True
+        copied = sorted(c[0][3] for c in mock_copy.call_args_list)
+        assert copied == [('public', 'events'), ('public', 'users')]
+        assert all(c[1]['columns'] is None for c in mock_copy.call_args_list)
+        assert all(c[1]['snapshot'] == 'snap-1' for c in mock_copy.call_args_list)
+        assert all(c[0][2] == 'snap-1' for c in mock_dump.call_args_list)
+        # Sequências seguem pelo pg_dump, junto dos large objects
+        extras = mock_dump.call_args_list[2][0]
+        assert '"public"."users_id_seq"' in extras and '-b' in extras
+        paths = [c[0][2] for c in mock_restore.call_args_list]
+        assert paths[0].endswith('pre-data.dump')
+        assert paths[-1].endswith('post-data.dump')
+        mock_release.assert_called_once()
+
+    @patch('pg_mirror.copyengine.server_version', return_value=160000)
+    @patch('pg_mirror.snapshot.release_snapshot')
+    @patch('pg_mirror.snapshot.export_snapshot', return_value=(MagicMock(), 'snap-1'))
+    @patch('pg_mirror.copyengine.list_tables', return_value=TABLES)
+    @patch('pg_mirror.copyengine.run_restore', return_value=True)
+    @patch('pg_mirror.copyengine.run_dump')
+    @patch('pg_mirror.copyengine.copy_table', return_value=None)
+    def test_copy_failure_skips_post_data(self, mock_copy, mock_dump, mock_restore, mock_tables,
+                                          mock_export, mock_release, mock_version, mock_logger):
+        """Testa que a falha de uma tabela interrompe antes do post-data"""
+        result = copy_mirror(SOURCE, TARGET, 'test_db', 1, mock_logger)
+
+        assert result is False
+        # A primeira falha cancela as tabelas que ainda não começaram
+        mock_copy.assert_called_once()
+        assert mock_restore.call_count == 1
+        mock_release.assert_called_once()
+
+    @patch('pg_mirror.copyengine.table_columns', return_value=['id', 'tenant'])
+    @patch('pg_mirror.copyengine.server_version', return_value=160000)
+    @patch('pg_mirror.snapshot.release_snapshot')
+    @patch('pg_mirror.snapshot.export_snapshot', return_value=(MagicMock(), 'snap-1'))
+    @patch('pg_mirror.copyengine.list_tables', return_value=TABLES)
+    @patch('pg_mirror.copyengine.run_restore', return_value=True)
+    @patch('pg_mirror.copyengine.run_dump')
+    @patch('pg_mirror.copyengine.copy_table', return_value=0)
+    def test_subset_filters(self, mock_copy, mock_dump, mock_restore, mock_tables,
+                            mock_export, mock_release, mock_version, mock_columns, mock_logger):
+        """Testa tabelas filtradas puladas e predicados aplicados na cópia"""
+        subset = SubsetPlan(excluded=[('public', 'users')],
+                            predicates={('public', 'events'): 'id > 10'})
+
+        assert copy_mirror(SOURCE, TARGET, 'test_db', 2, mock_logger, subset=subset) is True
+
+        mock_copy.assert_called_once()
+        assert mock_copy.call_args[0][3] == ('public', 'events')
+        assert mock_copy.call_args[1]['predicate'] == '(id > 10)'
+        assert mock_copy.call_args[1]['columns'] == ['id', 'tenant']
+        assert '-L' not in mock_restore.call_args[0]
+
+    @patch('pg_mirror.copyengine.server_version', return_value=160000)
+    @patch('pg_mirror.copyengine.read_toc')
+    @patch('pg_mirror.snapshot.release_snapshot')
+    @patch('pg_mirror.snapshot.export_snapshot', return_value=(MagicMock(), 'snap-1'))
+    @patch('pg_mirror.copyengine.list_tables', return_value=TABLES)
+    @patch('pg_mirror.copyengine.run_restore', return_value=True)
+    @patch('pg_mirror.copyengine.run_dump')
+    @patch('pg_mirror.copyengine.copy_table', return_value=0)
+    def test_subset_skips_foreign_keys(self, mock_copy, mock_dump, mock_restore, mock_tables,
+                                       mock_export, mock_release, mock_toc, mock_version,
+                                       mock_logger):
+        """Testa post-data com lista -L sem as FKs para tabelas filtradas"""
+        mock_toc.return_value = ArchiveToc.parse(
+            "2890; 2606 16400 FK CONSTRAINT public events events_user_fk postgres\n"
+            "2891; 1259 16401 INDEX public events_created_idx postgres\n"
+        )
+        subset = SubsetPlan(excluded=[('public', 'users')],
+                            skipped_fks=[('public', 'events', 'events_user_fk')])
+        lists = []
+
+        def restore(target, database, path, logger, *args):
+            if '-L' in args:
+                with open(args[args.index('-L') + 1], encoding='utf-8') as f:
+                    lists.append(f.read())
+            return True
+        mock_restore.side_effect = restore
+
+        assert copy_mirror(SOURCE, TARGET, 'test_db', 2, mock_logger, subset=subset) is True
+
+        assert len(lists) == 1
+        assert 'events_created_idx' in lists[0] and 'events_user_fk' not in lists[0]
+
+    @patch('pg_mirror.snapshot.release_snapshot')
+    @patch('pg_mirror.snapshot.export_snapshot', return_value=(MagicMock(), 'snap-1'))
+    @patch('pg_mirror.copyengine.list_tables', return_value=TABLES)
+    @patch('pg_mirror.copyengine.run_dump',
+           side_effect=subprocess.CalledProcessError(1, 'pg_dump', stderr='boom'))
+    def test_schema_dump_failure(self, mock_dump, mock_tables, mock_export, mock_release,
+                                 mock_logger):
+        """Testa que falha no dump do schema falha o espelhamento"""
+        assert copy_mirror(SOURCE, TARGET, 'test_db', 2, mock_logger) is False
+        mock_logger.error.assert_called()
+        mock_release.assert_called_once()
+
+    @patch('pg_mirror.copyengine.table_columns', return_value=['id', 'tenant'])
+    @patch('pg_mirror.copyengine.server_version', return_value=160000)
+    @patch('pg_mirror.snapshot.release_snapshot')
+    @patch('pg_mirror.snapshot.export_snapshot', return_value=(MagicMock(), 'snap-1'))
+    @patch('pg_mirror.copyengine.list_tables', return_value=[('public', 'events', 'r', 2048 * MB)])
+    @patch('pg_mirror.copyengine.run_restore', return_value=True)
+    @patch('pg_mirror.copyengine.run_dump')
+    @patch('pg_mirror.copyengine.split_ranges')
+    @patch('pg_mirror.copyengine.copy_table', return_value=0)
+    def test_large_table_split_into_ranges(self, mock_copy, mock_split, mock_dump, mock_restore,
+                                           mock_tables, mock_export, mock_release, mock_version,
+                                           mock_columns, mock_logger):
+        """Testa uma cópia por faixa, todas no mesmo snapshot e com o filtro da tabela"""
+        mock_split.return_value = ['"id" < 100', '"id" >= 100']
+        subset = SubsetPlan(predicates={('public', 'events'): 'tenant = 1'})
+
+        assert copy_mirror(SOURCE, TARGET, 'test_db', 2, mock_logger, subset=subset,
+                           split_mb=1024) is True
+
+        assert mock_split.call_args[0][3] == 8  # 2 GB em faixas de 256 MB
+        assert mock_split.call_args[1] == {'version': 160000}
+        mock_columns.assert_called_once()  # Uma consulta para todas as faixas
+        assert all(c[1]['columns'] == ['id', 'tenant'] for c in mock_copy.call_args_list)
+        predicates = sorted(c[1]['predicate'] for c in mock_copy.call_args_list)
+        assert predicates == ['(tenant = 1) AND ("id" < 100)', '(tenant = 1) AND ("id" >= 100)']
+        assert all(c[1]['snapshot'] == 'snap-1' for c in mock_copy.call_args_list)
@@ -6,8 +6,14 @@ from unittest.mock import patch, MagicMock
 from pg_mirror.database import (
     check_database_exists,
     create_database,
-    drop_and_create_database
+    drop_and_create_database,
+    quote_ident,
+    run_query,
+    list_databases,
+    list_tables,
+    QueryError
 )
+from pg_mirror.openmetrics import DATABASE_OPERATIONS
 
 
 class TestCheckDatabaseExists:
@@ -98,6 +104,17 @@ class TestCheckDatabaseExists:
         
         assert result is False
         mock_logger.error.assert_called_once()
+    
+    @patch('subprocess.run')
+    def test_counted_as_operation(self, mock_run, mock_logger):
+        """Testa que a verificação conta em pg_mirror_database_operations"""
+        mock_run.return_value = MagicMock(stdout='1', returncode=0)
+        before = dict((tuple(k), v) for k, v in DATABASE_OPERATIONS.snapshot())
+        
+        check_database_exists('localhost', 5432, 'existing_db', 'postgres', 'password', mock_logger)
+        
+        after = dict((tuple(k), v) for k, v in DATABASE_OPERATIONS.snapshot())
+        assert after[('exists', 'ok')] == before.get(('exists', 'ok'), 0) + 1
 
 
 class TestCreateDatabase:
@@ -258,3 +275,95 @@ class TestDropAndCreateDatabase:
             )
         
         mock_logger.error.assert_called()
+
+
+class TestQuoteIdent:
+    """Testes para quote_ident"""
+    
+    def test_simple_name(self):
+        """Testa nome simples"""
+        assert quote_ident('users') == '"users"'
+    
+    def test_escapes_double_quotes(self):
+        """Testa escape de aspas duplas no nome"""
+        assert quote_ident('my"table') == '"my""table"'
+
+
+class TestRunQuery:
+    """Testes para run_query"""
+    
+    @patch('subprocess.run')
+    def test_splits_rows_and_columns(self, mock_run, mock_logger):
+        """Testa conversão da saída do psql em tuplas"""
+        mock_run.return_value = MagicMock(stdout='a\x1f1\nb\x1f2\n')
+        
+        rows = run_query('localhost', 5432, 'db', 'postgres', 'pw', 'SELECT 1', mock_logger)
+        
+        assert rows == [('a', '1'), ('b', '2')]
+    
+    @patch('subprocess.run')
+    def test_stops_on_error(self, mock_run, mock_logger):
+        """Testa que a consulta usa ON_ERROR_STOP e check=True"""
+        mock_run.return_value = MagicMock(stdout='')
+        
+        run_query('localhost', 5432, 'db', 'postgres', 'pw', 'SELECT 1', mock_logger)
+        
+        cmd = mock_run.call_args[0][0]
+        assert 'ON_ERROR_STOP=1' in cmd
+        assert mock_run.call_args[1]['check'] is True
+    
+    @patch('subprocess.run')
+    def test_failure_raises_query_error(self, mock_run, mock_logger):
+        """Testa que falha do psql vira QueryError com o stderr"""
+        from subprocess import CalledProcessError
+        mock_run.side_effect = CalledProcessError(1, 'psql', stderr='ERROR: boom\n')
+        
+        with pytest.raises(QueryError, match='ERROR: boom'):
+            run_query('localhost', 5432, 'db', 'postgres', 'pw', 'SELECT 1', mock_logger)
+
+
+class TestListDatabases:
+    """Testes para list_databases"""
+    
+    @patch('pg_mirror.database.run_query')
+    def test_pattern_filter(self, mock_query, mock_logger):
+        """Testa filtro LIKE com escape de aspas"""
+        mock_query.return_value = [('tenant_a', '2048')]
+        
+        result = list_databases('localhost', 5432, 'postgres', 'pw', mock_logger,
+                                pattern="tenant_'%")
+        
+        sql = mock_query.call_args[0][5]
+        assert result == [('tenant_a', 2048)]
+        assert "LIKE 'tenant_''%'" in sql
+        assert mock_query.call_args[0][2] == 'postgres'
+    
+    @patch('pg_mirror.database.run_query')
+    def test_without_pattern(self, mock_query, mock_logger):
+        """Testa listagem sem filtro"""
+        mock_query.return_value = []
+        
+        list_databases('localhost', 5432, 'postgres', 'pw', mock_logger)
+        
+        assert 'LIKE' not in mock_query.call_args[0][5]
+
+
+class TestListTables:
+    """Testes para list_tables"""
+    
+    @patch('pg_mirror.database.run_query')
+    def test_converts_sizes(self, mock_query, mock_logger):
+        """Testa conversão do tamanho para inteiro"""
+        mock_query.return_value = [('public', 'events', 'r', '4096')]
+        
+        tables = list_tables('localhost', 5432, 'db', 'postgres', 'pw', mock_logger)
+        
+        assert tables == [('public', 'events', 'r', 4096)]
+    
+    @patch('pg_mirror.database.run_query')
+    def test_failure_exits(self, mock_query, mock_logger):
+        """Testa que falha ao listar tabelas sai do programa"""
+        mock_query.side_effect = QueryError('denied')
+        
+        with pytest.raises(SystemExit):
+            list_tables('localhost', 5432, 'db', 'postgres', 'pw', mock_logger)
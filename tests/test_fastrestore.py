@@ -0,0 +1,78 @@
+"""
+Testes para o módulo pg_mirror.fastrestore
+"""
+import pytest
+from unittest.mock import patch
+from pg_mirror.database import QueryError
+from pg_mirror.fastrestore import FastRestore, parse_fast_restore
+
+
+def _profile(mock_logger, unlogged=False):
+    return FastRestore('staging.db', 5432, 'app', 'postgres', 'pw', mock_logger, unlogged=unlogged)
+
+
+class TestParseFastRestore:
+    """Testes para parse_fast_restore"""
+
+    def test_values(self):
+        """Testa formatos aceitos"""
+        assert parse_fast_restore(False) is None
+        assert parse_fast_restore(True) == {'unlogged': False}
+        assert parse_fast_restore({'unlogged': True}) == {'unlogged': True}
+
+    def test_invalid(self):
+        """Testa valor inválido"""
+        with pytest.raises(ValueError):
+            parse_fast_restore('yes')
+
+
+class TestFastRestore:
+    """Testes para FastRestore"""
+
+    @patch('pg_mirror.fastrestore.run_query', return_value=[('t',)])
+    def test_superuser_settings(self, mock_query, mock_logger):
+        """Testa opções de sessão para superusuário"""
+        profile = _profile(mock_logger)
+        profile.before_data()
+
+        options = profile.session_options()
+        assert '-c synchronous_commit=off' in options
+        assert '-c session_replication_role=replica' in options
+
+    @patch('pg_mirror.fastrestore.run_query', return_value=[('f',)])
+    def test_non_superuser_keeps_triggers(self, mock_query, mock_logger):
+        """Testa que sem superusuário apenas synchronous_commit é aplicado"""
+        profile = _profile(mock_logger)
+        profile.before_data()
+
+        assert profile.session_options() == '-c synchronous_commit=off'
+        mock_logger.warning.assert_called_once()
+
+    @patch('pg_mirror.fastrestore.run_query')
+    def test_unlogged_roundtrip(self, mock_query, mock_logger):
+        """Testa tabelas UNLOGGED durante a carga e de volta a LOGGED"""
+        mock_query.side_effect = lambda *args: {
+            0: [('t',)],
+            1: [('public', 'orders'), ('public', 'items')],
+        }.get(mock_query.call_count - 1, [])
+        profile = _profile(mock_logger, unlogged=True)
+
+        profile.before_data()
+        assert profile.finish() is True
+
+        statements = [call[0][5] for call in mock_query.call_args_list]
+        assert 'ALTER TABLE "public"."orders" SET UNLOGGED;' in statements
+        assert 'ALTER TABLE "public"."orders" SET LOGGED;' in statements
+        assert statements.index('ALTER TABLE "public"."items" SET UNLOGGED;') < \
+            statements.index('ALTER TABLE "public"."items" SET LOGGED;')
+        assert profile.unlogged_tables == []
+
+    @patch('pg_mirror.fastrestore.run_query')
+    def test_finish_reports_failure(self, mock_query, mock_logger):
+        """Testa falha ao voltar uma tabela para LOGGED"""
+        mock_query.side_effect = QueryError('cannot')
+        profile = _profile(mock_logger, unlogged=True)
+        profile.unlogged_tables = [('public', 'orders')]
+
+        assert profile.finish() is False
+        mock_logger.error.assert_called_once()
@@ -0,0 +1,126 @@
+"""
+Testes para o módulo pg_mirror.incremental
+"""
+import json
+import os
+from unittest.mock import patch
+from pg_mirror.incremental import (
+    collect_markers,
+    changed_tables,
+    state_path,
+    load_state,
+    save_state,
+    truncate_tables
+)
+from pg_mirror.database import QueryError
+
+
+SOURCE = {'host': 'prod.db', 'port': 5432, 'user': 'postgres', 'password': 'pw'}
+TARGET = {'host': 'staging.db', 'port': 5433, 'user': 'postgres', 'password': 'pw'}
+
+
+class TestCollectMarkers:
+    """Testes para collect_markers"""
+
+    @patch('pg_mirror.incremental.run_query')
+    def test_parses_markers(self, mock_query, mock_logger):
+        """Testa conversão dos marcadores em inteiros"""
+        mock_query.side_effect = [
+            [('abc123',)],
+            [('public', 'users', '10', '2', '1', '16401', '8192'),
+             ('public', 'parted', '0', '0', '0', '', '0')],
+        ]
+
+        signature, markers = collect_markers(SOURCE, 'app', mock_logger)
+
+        assert signature == 'abc123'
+        assert markers[('public', 'users')] == [10, 2, 1, 16401, 8192]
+        assert markers[('public', 'parted')] == [0, 0, 0, 0, 0]
+
+
+class TestChangedTables:
+    """Testes para changed_tables"""
+
+    def test_detects_changes_and_new_tables(self):
+        """Testa que tabelas alteradas e novas são selecionadas"""
+        previous = {('public', 'a'): [1, 0, 0, 1, 10], ('public', 'b'): [5, 0, 0, 2, 10]}
+        current = {
+            ('public', 'a'): [1, 0, 0, 1, 10],
+            ('public', 'b'): [5, 1, 0, 2, 10],
+            ('public', 'c'): [0, 0, 0, 3, 0],
+        }
+
+        assert changed_tables(previous, current) == [('public', 'b'), ('public', 'c')]
+
+    def test_rewrite_changes_filenode(self):
+        """Testa que reescrita da tabela (novo relfilenode) é detectada"""
+        previous = {('public', 'a'): [1, 0, 0, 100, 10]}
+        current = {('public', 'a'): [1, 0, 0, 200, 10]}
+
+        assert changed_tables(previous, current) == [('public', 'a')]
+
+    def test_unchanged(self):
+        """Testa que nada é selecionado sem mudanças"""
+        markers = {('public', 'a'): [1, 0, 0, 1, 10]}
+
+        assert changed_tables(markers, dict(markers)) == []
+
+
+class TestState:
+    """Testes para persistência do estado"""
+
+    def test_state_path_is_per_target(self, tmp_path):
+        """Testa que cada par origem/destino tem seu arquivo"""
+        other = dict(TARGET, host='qa.db')
+
+        path_a = state_path(str(tmp_path), SOURCE, TARGET, 'app')
+        path_b = state_path(str(tmp_path), SOURCE, other, 'app')
+
+        assert path_a != path_b
+        assert path_a.startswith(str(tmp_path))
+        assert path_a.endswith('.json')
+
+    def test_round_trip(self, tmp_path):
+        """Testa gravação e leitura do estado"""
+        path = str(tmp_path / 'incremental' / 'state.json')
+        markers = {('public', 'users'): [1, 2, 3, 4, 5]}
+
+        save_state(path, 'sig', markers)
+
+        assert load_state(path) == ('sig', markers)
+        assert [f for f in os.listdir(tmp_path / 'incremental')] == ['state.json']
+
+    def test_missing_state(self, tmp_path):
+        """Testa ausência de estado anterior"""
+        assert load_state(str(tmp_path / 'nothing.json')) is None
+
+    def test_corrupt_state(self, tmp_path):
+        """Testa estado corrompido tratado como ausente"""
+        path = tmp_path / 'state.json'
+        path.write_text(json.dumps({'signature': 'x'}))
+
+        assert load_state(str(path)) is None
+
+
+class TestTruncateTables:
+    """Testes para truncate_tables"""
+
+    @patch('pg_mirror.incremental.run_query')
+    def test_single_statement(self, mock_query, mock_logger):
+        """Testa TRUNCATE único com nomes citados"""
+        result = truncate_tables(TARGET, 'app', [('public', 'a'), ('sales', 'b')], mock_logger)
+
+        sql = mock_query.call_args[0][5]
+        assert result is True
+        assert sql == 'TRUNCATE TABLE "public"."a", "sales"."b";'
+        assert 'CASCADE' not in sql
+
+    @patch('pg_mirror.incremental.run_query')
+    def test_failure_returns_false(self, mock_query, mock_logger):
+        """Testa falha (ex.: FK de tabela inalterada)"""
+        mock_query.side_effect = QueryError(
+            'cannot truncate a table referenced in a foreign key constraint'
+        )
+
+        assert truncate_tables(TARGET, 'app', [('public', 'a')], mock_logger) is False
+        mock_logger.warning.assert_called_once()
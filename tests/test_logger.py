@@ -1,9 +1,12 @@
 """
 Testes para o módulo pg_mirror.logger
 """
-import pytest
+import json
 import logging
-from pg_mirror.logger import setup_logger
+import logging.handlers
+import threading
+import pytest
+from pg_mirror.logger import RUN_ID, log_context, setup_logger, shutdown_logging
 
 
 class TestSetupLogger:
@@ -111,3 +114,82 @@ class TestSetupLogger:
             logger.error("Test error message")
         
         assert "Test error message" in caplog.text
+
+
+@pytest.fixture
+def restore_logger():
+    """Volta ao logger texto padrão ao final do teste"""
+    yield
+    setup_logger()
+
+
+def _json_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+class TestStructuredLogging:
+    """Testes para o modo JSON, fila e rotação"""
+    
+    def test_json_uses_queue_handler(self, restore_logger):
+        """Testa que o modo JSON não escreve direto no console"""
+        logger = setup_logger(log_format='json')
+        
+        assert [type(h) for h in logger.handlers] == [logging.handlers.QueueHandler]
+    
+    def test_json_fields(self, restore_logger, tmp_path):
+        """Testa campos do registro JSON com contexto de fase e objeto"""
+        path = tmp_path / 'pg-mirror.log'
+        logger = setup_logger(verbose=True, log_format='json', log_file=str(path))
+        
+        with log_context(database='app', phase='restore'):
+            logger.debug('Restore: restore public.orders', extra={'object': 'public.orders'})
+        logger.info('fim')
+        shutdown_logging()
+        
+        first, second = _json_lines(path)
+        assert first['run_id'] == RUN_ID
+        assert (first['database'], first['phase'], first['object']) == \
+            ('app', 'restore', 'public.orders')
+        assert first['level'] == 'DEBUG'
+        assert first['elapsed_ms'] >= 0
+        assert second['message'] == 'fim'
+        assert 'database' not in second and 'elapsed_ms' not in second
+    
+    def test_text_file_output(self, restore_logger, tmp_path):
+        """Testa arquivo em formato texto"""
+        path = tmp_path / 'pg-mirror.log'
+        logger = setup_logger(log_file=str(path))
+        
+        logger.info('mensagem')
+        shutdown_logging()
+        
+        assert ' - INFO - mensagem' in path.read_text(encoding='utf-8')
+    
+    def test_rotation(self, restore_logger, tmp_path):
+        """Testa rotação por tamanho mantendo o número de arquivos"""
+        path = tmp_path / 'pg-mirror.log'
+        logger = setup_logger(log_format='json', log_file=str(path), max_mb=1, backups=2)
+        
+        for i in range(6000):
+            logger.info('x' * 500)
+        shutdown_logging()
+        
+        assert sorted(p.name for p in tmp_path.iterdir()) == \
+            ['pg-mirror.log', 'pg-mirror.log.1', 'pg-mirror.log.2']
+    
+    def test_context_is_per_thread(self, restore_logger, tmp_path):
+        """Testa que o contexto de uma thread não vaza para outra"""
+        path = tmp_path / 'pg-mirror.log'
+        logger = setup_logger(log_format='json', log_file=str(path))
+        
+        def worker():
+            logger.info('worker')
+        
+        with log_context(database='app'):
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+        shutdown_logging()
+        
+        assert 'database' not in _json_lines(path)[0]
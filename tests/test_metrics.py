@@ -0,0 +1,122 @@
+"""
+Testes para o módulo pg_mirror.metrics
+"""
+import json
+import subprocess
+import sys
+import pytest
+from pg_mirror import metrics
+from pg_mirror.metrics import RunMetrics, collect_metrics, get_metrics
+
+
+class TestRunMetrics:
+    """Testes para RunMetrics"""
+
+    def test_phase_records_timings(self):
+        """Testa registro de tempo, CPU e atributos da fase"""
+        run = RunMetrics()
+
+        with run.phase('restore', 'app', jobs=4):
+            pass
+
+        phase = run.phases[0]
+        assert (phase['name'], phase['database'], phase['jobs']) == ('restore', 'app', 4)
+        assert phase['success'] is True
+        assert phase['wall_seconds'] >= 0 and phase['cpu_seconds'] >= 0
+
+    def test_failed_phase(self):
+        """Testa fase interrompida por exceção"""
+        run = RunMetrics()
+
+        with pytest.raises(RuntimeError):
+            with run.phase('backup', 'app'):
+                raise RuntimeError('boom')
+
+        assert run.phases[0]['success'] is False
+
+    def test_ratio_and_rates(self):
+        """Testa razão de compressão e MB/s derivados"""
+        run = RunMetrics()
+        run.record('app', database_bytes=400 * 1024 * 1024, archive_bytes=100 * 1024 * 1024)
+        run._spans = [
+            ('backup', 'app', 100.0, 104.0),
+            ('restore', 'app', 105.0, 115.0),
+        ]
+
+        report = run.to_dict(0)['databases']['app']
+
+        assert report['compression_ratio'] == 0.25
+        assert report['backup_mb_s'] == 25.0
+        assert report['restore_mb_s'] == 10.0
+
+    def test_concurrent_restores_use_span(self):
+        """Testa que restores simultâneos em vários destinos não somam durações"""
+        run = RunMetrics()
+        run.record('app', archive_bytes=100 * 1024 * 1024)
+        run._spans = [
+            ('restore', 'app', 100.0, 110.0),
+            ('restore', 'app', 100.5, 108.0),
+            ('restore', 'other', 0.0, 500.0),
+        ]
+
+        assert run.to_dict(0)['databases']['app']['restore_mb_s'] == 10.0
+
+    def test_cpu_without_resource(self, monkeypatch):
+        """Testa a CPU sem getrusage (Windows): apenas o próprio processo"""
+        monkeypatch.setattr(metrics, 'resource', None)
+        run = RunMetrics()
+
+        with run.phase('checks'):
+            pass
+
+        assert run.phases[0]['cpu_seconds'] >= 0
+
+
+def test_cli_imports_without_unix_modules():
+    """Testa que a CLI importa sem resource e fcntl (Windows)"""
+    code = ("import sys; sys.modules['resource'] = None; sys.modules['fcntl'] = None; "
+            "import pg_mirror.cli")
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+class TestCollectMetrics:
+    """Testes para collect_metrics"""
+
+    def test_inactive_is_noop(self, mock_logger):
+        """Testa que sem --metrics-file nada é coletado"""
+        with collect_metrics(None, mock_logger) as run:
+            with metrics.phase('backup', 'app') as record:
+                record['jobs'] = 2
+            metrics.record('app', archive_bytes=1)
+
+        assert run is None
+        assert get_metrics() is None
+
+    def test_writes_report_on_exit(self, tmp_path, mock_logger):
+        """Testa relatório gravado mesmo com sys.exit(1)"""
+        path = tmp_path / 'metrics.json'
+
+        with pytest.raises(SystemExit):
+            with collect_metrics(str(path), mock_logger):
+                with metrics.phase('checks'):
+                    pass
+                metrics.record('app', success=False)
+                raise SystemExit(1)
+
+        report = json.loads(path.read_text())
+        assert report['exit_code'] == 1
+        assert report['status'] == 'failure'
+        assert [p['name'] for p in report['phases']] == ['checks']
+        assert report['databases']['app']['success'] is False
+        assert get_metrics() is None
+
+    def test_success_report(self, tmp_path, mock_logger):
+        """Testa relatório de execução bem-sucedida"""
+        path = tmp_path / 'out' / 'metrics.json'
+
+        with collect_metrics(str(path), mock_logger) as run:
+            assert get_metrics() is run
+
+        report = json.loads(path.read_text())
+        assert report['status'] == 'success'
+        assert report['run_id'] == run.run_id
@@ -0,0 +1,591 @@
+"""
+Testes para o módulo pg_mirror.mirror
+"""
+import os
+import pytest
+from unittest.mock import patch
+from pg_mirror.mirror import (
+    get_targets,
+    is_multi_database,
+    resolve_databases,
+    prepare_target,
+    mirror_database
+)
+from pg_mirror.planner import RestorePlan
+from pg_mirror.spool import SpoolSpaceError, expected_ratio, ratio_key
+from pg_mirror.toc import TocEntry
+
+
+def with_options(config, **options):
+    """Completa a configuração com os padrões de load_config"""
+    defaults = {
+        'drop_existing': False,
+        'parallel_jobs': 4,
+        'dump_jobs': 1,
+        'compression': {'algorithm': 'gzip', 'level': 6, 'workers': 1},
+        'restore_ordering': False,
+        'maintenance_memory_mb': None,
+        'fast_restore': None,
+        'stream': False,
+        'stream_buffer_mb': 64,
+        'pipeline': False,
+        'copy_engine': False,
+        'split_table_mb': 1024,
+        'incremental': False,
+        'state_dir': '~/.pg-mirror',
+        'spool_dir': None,
+        'spool_fallback': 'fail',
+        'checkpoint': False,
+        'resume': False,
+        'include': None,
+        'exclude': None,
+        'where': {},
+    }
+    defaults.update(options)
+    config['options'] = defaults
+    return config
+
+
+@pytest.fixture(autouse=True)
+def no_database_size():
+    """Sem tamanho da origem, a verificação de espaço é pulada"""
+    with patch('pg_mirror.mirror.database_size', return_value=None):
+        yield
+
+
+class TestResolveDatabases:
+    """Testes para resolução de bancos"""
+
+    def test_single_database_is_not_multi(self, valid_config):
+        """Testa que um nome único mantém o modo de banco único"""
+        assert is_multi_database(valid_config) is False
+
+    def test_list_is_multi(self, valid_config):
+        """Testa que uma lista ativa o modo multi-banco"""
+        valid_config['source']['database'] = ['a', 'b']
+        assert is_multi_database(valid_config) is True
+
+    @patch('pg_mirror.mirror.list_databases')
+    def test_pattern_uses_catalog(self, mock_list, valid_config, mock_logger):
+        """Testa resolução de padrão contra pg_database"""
+        valid_config['source']['database_pattern'] = 'tenant_%'
+        mock_list.return_value = [('tenant_b', 200), ('tenant_a', 100)]
+
+        result = resolve_databases(valid_config, mock_logger)
+
+        assert result == [('tenant_b', 200), ('tenant_a', 100)]
+        assert mock_list.call_args[1]['pattern'] == 'tenant_%'
+
+    @patch('pg_mirror.mirror.list_databases')
+    def test_list_sorted_by_size(self, mock_list, valid_config, mock_logger):
+        """Testa que a lista explícita é ordenada pelo tamanho na origem"""
+        valid_config['source']['database'] = ['small', 'big', 'missing']
+        mock_list.return_value = [('big', 500), ('small', 5), ('other', 900)]
+
+        result = resolve_databases(valid_config, mock_logger)
+
+        assert result == [('big', 500), ('small', 5), ('missing', 0)]
+        mock_logger.warning.assert_called_once()
+
+
+class TestPrepareTarget:
+    """Testes para prepare_target"""
+
+    @patch('pg_mirror.mirror.create_database')
+    @patch('pg_mirror.mirror.check_database_exists', return_value=False)
+    def test_creates_missing_database(self, mock_exists, mock_create,
+                                      valid_config, mock_logger):
+        """Testa criação do banco ausente no destino"""
+        prepare_target(valid_config['target'], 'tenant_a', False, mock_logger)
+
+        assert mock_create.call_args[1]['database'] == 'tenant_a'
+
+    @patch('pg_mirror.mirror.drop_and_create_database')
+    @patch('pg_mirror.mirror.check_database_exists', return_value=True)
+    def test_recreates_with_drop_existing(self, mock_exists, mock_drop,
+                                          valid_config, mock_logger):
+        """Testa recriação do banco com drop_existing"""
+        prepare_target(valid_config['target'], 'db', True, mock_logger)
+
+        mock_drop.assert_called_once()
+
+
+class TestMirrorDatabase:
+    """Testes para mirror_database"""
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.restore_backup', return_value=True)
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup', return_value='/tmp/db.dump')
+    def test_standard_flow(self, mock_backup, mock_prepare, mock_restore, mock_cleanup,
+                           valid_config, mock_logger):
+        """Testa fluxo padrão backup -> destino -> restore -> limpeza"""
+        result = mirror_database(with_options(valid_config), 'tenant_a', mock_logger)
+
+        assert result is True
+        assert mock_backup.call_args[1]['database'] == 'tenant_a'
+        assert mock_restore.call_args[1]['backup_file'] == '/tmp/db.dump'
+        mock_cleanup.assert_called_once_with('/tmp/db.dump', mock_logger)
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.restore_backup', return_value=True)
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup', return_value='/tmp/db.dump')
+    @patch('pg_mirror.mirror.calibrate_compression')
+    def test_auto_compression_calibrates(self, mock_calibrate, mock_backup, mock_prepare,
+                                         mock_restore, mock_cleanup, valid_config, mock_logger):
+        """Testa que compression=auto calibra antes do backup"""
+        chosen = {'algorithm': 'lz4', 'level': 1, 'workers': 1}
+        mock_calibrate.return_value = chosen
+
+        mirror_database(with_options(valid_config, compression='auto'), 'db', mock_logger)
+
+        mock_calibrate.assert_called_once()
+        assert mock_backup.call_args[1]['compression'] == chosen
+
+    @patch('pg_mirror.mirror.pg_dump_major', return_value=15)
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup')
+    def test_explicit_compression_needs_pg_dump(self, mock_backup, mock_prepare, mock_major,
+                                                valid_config, mock_logger):
+        """Testa que zstd com pg_dump anterior ao 16 falha antes do dump e do destino"""
+        cfg = with_options(valid_config,
+                           compression={'algorithm': 'zstd', 'level': 3, 'workers': 1})
+
+        with pytest.raises(SystemExit):
+            mirror_database(cfg, 'db', mock_logger)
+
+        mock_backup.assert_not_called()
+        mock_prepare.assert_not_called()
+        assert 'pg_dump 16+' in mock_logger.error.call_args[0][0]
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.restore_backup', return_value=True)
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup', return_value='/tmp/db.dump')
+    @patch('pg_mirror.mirror.list_tables', return_value=[('public', 't', 'r', 4096)])
+    @patch('pg_mirror.mirror.auto_restore_plan')
+    def test_auto_parallel_jobs_plans(self, mock_plan, mock_tables, mock_backup, mock_prepare,
+                                      mock_restore, mock_cleanup, valid_config, mock_logger):
+        """Testa que parallel_jobs=auto usa o plano por fase"""
+        mock_plan.return_value = RestorePlan(3, 12)
+
+        mirror_database(with_options(valid_config, parallel_jobs='auto'), 'db', mock_logger)
+
+        assert mock_plan.call_args[0][1] == [4096]
+        assert mock_restore.call_args[1]['parallel_jobs'] == 3
+        assert mock_restore.call_args[1]['post_data_jobs'] == 12
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.restore_backup', side_effect=RuntimeError('boom'))
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup', return_value='/tmp/db.dump')
+    def test_cleanup_on_failure(self, mock_backup, mock_prepare, mock_restore, mock_cleanup,
+                                valid_config, mock_logger):
+        """Testa que o backup é removido mesmo com falha no restore"""
+        with pytest.raises(RuntimeError):
+            mirror_database(with_options(valid_config), 'db', mock_logger)
+
+        mock_cleanup.assert_called_once()
+
+    @patch('pg_mirror.mirror.stream_mirror', return_value=True)
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup')
+    def test_stream_mode(self, mock_backup, mock_prepare, mock_stream,
+                         valid_config, mock_logger):
+        """Testa que o modo streaming não cria backup em disco"""
+        result = mirror_database(with_options(valid_config, stream=True), 'db', mock_logger)
+
+        assert result is True
+        mock_backup.assert_not_called()
+        mock_stream.assert_called_once()
+
+    @patch('pg_mirror.mirror.pipeline_mirror', return_value=True)
+    @patch('pg_mirror.mirror.prepare_target')
+    def test_pipeline_mode(self, mock_prepare, mock_pipeline, valid_config, mock_logger):
+        """Testa seleção do modo pipeline"""
+        result = mirror_database(with_options(valid_config, pipeline=True), 'db', mock_logger)
+
+        assert result is True
+        assert mock_pipeline.call_args[1]['database'] == 'db'
+
+    @patch('pg_mirror.mirror.copy_mirror', return_value=True)
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup')
+    def test_copy_engine_mode(self, mock_backup, mock_prepare, mock_copy,
+                              valid_config, mock_logger):
+        """Testa que o motor de COPY não cria backup em disco"""
+        cfg = with_options(valid_config, copy_engine=True, parallel_jobs=6)
+
+        assert mirror_database(cfg, 'db', mock_logger) is True
+
+        mock_backup.assert_not_called()
+        assert mock_copy.call_args[1]['parallel_jobs'] == 6
+        assert mock_copy.call_args[1]['subset'] is None
+        assert mock_copy.call_args[1]['split_mb'] == 1024
+
+
+class TestMultipleTargets:
+    """Testes para dump único com restore em vários destinos"""
+
+    @staticmethod
+    def targets():
+        return [
+            {'host': 'qa1', 'port': 5432, 'user': 'postgres', 'password': 'a'},
+            {'host': 'qa2', 'port': 5432, 'user': 'postgres', 'password': 'b',
+             'parallel_jobs': 12},
+        ]
+
+    def test_get_targets_single(self, valid_config):
+        """Testa que um destino único vira lista de um elemento"""
+        assert get_targets(valid_config) == [valid_config['target']]
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.restore_backup', return_value=True)
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup', return_value='/tmp/db.dump')
+    def test_single_backup_for_all_targets(self, mock_backup, mock_prepare, mock_restore,
+                                           mock_cleanup, valid_config, mock_logger):
+        """Testa que o backup é criado uma vez e restaurado em cada destino"""
+        valid_config['target'] = self.targets()
+
+        result = mirror_database(with_options(valid_config), 'db', mock_logger)
+
+        assert result is True
+        mock_backup.assert_called_once()
+        hosts = sorted(call[1]['host'] for call in mock_restore.call_args_list)
+        assert hosts == ['qa1', 'qa2']
+        mock_cleanup.assert_called_once_with('/tmp/db.dump', mock_logger)
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.restore_backup', return_value=True)
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup', return_value='/tmp/db.dump')
+    def test_per_target_jobs(self, mock_backup, mock_prepare, mock_restore,
+                             mock_cleanup, valid_config, mock_logger):
+        """Testa que cada destino usa seu próprio parallel_jobs"""
+        valid_config['target'] = self.targets()
+
+        mirror_database(with_options(valid_config, parallel_jobs=3), 'db', mock_logger)
+
+        jobs = {call[1]['host']: call[1]['parallel_jobs'] for call in mock_restore.call_args_list}
+        assert jobs == {'qa1': 3, 'qa2': 12}
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.restore_backup')
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup', return_value='/tmp/db.dump')
+    def test_failure_isolated_per_target(self, mock_backup, mock_prepare, mock_restore,
+                                         mock_cleanup, valid_config, mock_logger):
+        """Testa que a falha de um destino não impede os demais"""
+        valid_config['target'] = self.targets()
+
+        def restore(**kwargs):
+            if kwargs['host'] == 'qa1':
+                raise SystemExit(1)
+            return True
+        mock_restore.side_effect = restore
+
+        result = mirror_database(with_options(valid_config), 'db', mock_logger)
+
+        assert result is False
+        assert mock_restore.call_count == 2
+        mock_cleanup.assert_called_once()
+
+
+class TestIncrementalMirror:
+    """Testes para o espelhamento incremental"""
+
+    MARKERS = {('public', 'users'): [1, 0, 0, 10, 100], ('public', 'events'): [9, 0, 0, 11, 900]}
+
+    @patch('pg_mirror.mirror.save_state')
+    @patch('pg_mirror.mirror.load_state', return_value=None)
+    @patch('pg_mirror.mirror.collect_markers')
+    @patch('pg_mirror.mirror.check_database_exists', return_value=True)
+    @patch('pg_mirror.mirror._full_incremental_mirror', return_value=True)
+    def test_first_run_is_full(self, mock_full, mock_exists, mock_collect, mock_load,
+                               mock_save, valid_config, mock_logger):
+        """Testa espelhamento completo sem estado anterior"""
+        mock_collect.return_value = ('sig', self.MARKERS)
+
+        result = mirror_database(with_options(valid_config, incremental=True), 'app', mock_logger)
+
+        assert result is True
+        mock_full.assert_called_once()
+        assert mock_save.call_args[0][1:] == ('sig', self.MARKERS)
+
+    @patch('pg_mirror.mirror.save_state')
+    @patch('pg_mirror.mirror.load_state')
+    @patch('pg_mirror.mirror.collect_markers')
+    @patch('pg_mirror.mirror.check_database_exists', return_value=True)
+    @patch('pg_mirror.mirror.truncate_tables', return_value=True)
+    @patch('pg_mirror.mirror._partial_incremental_mirror', return_value=True)
+    def test_only_changed_tables(self, mock_partial, mock_truncate, mock_exists,
+                                 mock_collect, mock_load, mock_save,
+                                 valid_config, mock_logger):
+        """Testa que apenas as tabelas alteradas são recopiadas"""
+        previous = dict(self.MARKERS)
+        previous[('public', 'events')] = [8, 0, 0, 11, 880]
+        mock_load.return_value = ('sig', previous)
+        mock_collect.return_value = ('sig', self.MARKERS)
+
+        result = mirror_database(with_options(valid_config, incremental=True), 'app', mock_logger)
+
+        assert result is True
+        assert mock_truncate.call_args[0][2] == [('public', 'events')]
+        assert mock_partial.call_args[0][3] == [('public', 'events')]
+        mock_save.assert_called_once()
+
+    @patch('pg_mirror.mirror.save_state')
+    @patch('pg_mirror.mirror.load_state')
+    @patch('pg_mirror.mirror.collect_markers')
+    @patch('pg_mirror.mirror.check_database_exists', return_value=True)
+    @patch('pg_mirror.mirror._full_incremental_mirror', return_value=True)
+    def test_schema_change_is_full(self, mock_full, mock_exists, mock_collect, mock_load,
+                                   mock_save, valid_config, mock_logger):
+        """Testa que mudança estrutural força espelhamento completo"""
+        mock_load.return_value = ('old-sig', self.MARKERS)
+        mock_collect.return_value = ('new-sig', self.MARKERS)
+
+        mirror_database(with_options(valid_config, incremental=True), 'app', mock_logger)
+
+        mock_full.assert_called_once()
+
+    @patch('pg_mirror.mirror.save_state')
+    @patch('pg_mirror.mirror.load_state')
+    @patch('pg_mirror.mirror.collect_markers')
+    @patch('pg_mirror.mirror.check_database_exists', return_value=True)
+    @patch('pg_mirror.mirror.truncate_tables', return_value=False)
+    @patch('pg_mirror.mirror._full_incremental_mirror', return_value=False)
+    def test_truncate_failure_falls_back(self, mock_full, mock_truncate, mock_exists,
+                                         mock_collect, mock_load, mock_save,
+                                         valid_config, mock_logger):
+        """Testa fallback completo e estado não salvo em caso de falha"""
+        mock_load.return_value = ('sig', {})
+        mock_collect.return_value = ('sig', self.MARKERS)
+
+        result = mirror_database(with_options(valid_config, incremental=True), 'app', mock_logger)
+
+        assert result is False
+        mock_full.assert_called_once()
+        mock_save.assert_not_called()
+
+
+class TestDumpCacheFlow:
+    """Testes para o uso do cache de dumps no espelhamento"""
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.restore_backup', return_value=True)
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup')
+    def test_second_run_reuses_dump(self, mock_backup, mock_prepare, mock_restore, mock_cleanup,
+                                    valid_config, mock_logger, tmp_path):
+        """Testa que a segunda execução não consulta a origem novamente"""
+        def create(**kwargs):
+            path = tmp_path / 'cache' / 'db.dump'
+            path.write_bytes(b'dump')
+            return str(path)
+        mock_backup.side_effect = create
+        cfg = with_options(valid_config, dump_cache={
+            'dir': str(tmp_path / 'cache'), 'ttl_minutes': 60, 'max_size_mb': None
+        })
+
+        assert mirror_database(cfg, 'db', mock_logger) is True
+        assert mirror_database(cfg, 'db', mock_logger) is True
+
+        mock_backup.assert_called_once()
+        assert mock_backup.call_args[1]['output_dir'] == str(tmp_path / 'cache')
+        files = [c[1]['backup_file'] for c in mock_restore.call_args_list]
+        assert files[0] == files[1]
+        assert os.path.exists(files[0])
+        mock_cleanup.assert_not_called()
+
+
+class TestCheckpointFlow:
+    """Testes para espelhamentos retomáveis"""
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.restore_backup')
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup')
+    def test_resume_reuses_backup_without_drop(self, mock_backup, mock_prepare, mock_restore,
+                                               mock_cleanup, valid_config, mock_logger, tmp_path):
+        """Testa que a falha mantém o backup e o --resume continua sem recriar o banco"""
+        backup = tmp_path / 'db.dump'
+        backup.write_bytes(b'dump')
+        mock_backup.return_value = str(backup)
+
+        def fail_after_pre_data(**kwargs):
+            kwargs['checkpoint'].mark_section('pre-data')
+            return False
+        mock_restore.side_effect = fail_after_pre_data
+        cfg = with_options(valid_config, state_dir=str(tmp_path), checkpoint=True,
+                           drop_existing=True)
+
+        assert mirror_database(cfg, 'db', mock_logger) is False
+        mock_cleanup.assert_not_called()
+        assert mock_prepare.call_args[0][2] is True
+
+        mock_restore.side_effect = None
+        mock_restore.return_value = True
+        cfg['options']['resume'] = True
+        assert mirror_database(cfg, 'db', mock_logger) is True
+
+        mock_backup.assert_called_once()
+        assert mock_restore.call_args[1]['backup_file'] == str(backup)
+        assert mock_restore.call_args[1]['checkpoint'].sections == {'pre-data'}
+        assert mock_prepare.call_args[0][2] is False
+        mock_cleanup.assert_called_once_with(str(backup), mock_logger)
+        assert not os.listdir(tmp_path / 'checkpoints')
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.restore_backup')
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup')
+    def test_resume_recreates_target_interrupted_in_pre_data(self, mock_backup, mock_prepare,
+                                                             mock_restore, mock_cleanup,
+                                                             valid_config, mock_logger, tmp_path):
+        """Testa que um destino com pre-data incompleto é recriado na retomada"""
+        backup = tmp_path / 'db.dump'
+        backup.write_bytes(b'dump')
+        mock_backup.return_value = str(backup)
+        mock_restore.return_value = False
+        cfg = with_options(valid_config, state_dir=str(tmp_path), checkpoint=True,
+                           drop_existing=False)
+
+        assert mirror_database(cfg, 'db', mock_logger) is False
+
+        mock_restore.return_value = True
+        cfg['options']['resume'] = True
+        assert mirror_database(cfg, 'db', mock_logger) is True
+
+        progress = mock_restore.call_args[1]['checkpoint']
+        assert progress.prepared and not progress.started
+        assert mock_prepare.call_args[0][2] is True
+        mock_logger.warning.assert_called()
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.restore_backup')
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup')
+    def test_resume_skips_finished_targets(self, mock_backup, mock_prepare, mock_restore,
+                                           mock_cleanup, valid_config, mock_logger, tmp_path):
+        """Testa que apenas o destino que falhou é restaurado de novo"""
+        backup = tmp_path / 'db.dump'
+        backup.write_bytes(b'dump')
+        mock_backup.return_value = str(backup)
+        mock_restore.side_effect = lambda **kwargs: kwargs['host'] == 'qa1'
+        valid_config['target'] = TestMultipleTargets.targets()
+        cfg = with_options(valid_config, state_dir=str(tmp_path), checkpoint=True)
+
+        assert mirror_database(cfg, 'db', mock_logger) is False
+
+        mock_restore.reset_mock()
+        mock_restore.side_effect = None
+        mock_restore.return_value = True
+        cfg['options']['resume'] = True
+        assert mirror_database(cfg, 'db', mock_logger) is True
+
+        assert [c[1]['host'] for c in mock_restore.call_args_list] == ['qa2']
+        mock_cleanup.assert_called_once()
+
+
+class TestSubsetFlow:
+    """Testes para espelhamento com filtros de dados"""
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.load_filtered', return_value=True)
+    @patch('pg_mirror.mirror.restore_backup')
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup', return_value='/tmp/db.dump')
+    @patch('pg_mirror.subset.list_foreign_keys', return_value=[
+        (('public', 'users'), 'users_last_order_fk', ('public', 'orders')),
+    ])
+    @patch('pg_mirror.subset.list_tables', return_value=[
+        ('public', 'orders', 'r', 100),
+        ('public', 'users', 'r', 10),
+        ('audit', 'log', 'r', 1000),
+        ('public', 'orders_id_seq', 'S', 0),
+    ])
+    def test_filtered_data_and_predicates(self, mock_tables, mock_fks, mock_backup, mock_prepare,
+                                          mock_restore, mock_load, mock_cleanup,
+                                          valid_config, mock_logger):
+        """Testa dump sem os dados filtrados e cópia das tabelas com WHERE após os dados"""
+        mock_restore.side_effect = lambda **kwargs: kwargs['after_data']()
+        cfg = with_options(valid_config, exclude=['audit'],
+                           where={('public', 'orders'): 'created_at > now() - interval \'30 days\''})
+
+        assert mirror_database(cfg, 'db', mock_logger) is True
+
+        assert mock_backup.call_args[1]['exclude_data'] == [('audit', 'log'), ('public', 'orders')]
+        mock_load.assert_called_once()
+        assert mock_load.call_args[0][3] == {
+            ('public', 'orders'): "created_at > now() - interval '30 days'"
+        }
+        keep = mock_restore.call_args[1]['keep']
+        assert not keep(TocEntry(1, 'FK CONSTRAINT', 'public', 'users_last_order_fk', '',
+                                 table='users'))
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.restore_backup', return_value=True)
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup', return_value='/tmp/db.dump')
+    def test_no_filters_dumps_everything(self, mock_backup, mock_prepare, mock_restore,
+                                         mock_cleanup, valid_config, mock_logger):
+        """Testa que sem filtros o dump e o restore não mudam"""
+        mirror_database(with_options(valid_config), 'db', mock_logger)
+
+        assert mock_backup.call_args[1]['exclude_data'] is None
+        assert mock_restore.call_args[1]['after_data'] is None
+
+
+class TestSpoolPreflight:
+    """Testes para a verificação de espaço antes do backup"""
+
+    @patch('pg_mirror.mirror.create_backup')
+    @patch('pg_mirror.mirror.check_free_space', side_effect=SpoolSpaceError('sem espaço'))
+    @patch('pg_mirror.mirror.database_size', return_value=10 * 1024 ** 3)
+    def test_fails_before_dump(self, mock_size, mock_check, mock_backup,
+                               valid_config, mock_logger, tmp_path):
+        """Testa que o backup nem começa sem espaço"""
+        cfg = with_options(valid_config, spool_dir=str(tmp_path))
+
+        assert mirror_database(cfg, 'db', mock_logger) is False
+        mock_backup.assert_not_called()
+        assert mock_check.call_args[0][0] == str(tmp_path)
+
+    @patch('pg_mirror.mirror.stream_mirror', return_value=True)
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup')
+    @patch('pg_mirror.mirror.check_free_space', side_effect=SpoolSpaceError('sem espaço'))
+    @patch('pg_mirror.mirror.database_size', return_value=10 * 1024 ** 3)
+    def test_falls_back_to_stream(self, mock_size, mock_check, mock_backup, mock_prepare,
+                                  mock_stream, valid_config, mock_logger, tmp_path):
+        """Testa recurso ao streaming com spool_fallback=stream"""
+        cfg = with_options(valid_config, spool_dir=str(tmp_path), spool_fallback='stream')
+
+        assert mirror_database(cfg, 'db', mock_logger) is True
+        mock_backup.assert_not_called()
+        mock_stream.assert_called_once()
+
+    @patch('pg_mirror.mirror.cleanup_backup')
+    @patch('pg_mirror.mirror.restore_backup', return_value=True)
+    @patch('pg_mirror.mirror.prepare_target')
+    @patch('pg_mirror.mirror.create_backup')
+    @patch('pg_mirror.mirror.database_size', return_value=1000)
+    def test_records_ratio(self, mock_size, mock_backup, mock_prepare, mock_restore,
+                           mock_cleanup, valid_config, mock_logger, tmp_path):
+        """Testa que a razão observada alimenta a próxima estimativa"""
+        dump = tmp_path / 'spool' / 'db.dump'
+        def create(**kwargs):
+            dump.write_bytes(b'x' * 250)
+            return str(dump)
+        mock_backup.side_effect = create
+        cfg = with_options(valid_config, spool_dir=str(tmp_path / 'spool'),
+                           state_dir=str(tmp_path / 'state'))
+
+        mirror_database(cfg, 'db', mock_logger)
+
+        assert mock_backup.call_args[1]['output_dir'] == str(tmp_path / 'spool')
+        key = ratio_key(valid_config['source'], 'db', 'gzip:6')
+        assert expected_ratio(str(tmp_path / 'state'), key, 'gzip') == 0.25
@@ -0,0 +1,197 @@
+"""
+Testes para o módulo pg_mirror.openmetrics
+"""
+import json
+import urllib.request
+import pytest
+from pg_mirror import openmetrics
+from pg_mirror.openmetrics import (
+    Counter, Gauge, Histogram, Registry, exporting, serve, state_path, write_textfile
+)
+from pg_mirror.restore import _count_restored
+
+
+@pytest.fixture
+def registry():
+    """Registry isolado com uma métrica de cada tipo"""
+    registry = Registry()
+    registry.register(Counter('demo_bytes', 'Bytes', ['database']))
+    registry.register(Gauge('demo_last', 'Último valor'))
+    registry.register(Histogram('demo_seconds', 'Duração', ['phase'], buckets=(1, 10)))
+    return registry
+
+
+def _metric(registry, name):
+    return next(m for m in registry.metrics if m.name == name)
+
+
+class TestRender:
+    """Testes para Registry.render"""
+
+    def test_openmetrics_format(self, registry):
+        """Testa família sem _total, amostra com _total e # EOF"""
+        _metric(registry, 'demo_bytes').inc(512, database='app')
+
+        text = registry.render()
+
+        assert '# TYPE demo_bytes counter' in text
+        assert 'demo_bytes_total{database="app"} 512' in text
+        assert text.endswith('# EOF\n')
+
+    def test_prometheus_format(self, registry):
+        """Testa formato do textfile collector (família com _total, sem # EOF)"""
+        _metric(registry, 'demo_bytes').inc(database='app')
+
+        text = registry.render(openmetrics=False)
+
+        assert '# TYPE demo_bytes_total counter' in text
+        assert '# EOF' not in text
+
+    def test_histogram_buckets(self, registry):
+        """Testa buckets cumulativos, soma e contagem"""
+        histogram = _metric(registry, 'demo_seconds')
+        histogram.observe(0.5, phase='backup')
+        histogram.observe(5, phase='backup')
+
+        text = registry.render()
+
+        assert 'demo_seconds_bucket{phase="backup",le="1"} 1' in text
+        assert 'demo_seconds_bucket{phase="backup",le="10"} 2' in text
+        assert 'demo_seconds_bucket{phase="backup",le="+Inf"} 2' in text
+        assert 'demo_seconds_sum{phase="backup"} 5.5' in text
+        assert 'demo_seconds_count{phase="backup"} 2' in text
+
+    def test_label_escaping(self, registry):
+        """Testa escape de aspas em valores de label"""
+        _metric(registry, 'demo_bytes').inc(database='a"b')
+
+        assert 'database="a\\"b"' in registry.render()
+
+    def test_wrong_labels(self, registry):
+        """Testa rejeição de labels diferentes dos declarados"""
+        with pytest.raises(ValueError):
+            _metric(registry, 'demo_bytes').inc(table='x')
+
+
+class TestMerge:
+    """Testes para Registry.merge"""
+
+    def test_accumulates_counters_and_histograms(self, registry):
+        """Testa soma com a execução anterior; gauge atual prevalece"""
+        previous = Registry()
+        previous.register(Counter('demo_bytes', 'Bytes', ['database'])).inc(100, database='app')
+        previous.register(Gauge('demo_last', 'Último valor')).set(1)
+        previous.register(Histogram('demo_seconds', 'Duração', ['phase'],
+                                    buckets=(1, 10))).observe(2, phase='backup')
+        _metric(registry, 'demo_bytes').inc(50, database='app')
+        _metric(registry, 'demo_last').set(2)
+        _metric(registry, 'demo_seconds').observe(20, phase='backup')
+
+        registry.merge(json.loads(json.dumps(previous.snapshot())))
+        text = registry.render()
+
+        assert 'demo_bytes_total{database="app"} 150' in text
+        assert 'demo_last 2' in text
+        assert 'demo_seconds_count{phase="backup"} 2' in text
+        assert 'demo_seconds_bucket{phase="backup",le="10"} 1' in text
+
+
+class TestTextfile:
+    """Testes para write_textfile e exporting"""
+
+    def test_write_textfile(self, registry, tmp_path):
+        """Testa gravação no formato Prometheus"""
+        path = tmp_path / 'pg_mirror.prom'
+        _metric(registry, 'demo_bytes').inc(database='app')
+
+        write_textfile(str(path), registry)
+
+        assert 'demo_bytes_total{database="app"} 1' in path.read_text()
+        assert not list(tmp_path.glob('*.tmp'))
+
+    def test_state_path(self):
+        """Testa arquivo de estado ao lado do .prom"""
+        assert state_path('/var/lib/textfile/pg_mirror.prom') == \
+            '/var/lib/textfile/pg_mirror.state.json'
+
+    def test_exporting_accumulates_runs(self, mock_logger, tmp_path):
+        """Testa que execuções seguidas acumulam pg_mirror_runs_total"""
+        path = str(tmp_path / 'pg_mirror.prom')
+
+        with exporting(mock_logger, textfile=path):
+            openmetrics.BACKUP_BYTES.inc(100, database='app')
+        with pytest.raises(SystemExit):
+            with exporting(mock_logger, textfile=path):
+                openmetrics.BACKUP_BYTES.inc(50, database='app')
+                raise SystemExit(1)
+
+        text = open(path).read()
+        assert 'pg_mirror_runs_total{status="success"} 1' in text
+        assert 'pg_mirror_runs_total{status="failure"} 1' in text
+        assert 'pg_mirror_backup_bytes_total{database="app"} 150' in text
+        assert 'pg_mirror_last_run_duration_seconds' in text
+        with open(state_path(path)) as f:
+            assert 'pg_mirror_runs' in json.load(f)
+
+    def test_exporting_disabled(self, mock_logger, tmp_path):
+        """Testa que sem textfile nem porta nada é gravado"""
+        with exporting(mock_logger, registry=Registry()):
+            pass
+
+        assert not list(tmp_path.iterdir())
+
+
+class TestServe:
+    """Testes para o endpoint HTTP"""
+
+    def _get(self, server, path='/metrics', accept=None):
+        port = server.server_address[1]
+        request = urllib.request.Request(f'http://127.0.0.1:{port}{path}')
+        if accept:
+            request.add_header('Accept', accept)
+        return urllib.request.urlopen(request, timeout=5)
+
+    def test_content_negotiation(self, registry):
+        """Testa OpenMetrics com Accept e Prometheus sem"""
+        _metric(registry, 'demo_bytes').inc(database='app')
+        server = serve(0, registry=registry)
+        try:
+            with self._get(server, accept='application/openmetrics-text; version=1.0.0') as r:
+                assert r.headers['Content-Type'].startswith('application/openmetrics-text')
+                assert r.read().decode().endswith('# EOF\n')
+            with self._get(server) as r:
+                assert r.headers['Content-Type'].startswith('text/plain')
+                assert 'demo_bytes_total{database="app"} 1' in r.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_unknown_path(self, registry):
+        """Testa 404 fora de /metrics"""
+        server = serve(0, registry=registry)
+        try:
+            with pytest.raises(urllib.error.HTTPError) as exc:
+                self._get(server, path='/outro')
+            assert exc.value.code == 404
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestInstrumentation:
+    """Testes para os pontos instrumentados"""
+
+    def test_restored_objects_ignore_finished_items(self):
+        """Testa que "finished item" do restore paralelo não é contado de novo"""
+        before = openmetrics.RESTORED_OBJECTS.snapshot()
+
+        _count_restored('om_app', 'restore', 'public.a',
+                        'pg_restore: processing data for table "public.a"')
+        _count_restored('om_app', 'finished', 'TABLE DATA a',
+                        'pg_restore: finished item 10 TABLE DATA a')
+        _count_restored('om_app', 'create', 'TABLE a', 'pg_restore: creating TABLE "public.a"')
+
+        values = {tuple(k): v for k, v in openmetrics.RESTORED_OBJECTS.snapshot()}
+        assert values[('om_app', 'data')] == 1
+        assert values[('om_app', 'schema')] == 1
+        assert ('om_app', 'data') not in {tuple(k) for k, _ in before}
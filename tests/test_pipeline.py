@@ -0,0 +1,120 @@
+"""
+Testes para o módulo pg_mirror.pipeline
+"""
+import subprocess
+import pytest
+from unittest.mock import patch, MagicMock
+from pg_mirror.pipeline import pipeline_mirror, _build_data_items
+
+
+SOURCE = {'host': 'source.example.com', 'port': 5432, 'user': 'postgres', 'password': 'src_pass'}
+TARGET = {'host': 'target.example.com', 'port': 5432, 'user': 'postgres', 'password': 'tgt_pass'}
+
+TABLES = [
+    ('public', 'events', 'r', 5000),
+    ('public', 'users', 'r', 300),
+    ('public', 'users_id_seq', 'S', 8192),
+]
+
+
+class TestBuildDataItems:
+    """Testes para _build_data_items"""
+
+    def test_one_item_per_table(self):
+        """Testa que cada tabela vira um item, na ordem recebida"""
+        items = _build_data_items(TABLES)
+        labels = [label for label, _ in items]
+
+        assert labels[0] == 'public.events'
+        assert labels[1] == 'public.users'
+        assert items[0][1] == ['-t', '"public"."events"']
+
+    def test_sequences_grouped_with_large_objects(self):
+        """Testa que sequências formam um item extra com -b"""
+        items = _build_data_items(TABLES)
+
+        assert len(items) == 3
+        assert items[-1][1] == ['-t', '"public"."users_id_seq"', '-b']
+
+    def test_large_objects_without_sequences(self):
+        """Testa item de large objects quando não há sequências"""
+        items = _build_data_items([('public', 'users', 'r', 10)])
+
+        assert items[-1][1] == ['-b', '--exclude-table-data', '*']
+
+
+class TestPipelineMirror:
+    """Testes para pipeline_mirror"""
+
+    @patch('pg_mirror.snapshot.release_snapshot')
+    @patch('pg_mirror.snapshot.export_snapshot')
+    @patch('pg_mirror.pipeline.list_tables')
+    @patch('pg_mirror.pipeline.run_restore')
+    @patch('pg_mirror.pipeline.run_dump')
+    def test_successful_pipeline(self, mock_dump, mock_restore, mock_tables,
+                                 mock_export, mock_release, mock_logger):
+        """Testa pipeline completo com schema, dados e post-data"""
+        mock_export.return_value = (MagicMock(), 'snap-1')
+        mock_tables.return_value = TABLES
+        mock_restore.return_value = True
+
+        result = pipeline_mirror(SOURCE, TARGET, 'test_db', 2, mock_logger)
+
+        assert result is True
+        # pre-data + post-data + 3 itens de dados
+        assert mock_dump.call_count == 5
+        assert mock_restore.call_count == 5
+        # Todos os dumps usam o mesmo snapshot
+        assert all(call[0][2] == 'snap-1' for call in mock_dump.call_args_list)
+        mock_release.assert_called_once()
+
+    @patch('pg_mirror.snapshot.release_snapshot')
+    @patch('pg_mirror.snapshot.export_snapshot')
+    @patch('pg_mirror.pipeline.list_tables')
+    @patch('pg_mirror.pipeline.run_restore')
+    @patch('pg_mirror.pipeline.run_dump')
+    def test_post_data_runs_last(self, mock_dump, mock_restore, mock_tables,
+                                 mock_export, mock_release, mock_logger):
+        """Testa que o post-data é restaurado após todos os dados"""
+        mock_export.return_value = (MagicMock(), 'snap-1')
+        mock_tables.return_value = TABLES
+        mock_restore.return_value = True
+
+        pipeline_mirror(SOURCE, TARGET, 'test_db', 2, mock_logger)
+
+        paths = [call[0][2] for call in mock_restore.call_args_list]
+        assert paths[0].endswith('pre-data.dump')
+        assert paths[-1].endswith('post-data.dump')
+
+    @patch('pg_mirror.snapshot.release_snapshot')
+    @patch('pg_mirror.snapshot.export_snapshot')
+    @patch('pg_mirror.pipeline.list_tables')
+    @patch('pg_mirror.pipeline.run_restore')
+    @patch('pg_mirror.pipeline.run_dump')
+    def test_table_dump_failure(self, mock_dump, mock_restore, mock_tables,
+                                mock_export, mock_release, mock_logger):
+        """Testa que falha no dump de uma tabela falha o pipeline"""
+        mock_export.return_value = (MagicMock(), 'snap-1')
+        mock_tables.return_value = TABLES
+        mock_restore.return_value = True
+
+        def dump(source, database, snapshot, path, *args):
+            if '--section=data' in args:
+                raise subprocess.CalledProcessError(1, 'pg_dump', stderr='boom')
+        mock_dump.side_effect = dump
+
+        result = pipeline_mirror(SOURCE, TARGET, 'test_db', 2, mock_logger)
+
+        assert result is False
+        mock_logger.error.assert_called()
+        mock_release.assert_called_once()
+
+    @patch('pg_mirror.snapshot.export_snapshot')
+    def test_snapshot_failure(self, mock_export, mock_logger):
+        """Testa falha ao exportar snapshot"""
+        mock_export.side_effect = RuntimeError("sem snapshot")
+
+        result = pipeline_mirror(SOURCE, TARGET, 'test_db', 2, mock_logger)
+
+        assert result is False
+        mock_logger.error.assert_called_once()
@@ -0,0 +1,71 @@
+"""
+Testes para o módulo pg_mirror.planner
+"""
+from unittest.mock import patch
+from pg_mirror.database import QueryError
+from pg_mirror.planner import RestorePlan, plan_restore, free_connections, auto_restore_plan
+
+
+MB = 1024 * 1024
+TARGET = {'host': 'staging.db', 'port': 5432, 'user': 'postgres', 'password': 'pw'}
+
+
+class TestPlanRestore:
+    """Testes para plan_restore"""
+
+    def test_tiny_database_single_transaction(self):
+        """Testa restore serial em transação única para bancos pequenos"""
+        plan = plan_restore([1 * MB, 2 * MB], cpu_count=64)
+
+        assert plan.single_transaction is True
+        assert plan.data_jobs == 1
+
+    def test_limited_by_cpu(self):
+        """Testa que os jobs não passam das CPUs locais"""
+        plan = plan_restore([500 * MB] * 20, cpu_count=4)
+
+        assert plan.data_jobs == 4
+        assert plan.post_data_jobs == 4
+
+    def test_limited_by_largest_table(self):
+        """Testa que uma tabela dominante limita os jobs de dados"""
+        plan = plan_restore([900 * MB] + [10 * MB] * 30, cpu_count=64)
+
+        assert plan.data_jobs == 2  # ceil(1200 / 900)
+        assert plan.post_data_jobs == 32  # MAX_JOBS
+
+    def test_limited_by_connections(self):
+        """Testa metade das conexões livres como teto"""
+        plan = plan_restore([500 * MB] * 20, cpu_count=64, available_connections=6)
+
+        assert plan.data_jobs == 3
+        assert plan.post_data_jobs == 3
+
+    def test_fixed(self):
+        """Testa plano fixo (parallel_jobs numérico)"""
+        plan = RestorePlan.fixed(8)
+
+        assert (plan.data_jobs, plan.post_data_jobs, plan.single_transaction) == (8, 8, False)
+
+
+class TestFreeConnections:
+    """Testes para free_connections"""
+
+    @patch('pg_mirror.planner.run_query', return_value=[('100', '3', '17')])
+    def test_subtracts_reserved_and_backends(self, mock_query, mock_logger):
+        """Testa conexões livres no destino"""
+        assert free_connections(TARGET, mock_logger) == 80
+
+    @patch('pg_mirror.planner.run_query', side_effect=QueryError('denied'))
+    def test_unknown_on_error(self, mock_query, mock_logger):
+        """Testa que falha na consulta não impede o plano"""
+        assert free_connections(TARGET, mock_logger) is None
+        mock_logger.warning.assert_called_once()
+
+    @patch('pg_mirror.planner.free_connections', return_value=None)
+    def test_auto_plan_without_connection_info(self, mock_free, mock_logger):
+        """Testa plano automático sem informação de conexões"""
+        plan = auto_restore_plan(TARGET, [500 * MB] * 4, mock_logger)
+
+        assert 1 <= plan.data_jobs <= 4
+        mock_logger.info.assert_called_once()
@@ -0,0 +1,64 @@
+"""
+Testes para o módulo pg_mirror.postdata
+"""
+from pg_mirror.postdata import (
+    MB,
+    MIN_MAINTENANCE_MB,
+    plan_post_data,
+    session_options
+)
+from pg_mirror.toc import ArchiveToc, TocEntry
+
+
+def _toc(*sizes):
+    """TOC com um índice por tamanho informado"""
+    return ArchiveToc(entries=[
+        TocEntry(i, 'INDEX', 'public', f'idx{i}', f'{i}; 1259 1 INDEX public idx{i} u', size=size)
+        for i, size in enumerate(sizes)
+    ])
+
+
+class TestPlanPostData:
+    """Testes para plan_post_data"""
+
+    def test_small_builds_stay_in_rest(self):
+        """Testa que índices pequenos não viram builds individuais"""
+        builds, rest_memory = plan_post_data(_toc(10 * MB, 20 * MB), budget_mb=1024, jobs=4)
+
+        assert builds == []
+        assert rest_memory == 256
+
+    def test_largest_first_with_capped_memory(self):
+        """Testa ordem e memória limitada a metade do orçamento"""
+        builds, _ = plan_post_data(_toc(300 * MB, 8000 * MB, 500 * MB), budget_mb=2048, jobs=4)
+
+        assert [b.entry.name for b in builds] == ['idx1', 'idx2', 'idx0']
+        assert [b.memory_mb for b in builds] == [1024, 500, 300]
+
+    def test_parallel_workers_for_huge_builds(self):
+        """Testa workers paralelos apenas em builds muito grandes"""
+        builds, _ = plan_post_data(_toc(8000 * MB, 300 * MB), budget_mb=4096, jobs=2)
+
+        assert builds[0].workers == 4
+        assert builds[1].workers == 0
+
+    def test_minimum_memory(self):
+        """Testa memória mínima por sessão"""
+        builds, rest_memory = plan_post_data(_toc(300 * MB), budget_mb=16, jobs=4)
+
+        assert builds[0].memory_mb == MIN_MAINTENANCE_MB
+        assert rest_memory == MIN_MAINTENANCE_MB
+
+
+class TestSessionOptions:
+    """Testes para session_options"""
+
+    def test_with_workers(self):
+        """Testa PGOPTIONS com memória e workers"""
+        assert session_options(512, 2) == (
+            '-c maintenance_work_mem=512MB -c max_parallel_maintenance_workers=2'
+        )
+
+    def test_memory_only(self):
+        """Testa PGOPTIONS apenas com memória"""
+        assert session_options(64) == '-c maintenance_work_mem=64MB'
@@ -0,0 +1,115 @@
+"""
+Testes para o módulo pg_mirror.progress
+"""
+import subprocess
+import sys
+import pytest
+from pg_mirror.progress import parse_event, ProgressTracker, run_with_progress
+
+
+class TestParseEvent:
+    """Testes para parse_event"""
+
+    def test_dump_table(self):
+        """Testa linha de dump de dados de tabela"""
+        line = 'pg_dump: dumping contents of table "public.orders"'
+        assert parse_event(line) == ('dump', 'public.orders')
+
+    def test_restore_data(self):
+        """Testa linha de restore serial e paralelo"""
+        assert parse_event('pg_restore: processing data for table "public.orders"') == \
+            ('restore', 'public.orders')
+        assert parse_event('pg_restore: finished item 3012 TABLE DATA orders') == \
+            ('finished', 'TABLE DATA orders')
+
+    def test_other_lines_ignored(self):
+        """Testa que linhas sem evento retornam None"""
+        assert parse_event('pg_dump: reading extensions') is None
+
+
+class TestProgressTracker:
+    """Testes para ProgressTracker"""
+
+    def test_tail_is_bounded(self, mock_logger):
+        """Testa que apenas as últimas linhas ficam em memória"""
+        tracker = ProgressTracker('Backup', mock_logger, tail_lines=3)
+        for i in range(10):
+            tracker.feed(f'linha {i}\n')
+
+        assert list(tracker.tail) == ['linha 7', 'linha 8', 'linha 9']
+
+    def test_errors_survive_tail(self, mock_logger):
+        """Testa que erros antigos continuam no diagnóstico"""
+        tracker = ProgressTracker('Restore', mock_logger, tail_lines=2)
+        tracker.feed('pg_restore: error: could not execute query: ERROR: boom\n')
+        for i in range(5):
+            tracker.feed(f'linha {i}\n')
+
+        output = tracker.output()
+        assert output.startswith('pg_restore: error')
+        assert output.endswith('linha 4')
+
+    def test_counts_objects_and_reports(self, mock_logger):
+        """Testa contagem de objetos e relatório com MB/s"""
+        tracker = ProgressTracker('Backup', mock_logger, size_probe=lambda: 2 * 1024 * 1024)
+        tracker.feed('pg_dump: dumping contents of table "public.a"\n')
+        tracker.feed('pg_dump: dumping contents of table "public.b"\n')
+        tracker.report()
+
+        message = mock_logger.info.call_args[0][0]
+        assert tracker.objects == 2
+        assert '2 objeto(s)' in message
+        assert '2.0 MB' in message
+        assert 'MB/s' in message
+        assert 'public.b' in message
+
+    def test_parallel_item_counted_once(self, mock_logger):
+        """Testa que o "finished item" do restore paralelo não conta de novo"""
+        events = []
+        tracker = ProgressTracker('Restore', mock_logger,
+                                  on_event=lambda *event: events.append(event[0]))
+        tracker.feed('pg_restore: processing data for table "public.a"\n')
+        tracker.feed('pg_restore: creating INDEX "public.a_idx"\n')
+        tracker.feed('pg_restore: finished item 10 TABLE DATA a\n')
+        tracker.feed('pg_restore: finished item 11 INDEX a_idx\n')
+
+        assert tracker.objects == 2
+        assert tracker.current == 'INDEX "public.a_idx"'
+        assert events == ['restore', 'create', 'finished', 'finished']
+
+    def test_on_event_callback(self, mock_logger):
+        """Testa que cada evento é repassado ao callback com a linha original"""
+        events = []
+        tracker = ProgressTracker('Restore', mock_logger,
+                                  on_event=lambda *event: events.append(event))
+        tracker.feed('pg_restore: processing data for table "public.a"\n')
+        tracker.feed('pg_restore: reading dependency data\n')
+
+        assert events == [('restore', 'public.a',
+                           'pg_restore: processing data for table "public.a"')]
+
+
+class TestRunWithProgress:
+    """Testes para run_with_progress"""
+
+    def test_streams_stderr(self, mock_logger):
+        """Testa leitura incremental do stderr de um processo real"""
+        script = (
+            "import sys\n"
+            "for t in 'abc':\n"
+            "    print(f'pg_dump: dumping contents of table \"public.{t}\"', file=sys.stderr)\n"
+        )
+        tracker = run_with_progress([sys.executable, '-c', script], None, mock_logger, 'Backup')
+
+        assert tracker.objects == 3
+        assert tracker.current == 'public.c'
+
+    def test_failure_raises_with_output(self, mock_logger):
+        """Testa que código de saída != 0 gera CalledProcessError com a cauda"""
+        script = "import sys; print('ERROR: boom', file=sys.stderr); sys.exit(2)"
+
+        with pytest.raises(subprocess.CalledProcessError) as exc:
+            run_with_progress([sys.executable, '-c', script], None, mock_logger, 'Restore')
+
+        assert exc.value.returncode == 2
+        assert 'ERROR: boom' in exc.value.stderr
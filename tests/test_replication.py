@@ -0,0 +1,266 @@
+"""
+Testes para o módulo pg_mirror.replication
+"""
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from pg_mirror.database import QueryError
+from pg_mirror.openmetrics import REPLICATION_LAG_BYTES, REPLICATION_UP
+from pg_mirror.replication import (
+    ReplicationError,
+    replication_name,
+    check_source,
+    create_publication,
+    create_slot,
+    create_subscription,
+    setup_sync,
+    replication_lag,
+    check_lag,
+    monitor_lag
+)
+
+
+SOURCE = {'host': 'source.example.com', 'port': 5432, 'user': 'postgres', 'password': 'src_pass'}
+TARGET = {'host': 'target.example.com', 'port': 5433, 'user': 'admin', 'password': 'tgt_pass'}
+
+
+def test_replication_name():
+    """Testa nome válido para slot (minúsculas, [a-z0-9_], até 63 caracteres)"""
+    assert replication_name('Meu-Banco') == 'pg_mirror_meu_banco'
+    assert len(replication_name('x' * 100)) == 63
+
+
+class TestCheckSource:
+    """Testes para check_source"""
+
+    @patch('pg_mirror.replication.run_query')
+    def test_requires_logical_wal_level(self, mock_query, mock_logger):
+        """Testa que wal_level diferente de logical bloqueia a sincronização"""
+        mock_query.side_effect = [[('replica',)], []]
+
+        with pytest.raises(ReplicationError, match='wal_level'):
+            check_source(SOURCE, 'db', mock_logger)
+
+    @patch('pg_mirror.replication.run_query')
+    def test_rejects_tables_without_identity(self, mock_query, mock_logger):
+        """Testa que tabelas sem chave primária bloqueiam a publicação"""
+        mock_query.side_effect = [[('logical',)], [('public', 'events')]]
+
+        with pytest.raises(ReplicationError, match='public.events'):
+            check_source(SOURCE, 'db', mock_logger)
+
+    @patch('pg_mirror.replication.run_query')
+    def test_query_error(self, mock_query, mock_logger):
+        """Testa que erro de consulta vira ReplicationError"""
+        mock_query.side_effect = QueryError('permission denied')
+
+        with pytest.raises(ReplicationError):
+            check_source(SOURCE, 'db', mock_logger)
+
+
+class TestCreatePublication:
+    """Testes para create_publication"""
+
+    @patch('pg_mirror.replication.run_query')
+    def test_creates_for_all_tables(self, mock_query, mock_logger):
+        """Testa criação da publicação para todas as tabelas"""
+        mock_query.side_effect = [[], []]
+
+        create_publication(SOURCE, 'db', 'pg_mirror_db', mock_logger)
+
+        assert mock_query.call_args[0][5] == "CREATE PUBLICATION pg_mirror_db FOR ALL TABLES;"
+
+    @patch('pg_mirror.replication.run_query', return_value=[('1',)])
+    def test_existing_publication_reused(self, mock_query, mock_logger):
+        """Testa que uma publicação existente é reaproveitada"""
+        create_publication(SOURCE, 'db', 'pg_mirror_db', mock_logger)
+
+        mock_query.assert_called_once()
+
+
+class TestCreateSlot:
+    """Testes para create_slot"""
+
+    @patch('subprocess.Popen')
+    def test_returns_exported_snapshot(self, mock_popen, mock_logger):
+        """Testa que o snapshot vem da sessão de replicação que criou o slot"""
+        session = MagicMock()
+        session.stdout.readline.return_value = (
+            'pg_mirror_db|0/16B1970|00000003-00000002-1|pgoutput\n'
+        )
+        mock_popen.return_value = session
+
+        proc, snapshot = create_slot(SOURCE, 'db', mock_logger, slot='pg_mirror_db')
+
+        assert proc is session
+        assert snapshot == '00000003-00000002-1'
+        assert "dbname='db' replication=database" in mock_popen.call_args[0][0]
+        sent = session.stdin.write.call_args[0][0]
+        assert 'CREATE_REPLICATION_SLOT pg_mirror_db LOGICAL pgoutput EXPORT_SNAPSHOT' in sent
+        assert mock_popen.call_args[1]['env']['PGPASSWORD'] == 'src_pass'
+
+    @patch('subprocess.Popen')
+    def test_failure_raises(self, mock_popen, mock_logger):
+        """Testa que falha na criação do slot gera RuntimeError com o erro do servidor"""
+        session = MagicMock()
+        session.stdout.readline.return_value = ''
+        session.communicate.return_value = ('', 'ERROR: replication slot "x" already exists')
+        mock_popen.return_value = session
+
+        with pytest.raises(RuntimeError, match='already exists'):
+            create_slot(SOURCE, 'db', mock_logger, slot='x')
+
+
+class TestCreateSubscription:
+    """Testes para create_subscription"""
+
+    @patch('pg_mirror.replication.run_query', return_value=[])
+    def test_uses_existing_slot_without_copy(self, mock_query, mock_logger):
+        """Testa assinatura sobre o slot existente, sem cópia inicial"""
+        source = dict(SOURCE, password="it's", replication_host='10.0.0.5')
+
+        create_subscription(source, TARGET, 'db', 'pg_mirror_db', mock_logger)
+
+        args = mock_query.call_args[0]
+        assert args[:3] == ('target.example.com', 5433, 'db')
+        assert "create_slot = false" in args[5]
+        assert "slot_name = 'pg_mirror_db'" in args[5]
+        assert "copy_data = false" in args[5]
+        assert "host=''10.0.0.5''" in args[5]
+        assert "password=''it\\''s''" in args[5]
+
+
+class TestSetupSync:
+    """Testes para setup_sync"""
+
+    @pytest.fixture
+    def cfg(self):
+        return {'source': dict(SOURCE), 'target': dict(TARGET), 'options': {}}
+
+    @patch('pg_mirror.replication.create_source_backup')
+    @patch('pg_mirror.replication.subscription_exists', return_value=True)
+    def test_existing_subscription_skips_copy(self, mock_exists, mock_backup, cfg, mock_logger):
+        """Testa que uma assinatura existente dispensa a cópia inicial"""
+        assert setup_sync(cfg, 'db', mock_logger) is True
+        mock_backup.assert_not_called()
+
+    @patch('pg_mirror.replication.create_publication')
+    @patch('pg_mirror.replication.check_source', side_effect=ReplicationError('wal_level'))
+    @patch('pg_mirror.replication.subscription_exists', return_value=False)
+    def test_source_not_ready(self, mock_exists, mock_check, mock_publication, cfg, mock_logger):
+        """Testa que a origem sem requisitos aborta antes da publicação"""
+        assert setup_sync(cfg, 'db', mock_logger) is False
+        mock_publication.assert_not_called()
+
+    @patch('pg_mirror.replication.create_subscription')
+    @patch('pg_mirror.replication.cleanup_backup')
+    @patch('pg_mirror.replication.restore_to_target', return_value=True)
+    @patch('pg_mirror.replication.create_source_backup', return_value='/tmp/db.dump')
+    @patch('pg_mirror.replication.SnapshotCoordinator')
+    @patch('pg_mirror.replication.drop_slot')
+    @patch('pg_mirror.replication.create_publication')
+    @patch('pg_mirror.replication.check_source')
+    @patch('pg_mirror.replication.subscription_exists', return_value=False)
+    def test_initial_copy_in_slot_snapshot(self, mock_exists, mock_check, mock_publication,
+                                           mock_drop, mock_coordinator, mock_backup, mock_restore,
+                                           mock_cleanup, mock_subscription, cfg, mock_logger):
+        """Testa backup no snapshot do slot, restore padrão e assinatura ao final"""
+        coordinator = mock_coordinator.return_value
+        coordinator.snapshot = 'snap-1'
+
+        assert setup_sync(cfg, 'db', mock_logger) is True
+
+        assert mock_coordinator.call_args[1]['keepalive'] is None
+        assert mock_backup.call_args[1] == {'snapshot': 'snap-1'}
+        coordinator.close.assert_called_once()
+        mock_cleanup.assert_called_once_with('/tmp/db.dump', mock_logger)
+        mock_subscription.assert_called_once_with(
+            cfg['source'], cfg['target'], 'db', 'pg_mirror_db', mock_logger
+        )
+        # Apenas o slot órfão de uma tentativa anterior
+        mock_drop.assert_called_once()
+
+    @patch('pg_mirror.replication.create_subscription')
+    @patch('pg_mirror.replication.cleanup_backup')
+    @patch('pg_mirror.replication.restore_to_target', return_value=False)
+    @patch('pg_mirror.replication.create_source_backup', return_value='/tmp/db.dump')
+    @patch('pg_mirror.replication.SnapshotCoordinator')
+    @patch('pg_mirror.replication.drop_slot')
+    @patch('pg_mirror.replication.create_publication')
+    @patch('pg_mirror.replication.check_source')
+    @patch('pg_mirror.replication.subscription_exists', return_value=False)
+    def test_failed_restore_drops_slot(self, mock_exists, mock_check, mock_publication,
+                                       mock_drop, mock_coordinator, mock_backup, mock_restore,
+                                       mock_cleanup, mock_subscription, cfg, mock_logger):
+        """Testa que um slot sem assinatura não fica retendo WAL na origem"""
+        assert setup_sync(cfg, 'db', mock_logger) is False
+
+        mock_subscription.assert_not_called()
+        mock_cleanup.assert_called_once()
+        assert mock_drop.call_count == 2
+
+    @patch('pg_mirror.replication.restore_to_target')
+    @patch('pg_mirror.replication.create_source_backup', side_effect=SystemExit(1))
+    @patch('pg_mirror.replication.SnapshotCoordinator')
+    @patch('pg_mirror.replication.drop_slot')
+    @patch('pg_mirror.replication.create_publication')
+    @patch('pg_mirror.replication.check_source')
+    @patch('pg_mirror.replication.subscription_exists', return_value=False)
+    def test_failed_backup_drops_slot(self, mock_exists, mock_check, mock_publication,
+                                      mock_drop, mock_coordinator, mock_backup, mock_restore,
+                                      cfg, mock_logger):
+        """Testa que falha no backup fecha o snapshot e remove o slot"""
+        with pytest.raises(SystemExit):
+            setup_sync(cfg, 'db', mock_logger)
+
+        mock_coordinator.return_value.close.assert_called_once()
+        mock_restore.assert_not_called()
+        assert mock_drop.call_count == 2
+
+
+class TestReplicationLag:
+    """Testes para replication_lag e check_lag"""
+
+    @patch('pg_mirror.replication.run_query')
+    def test_running_subscription(self, mock_query, mock_logger):
+        """Testa atraso de uma assinatura em execução"""
+        mock_query.side_effect = [[('t', '0/3000000', '2.5')], [('4096',)]]
+
+        lag = replication_lag(SOURCE, TARGET, 'db', mock_logger)
+
+        assert lag.running is True
+        assert lag.lag_bytes == 4096
+        assert lag.lag_seconds == 2.5
+        assert mock_query.call_args_list[0][0][0] == 'target.example.com'
+        assert "'0/3000000'" in mock_query.call_args_list[1][0][5]
+
+    @patch('pg_mirror.replication.run_query', return_value=[('f', '', '')])
+    def test_stopped_worker(self, mock_query, mock_logger):
+        """Testa assinatura sem worker ativo"""
+        lag = replication_lag(SOURCE, TARGET, 'db', mock_logger)
+
+        assert lag.running is False
+        mock_query.assert_called_once()
+
+    @patch('pg_mirror.replication.run_query')
+    def test_check_lag_sets_gauges(self, mock_query, mock_logger):
+        """Testa que check_lag atualiza as métricas de cada banco"""
+        mock_query.side_effect = [[('t', '0/3000000', '1.0')], [('2048',)], [('f', '', '')]]
+
+        assert check_lag(SOURCE, TARGET, ['lag_a', 'lag_b'], mock_logger) is False
+
+        assert REPLICATION_UP.snapshot() == [[['lag_a'], 1], [['lag_b'], 0]]
+        assert [['lag_a'], 2048] in REPLICATION_LAG_BYTES.snapshot()
+        mock_logger.warning.assert_called_once()
+
+    @patch('pg_mirror.replication.write_textfile')
+    @patch('pg_mirror.replication.check_lag')
+    def test_monitor_stops_on_event(self, mock_check, mock_write, mock_logger):
+        """Testa que o monitor encerra quando o evento é sinalizado"""
+        stop = threading.Event()
+        stop.set()
+
+        monitor_lag(SOURCE, TARGET, ['db'], mock_logger, 30, stop, textfile='/tmp/pg.prom')
+
+        mock_check.assert_called_once()
+        mock_write.assert_called_once_with('/tmp/pg.prom')
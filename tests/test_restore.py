@@ -9,7 +9,7 @@ from pg_mirror.restore import restore_backup
 class TestRestoreBackup:
     """Testes para restore_backup"""
     
-    @patch('subprocess.run')
+    @patch('pg_mirror.restore.run_with_progress')
     def test_successful_restore(self, mock_run, mock_logger):
         """Testa restore bem-sucedido"""
         mock_result = MagicMock()
@@ -31,7 +31,7 @@ class TestRestoreBackup:
         assert result is True
         mock_logger.info.assert_called()
     
-    @patch('subprocess.run')
+    @patch('pg_mirror.restore.run_with_progress')
     def test_restore_command_structure(self, mock_run, mock_logger):
         """Testa estrutura do comando pg_restore"""
         mock_result = MagicMock()
@@ -68,7 +68,29 @@ class TestRestoreBackup:
         assert '--no-acl' in cmd
         assert '/tmp/backup.dump' in cmd
     
-    @patch('subprocess.run')
+    @patch('pg_mirror.restore.run_query')
+    @patch('pg_mirror.restore.run_with_progress')
+    def test_progress_reports_target_growth(self, mock_run, mock_query, mock_logger):
+        """Testa que o progresso mede o crescimento do banco de destino"""
+        mock_query.side_effect = [[('1000',)], [('5000',)]]
+        
+        restore_backup(
+            backup_file='/tmp/backup.dump',
+            host='db.example.com',
+            port=5433,
+            database='mydb',
+            user='dbuser',
+            password='secret',
+            parallel_jobs=8,
+            logger=mock_logger
+        )
+        
+        probe = mock_run.call_args[1]['size_probe']
+        assert probe() == 0
+        assert probe() == 4000
+        assert mock_query.call_args[0][:3] == ('db.example.com', 5433, 'mydb')
+    
+    @patch('pg_mirror.restore.run_with_progress')
     def test_restore_with_warnings_succeeds(self, mock_run, mock_logger):
         """Testa que restore com avisos ainda é considerado sucesso"""
         mock_result = MagicMock()
@@ -98,7 +120,7 @@ class TestRestoreBackup:
         assert result is True
         mock_logger.warning.assert_called()
     
-    @patch('subprocess.run')
+    @patch('pg_mirror.restore.run_with_progress')
     def test_restore_with_error_fails(self, mock_run, mock_logger):
         """Testa que restore com erro falha"""
         from subprocess import CalledProcessError
@@ -122,7 +144,7 @@ class TestRestoreBackup:
         assert result is False
         mock_logger.error.assert_called()
     
-    @patch('subprocess.run')
+    @patch('pg_mirror.restore.run_with_progress')
     def test_restore_sets_pgpassword_env(self, mock_run, mock_logger):
         """Testa que PGPASSWORD é definida no ambiente"""
         mock_result = MagicMock()
@@ -147,7 +169,7 @@ class TestRestoreBackup:
         assert 'PGPASSWORD' in env
         assert env['PGPASSWORD'] == 'my_secret_password'
     
-    @patch('subprocess.run')
+    @patch('pg_mirror.restore.run_with_progress')
     def test_restore_uses_parallel_jobs(self, mock_run, mock_logger):
         """Testa que número de jobs paralelos é usado"""
         mock_result = MagicMock()
@@ -172,7 +194,7 @@ class TestRestoreBackup:
         assert '-j' in cmd
         assert '16' in cmd
     
-    @patch('subprocess.run')
+    @patch('pg_mirror.restore.run_with_progress')
     def test_restore_logs_parallel_jobs_info(self, mock_run, mock_logger):
         """Testa que informa quantidade de jobs paralelos no log"""
         mock_result = MagicMock()
@@ -195,3 +217,279 @@ class TestRestoreBackup:
         info_calls = [str(call) for call in mock_logger.info.call_args_list]
         has_jobs_info = any('4' in call and 'jobs' in call.lower() for call in info_calls)
         assert has_jobs_info
+    
+    @patch('pg_mirror.restore.run_with_progress')
+    def test_separate_post_data_jobs(self, mock_run, mock_logger):
+        """Testa restore em duas etapas com jobs diferentes no post-data"""
+        result = restore_backup(
+            backup_file='/tmp/backup.dump',
+            host='localhost',
+            port=5432,
+            database='test_db',
+            user='postgres',
+            password='password',
+            parallel_jobs=2,
+            logger=mock_logger,
+            post_data_jobs=16
+        )
+        
+        first, second = (call[0][0] for call in mock_run.call_args_list)
+        assert result is True
+        assert '--section=data' in first and first[first.index('-j') + 1] == '2'
+        assert '--section=post-data' in second and second[second.index('-j') + 1] == '16'
+    
+    @patch('pg_mirror.restore.run_with_progress')
+    def test_single_transaction(self, mock_run, mock_logger):
+        """Testa restore serial em transação única"""
+        restore_backup(
+            backup_file='/tmp/backup.dump',
+            host='localhost',
+            port=5432,
+            database='test_db',
+            user='postgres',
+            password='password',
+            parallel_jobs=1,
+            logger=mock_logger,
+            single_transaction=True
+        )
+        
+        cmd = mock_run.call_args[0][0]
+        assert '-1' in cmd
+        assert '-j' not in cmd
+    
+    @patch('pg_mirror.restore.write_ordered_list')
+    @patch('pg_mirror.restore.run_with_progress')
+    def test_ordered_list(self, mock_run, mock_list, mock_logger, tmp_path):
+        """Testa uso da lista -L ordenada e sua remoção"""
+        list_file = tmp_path / 'toc.list'
+        list_file.write_text('')
+        mock_list.return_value = str(list_file)
+        
+        restore_backup(
+            backup_file='/tmp/backup.dump',
+            host='localhost',
+            port=5432,
+            database='test_db',
+            user='postgres',
+            password='password',
+            parallel_jobs=4,
+            logger=mock_logger,
+            object_sizes=MagicMock()
+        )
+        
+        cmd = mock_run.call_args[0][0]
+        assert cmd[cmd.index('-L') + 1] == str(list_file)
+        assert not list_file.exists()
+    
+    @patch('pg_mirror.restore.write_ordered_list')
+    @patch('pg_mirror.restore.run_with_progress')
+    def test_keep_filter_in_single_transaction(self, mock_run, mock_list, mock_logger, tmp_path):
+        """Testa que o filtro de entradas gera a lista -L mesmo sem ordenação"""
+        list_file = tmp_path / 'toc.list'
+        list_file.write_text('')
+        mock_list.return_value = str(list_file)
+        keep = MagicMock()
+        
+        restore_backup(
+            backup_file='/tmp/backup.dump',
+            host='localhost',
+            port=5432,
+            database='test_db',
+            user='postgres',
+            password='password',
+            parallel_jobs=1,
+            logger=mock_logger,
+            single_transaction=True,
+            object_sizes=MagicMock(),
+            keep=keep
+        )
+        
+        assert mock_list.call_args[0][1] is None
+        assert mock_list.call_args[1] == {'keep': keep}
+        cmd = mock_run.call_args[0][0]
+        assert '-1' in cmd and cmd[cmd.index('-L') + 1] == str(list_file)
+    
+    @patch('pg_mirror.restore.write_ordered_list', return_value=None)
+    @patch('pg_mirror.restore.read_toc')
+    @patch('pg_mirror.restore.run_with_progress')
+    def test_phased_post_data_with_budget(self, mock_run, mock_toc, mock_list, mock_logger):
+        """Testa três fases e builds grandes com memória própria"""
+        from pg_mirror.toc import ArchiveToc, ObjectSizes
+        mock_toc.return_value = ArchiveToc.parse(
+            "3001; 0 1 TABLE DATA public big u\n"
+            "2891; 1259 2 INDEX public big_idx u\n"
+            "2892; 1259 3 INDEX public small_idx u\n"
+        )
+        sizes = ObjectSizes(
+            tables={('public', 'big'): 2048 * 1024 * 1024},
+            index_tables={('public', 'big_idx'): 'big'}
+        )
+        
+        result = restore_backup(
+            backup_file='/tmp/backup.dump',
+            host='localhost',
+            port=5432,
+            database='test_db',
+            user='postgres',
+            password='password',
+            parallel_jobs=4,
+            logger=mock_logger,
+            object_sizes=sizes,
+            maintenance_budget_mb=1024
+        )
+        
+        calls = mock_run.call_args_list
+        sections = [next(a for a in c[0][0] if a.startswith('--section')) for c in calls]
+        assert result is True
+        assert sections == ['--section=pre-data', '--section=data',
+                            '--section=post-data', '--section=post-data']
+        build_env = calls[2][1]['env']['PGOPTIONS']
+        assert 'maintenance_work_mem=512MB' in build_env
+        assert 'max_parallel_maintenance_workers=4' in build_env
+        assert calls[3][1]['env']['PGOPTIONS'] == '-c maintenance_work_mem=256MB'
+    
+    @patch('pg_mirror.restore.FastRestore')
+    @patch('pg_mirror.restore.run_with_progress')
+    def test_fast_restore_only_on_data_load(self, mock_run, mock_profile, mock_logger):
+        """Testa perfil rápido aplicado só na carga de dados"""
+        profile = mock_profile.return_value
+        profile.session_options.return_value = '-c synchronous_commit=off'
+        profile.finish.return_value = True
+        
+        result = restore_backup(
+            backup_file='/tmp/backup.dump',
+            host='localhost',
+            port=5432,
+            database='test_db',
+            user='postgres',
+            password='password',
+            parallel_jobs=4,
+            logger=mock_logger,
+            fast_restore={'unlogged': True}
+        )
+        
+        calls = mock_run.call_args_list
+        sections = [next(a for a in c[0][0] if a.startswith('--section')) for c in calls]
+        assert result is True
+        assert sections == ['--section=pre-data', '--section=data', '--section=post-data']
+        assert calls[1][1]['env']['PGOPTIONS'] == '-c synchronous_commit=off'
+        assert 'PGOPTIONS' not in calls[2][1]['env']
+        profile.before_data.assert_called_once()
+        assert mock_profile.call_args[1]['unlogged'] is True
+    
+    @patch('pg_mirror.restore.run_with_progress')
+    def test_checkpoint_records_progress(self, mock_run, mock_logger, tmp_path):
+        """Testa seções e entradas concluídas gravadas no diário"""
+        from pg_mirror.checkpoint import Journal
+        journal = Journal(str(tmp_path / 'app.jsonl'), mock_logger)
+        journal.start('/tmp/backup.dump')
+        progress = journal.target('dst:5432')
+        
+        def fake_run(cmd, **kwargs):
+            if '--section=data' in cmd:
+                kwargs['on_event']('restore', 'TABLE DATA orders',
+                                   'pg_restore: finished item 3012 TABLE DATA public orders')
+        mock_run.side_effect = fake_run
+        
+        result = restore_backup(
+            backup_file='/tmp/backup.dump',
+            host='localhost',
+            port=5432,
+            database='test_db',
+            user='postgres',
+            password='password',
+            parallel_jobs=4,
+            logger=mock_logger,
+            checkpoint=progress
+        )
+        
+        assert result is True
+        assert all('--exit-on-error' in c[0][0] for c in mock_run.call_args_list)
+        reloaded = Journal.load(journal.path, mock_logger).target('dst:5432')
+        assert reloaded.sections == {'pre-data', 'data', 'post-data'}
+        assert reloaded.items == {3012}
+    
+    @patch('pg_mirror.restore.truncate_tables', return_value=True)
+    @patch('pg_mirror.restore.read_toc')
+    @patch('pg_mirror.restore.run_with_progress')
+    def test_checkpoint_resume_restores_remaining(self, mock_run, mock_toc, mock_truncate,
+                                                  mock_logger, tmp_path):
+        """Testa retomada: pula o pre-data, esvazia e recarrega só o que falta"""
+        from pg_mirror.checkpoint import Journal
+        from pg_mirror.toc import ArchiveToc
+        mock_toc.return_value = ArchiveToc.parse(
+            "3001; 0 1 TABLE DATA public done u\n"
+            "3002; 0 2 TABLE DATA public pending u\n"
+            "2891; 1259 3 INDEX public pending_idx u\n"
+        )
+        journal = Journal(str(tmp_path / 'app.jsonl'), mock_logger)
+        journal.start('/tmp/backup.dump')
+        progress = journal.target('dst:5432')
+        progress.mark_section('pre-data')
+        progress.mark_item(3001)
+        lists = []
+        mock_run.side_effect = lambda cmd, **kwargs: lists.append(
+            open(cmd[cmd.index('-L') + 1]).read()
+        )
+        
+        result = restore_backup(
+            backup_file='/tmp/backup.dump',
+            host='localhost',
+            port=5432,
+            database='test_db',
+            user='postgres',
+            password='password',
+            parallel_jobs=4,
+            logger=mock_logger,
+            checkpoint=progress
+        )
+        
+        sections = [next(a for a in c[0][0] if a.startswith('--section'))
+                    for c in mock_run.call_args_list]
+        assert result is True
+        assert sections == ['--section=data', '--section=post-data']
+        assert mock_truncate.call_args[0][2] == [('public', 'pending')]
+        assert '3001;' not in lists[0] and '3002;' in lists[0]
+    
+    @patch('pg_mirror.restore.run_with_progress')
+    def test_after_data_runs_before_post_data(self, mock_run, mock_logger):
+        """Testa que after_data é chamado entre a carga de dados e o post-data"""
+        calls = []
+        mock_run.side_effect = lambda cmd, **kwargs: calls.append(
+            next(a for a in cmd if a.startswith('--section'))
+        )
+        after_data = MagicMock(side_effect=lambda: calls.append('after_data') or True)
+        
+        result = restore_backup(
+            backup_file='/tmp/backup.dump',
+            host='localhost',
+            port=5432,
+            database='test_db',
+            user='postgres',
+            password='password',
+            parallel_jobs=4,
+            logger=mock_logger,
+            after_data=after_data
+        )
+        
+        assert result is True
+        assert calls == ['--section=pre-data', '--section=data', 'after_data',
+                         '--section=post-data']
+    
+    @patch('pg_mirror.restore.run_with_progress')
+    def test_after_data_failure_stops_restore(self, mock_run, mock_logger):
+        """Testa que uma falha em after_data interrompe antes do post-data"""
+        result = restore_backup(
+            backup_file='/tmp/backup.dump',
+            host='localhost',
+            port=5432,
+            database='test_db',
+            user='postgres',
+            password='password',
+            parallel_jobs=4,
+            logger=mock_logger,
+            after_data=MagicMock(return_value=False)
+        )
+        
+        assert result is False
+        assert mock_run.call_count == 2
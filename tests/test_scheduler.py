@@ -0,0 +1,140 @@
+"""
+Testes para o módulo pg_mirror.scheduler
+"""
+import threading
+import time
+import pytest
+from pg_mirror.scheduler import MirrorJob, run_jobs, log_summary
+
+
+def tracking_job(name, host, size, tracker, delay=0.02, result=True):
+    """Cria um job que registra concorrência global e por host"""
+    def func():
+        with tracker['lock']:
+            tracker['order'].append(name)
+            tracker['running'] += 1
+            tracker['per_host'][host] = tracker['per_host'].get(host, 0) + 1
+            tracker['max_running'] = max(tracker['max_running'], tracker['running'])
+            tracker['max_per_host'][host] = max(
+                tracker['max_per_host'].get(host, 0), tracker['per_host'][host]
+            )
+        time.sleep(delay)
+        with tracker['lock']:
+            tracker['running'] -= 1
+            tracker['per_host'][host] -= 1
+        return result
+    return MirrorJob(name, host, size, func)
+
+
+@pytest.fixture
+def tracker():
+    """Estado compartilhado para medir a concorrência dos jobs"""
+    return {
+        'lock': threading.Lock(),
+        'order': [],
+        'running': 0,
+        'max_running': 0,
+        'per_host': {},
+        'max_per_host': {},
+    }
+
+
+class TestRunJobs:
+    """Testes para run_jobs"""
+
+    def test_largest_first(self, tracker, mock_logger):
+        """Testa que os maiores bancos iniciam primeiro"""
+        jobs = [
+            tracking_job('small', 'h1', 10, tracker),
+            tracking_job('large', 'h1', 1000, tracker),
+            tracking_job('medium', 'h1', 100, tracker),
+        ]
+
+        run_jobs(jobs, max_concurrent=1, max_per_host=1, logger=mock_logger)
+
+        assert tracker['order'] == ['large', 'medium', 'small']
+
+    def test_respects_global_limit(self, tracker, mock_logger):
+        """Testa limite global de concorrência"""
+        jobs = [tracking_job(f'db{i}', f'h{i}', i, tracker) for i in range(8)]
+
+        run_jobs(jobs, max_concurrent=3, max_per_host=10, logger=mock_logger)
+
+        assert tracker['max_running'] <= 3
+        assert all(job.success for job in jobs)
+
+    def test_respects_per_host_limit(self, tracker, mock_logger):
+        """Testa limite de concorrência por host de origem"""
+        jobs = [tracking_job(f'a{i}', 'h1', 100 + i, tracker) for i in range(4)]
+        jobs += [tracking_job(f'b{i}', 'h2', i, tracker) for i in range(4)]
+
+        run_jobs(jobs, max_concurrent=4, max_per_host=2, logger=mock_logger)
+
+        assert tracker['max_per_host']['h1'] <= 2
+        assert tracker['max_per_host']['h2'] <= 2
+
+    def test_failure_is_isolated(self, mock_logger):
+        """Testa que exceções e sys.exit afetam apenas o próprio job"""
+        def exits():
+            raise SystemExit(1)
+
+        jobs = [
+            MirrorJob('ok', 'h1', 1, lambda: True),
+            MirrorJob('exits', 'h1', 2, exits),
+            MirrorJob('false', 'h1', 3, lambda: False),
+        ]
+
+        run_jobs(jobs, max_concurrent=2, max_per_host=2, logger=mock_logger)
+        results = {job.name: job.success for job in jobs}
+
+        assert results == {'ok': True, 'exits': False, 'false': False}
+        assert isinstance(jobs[1].error, SystemExit)
+
+    def test_respects_budget(self, mock_logger):
+        """Testa que a soma do cost dos jobs ativos não passa do budget"""
+        lock = threading.Lock()
+        state = {'cost': 0, 'max_cost': 0}
+
+        def costly(cost):
+            def func():
+                with lock:
+                    state['cost'] += cost
+                    state['max_cost'] = max(state['max_cost'], state['cost'])
+                time.sleep(0.02)
+                with lock:
+                    state['cost'] -= cost
+                return True
+            return func
+
+        jobs = [MirrorJob(f'idx{i}', f't{i}', 100 - i, costly(400), cost=400) for i in range(4)]
+        jobs.append(MirrorJob('huge', 'tx', 1000, costly(2000), cost=2000))
+
+        run_jobs(jobs, max_concurrent=4, max_per_host=4, logger=mock_logger, budget=1000)
+
+        assert all(job.success for job in jobs)
+        assert state['max_cost'] == 2000  # Maior que o budget: executa sozinho
+
+    def test_empty_job_list(self, mock_logger):
+        """Testa execução sem jobs"""
+        assert run_jobs([], max_concurrent=2, max_per_host=2, logger=mock_logger) == []
+
+
+class TestLogSummary:
+    """Testes para log_summary"""
+
+    def test_all_success(self, mock_logger):
+        """Testa resumo com todos os bancos espelhados"""
+        job = MirrorJob('db1', 'h1', 1, None)
+        job.success = True
+
+        assert log_summary([job], mock_logger) is True
+        assert any('1/1' in str(call) for call in mock_logger.info.call_args_list)
+
+    def test_with_failure(self, mock_logger):
+        """Testa resumo com falha"""
+        ok = MirrorJob('db1', 'h1', 1, None)
+        ok.success = True
+        failed = MirrorJob('db2', 'h1', 1, None)
+        failed.success = False
+
+        assert log_summary([ok, failed], mock_logger) is False
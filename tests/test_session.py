@@ -0,0 +1,133 @@
+"""
+Testes para o módulo pg_mirror.session
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+from pg_mirror import session
+from pg_mirror.session import ConnectionPool, connection_pool, get_pool
+from pg_mirror.database import check_database_exists, create_database, run_query
+
+
+def _fake_driver(rows=None):
+    """psycopg falso cujas conexões retornam as linhas informadas"""
+    driver = MagicMock()
+
+    def _connect(**kwargs):
+        conn = MagicMock()
+        conn.closed = False
+        conn.close.side_effect = lambda: setattr(conn, 'closed', True)
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.description = [('col',)]
+        cursor.fetchall.return_value = rows if rows is not None else []
+        return conn
+
+    driver.connect.side_effect = _connect
+    return driver
+
+
+class TestConnectionPool:
+    """Testes para ConnectionPool"""
+
+    def test_reuses_connection(self, mock_logger):
+        """Testa que consultas ao mesmo banco reutilizam a conexão"""
+        with patch.object(session, 'psycopg', _fake_driver([(1, None, True)])) as driver:
+            pool = ConnectionPool(mock_logger)
+            first = pool.query('h', 5432, 'db', 'u', 'pw', 'SELECT 1')
+            pool.query('h', 5432, 'db', 'u', 'pw', 'SELECT 1')
+
+        assert first == [('1', '', 't')]
+        assert driver.connect.call_count == 1
+        assert pool.connections_opened == 1
+        assert driver.connect.call_args[1]['autocommit'] is True
+
+    def test_separate_connection_per_database(self, mock_logger):
+        """Testa que bancos diferentes usam conexões diferentes"""
+        with patch.object(session, 'psycopg', _fake_driver()) as driver:
+            pool = ConnectionPool(mock_logger)
+            pool.query('h', 5432, 'a', 'u', 'pw', 'SELECT 1')
+            pool.query('h', 5432, 'b', 'u', 'pw', 'SELECT 1')
+
+        assert driver.connect.call_count == 2
+
+    def test_failed_connection_is_discarded(self, mock_logger):
+        """Testa que uma conexão que falhou não volta ao pool"""
+        with patch.object(session, 'psycopg', _fake_driver()) as driver:
+            pool = ConnectionPool(mock_logger)
+            with pytest.raises(RuntimeError):
+                with pool.connection('h', 5432, 'db', 'u', 'pw'):
+                    raise RuntimeError('boom')
+            pool.query('h', 5432, 'db', 'u', 'pw', 'SELECT 1')
+
+        assert driver.connect.call_count == 2
+
+    def test_close_closes_idle(self, mock_logger):
+        """Testa que close() fecha as conexões ociosas"""
+        with patch.object(session, 'psycopg', _fake_driver()):
+            pool = ConnectionPool(mock_logger)
+            with pool.connection('h', 5432, 'db', 'u', 'pw') as conn:
+                pass
+            pool.close()
+
+        assert conn.closed is True
+
+
+class TestConnectionPoolContext:
+    """Testes para connection_pool"""
+
+    def test_activates_and_restores(self, mock_logger):
+        """Testa que o pool fica ativo apenas dentro do bloco"""
+        with patch.object(session, 'psycopg', _fake_driver()):
+            with connection_pool(mock_logger) as pool:
+                assert get_pool() is pool
+        assert get_pool() is None
+
+    def test_disabled(self, mock_logger):
+        """Testa que enabled=False mantém o psql"""
+        with patch.object(session, 'psycopg', _fake_driver()):
+            with connection_pool(mock_logger, enabled=False) as pool:
+                assert pool is None
+                assert get_pool() is None
+
+    def test_without_driver(self, mock_logger):
+        """Testa o fallback quando o psycopg não está instalado"""
+        with patch.object(session, 'psycopg', None):
+            with connection_pool(mock_logger) as pool:
+                assert pool is None
+
+
+class TestDatabaseWithPool:
+    """Testes das operações de catálogo com o pool ativo"""
+
+    @patch('subprocess.run')
+    def test_run_query_uses_pool(self, mock_run, mock_logger):
+        """Testa que run_query não inicia psql com o pool ativo"""
+        with patch.object(session, 'psycopg', _fake_driver([('a', 1)])):
+            with connection_pool(mock_logger):
+                rows = run_query('h', 5432, 'db', 'u', 'pw', 'SELECT 1', mock_logger)
+
+        assert rows == [('a', '1')]
+        mock_run.assert_not_called()
+
+    @patch('subprocess.run')
+    def test_check_database_exists_parameterized(self, mock_run, mock_logger):
+        """Testa que a verificação usa parâmetro em vez de interpolar o nome"""
+        with patch.object(session, 'psycopg', _fake_driver([(1,)])):
+            with connection_pool(mock_logger) as pool:
+                with patch.object(pool, 'query', wraps=pool.query) as query:
+                    exists = check_database_exists('h', 5432, "o'db", 'u', 'pw', mock_logger)
+
+        assert exists is True
+        assert query.call_args[0][5].count('%s') == 1
+        assert query.call_args[0][6] == ("o'db",)
+        mock_run.assert_not_called()
+
+    @patch('subprocess.run')
+    def test_create_database_quotes_name(self, mock_run, mock_logger):
+        """Testa CREATE DATABASE com o nome citado"""
+        with patch.object(session, 'psycopg', _fake_driver()):
+            with connection_pool(mock_logger) as pool:
+                with patch.object(pool, 'query', wraps=pool.query) as query:
+                    create_database('h', 5432, 'my"db', 'u', 'pw', mock_logger)
+
+        assert query.call_args[0][5] == 'CREATE DATABASE "my""db";'
+        mock_run.assert_not_called()
@@ -0,0 +1,111 @@
+"""
+Testes para o módulo pg_mirror.snapshot
+"""
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from pg_mirror.snapshot import export_snapshot, release_snapshot, SnapshotCoordinator
+
+
+SOURCE = {'host': 'source.example.com', 'port': 5432, 'user': 'postgres', 'password': 'src_pass'}
+
+
+class TestExportSnapshot:
+    """Testes para export_snapshot"""
+
+    @patch('subprocess.Popen')
+    def test_returns_snapshot_id(self, mock_popen, mock_logger):
+        """Testa que o id do snapshot é lido da sessão"""
+        session = MagicMock()
+        session.stdout.readline.return_value = '00000003-0000001B-1\n'
+        mock_popen.return_value = session
+
+        proc, snapshot = export_snapshot(SOURCE, 'test_db', mock_logger)
+
+        assert proc is session
+        assert snapshot == '00000003-0000001B-1'
+        sent = session.stdin.write.call_args[0][0]
+        assert 'REPEATABLE READ' in sent
+        assert 'pg_export_snapshot()' in sent
+
+    @patch('subprocess.Popen')
+    def test_failure_raises(self, mock_popen, mock_logger):
+        """Testa erro quando a sessão não retorna snapshot"""
+        session = MagicMock()
+        session.stdout.readline.return_value = ''
+        session.communicate.return_value = ('', 'FATAL: password authentication failed')
+        mock_popen.return_value = session
+
+        with pytest.raises(RuntimeError):
+            export_snapshot(SOURCE, 'test_db', mock_logger)
+
+    def test_release_commits(self, mock_logger):
+        """Testa que liberar o snapshot encerra a transação"""
+        session = MagicMock()
+
+        release_snapshot(session, mock_logger)
+
+        assert 'COMMIT' in session.communicate.call_args[0][0]
+
+
+class TestSnapshotCoordinator:
+    """Testes para SnapshotCoordinator"""
+
+    @patch('pg_mirror.snapshot.metrics.record')
+    @patch('pg_mirror.snapshot.release_snapshot')
+    @patch('pg_mirror.snapshot.export_snapshot')
+    def test_reports_hold_time(self, mock_export, mock_release, mock_record, mock_logger):
+        """Testa que close() libera o snapshot e registra o tempo em que ficou aberto"""
+        session = MagicMock()
+        mock_export.return_value = (session, 'snap-1')
+
+        with SnapshotCoordinator(SOURCE, 'test_db', mock_logger, keepalive=60) as coordinator:
+            assert coordinator.snapshot == 'snap-1'
+
+        mock_release.assert_called_once_with(session, mock_logger)
+        assert coordinator.held_seconds >= 0
+        assert 'snapshot_held_seconds' in mock_record.call_args[1]
+
+    @patch('pg_mirror.snapshot.metrics.record')
+    @patch('pg_mirror.snapshot.release_snapshot')
+    @patch('pg_mirror.snapshot.export_snapshot', return_value=(MagicMock(), 'snap-1'))
+    def test_close_is_idempotent(self, mock_export, mock_release, mock_record, mock_logger):
+        """Testa que close pode ser chamado antes de open e mais de uma vez"""
+        coordinator = SnapshotCoordinator(SOURCE, 'test_db', mock_logger, keepalive=60)
+        coordinator.close()
+        coordinator.open()
+        coordinator.close()
+        coordinator.close()
+
+        mock_release.assert_called_once()
+        mock_record.assert_called_once()
+
+    @patch('pg_mirror.snapshot.metrics.record')
+    @patch('pg_mirror.snapshot.release_snapshot')
+    @patch('pg_mirror.snapshot.export_snapshot')
+    def test_keepalive_detects_lost_session(self, mock_export, mock_release, mock_record,
+                                            mock_logger):
+        """Testa que o keepalive percebe a sessão encerrada na origem"""
+        session = MagicMock()
+        lost = threading.Event()
+        session.stdout.readline.side_effect = lambda: lost.set() or ''
+        mock_export.return_value = (session, 'snap-1')
+
+        coordinator = SnapshotCoordinator(SOURCE, 'test_db', mock_logger, keepalive=0.01)
+        coordinator.open()
+        assert lost.wait(2)
+        coordinator._thread.join(2)
+        coordinator.close()
+
+        assert coordinator.lost is True
+        session.stdin.write.assert_called_with("SELECT 1;\n")
+        mock_logger.error.assert_called_once()
+
+    @patch('pg_mirror.snapshot.export_snapshot', side_effect=RuntimeError('sem conexão'))
+    def test_open_failure_propagates(self, mock_export, mock_logger):
+        """Testa que falha ao exportar o snapshot propaga e close continua seguro"""
+        coordinator = SnapshotCoordinator(SOURCE, 'test_db', mock_logger)
+
+        with pytest.raises(RuntimeError):
+            coordinator.open()
+        coordinator.close()
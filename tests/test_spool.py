@@ -0,0 +1,93 @@
+"""
+Testes para o módulo pg_mirror.spool
+"""
+import tempfile
+import pytest
+from unittest.mock import patch
+from pg_mirror.database import QueryError
+from pg_mirror.spool import (
+    SpoolSpaceError,
+    check_free_space,
+    database_size,
+    expected_ratio,
+    record_ratio,
+    spool_directory,
+    HISTORY_SIZE
+)
+
+
+class TestSpoolDirectory:
+    """Testes para spool_directory"""
+
+    def test_default_is_system_temp(self):
+        """Testa padrão no diretório temporário do sistema"""
+        assert spool_directory(None) == tempfile.gettempdir()
+
+    def test_creates_directory(self, tmp_path):
+        """Testa criação do diretório configurado"""
+        path = spool_directory(str(tmp_path / 'spool'))
+
+        assert (tmp_path / 'spool').is_dir()
+        assert path == str(tmp_path / 'spool')
+
+
+class TestRatios:
+    """Testes para o histórico de razões de compressão"""
+
+    def test_default_without_history(self, tmp_path):
+        """Testa razão padrão por algoritmo"""
+        assert expected_ratio(str(tmp_path), 'k', 'none') == 1.0
+        assert expected_ratio(str(tmp_path), 'k', 'zstd') == 0.5
+
+    def test_uses_largest_recent_ratio(self, tmp_path):
+        """Testa que a maior das últimas razões é usada"""
+        for archive in (200, 300, 250):
+            record_ratio(str(tmp_path), 'k', 1000, archive)
+
+        assert expected_ratio(str(tmp_path), 'k', 'gzip') == 0.3
+
+    def test_history_is_bounded(self, tmp_path):
+        """Testa que só as últimas razões são guardadas"""
+        record_ratio(str(tmp_path), 'k', 1000, 900)
+        for _ in range(HISTORY_SIZE):
+            record_ratio(str(tmp_path), 'k', 1000, 100)
+
+        assert expected_ratio(str(tmp_path), 'k', 'gzip') == 0.1
+
+
+class TestCheckFreeSpace:
+    """Testes para check_free_space"""
+
+    @patch('pg_mirror.spool.shutil.disk_usage')
+    def test_fits(self, mock_usage, mock_logger):
+        """Testa estimativa que cabe no spool"""
+        mock_usage.return_value.free = 1000
+
+        assert check_free_space('/spool', 1000, 0.5, mock_logger) == 500
+
+    @patch('pg_mirror.spool.shutil.disk_usage')
+    def test_not_enough_space(self, mock_usage, mock_logger):
+        """Testa falha antes do dump, considerando a folga"""
+        mock_usage.return_value.free = 520
+
+        with pytest.raises(SpoolSpaceError):
+            check_free_space('/spool', 1000, 0.5, mock_logger)
+
+
+class TestDatabaseSize:
+    """Testes para database_size"""
+
+    @patch('pg_mirror.spool.run_query', return_value=[('123456',)])
+    def test_reads_size(self, mock_query, mock_logger):
+        """Testa leitura de pg_database_size"""
+        source = {'host': 'h', 'port': 5432, 'user': 'u', 'password': 'pw'}
+
+        assert database_size(source, 'app', mock_logger) == 123456
+
+    @patch('pg_mirror.spool.run_query', side_effect=QueryError('denied'))
+    def test_failure_skips_check(self, mock_query, mock_logger):
+        """Testa que falha na consulta apenas pula a verificação"""
+        source = {'host': 'h', 'port': 5432, 'user': 'u', 'password': 'pw'}
+
+        assert database_size(source, 'app', mock_logger) is None
+        mock_logger.warning.assert_called_once()
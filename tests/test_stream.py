@@ -0,0 +1,182 @@
+"""
+Testes para o módulo pg_mirror.stream
+"""
+import io
+import pytest
+from unittest.mock import patch, MagicMock
+from pg_mirror.stream import pump_stream, stream_mirror
+
+
+SOURCE = {'host': 'source.example.com', 'port': 5432, 'user': 'postgres', 'password': 'src_pass'}
+TARGET = {'host': 'target.example.com', 'port': 5433, 'user': 'admin', 'password': 'tgt_pass'}
+
+
+class SlowWriter(io.BytesIO):
+    """Writer que registra o tamanho de cada escrita"""
+
+    def __init__(self):
+        super().__init__()
+        self.write_sizes = []
+
+    def write(self, data):
+        self.write_sizes.append(len(data))
+        return super().write(data)
+
+
+def make_process(stdout=b'', stderr=b'', returncode=0):
+    """Cria mock de subprocess.Popen"""
+    proc = MagicMock()
+    proc.stdout = io.BytesIO(stdout)
+    proc.stdin = io.BytesIO()
+    proc.stdin.close = MagicMock()
+    proc.stderr = io.BytesIO(stderr)
+    proc.wait.return_value = returncode
+    return proc
+
+
+class TestPumpStream:
+    """Testes para pump_stream"""
+
+    def test_copies_all_bytes(self):
+        """Testa que todos os bytes são copiados na ordem"""
+        data = bytes(range(256)) * 1000
+        writer = io.BytesIO()
+
+        total = pump_stream(io.BytesIO(data), writer, chunk_size=1000, max_buffers=3)
+
+        assert total == len(data)
+        assert writer.getvalue() == data
+
+    def test_empty_input(self):
+        """Testa stream vazio"""
+        writer = io.BytesIO()
+
+        total = pump_stream(io.BytesIO(b''), writer)
+
+        assert total == 0
+        assert writer.getvalue() == b''
+
+    def test_writes_never_exceed_chunk_size(self):
+        """Testa que cada escrita usa no máximo um buffer"""
+        writer = SlowWriter()
+
+        pump_stream(io.BytesIO(b'x' * 10500), writer, chunk_size=1024, max_buffers=2)
+
+        assert max(writer.write_sizes) <= 1024
+        assert sum(writer.write_sizes) == 10500
+
+    def test_writer_error_propagates(self):
+        """Testa que erro do consumidor é propagado"""
+        writer = MagicMock()
+        writer.write.side_effect = BrokenPipeError()
+
+        with pytest.raises(BrokenPipeError):
+            pump_stream(io.BytesIO(b'x' * 4096), writer, chunk_size=1024, max_buffers=1)
+
+
+class TestStreamMirror:
+    """Testes para stream_mirror"""
+
+    @patch('subprocess.Popen')
+    def test_successful_stream(self, mock_popen, mock_logger):
+        """Testa streaming bem-sucedido"""
+        dump = make_process(stdout=b'archive-bytes')
+        restore = make_process()
+        mock_popen.side_effect = [dump, restore]
+
+        result = stream_mirror(SOURCE, TARGET, 'test_db', mock_logger)
+
+        assert result is True
+        assert restore.stdin.getvalue() == b'archive-bytes'
+
+    @patch('subprocess.Popen')
+    def test_stream_command_structure(self, mock_popen, mock_logger):
+        """Testa comandos pg_dump e pg_restore do pipe"""
+        mock_popen.side_effect = [make_process(), make_process()]
+
+        stream_mirror(SOURCE, TARGET, 'mydb', mock_logger)
+
+        dump_cmd = mock_popen.call_args_list[0][0][0]
+        restore_cmd = mock_popen.call_args_list[1][0][0]
+
+        assert dump_cmd[0] == 'pg_dump'
+        assert 'source.example.com' in dump_cmd
+        assert '-Fc' in dump_cmd
+        assert '-f' not in dump_cmd  # Escreve em stdout
+        assert restore_cmd[0] == 'pg_restore'
+        assert 'target.example.com' in restore_cmd
+        assert '5433' in restore_cmd
+        assert 'mydb' in restore_cmd
+        assert '-j' not in restore_cmd  # stdin não suporta paralelismo
+
+    @patch('subprocess.Popen')
+    def test_stream_uses_separate_passwords(self, mock_popen, mock_logger):
+        """Testa que cada processo recebe a senha do seu servidor"""
+        mock_popen.side_effect = [make_process(), make_process()]
+
+        stream_mirror(SOURCE, TARGET, 'test_db', mock_logger)
+
+        assert mock_popen.call_args_list[0][1]['env']['PGPASSWORD'] == 'src_pass'
+        assert mock_popen.call_args_list[1][1]['env']['PGPASSWORD'] == 'tgt_pass'
+
+    @patch('subprocess.Popen')
+    def test_dump_failure_returns_false(self, mock_popen, mock_logger):
+        """Testa falha no pg_dump"""
+        dump = make_process(stderr=b'pg_dump: error: connection failed', returncode=1)
+        mock_popen.side_effect = [dump, make_process()]
+
+        result = stream_mirror(SOURCE, TARGET, 'test_db', mock_logger)
+
+        assert result is False
+        mock_logger.error.assert_called()
+
+    @patch('subprocess.Popen')
+    def test_restore_warnings_succeed(self, mock_popen, mock_logger):
+        """Testa que avisos do pg_restore não falham o streaming"""
+        restore = make_process(stderr=b'WARNING: errors ignored', returncode=1)
+        mock_popen.side_effect = [make_process(stdout=b'data'), restore]
+
+        result = stream_mirror(SOURCE, TARGET, 'test_db', mock_logger)
+
+        assert result is True
+        mock_logger.warning.assert_called()
+
+    @patch('subprocess.Popen')
+    def test_restore_error_fails(self, mock_popen, mock_logger):
+        """Testa que ERROR no pg_restore falha o streaming"""
+        restore = make_process(stderr=b'ERROR: relation already exists', returncode=1)
+        mock_popen.side_effect = [make_process(stdout=b'data'), restore]
+
+        result = stream_mirror(SOURCE, TARGET, 'test_db', mock_logger)
+
+        assert result is False
+
+    @patch('subprocess.Popen')
+    def test_broken_pipe_kills_dump(self, mock_popen, mock_logger):
+        """Testa que pg_dump é encerrado se o pg_restore morrer"""
+        dump = make_process(stdout=b'x' * 4096)
+        restore = make_process(returncode=1)
+        restore.stdin = MagicMock()
+        restore.stdin.write.side_effect = BrokenPipeError()
+        mock_popen.side_effect = [dump, restore]
+
+        result = stream_mirror(SOURCE, TARGET, 'test_db', mock_logger)
+
+        assert result is False
+        dump.kill.assert_called_once()
+
+    @patch('pg_mirror.stream.pump_stream', side_effect=KeyboardInterrupt)
+    @patch('subprocess.Popen')
+    def test_interrupt_kills_both_processes(self, mock_popen, mock_pump, mock_logger):
+        """Testa que uma interrupção encerra pg_dump e pg_restore"""
+        dump = make_process(stdout=b'data')
+        restore = make_process()
+        mock_popen.side_effect = [dump, restore]
+
+        with pytest.raises(KeyboardInterrupt):
+            stream_mirror(SOURCE, TARGET, 'test_db', mock_logger)
+
+        dump.kill.assert_called_once()
+        restore.kill.assert_called_once()
+        dump.wait.assert_called()
+        restore.wait.assert_called()
@@ -0,0 +1,169 @@
+"""
+Testes para o módulo pg_mirror.subset
+"""
+import pytest
+from unittest.mock import patch
+from pg_mirror.subset import (
+    parse_patterns,
+    parse_where,
+    matches,
+    plan_subset,
+    copy_filtered,
+    load_filtered
+)
+from pg_mirror.toc import ArchiveToc
+
+
+SOURCE = {'host': 'source.example.com', 'port': 5432, 'user': 'postgres', 'password': 'src_pass'}
+TARGET = {'host': 'target.example.com', 'port': 5433, 'user': 'admin', 'password': 'tgt_pass'}
+
+TABLES = [
+    ('public', 'orders', 'r', 100),
+    ('public', 'users', 'r', 10),
+    ('audit', 'log', 'r', 1000),
+    ('public', 'orders_id_seq', 'S', 0),
+]
+
+FOREIGN_KEYS = [
+    (('audit', 'log'), 'log_user_fk', ('public', 'users')),
+    (('public', 'orders'), 'orders_user_fk', ('public', 'users')),
+    (('public', 'orders'), 'orders_parent_fk', ('public', 'orders')),
+]
+
+
+def options(**overrides):
+    """Seção options com os padrões de load_config"""
+    defaults = {'include': None, 'exclude': None, 'where': {}}
+    defaults.update(overrides)
+    return defaults
+
+
+class TestParsing:
+    """Testes para parse_patterns e parse_where"""
+
+    def test_patterns_must_be_list(self):
+        """Testa que include/exclude exigem lista de padrões"""
+        with pytest.raises(ValueError):
+            parse_patterns('public.*', 'include')
+
+    def test_empty_predicate_rejected(self):
+        """Testa que predicado vazio em where é rejeitado"""
+        with pytest.raises(ValueError):
+            parse_where({'public.orders': '  '})
+
+    def test_table_name_may_contain_dots(self):
+        """Testa que apenas o primeiro ponto separa schema e tabela"""
+        assert parse_where({'public.v1.events': 'id > 1'}) == {('public', 'v1.events'): 'id > 1'}
+
+
+class TestMatches:
+    """Testes para matches"""
+
+    def test_schema_only_pattern(self):
+        """Testa padrão sem ponto casando o schema inteiro"""
+        assert matches('audit', 'log', ['audit'])
+        assert not matches('public', 'audit', ['audit'])
+
+    def test_table_wildcards(self):
+        """Testa curingas no schema e no nome da tabela"""
+        assert matches('public', 'orders_2024', ['public.orders_*'])
+        assert not matches('public', 'users', ['public.orders_*'])
+        assert matches('sales', 'orders', ['*.orders'])
+
+    def test_case_sensitive(self):
+        """Testa que a comparação diferencia maiúsculas"""
+        assert not matches('public', 'Orders', ['public.orders'])
+
+
+class TestPlanSubset:
+    """Testes para plan_subset"""
+
+    def test_no_filters(self, mock_logger):
+        """Testa que sem filtros não há plano nem consulta à origem"""
+        with patch('pg_mirror.subset.list_tables') as mock_tables:
+            assert plan_subset(SOURCE, 'db', options(), mock_logger) is None
+        mock_tables.assert_not_called()
+
+    @patch('pg_mirror.subset.list_foreign_keys', return_value=[])
+    @patch('pg_mirror.subset.list_tables', return_value=TABLES)
+    def test_include_and_exclude(self, mock_tables, mock_fks, mock_logger):
+        """Testa que include limita e exclude remove (sequências não entram)"""
+        plan = plan_subset(SOURCE, 'db', options(include=['public'], exclude=['public.users']),
+                           mock_logger)
+
+        assert plan.excluded == [('audit', 'log'), ('public', 'users')]
+        assert plan.predicates == {}
+
+    @patch('pg_mirror.subset.list_foreign_keys', return_value=[])
+    @patch('pg_mirror.subset.list_tables', return_value=TABLES)
+    def test_predicates_excluded_from_dump(self, mock_tables, mock_fks, mock_logger):
+        """Testa que tabelas com WHERE ficam fora dos dados do dump"""
+        where = {('public', 'orders'): 'id > 10', ('audit', 'log'): 'true'}
+        plan = plan_subset(SOURCE, 'db', options(exclude=['audit'], where=where), mock_logger)
+
+        assert plan.predicates == {('public', 'orders'): 'id > 10'}
+        assert plan.exclude_data == [('audit', 'log'), ('public', 'orders')]
+        mock_logger.warning.assert_called_once()
+        assert plan.toc_filter is None
+
+    @patch('pg_mirror.subset.list_foreign_keys', return_value=FOREIGN_KEYS)
+    @patch('pg_mirror.subset.list_tables', return_value=TABLES)
+    def test_foreign_keys_to_filtered_tables_skipped(self, mock_tables, mock_fks, mock_logger):
+        """Testa que FKs de tabelas com dados para tabelas filtradas não são criadas"""
+        plan = plan_subset(SOURCE, 'db', options(exclude=['audit', 'public.users'],
+                                                 where={('public', 'orders'): 'id > 10'}),
+                           mock_logger)
+
+        # A FK de audit.log fica: a tabela está vazia no destino
+        assert plan.skipped_fks == [('public', 'orders', 'orders_user_fk'),
+                                    ('public', 'orders', 'orders_parent_fk')]
+        assert 'orders_user_fk' in mock_logger.warning.call_args[0][0]
+
+        entries = ArchiveToc.parse(
+            "2890; 2606 16400 FK CONSTRAINT public orders orders_user_fk postgres\n"
+            "2891; 2606 16401 FK CONSTRAINT audit log log_user_fk postgres\n"
+            "2892; 2606 16402 CONSTRAINT public orders orders_user_fk postgres\n"
+        ).select(plan.toc_filter).entries
+        assert [e.dump_id for e in entries] == [2891, 2892]
+
+
+class TestCopyFiltered:
+    """Testes para copy_filtered"""
+
+    @patch('pg_mirror.subset.copy_table', return_value=2048)
+    def test_truncates_and_copies_predicate(self, mock_copy, mock_logger):
+        """Testa cópia com predicado, esvaziando a tabela na mesma transação"""
+        result = copy_filtered(SOURCE, TARGET, 'db', ('public', 'orders'), 'id > 10', mock_logger)
+
+        assert result is True
+        assert mock_copy.call_args[0][3] == ('public', 'orders')
+        assert mock_copy.call_args[1] == {'predicate': 'id > 10', 'truncate': True}
+
+    @patch('pg_mirror.subset.copy_table', return_value=0)
+    def test_empty_result_succeeds(self, mock_copy, mock_logger):
+        """Testa que uma cópia sem linhas é sucesso"""
+        assert copy_filtered(SOURCE, TARGET, 'db', ('public', 'orders'), 'false',
+                             mock_logger) is True
+
+    @patch('pg_mirror.subset.copy_table', return_value=None)
+    def test_copy_error(self, mock_copy, mock_logger):
+        """Testa que erro no COPY falha a carga da tabela"""
+        assert copy_filtered(SOURCE, TARGET, 'db', ('public', 'orders'), 'x > 1',
+                             mock_logger) is False
+
+
+class TestLoadFiltered:
+    """Testes para load_filtered"""
+
+    def test_nothing_to_copy(self, mock_logger):
+        """Testa carga sem tabelas filtradas"""
+        assert load_filtered(SOURCE, TARGET, 'db', {}, 4, mock_logger) is True
+
+    @patch('pg_mirror.subset.copy_filtered')
+    def test_fails_if_any_copy_fails(self, mock_copy, mock_logger):
+        """Testa que a falha de uma tabela falha a carga toda"""
+        mock_copy.side_effect = lambda s, t, db, table, pred, logger: table[1] != 'b'
+        predicates = {('public', 'a'): 'true', ('public', 'b'): 'true'}
+
+        assert load_filtered(SOURCE, TARGET, 'db', predicates, 2, mock_logger) is False
+        assert mock_copy.call_count == 2
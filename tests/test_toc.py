@@ -0,0 +1,142 @@
+"""
+Testes para o módulo pg_mirror.toc
+"""
+import os
+import subprocess
+from unittest.mock import patch, MagicMock
+from pg_mirror.database import QueryError
+from pg_mirror.toc import (
+    ArchiveToc,
+    ObjectSizes,
+    collect_object_sizes,
+    write_ordered_list
+)
+
+
+TOC_TEXT = """;
+; Archive created at 2025-11-05 10:00:00 UTC
+;     dbname: app
+;
+215; 1259 16385 TABLE public small postgres
+216; 1259 16390 TABLE public big postgres
+3001; 0 16385 TABLE DATA public small postgres
+3002; 0 16390 TABLE DATA public big postgres
+3003; 0 0 SEQUENCE SET public small_id_seq postgres
+2890; 2606 16400 CONSTRAINT public small small_pkey postgres
+2891; 1259 16401 INDEX public big_created_idx postgres
+2892; 2606 16402 FK CONSTRAINT public big big_small_fk postgres
+"""
+
+SIZES = ObjectSizes(
+    tables={('public', 'small'): 10, ('public', 'big'): 5000},
+    index_tables={('public', 'big_created_idx'): 'big', ('public', 'small_pkey'): 'small'},
+)
+
+
+class TestArchiveToc:
+    """Testes para ArchiveToc"""
+
+    def test_parse_entries(self):
+        """Testa interpretação das linhas do pg_restore -l"""
+        toc = ArchiveToc.parse(TOC_TEXT)
+
+        assert len(toc.header) == 4
+        data = [e for e in toc.entries if e.is_data]
+        assert [(e.schema, e.name) for e in data] == [('public', 'small'), ('public', 'big')]
+        constraint = next(e for e in toc.entries if e.desc == 'CONSTRAINT')
+        assert (constraint.table, constraint.name) == ('small', 'small_pkey')
+        fk = next(e for e in toc.entries if e.dump_id == 2892)
+        assert (fk.desc, fk.table, fk.name) == ('FK CONSTRAINT', 'big', 'big_small_fk')
+
+    def test_with_sizes(self):
+        """Testa pesos de dados, índices e constraints"""
+        toc = ArchiveToc.parse(TOC_TEXT).with_sizes(SIZES)
+        sizes = {e.dump_id: e.size for e in toc.entries}
+
+        assert sizes[3002] == 5000
+        assert sizes[2891] == 5000  # Índice pesa a tabela que varre
+        assert sizes[2890] == 10
+
+    def test_ordered_largest_first_in_place(self):
+        """Testa reordenação dentro das posições de cada classe"""
+        original = ArchiveToc.parse(TOC_TEXT)
+        ordered = original.with_sizes(SIZES).ordered()
+        ids = [e.dump_id for e in ordered.entries]
+
+        assert ids == [215, 216, 3002, 3001, 3003, 2891, 2890, 2892]
+        assert [e.dump_id for e in original.entries][0:2] == [215, 216]
+
+    def test_render_roundtrip(self):
+        """Testa que o texto gerado mantém as linhas originais"""
+        rendered = ArchiveToc.parse(TOC_TEXT).render()
+
+        assert rendered.strip() == TOC_TEXT.strip()
+
+
+class TestCollectObjectSizes:
+    """Testes para collect_object_sizes"""
+
+    @patch('pg_mirror.toc.run_query')
+    def test_collects(self, mock_query, mock_logger):
+        """Testa coleta de tamanhos e tabela de cada índice"""
+        mock_query.side_effect = [
+            [('public', 'big', '5000')],
+            [('public', 'big_created_idx', 'big', '5000')],
+        ]
+        source = {'host': 'h', 'port': 5432, 'user': 'u', 'password': 'pw'}
+
+        sizes = collect_object_sizes(source, 'app', mock_logger)
+
+        assert sizes.table_size('public', 'big') == 5000
+        assert sizes.index_tables[('public', 'big_created_idx')] == 'big'
+
+    @patch('pg_mirror.toc.run_query', side_effect=QueryError('denied'))
+    def test_failure_returns_none(self, mock_query, mock_logger):
+        """Testa que falha apenas desativa a ordenação"""
+        source = {'host': 'h', 'port': 5432, 'user': 'u', 'password': 'pw'}
+
+        assert collect_object_sizes(source, 'app', mock_logger) is None
+
+
+class TestWriteOrderedList:
+    """Testes para write_ordered_list"""
+
+    @patch('subprocess.run')
+    def test_writes_list(self, mock_run, mock_logger):
+        """Testa geração do arquivo -L"""
+        mock_run.return_value = MagicMock(stdout=TOC_TEXT)
+
+        path = write_ordered_list('/tmp/app.dump', SIZES, mock_logger)
+        try:
+            with open(path, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        finally:
+            os.unlink(path)
+
+        assert mock_run.call_args[0][0] == ['pg_restore', '-l', '/tmp/app.dump']
+        assert lines.index('3002; 0 16390 TABLE DATA public big postgres') < \
+            lines.index('3001; 0 16385 TABLE DATA public small postgres')
+
+    @patch('subprocess.run')
+    def test_keep_without_sizes(self, mock_run, mock_logger):
+        """Testa lista na ordem do arquivo sem as entradas recusadas"""
+        mock_run.return_value = MagicMock(stdout=TOC_TEXT)
+
+        path = write_ordered_list('/tmp/app.dump', None, mock_logger,
+                                  keep=lambda entry: entry.desc != 'FK CONSTRAINT')
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        finally:
+            os.unlink(path)
+
+        assert 'big_small_fk' not in text
+        assert text.index('TABLE DATA public small') < text.index('TABLE DATA public big')
+
+    @patch('subprocess.run')
+    def test_unreadable_toc(self, mock_run, mock_logger):
+        """Testa fallback para a ordem padrão"""
+        mock_run.side_effect = subprocess.CalledProcessError(1, 'pg_restore', stderr='bad')
+
+        assert write_ordered_list('/tmp/app.dump', SIZES, mock_logger) is None
+        mock_logger.warning.assert_called_once()